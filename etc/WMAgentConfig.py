@@ -101,6 +101,8 @@ config.JobStateMachine.jobSummaryDBName = jobSummaryDBName
 config.JobStateMachine.summaryStatsDBName = summaryStatsDBName
 # Amount of documents allowed in the ChangeState module for bulk commits
 config.JobStateMachine.maxBulkCommitDocs = 250
+# Amount of bulk commits of maxBulkCommitDocs documents running concurrently
+config.JobStateMachine.bulkCommitInFlight = 4
 # total allowed serialized size for the FJR document that is uploaded to wmagent_jobdump/fwjrs
 # NOTE: this needs to be in sync with CouchDB couchdb.max_document_size parameter
 # see: https://docs.couchdb.org/en/latest/config/couchdb.html#couchdb/max_document_size
@@ -121,6 +123,13 @@ config.BossAir.nCondorProcesses = 1
 config.BossAir.submitWMSMode = True
 config.BossAir.acctGroup = glideInAcctGroup
 config.BossAir.acctGroupUser = glideInAcctGroupUser
+# incremental job tracking from the schedd job event log (its EVENT_LOG parameter),
+# with a full schedd query every fullTrackInterval seconds. The job locations come
+# from the job ad information events, the schedd needs:
+#   EVENT_LOG_JOB_AD_INFORMATION_ATTRS = JobStatus, MachineAttrGLIDEIN_CMSSite0
+# config.BossAir.condorEventLog = "/var/log/condor/EventLog"
+# config.BossAir.condorEventLogState = os.path.join(workDirectory, "BossAir/condorEventLog.pkl")
+# config.BossAir.fullTrackInterval = 3600
 
 config.section_("CoreDatabase")
 config.CoreDatabase.connectUrl = databaseUrl
@@ -224,6 +233,8 @@ config.JobCreator.UpdateFromResourceControl = True
 # disk, and should probably NOT be run on the same disk as the JobArchiver
 config.JobCreator.jobCacheDir = config.General.workDir + "/JobCache"
 config.JobCreator.defaultJobType = "Processing"
+# job objects persistency: "pickle" (one job.pkl per job) or "sqlite" (one JobStore.db per JobCollection)
+config.JobCreator.jobStoreBackend = "pickle"
 config.JobCreator.workerThreads = 1
 # glidein restrictions used for resource estimation (per core)
 config.JobCreator.GlideInRestriction = {"MinWallTimeSecs": 1 * 3600,  # 1h
@@ -244,6 +255,8 @@ config.JobSubmitter.maxJobsPerPoll = 1000
 config.JobSubmitter.maxJobsToCache = 100000  # used to be 50k
 config.JobSubmitter.cacheRefreshSize = 30000  # set -1 if cache need to refresh all the time.
 config.JobSubmitter.skipRefreshCount = 20  # (If above the threshold meet, cache will updates every 20 polling cycle) 120 * 20 = 40 minutes
+config.JobSubmitter.incrementalRefresh = False  # only pull jobs created since the last cache refresh
+config.JobSubmitter.fullRefreshInterval = 10  # number of incremental refreshes between two full cache refreshes
 config.JobSubmitter.submitScript = os.path.join(os.environ["WMCORE_ROOT"], submitScript)
 config.JobSubmitter.extraMemoryPerCore = 500  # in MB
 config.JobSubmitter.drainGraceTime = 2 * 24 * 60 * 60  # in seconds
@@ -306,6 +319,10 @@ config.JobArchiver.componentDir = config.General.workDir + "/JobArchiver"
 config.JobArchiver.logLevel = globalLogLevel
 config.JobArchiver.numberOfJobsToCluster = 1000
 config.JobArchiver.numberOfJobsToArchive = 10000
+# job cache dirs are appended to one indexed archive per JobCluster, packed by archiveThreads
+# threads with the gz (gzip) or zst (zstandard) codec; use bin/wmagent-job-logs to extract a job
+config.JobArchiver.archiveCodec = "gz"
+config.JobArchiver.archiveThreads = 4
 # This is now OPTIONAL, it defaults to the componentDir
 # HOWEVER: Is is HIGHLY recommended that you do NOT run this on the same
 # disk as the JobCreator
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+"""
+File       : PathTrie.py
+Description: Provides a compact trie of file system like paths (e.g. LFNs), where
+             the paths sharing a prefix share the nodes of their common directories,
+             with a counter for every path stored, and prefix lookups walking the
+             path components only once.
+"""
+
+import sys
+
+# key of the path counter within a node, it cannot collide with a path component
+_COUNT = None
+
+
+def splitPath(path):
+    """
+    Split a path into its non empty components, i.e. ignoring leading,
+    trailing and repeated slashes
+    :param path: a path string, e.g. '/store/unmerged/Run2016B/'
+    :return: list of components, e.g. ['store', 'unmerged', 'Run2016B']
+    """
+    return [part for part in path.split('/') if part]
+
+
+class PathTrie(object):
+    """
+    A trie of paths, made of nested dictionaries keyed by the path components.
+    Components are interned, such that their strings are shared by all the
+    tries of the process.
+    """
+
+    def __init__(self, paths=None):
+        """
+        :param paths: optional iterable of paths to add to the trie
+        """
+        self.root = {}
+        self.numPaths = 0
+        self.numNodes = 0
+        for path in paths or []:
+            self.add(path)
+
+    def add(self, path, count=1):
+        """
+        Add a path to the trie, or increase its counter if already there
+        :param path: path string
+        :param count: the value to increase the path counter with
+        :return: the path counter
+        """
+        node = self.root
+        for part in splitPath(path):
+            child = node.get(part)
+            if child is None:
+                child = node[sys.intern(part)] = {}
+                self.numNodes += 1
+            node = child
+        if _COUNT not in node:
+            node[_COUNT] = 0
+            self.numPaths += 1
+        node[_COUNT] += count
+        return node[_COUNT]
+
+    def count(self, path):
+        """
+        Return the counter of a path, 0 if the path is not in the trie
+        """
+        node = self._getNode(path)
+        return node.get(_COUNT, 0) if node else 0
+
+    def hasPrefixOf(self, path):
+        """
+        Return True if the path, or one of its parent directories, is in the trie
+        """
+        node = self.root
+        for part in splitPath(path):
+            if _COUNT in node:
+                return True
+            node = node.get(part)
+            if node is None:
+                return False
+        return _COUNT in node
+
+    def overlaps(self, path):
+        """
+        Return True if the path, one of its parent directories or one of its
+        sub-directories is in the trie, i.e. if removing the path would remove
+        (part of) a path in the trie
+        """
+        node = self.root
+        for part in splitPath(path):
+            if _COUNT in node:
+                return True
+            node = node.get(part)
+            if node is None:
+                return False
+        # any node below the path leads to a path of the trie
+        return bool(node)
+
+    def paths(self):
+        """
+        Generator of the (path, counter) tuples of all the paths in the trie
+        """
+        stack = [('', self.root)]
+        while stack:
+            prefix, node = stack.pop()
+            for part, child in node.items():
+                if part is _COUNT:
+                    yield prefix or '/', child
+                else:
+                    stack.append(('%s/%s' % (prefix, part), child))
+
+    def _getNode(self, path):
+        node = self.root
+        for part in splitPath(path):
+            node = node.get(part)
+            if node is None:
+                return None
+        return node
+
+    def __contains__(self, path):
+        node = self._getNode(path)
+        return node is not None and _COUNT in node
+
+    def __len__(self):
+        return self.numPaths
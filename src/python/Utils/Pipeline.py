@@ -4,11 +4,15 @@ Description: Provides 2 basic classes:
              - Functor:  A class to create function calls from a function object
                          and arbitrary number of arguments
              - Pipeline: A class to provide building blocks for creating functional
-                         pipelines for cumulative execution on an arbitrary object
+                         pipelines for cumulative execution on an arbitrary object,
+                         or on many objects concurrently
 """
 
 from builtins import object
+from concurrent.futures import ThreadPoolExecutor
 from functools import reduce
+import threading
+import time
 
 
 class Functor(object):
@@ -87,7 +91,7 @@ class Pipeline(object):
     #    [2]
     #    https://gitlab.com/mc706/functional-pipeline
 
-    def __init__(self, funcLine=None, name=None):
+    def __init__(self, funcLine=None, name=None, stageLimits=None):
         """
         :funcLine: A list of functions or Functors of function + arguments (see
                    the Class definition above) that are to be applied sequentially
@@ -122,9 +126,22 @@ class Pipeline(object):
         adder res: 19
         adder kwargs: {'update': True}
         adder res: 27
+
+        :stageLimits: An optional dictionary with the maximum number of objects
+                   going through a stage at the same time, when the pipeline is
+                   run from many threads (e.g. with runConcurrent), keyed by the
+                   name of the stage function. The value can also be a semaphore,
+                   to share the limit with the stages of other pipelines.
         """
         self.funcLine = funcLine or []
         self.name = name
+        self.stageLimits = {}
+        for stage, limit in (stageLimits or {}).items():
+            if isinstance(limit, int):
+                limit = threading.BoundedSemaphore(limit)
+            self.stageLimits[stage] = limit
+        self.statsLock = threading.Lock()
+        self.stageStats = {}
 
     def getPipelineName(self):
         """
@@ -133,5 +150,78 @@ class Pipeline(object):
         name = self.name or "Unnamed Pipeline"
         return name
 
+    @staticmethod
+    def getStageName(functor):
+        """
+        __getStageName__
+
+        Return the name of the function called by a stage of the pipeline
+        """
+        func = getattr(functor, 'func', functor)
+        return getattr(func, '__name__', repr(func))
+
     def run(self, obj):
-        return reduce(lambda obj, functor: functor(obj), self.funcLine, obj)
+        return reduce(lambda obj, functor: self._runStage(functor, obj), self.funcLine, obj)
+
+    def _runStage(self, functor, obj):
+        """
+        Apply a stage of the pipeline to the object, within the stage
+        concurrency limit, and account for its execution time and errors
+        """
+        stage = self.getStageName(functor)
+        limit = self.stageLimits.get(stage)
+        if limit is not None:
+            limit.acquire()
+        failed = True
+        tStart = time.time()
+        try:
+            obj = functor(obj)
+            failed = False
+        finally:
+            elapsed = time.time() - tStart
+            if limit is not None:
+                limit.release()
+            with self.statsLock:
+                stats = self.stageStats.setdefault(stage, {'calls': 0, 'errors': 0, 'time': 0.0})
+                stats['calls'] += 1
+                stats['errors'] += int(failed)
+                stats['time'] += elapsed
+        return obj
+
+    def runConcurrent(self, objs, maxWorkers=10):
+        """
+        __runConcurrent__
+
+        Run many objects through the pipeline, on a pool of maxWorkers threads.
+        Errors are isolated: an exception raised by a stage stops the pipeline
+        for that object only.
+        :param objs: an iterable of objects
+        :param maxWorkers: the maximum number of objects in the pipeline at the same time
+        :return: a list of (result, exception) tuples, in the order of the objects,
+                 where exception is None if the object went through the whole pipeline
+        """
+        def runObject(obj):
+            try:
+                return self.run(obj), None
+            except Exception as ex:
+                return None, ex
+
+        with ThreadPoolExecutor(max_workers=maxWorkers) as executor:
+            return list(executor.map(runObject, objs))
+
+    def getStageStats(self):
+        """
+        __getStageStats__
+
+        Return the number of calls, errors and the total execution time in
+        seconds of every stage of the pipeline, keyed by the stage name
+        """
+        with self.statsLock:
+            return {stage: dict(stats) for stage, stats in self.stageStats.items()}
+
+    def resetStageStats(self):
+        """
+        __resetStageStats__
+        """
+        with self.statsLock:
+            self.stageStats = {}
@@ -225,6 +225,7 @@ class AgentStatusPoller(BaseWorkerThread):
           3. couchdb active tasks and its replications
           4. check the disk usage
           5. check the number of couch processes
+          6. hit/miss/eviction counters of the Service memory cache
 
         :return: a dict with all the info collected
         """
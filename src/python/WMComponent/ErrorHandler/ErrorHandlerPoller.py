@@ -35,7 +35,7 @@ from Utils.wmcoreDTools import resetWatchdogTimer, moduleName
 from WMCore.ACDC.DataCollectionService import DataCollectionService
 from WMCore.DAOFactory import DAOFactory
 from WMCore.Database.CouchUtils import CouchConnectionError
-from WMCore.FwkJobReport.Report import Report
+from WMCore.FwkJobReport.Report import Report, loadErrorSummaries
 from WMCore.JobStateMachine.ChangeState import ChangeState
 from WMCore.WMBS.Job import Job
 from WMCore.WMException import WMException
@@ -232,32 +232,35 @@ class ErrorHandlerPoller(BaseWorkerThread):
         passJobs = []
         exhaustJobs = []
 
+        # the error summaries written by the JobAccountant spare loading the whole reports
+        summaries = loadErrorSummaries([job['fwjr_path'] for job in jobList if job['fwjr_path']])
+        logging.info("Found FWJR error summaries for %d out of %d jobs", len(summaries), len(jobList))
+
         for job in jobList:
-            report = Report()
             reportPath = job['fwjr_path']
             if reportPath is None:
                 logging.error("No FWJR in job %i, ErrorHandler can't process it.\n Passing it to cooloff.", job['id'])
                 cooloffJobs.append(job)
                 continue
-            if not os.path.isfile(reportPath):
+            summary = summaries.get(reportPath)
+            if summary is None and not os.path.isfile(reportPath):
                 logging.error(
                     "Failed to find FWJR for job %i in location %s.\n Passing it to cooloff.", job['id'], reportPath)
                 cooloffJobs.append(job)
                 continue
             try:
-                report.load(reportPath)
+                if summary is None:
+                    report = Report()
+                    report.load(reportPath)
+                    summary = report.getErrorSummary()
                 # First let's check the time conditions
-                times = report.getFirstStartLastStop()
-                startTime = None
-                stopTime = None
-                if times is not None:
-                    startTime = times['startTime']
-                    stopTime = times['stopTime']
+                startTime = summary['startTime']
+                stopTime = summary['stopTime']
 
                 # correct the location if the original location is different from recorded in wmbs
                 # WARNING: we are not updating job location in wmbs only updating in couchdb by doing this.
                 # If location in wmbs needs to be updated, it should happen in JobAccountant.
-                locationFromFWJR = report.getSiteName()
+                locationFromFWJR = summary['siteName']
                 if locationFromFWJR:
                     job["location"] = locationFromFWJR
                     job["site_cms_name"] = locationFromFWJR
@@ -271,15 +274,15 @@ class ErrorHandlerPoller(BaseWorkerThread):
                     exhaustJobs.append(job)
                     continue
 
-                if len([x for x in report.getExitCodes() if x in self.exitCodesNoRetry]):
-                    msg = "Job %i exhausted due to a bad exit code (%s)" % (job['id'], str(report.getExitCodes()))
+                exitCodes = summary['exitCodes']
+                if len([x for x in exitCodes if x in self.exitCodesNoRetry]):
+                    msg = "Job %i exhausted due to a bad exit code (%s)" % (job['id'], str(exitCodes))
                     logging.debug(msg)
                     exhaustJobs.append(job)
                     continue
 
-                if len([x for x in report.getExitCodes() if x in self.passCodes]):
-                    msg = "Job %i restarted immediately due to an exit code (%s)" % (job['id'],
-                                                                                     str(report.getExitCodes()))
+                if len([x for x in exitCodes if x in self.passCodes]):
+                    msg = "Job %i restarted immediately due to an exit code (%s)" % (job['id'], str(exitCodes))
                     logging.debug(msg)
                     passJobs.append(job)
                     continue
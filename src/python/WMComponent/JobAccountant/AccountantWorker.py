@@ -38,6 +38,92 @@ class AccountantWorkerException(WMException):
     """
 
 
+def loadDigestedReport(jobReportPath, errorSummary=False):
+    """
+    _loadDigestedReport_
+
+    Load a framework job report and extract what the AccountantWorker needs
+    from it: the task status and the output files. Returns a tuple with the
+    report and a dictionary of these, the files keeping their references to
+    the report. See loadJobReport for the errorSummary flag.
+    """
+    jobReport = AccountantWorker.loadJobReport(jobReportPath, errorSummary=errorSummary)
+    digest = {"taskSuccessful": jobReport.taskSuccessful(),
+              "logArchFiles": jobReport.getAllFilesFromStep(step='logArch1')}
+    if digest["taskSuccessful"]:
+        digest["files"] = jobReport.getAllFiles()
+    return jobReport, digest
+
+
+def resolveDBSParents(lfns, getParentInfo, cache=None):
+    """
+    _resolveDBSParents_
+
+    Find the merged DBS parents of many files, going up through the unmerged
+    (redneck) ancestors until a merged file is found. The ancestry is walked
+    breadth-first, with a single parentage lookup per level for all the LFNs
+    of that level.
+
+    :param lfns: iterable with the LFNs to find the parents for
+    :param getParentInfo: function taking a list of LFNs and returning a list
+        of dictionaries with the child_lfn, lfn, merged, gplfn and gpmerged keys
+    :param cache: optional dictionary of {lfn: set of parents}, updated with
+        every LFN resolved (including the ancestors), such that it can be used
+        by further calls
+    :return: a dictionary of {lfn: set of parent LFNs}
+    """
+    cache = {} if cache is None else cache
+    # LFN -> (merged parents, unmerged grandparents to get the parents from)
+    pending = {}
+    frontier = set(lfn for lfn in lfns if lfn not in cache)
+    while frontier:
+        rowsByLFN = collections.defaultdict(list)
+        for parentInfo in getParentInfo(list(frontier)):
+            rowsByLFN[parentInfo['child_lfn']].append(parentInfo)
+        nextFrontier = set()
+        for lfn in frontier:
+            newParents, ancestors = set(), set()
+            for parentInfo in rowsByLFN[lfn]:
+                # This will catch straight to merge files that do not have redneck
+                # parents.  We will mark the straight to merge file from the job
+                # as a child of the merged parent.
+                if int(parentInfo["merged"]) == 1 and not parentInfo["lfn"].startswith("/store/unmerged/"):
+                    newParents.add(parentInfo["lfn"])
+                elif parentInfo['gpmerged'] is None:
+                    continue
+                # Handle the files that result from merge jobs that aren't redneck
+                # children.
+                elif int(parentInfo["gpmerged"]) == 1 and not parentInfo["gplfn"].startswith("/store/unmerged/"):
+                    newParents.add(parentInfo["gplfn"])
+                # If that didn't work, we've reached the great-grandparents,
+                # which get resolved in the next level
+                else:
+                    ancestors.add(parentInfo['gplfn'])
+            pending[lfn] = (newParents, ancestors)
+            nextFrontier.update(gplfn for gplfn in ancestors if gplfn not in cache and gplfn not in pending)
+        frontier = nextFrontier
+
+    # now resolve the pending LFNs from the deepest ancestors, without recursion
+    for lfn in list(pending):
+        stack = [lfn]
+        while stack:
+            current = stack[-1]
+            if current in cache:
+                stack.pop()
+                continue
+            newParents, ancestors = pending[current]
+            unresolved = [gplfn for gplfn in ancestors if gplfn not in cache and gplfn not in stack]
+            if unresolved:
+                stack.extend(unresolved)
+                continue
+            for gplfn in ancestors:
+                newParents.update(cache.get(gplfn, set()))
+            cache[current] = newParents
+            stack.pop()
+
+    return {lfn: cache[lfn] for lfn in lfns}
+
+
 class AccountantWorker(WMConnectionBase):
     """
     Class that actually does the work of parsing FWJRs for the Accountant
@@ -61,6 +147,7 @@ class AccountantWorker(WMConnectionBase):
         self.bulkParentageAction = self.daofactory(classname="Files.AddBulkParentage")
         self.getJobTypeAction = self.daofactory(classname="Jobs.GetType")
         self.getParentInfoAction = self.daofactory(classname="Files.GetParentAndGrandParentInfo")
+        self.getParentInfoByLFNsAction = self.daofactory(classname="Files.GetParentAndGrandParentInfoByLFNs")
         self.setParentageByJob = self.daofactory(classname="Files.SetParentageByJob")
         self.setParentageByMergeJob = self.daofactory(classname="Files.SetParentageByMergeJob")
         self.setFileRunLumi = self.daofactory(classname="Files.AddRunLumi")
@@ -108,6 +195,9 @@ class AccountantWorker(WMConnectionBase):
         self.fwjrCouchDB = None
         self.localWMStats = WMStatsWriter(config.TaskArchiver.localWMStatsURL, appName="WMStatsAgent")
 
+        # write the error summaries of the failed jobs if the ErrorHandler reads them
+        self.errorSummary = hasattr(config, "ErrorHandler") and getattr(config.ErrorHandler, 'readFWJR', False)
+
         # Hold data for later commital
         self.dbsFilesToCreate = []
         self.wmbsFilesToBuild = []
@@ -119,6 +209,7 @@ class AccountantWorker(WMConnectionBase):
         self.parentageBinds = []
         self.parentageBindsForMerge = []
         self.jobsWithSkippedFiles = {}
+        self.dbsParentsCache = {}
         self.count = 0
         self.datasetAlgoID = collections.deque(maxlen=1000)
         self.datasetAlgoPaths = collections.deque(maxlen=1000)
@@ -144,31 +235,34 @@ class AccountantWorker(WMConnectionBase):
         self.parentageBinds = []
         self.parentageBindsForMerge = []
         self.jobsWithSkippedFiles = {}
+        self.dbsParentsCache = {}
         gc.collect()
         return
 
-    def loadJobReport(self, jobReportPath):
+    @staticmethod
+    def loadJobReport(jobReportPath, errorSummary=False):
         """
         _loadJobReport_
 
         Given a framework job report on disk, load it and return a
         FwkJobReport instance.  If there is any problem loading or parsing the
-        framework job report return None.
+        framework job report return None. With errorSummary, the error summary
+        of a failed job report gets written next to it, for the ErrorHandler.
         """
         # The jobReportPath may be prefixed with "file://" which needs to be
         # removed so it doesn't confuse the FwkJobReport() parser.
         if not jobReportPath:
             logging.error("Bad FwkJobReport Path: %s", jobReportPath)
-            return self.createMissingFWKJR(99999, "FWJR path is empty")
+            return AccountantWorker.createMissingFWKJR(99999, "FWJR path is empty")
 
         jobReportPath = jobReportPath.replace("file://", "")
         if not os.path.exists(jobReportPath):
             logging.error("Bad FwkJobReport Path: %s", jobReportPath)
-            return self.createMissingFWKJR(99999, 'Cannot find file in jobReport path: %s' % jobReportPath)
+            return AccountantWorker.createMissingFWKJR(99999, 'Cannot find file in jobReport path: %s' % jobReportPath)
 
         if os.path.getsize(jobReportPath) == 0:
             logging.error("Empty FwkJobReport: %s", jobReportPath)
-            return self.createMissingFWKJR(99998, 'jobReport of size 0: %s ' % jobReportPath)
+            return AccountantWorker.createMissingFWKJR(99998, 'jobReport of size 0: %s ' % jobReportPath)
 
         jobReport = Report()
 
@@ -176,15 +270,21 @@ class AccountantWorker(WMConnectionBase):
             jobReport.load(jobReportPath)
         except UnicodeDecodeError:
             logging.error("Hit UnicodeDecodeError exception while loading jobReport: %s", jobReportPath)
-            return self.createMissingFWKJR(99997, 'Found undecodable data in jobReport: {}'.format(jobReportPath))
+            return AccountantWorker.createMissingFWKJR(99997, 'Found undecodable data in jobReport: {}'.format(jobReportPath))
         except Exception as ex:
             msg = "Error loading jobReport: {}\nDetails: {}".format(jobReportPath, str(ex))
             logging.error(msg)
-            return self.createMissingFWKJR(99997, 'Cannot load jobReport')
+            return AccountantWorker.createMissingFWKJR(99997, 'Cannot load jobReport')
 
         if not jobReport.listSteps():
             logging.error("FwkJobReport with no steps: %s", jobReportPath)
-            return self.createMissingFWKJR(99997, 'jobReport with no steps: %s ' % jobReportPath)
+            return AccountantWorker.createMissingFWKJR(99997, 'jobReport with no steps: %s ' % jobReportPath)
+
+        if errorSummary and not jobReport.taskSuccessful():
+            try:
+                jobReport.persistErrorSummary(jobReportPath)
+            except Exception as ex:
+                logging.warning("Failed to write the error summary of %s: %s", jobReportPath, str(ex))
 
         return jobReport
 
@@ -226,11 +326,12 @@ class AccountantWorker(WMConnectionBase):
             logging.info("Handling %s", job["fwjr_path"])
 
             # Load the job and set the ID
-            fwkJobReport = self.loadJobReport(job["fwjr_path"])
+            fwkJobReport, digest = loadDigestedReport(job["fwjr_path"], errorSummary=self.errorSummary)
             fwkJobReport.setJobID(job['id'])
 
             jobSuccess = self.handleJob(jobID=job["id"],
-                                        fwkJobReport=fwkJobReport)
+                                        fwkJobReport=fwkJobReport,
+                                        digest=digest)
 
             if self.returnJobReport:
                 returnList.append({'id': job["id"], 'jobSuccess': jobSuccess,
@@ -372,39 +473,27 @@ class AccountantWorker(WMConnectionBase):
         """
         _findDBSParents_
 
-        Find the parent of the file in DBS
-        This is meant to be called recursively
-        """
-        parentsInfo = self.getParentInfoAction.execute([lfn],
-                                                       conn=self.getDBConn(),
-                                                       transaction=self.existingTransaction())
-        newParents = set()
-        logging.debug("Found %d potential parents for lfn: %s", len(parentsInfo), lfn)
-        for parentInfo in parentsInfo:
-            # This will catch straight to merge files that do not have redneck
-            # parents.  We will mark the straight to merge file from the job
-            # as a child of the merged parent.
-            if int(parentInfo["merged"]) == 1 and not parentInfo["lfn"].startswith("/store/unmerged/"):
-                newParents.add(parentInfo["lfn"])
-
-            elif parentInfo['gpmerged'] is None:
-                continue
+        Find the parents of the file in DBS
+        """
+        return self.findDBSParentsBulk([lfn])[lfn]
 
-            # Handle the files that result from merge jobs that aren't redneck
-            # children.  We have to setup parentage and then check on whether or
-            # not this file has any redneck children and update their parentage
-            # information.
-            elif int(parentInfo["gpmerged"]) == 1 and not parentInfo["gplfn"].startswith("/store/unmerged/"):
-                newParents.add(parentInfo["gplfn"])
+    def findDBSParentsBulk(self, lfns):
+        """
+        _findDBSParentsBulk_
 
-            # If that didn't work, we've reached the great-grandparents
-            # And we have to work via recursion
-            else:
-                parentSet = self.findDBSParents(lfn=parentInfo['gplfn'])
-                for parent in parentSet:
-                    newParents.add(parent)
+        Find the parents in DBS of many files, with one database query per
+        level of ancestry. Files resolved are kept for the rest of the batch.
+        :return: a dictionary of {lfn: set of parent LFNs}
+        """
+        def getParentInfo(childLFNs):
+            return self.getParentInfoByLFNsAction.execute(childLFNs,
+                                                          conn=self.getDBConn(),
+                                                          transaction=self.existingTransaction())
 
-        return newParents
+        parents = resolveDBSParents(lfns, getParentInfo, cache=self.dbsParentsCache)
+        logging.debug("Found parents for %d lfns, with %d lfns resolved in this batch",
+                      len(parents), len(self.dbsParentsCache))
+        return parents
 
     def addFileToWMBS(self, jobType, fwjrFile, jobMask, task, jobID=None):
         """
@@ -434,15 +523,24 @@ class AccountantWorker(WMConnectionBase):
 
         return wmbsFile
 
-    def handleJob(self, jobID, fwkJobReport):
+    def handleJob(self, jobID, fwkJobReport, digest=None):
         """
         _handleJob_
 
         Figure out if a job was successful or not, handle it appropriately
         (parse FWJR, update WMBS) and return the success status as a boolean
 
+        The optional digest is the one from loadDigestedReport, it saves
+        extracting the files from the report again.
         """
-        jobSuccess = fwkJobReport.taskSuccessful()
+        digest = digest or {}
+
+        def logArchFiles():
+            if "logArchFiles" in digest:
+                return digest["logArchFiles"]
+            return fwkJobReport.getAllFilesFromStep(step='logArch1')
+
+        jobSuccess = digest["taskSuccessful"] if "taskSuccessful" in digest else fwkJobReport.taskSuccessful()
         logging.info("Task successful: %s", jobSuccess)
 
         outputMap = self.getOutputMapAction.execute(jobID=jobID,
@@ -454,7 +552,7 @@ class AccountantWorker(WMConnectionBase):
                                                 transaction=self.existingTransaction())
 
         if jobSuccess:
-            fileList = fwkJobReport.getAllFiles()
+            fileList = digest["files"] if "files" in digest else fwkJobReport.getAllFiles()
 
             # Consistency check comparing outputMap to fileList
             # they should match except for some limited special cases related to Tier-0:
@@ -494,9 +592,9 @@ class AccountantWorker(WMConnectionBase):
                     errMsg += f"but has FWJR output modules: {sorted(outputModules)}"
                     logging.error(errMsg)
                     # override file list by the logArch1 output only
-                    fileList = fwkJobReport.getAllFilesFromStep(step='logArch1')
+                    fileList = logArchFiles()
         else:
-            fileList = fwkJobReport.getAllFilesFromStep(step='logArch1')
+            fileList = logArchFiles()
 
         # Workaround: make sure every file has a valid location. See:
         # https://github.com/dmwm/WMCore/issues/9353 and https://github.com/dmwm/WMCore/issues/12092
@@ -506,7 +604,7 @@ class AccountantWorker(WMConnectionBase):
             if not fwjrFile.get("locations") and fwjrFile.get("lfn", "").endswith(".root"):
                 logging.warning("The following file does not have any location: %s", fwjrFile)
                 jobSuccess = False
-                fileList = fwkJobReport.getAllFilesFromStep(step='logArch1')
+                fileList = logArchFiles()
                 break
 
         if jobSuccess:
@@ -630,7 +728,8 @@ class AccountantWorker(WMConnectionBase):
 
         return
 
-    def createMissingFWKJR(self, errorCode=999, errorDescription='Failure of unknown type'):
+    @staticmethod
+    def createMissingFWKJR(errorCode=999, errorDescription='Failure of unknown type'):
         """
         _createMissingFWJR_
 
@@ -904,9 +1003,9 @@ class AccountantWorker(WMConnectionBase):
         """
         outputLFNs = [f['lfn'] for f in self.mergedOutputFiles]
         bindList = []
+        parentsByLFN = self.findDBSParentsBulk(outputLFNs)
         for lfn in outputLFNs:
-            newParents = self.findDBSParents(lfn=lfn)
-            for parentLFN in newParents:
+            for parentLFN in parentsByLFN[lfn]:
                 bindList.append({'child': lfn, 'parent': parentLFN})
 
         # Now all the parents should exist
@@ -4,16 +4,19 @@ The actual jobArchiver algorithm
 """
 from __future__ import division
 
+import collections
 import logging
 import os
 import os.path
 import shutil
-import tarfile
 import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
 
 from Utils.IteratorTools import grouper
 from Utils.Timers import timeFunction
 from Utils.wmcoreDTools import resetWatchdogTimer, moduleName
+from WMComponent.JobArchiver.JobLogArchive import appendJobs, archiveName, jobClusterDir, packJob
 from WMCore.DAOFactory import DAOFactory
 from WMCore.JobStateMachine.ChangeState import ChangeState
 from WMCore.Services.ReqMgrAux.ReqMgrAux import isDrainMode
@@ -57,6 +60,14 @@ class JobArchiverPoller(BaseWorkerThread):
                                              "numberOfJobsToCluster", 1000)
         self.numberOfJobsToArchive = getattr(self.config.JobArchiver,
                                              "numberOfJobsToArchive", 10000)
+        # job cache directories get packed in parallel, as gzip (gz) or zstd (zst)
+        self.archiveCodec = getattr(self.config.JobArchiver, "archiveCodec", "gz")
+        self.archiveCompressLevel = getattr(self.config.JobArchiver, "archiveCompressLevel", None)
+        self.archiveThreads = getattr(self.config.JobArchiver, "archiveThreads", 4)
+        try:
+            archiveName(self.archiveCodec)
+        except WMException as ex:
+            raise JobArchiverPollerException(str(ex))
 
         try:
             self.logDir = getattr(config.JobArchiver, 'logDir',
@@ -212,83 +223,105 @@ class JobArchiverPoller(BaseWorkerThread):
         _cleanWorkArea_
 
         Upon workQueue realizing that a subscriptions is done, everything
-        regarding those jobs is cleaned up.
+        regarding those jobs is cleaned up: the job cache directories are
+        packed in a pool of threads, appended to the archive of their
+        JobCluster, then removed.
         """
-
+        archiveJobs = []
         for job in doneList:
-            # print "About to clean cache for job %i" % (job['id'])
-            self.cleanJobCache(job)
+            cacheDir = job['cache_dir']
+            if not cacheDir or not os.path.isdir(cacheDir):
+                logging.error("Could not find jobCacheDir %s", cacheDir)
+                continue
+            if not os.listdir(cacheDir):
+                os.rmdir(cacheDir)
+                continue
+            # Label all directories by workflow
+            # Workflow better have a first character
+            clusterDir = jobClusterDir(self.logDir, job['workflow'], job['id'], self.numberOfJobsToCluster)
+            archiveJobs.append((clusterDir, job))
+        if not archiveJobs:
+            return
+
+        archiveJobs.sort(key=lambda item: (item[0], item[1]['id']))
+        archivedDirs = []
+        failedClusters = []
+
+        with ThreadPoolExecutor(max_workers=max(self.archiveThreads, 1)) as executor:
+            packed = self.packJobs(executor, archiveJobs)
+            try:
+                for clusterDir, clusterJobs in groupby(packed, key=lambda item: item[0][0]):
+                    try:
+                        self.archiveCluster(clusterDir, clusterJobs, archivedDirs)
+                    except JobArchiverPollerException as ex:
+                        # go on with the other clusters, this one gets archived in the next cycle
+                        failedClusters.append(clusterDir)
+                        logging.error(str(ex))
+            finally:
+                packed.close()
+                # remove the archived job cache directories in one go, even on failure,
+                # such that they do not get archived again
+                for _ in executor.map(lambda cacheDir: shutil.rmtree(cacheDir, ignore_errors=True), archivedDirs):
+                    pass
+        logging.info("Archived %d job cache directories", len(archivedDirs))
+
+        if failedClusters:
+            msg = "Failed to archive the jobs of %d JobClusters: %s" % (len(failedClusters), failedClusters)
+            raise JobArchiverPollerException(msg)
 
         return
 
-    def cleanJobCache(self, job):
+    def packJobs(self, executor, archiveJobs):
         """
-        _cleanJobCache_
+        _packJobs_
 
-        Clears out any files still sticking around in the jobCache,
-        tars up the contents and sends them off
+        Pack the job cache directories in the executor threads, with at most
+        a few jobs per thread in flight, to bound the memory used.
+        Generator of ((cluster dir, job), future of the packed job) tuples,
+        in the order of archiveJobs.
         """
+        inFlight = collections.deque()
+        for item in archiveJobs:
+            inFlight.append((item, executor.submit(packJob, item[1]['id'], item[1]['cache_dir'],
+                                                   self.archiveCodec, self.archiveCompressLevel)))
+            if len(inFlight) >= 4 * max(self.archiveThreads, 1):
+                yield inFlight.popleft()
+        while inFlight:
+            yield inFlight.popleft()
+
+    def archiveCluster(self, clusterDir, clusterJobs, archivedDirs):
+        """
+        _archiveCluster_
 
-        cacheDir = job['cache_dir']
-
-        if not cacheDir or not os.path.isdir(cacheDir):
-            msg = "Could not find jobCacheDir %s" % (cacheDir)
-            logging.error(msg)
-            return
-
-        cacheDirList = os.listdir(cacheDir)
-
-        if cacheDirList == []:
-            os.rmdir(cacheDir)
-            return
-
-        # Now we need to set up a final destination
+        Append the packed jobs of a JobCluster to its archive, the cache
+        directories of the jobs archived, even on failure, are added to archivedDirs
+        """
         try:
-            # Label all directories by workflow
-            # Workflow better have a first character
-            workflow = job['workflow']
-            firstCharacter = workflow[0]
-            jobFolder = 'JobCluster_%i' \
-                        % (int(job['id'] / self.numberOfJobsToCluster))
-            logDir = os.path.join(self.logDir, firstCharacter,
-                                  workflow, jobFolder)
-            if not os.path.exists(logDir):
-                os.makedirs(logDir)
+            if not os.path.exists(clusterDir):
+                os.makedirs(clusterDir)
         except Exception as ex:
             msg = "Exception while trying to make output logDir\n"
-            msg += str("logDir: %s\n" % (logDir))
+            msg += "logDir: %s\n" % clusterDir
             msg += str(ex)
-            logging.error(msg)
             raise JobArchiverPollerException(msg)
 
-        # Otherwise we have something in there
-        try:
-            tarName = 'Job_%i.tar.bz2' % (job['id'])
-            with tarfile.open(name=os.path.join(logDir, tarName), mode='w:bz2') as tarball:
-                for fileName in cacheDirList:
-                    fullFile = os.path.join(cacheDir, fileName)
-                    try:
-                        tarball.add(name=fullFile, arcname='Job_%i/%s' % (job['id'], fileName))
-                    except IOError:
-                        logging.error('Cannot read %s, skipping', fullFile)
-        except Exception as ex:
-            msg = "Exception while opening and adding to a tarfile\n"
-            msg += "Tarfile: %s\n" % os.path.join(logDir, tarName)
-            msg += str(ex)
-            logging.error(msg)
-            logging.debug("cacheDirList: %s", cacheDirList)
-            raise JobArchiverPollerException(msg)
+        cacheDirs = {}
 
+        def streamJobs():
+            """Stream the packed jobs, waiting for their packing"""
+            for (_, job), future in clusterJobs:
+                cacheDirs[job['id']] = job['cache_dir']
+                yield job['id'], future.result()
+
+        indexed = []
         try:
-            shutil.rmtree('%s' % (cacheDir), ignore_errors=True)
+            appendJobs(clusterDir, streamJobs(), self.archiveCodec, indexed=indexed)
         except Exception as ex:
-            msg = "Error while removing the old cache dir.\n"
-            msg += "CacheDir: %s\n" % cacheDir
+            msg = "Exception while packing and adding jobs to the archive of %s\n" % clusterDir
             msg += str(ex)
-            logging.error(msg)
             raise JobArchiverPollerException(msg)
-
-        return
+        finally:
+            archivedDirs.extend(cacheDirs[jobId] for jobId in indexed)
 
     def markInjected(self):
         """
@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+"""
+_JobLogArchive_
+
+Archives of the job cache directories, one per JobCluster directory.
+
+Each job gets packed as a small tar stream of its Job_<id>/ files, compressed
+as an independent gzip member (or zstd frame), and appended to the archive of
+its JobCluster. An index file records the position of every job in the archive,
+such that a single job can be extracted without reading the whole archive.
+
+Concatenated gzip members (zstd frames) are a valid compressed stream, thus a
+whole archive can also be extracted with the standard tools, e.g.:
+
+    tar --ignore-zeros -xzf Jobs.tar.gz
+"""
+
+import gzip
+import io
+import logging
+import os
+import tarfile
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from WMCore.WMException import WMException
+
+INDEX_NAME = "Jobs.index"
+ARCHIVE_NAME = "Jobs.tar.%s"
+CODECS = ("gz", "zst")
+DEFAULT_LEVELS = {"gz": 6, "zst": 3}
+
+
+class JobLogArchiveException(WMException):
+    """
+    _JobLogArchiveException_
+
+    Exception raised for the job log archives
+    """
+
+
+def jobClusterDir(logDir, workflow, jobId, numberOfJobsToCluster):
+    """
+    _jobClusterDir_
+
+    Directory of the JobCluster of a job, the first character of the workflow
+    name, the workflow name and the cluster number of the job
+    """
+    jobFolder = 'JobCluster_%i' % (int(jobId / numberOfJobsToCluster))
+    return os.path.join(logDir, workflow[0], workflow, jobFolder)
+
+
+def archiveName(codec):
+    """
+    _archiveName_
+
+    Name of the archive file for a codec
+    """
+    if codec not in CODECS:
+        raise JobLogArchiveException("Unknown job archive codec: %s, known codecs: %s" % (codec, CODECS))
+    if codec == "zst" and zstandard is None:
+        raise JobLogArchiveException("The zstandard module is needed for the zst job archive codec")
+    return ARCHIVE_NAME % codec
+
+
+def compress(data, codec, level=None):
+    """
+    _compress_
+
+    Compress data as a single gzip member or zstd frame
+    """
+    level = DEFAULT_LEVELS[codec] if level is None else level
+    if codec == "zst":
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    return gzip.compress(data, compresslevel=level)
+
+
+def decompress(data, codec):
+    """
+    _decompress_
+
+    Decompress a single gzip member or zstd frame
+    """
+    if codec == "zst":
+        if zstandard is None:
+            raise JobLogArchiveException("The zstandard module is needed to read zst job archives")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def packJob(jobId, cacheDir, codec, level=None):
+    """
+    _packJob_
+
+    Tar the files of a job cache directory as Job_<id>/<file>, and compress them.
+    Files which cannot be read are skipped.
+    :return: the compressed tar stream
+    """
+    tarData = io.BytesIO()
+    with tarfile.open(fileobj=tarData, mode='w') as tarball:
+        for fileName in sorted(os.listdir(cacheDir)):
+            fullFile = os.path.join(cacheDir, fileName)
+            try:
+                tarball.add(name=fullFile, arcname='Job_%i/%s' % (jobId, fileName))
+            except IOError:
+                logging.error('Cannot read %s, skipping', fullFile)
+    return compress(tarData.getvalue(), codec, level)
+
+
+def appendJobs(clusterDir, packedJobs, codec, indexed=None):
+    """
+    _appendJobs_
+
+    Append packed jobs to the archive of a JobCluster directory, then add them
+    to its index. The data is flushed to disk before the index gets written,
+    thus the index only refers to complete jobs, even after a crash. On failure,
+    the jobs fully written before it are still indexed.
+    :param clusterDir: the JobCluster directory
+    :param packedJobs: iterable of (job id, compressed tar stream) tuples
+    :param codec: compression codec of the packed jobs
+    :param indexed: optional list, extended with the ids of the jobs indexed,
+        also when an exception is raised
+    :return: the number of jobs archived
+    """
+    name = archiveName(codec)
+    entries = []
+    jobIds = []
+    with open(os.path.join(clusterDir, name), 'ab') as archive:
+        try:
+            offset = archive.tell()
+            for jobId, data in packedJobs:
+                archive.write(data)
+                entries.append("%i %s %i %i\n" % (jobId, name, offset, len(data)))
+                jobIds.append(jobId)
+                offset += len(data)
+        finally:
+            # also index the jobs appended before a failure, once on disk
+            if entries:
+                archive.flush()
+                os.fsync(archive.fileno())
+                with open(os.path.join(clusterDir, INDEX_NAME), 'a') as index:
+                    index.writelines(entries)
+                    index.flush()
+                    os.fsync(index.fileno())
+                if indexed is not None:
+                    indexed.extend(jobIds)
+    return len(entries)
+
+
+def findJob(clusterDir, jobId):
+    """
+    _findJob_
+
+    Find a job in the index of a JobCluster directory, the last entry wins
+    :return: a (archive name, offset, length) tuple, or None
+    """
+    location = None
+    indexFile = os.path.join(clusterDir, INDEX_NAME)
+    if not os.path.isfile(indexFile):
+        return location
+    with open(indexFile) as index:
+        for line in index:
+            fields = line.split()
+            if len(fields) == 4 and int(fields[0]) == jobId:
+                location = (fields[1], int(fields[2]), int(fields[3]))
+    return location
+
+
+def readJob(clusterDir, jobId):
+    """
+    _readJob_
+
+    Read the tar stream of a job, from the JobCluster archive or from the
+    Job_<id>.tar.bz2 tarball written by the former JobArchiver
+    :return: a tarfile object opened for reading
+    """
+    location = findJob(clusterDir, jobId)
+    if location is not None:
+        name, offset, length = location
+        with open(os.path.join(clusterDir, name), 'rb') as archive:
+            archive.seek(offset)
+            data = archive.read(length)
+        if len(data) != length:
+            raise JobLogArchiveException("Archive %s is truncated for job %i" % (name, jobId))
+        return tarfile.open(fileobj=io.BytesIO(decompress(data, name.rsplit('.', 1)[-1])), mode='r:')
+
+    tarName = os.path.join(clusterDir, 'Job_%i.tar.bz2' % jobId)
+    if os.path.isfile(tarName):
+        return tarfile.open(name=tarName, mode='r:bz2')
+    raise JobLogArchiveException("Job %i is not archived in %s" % (jobId, clusterDir))
+
+
+def extractJob(clusterDir, jobId, destDir):
+    """
+    _extractJob_
+
+    Extract the files of a job, as Job_<id>/<file>, in a destination directory
+    :return: the list of extracted files
+    """
+    with readJob(clusterDir, jobId) as tarball:
+        members = [member for member in tarball.getmembers() if member.isfile()]
+        if hasattr(tarfile, 'data_filter'):
+            tarball.extractall(destDir, members=members, filter='data')
+        else:
+            tarball.extractall(destDir, members=members)
+    return [os.path.join(destDir, member.name) for member in members]
@@ -20,6 +20,7 @@ from Utils.wmcoreDTools import resetWatchdogTimer, moduleName
 from WMComponent.JobCreator.CreateWorkArea import CreateWorkArea
 from WMCore.WorkerThreads.BaseWorkerThread import BaseWorkerThread
 from WMCore.DAOFactory import DAOFactory
+from WMCore.DataStructs.JobStore import getJobStore
 from WMCore.WMException import WMException
 from WMCore.JobSplitting.Generators.GeneratorManager import GeneratorManager
 from WMCore.JobStateMachine.ChangeState import ChangeState
@@ -118,11 +119,13 @@ def capResourceEstimates(jobGroups, constraints):
     return
 
 
-def saveJob(job, thisJobNumber, **kwargs):
+def saveJob(job, thisJobNumber, jobStore=None, **kwargs):
     """
     _saveJob_
 
-    Actually do the mechanics of saving the job to a pickle file
+    Actually do the mechanics of saving the job to a pickle file.
+    If a jobStore is provided, only the job information is filled in
+    and the caller is responsible for saving the jobs in bulk.
     """
     job['counter'] = thisJobNumber
     job['spec'] = kwargs.get('workflow').spec
@@ -150,17 +153,19 @@ def saveJob(job, thisJobNumber, **kwargs):
     job['physicsTaskType'] = kwargs['physicsTaskType']
     job['campaignName'] = kwargs['campaignName']
 
-    with open(os.path.join(cacheDir, 'job.pkl'), 'wb') as output:
-        pickle.dump(job, output, HIGHEST_PICKLE_PROTOCOL)
+    if jobStore is None:
+        with open(os.path.join(cacheDir, 'job.pkl'), 'wb') as output:
+            pickle.dump(job, output, HIGHEST_PICKLE_PROTOCOL)
 
     return
 
 
-def creatorProcess(work, jobCacheDir):
+def creatorProcess(work, jobCacheDir, jobStore=None):
     """
     _creatorProcess_
 
-    Creator work areas and pickle job objects
+    Creator work areas and pickle job objects, or save
+    them in bulk to the jobStore if one is provided
     """
     createWorkArea = CreateWorkArea()
 
@@ -189,7 +194,9 @@ def creatorProcess(work, jobCacheDir):
         thisJobNumber = work.get('jobNumber', 0)
         for job in wmbsJobGroup.jobs:
             thisJobNumber += 1
-            saveJob(job, thisJobNumber, **work)
+            saveJob(job, thisJobNumber, jobStore=jobStore, **work)
+        if jobStore is not None:
+            jobStore.save(wmbsJobGroup.jobs)
     except Exception as ex:
         msg = "Exception in processing wmbsJobGroup %i\n. Error: %s" % (wmbsJobGroup.id, str(ex))
         logging.exception(msg)
@@ -337,6 +344,9 @@ class JobCreatorPoller(BaseWorkerThread):
         self.agentNumber = int(getattr(config.Agent, 'agentNumber', 0))
         self.agentName = getattr(config.Agent, 'hostName', '')
         self.glideinLimits = getattr(config.JobCreator, 'GlideInRestriction', None)
+        # job.pkl files are written by saveJob itself, other backends save in bulk
+        jobStoreBackend = getattr(config.JobCreator, 'jobStoreBackend', 'pickle')
+        self.jobStore = None if jobStoreBackend == 'pickle' else getJobStore(jobStoreBackend)
 
         try:
             self.jobCacheDir = getattr(config.JobCreator, 'jobCacheDir',
@@ -573,7 +583,8 @@ class JobCreatorPoller(BaseWorkerThread):
                     tempDict['inputDatasetLocations'] = wmbsJobGroup.getLocationsForJobs()
 
                     jobGroup = creatorProcess(work=tempDict,
-                                              jobCacheDir=self.jobCacheDir)
+                                              jobCacheDir=self.jobCacheDir,
+                                              jobStore=self.jobStore)
                     jobNumber += jobsInGroup
 
                     # Set jobCache for group
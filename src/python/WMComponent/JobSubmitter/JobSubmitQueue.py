@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+"""
+_JobSubmitQueue_
+
+Priority index of the jobs cached by the JobSubmitter.
+"""
+from __future__ import division
+
+import heapq
+from collections import Counter, defaultdict
+
+
+class JobSubmitQueue(object):
+    """
+    _JobSubmitQueue_
+
+    Keep one heap of job ids per (site, task type) pair, ordered by descending
+    final job priority and ascending job id. A job is pushed into the heaps of
+    all the sites it can run at. Removals are lazy: removed jobs stay in the
+    heaps until popped, or until the heaps are compacted when the stale entries
+    outnumber the valid ones.
+    """
+
+    def __init__(self):
+        self._heaps = defaultdict(list)  # (site, task type) -> heap of (-priority, job id, sequence)
+        self._jobs = {}  # job id -> (priority, task type, frozenset of sites, sequence)
+        self._prioCounts = Counter()  # (priority, task type) -> number of jobs
+        self._sequence = 0
+        self._entries = 0
+        self._staleEntries = 0
+        self._iterating = False
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def __contains__(self, jobID):
+        return jobID in self._jobs
+
+    def add(self, jobID, jobPrio, taskType, sites):
+        """
+        _add_
+
+        Add a job to the queue, or re-index it if it's already there.
+        """
+        self.remove(jobID)
+        sites = frozenset(sites)
+        self._sequence += 1
+        self._jobs[jobID] = (jobPrio, taskType, sites, self._sequence)
+        self._prioCounts[(jobPrio, taskType)] += 1
+        for site in sites:
+            heapq.heappush(self._heaps[(site, taskType)], (-jobPrio, jobID, self._sequence))
+        self._entries += len(sites)
+
+    def updateSites(self, jobID, sites):
+        """
+        _updateSites_
+
+        Re-index an already queued job with a new list of sites.
+        """
+        jobPrio, taskType, oldSites, _ = self._jobs[jobID]
+        if oldSites != frozenset(sites):
+            self.add(jobID, jobPrio, taskType, sites)
+
+    def remove(self, jobID):
+        """
+        _remove_
+
+        Remove a job from the queue, if present.
+        """
+        jobInfo = self._jobs.pop(jobID, None)
+        if jobInfo is None:
+            return
+        jobPrio, taskType, sites, _ = jobInfo
+        self._prioCounts[(jobPrio, taskType)] -= 1
+        if not self._prioCounts[(jobPrio, taskType)]:
+            del self._prioCounts[(jobPrio, taskType)]
+        self._staleEntries += len(sites)
+        if not self._iterating and self._staleEntries > max(self._entries - self._staleEntries, 1000):
+            self._compact()
+
+    def _compact(self):
+        """
+        _compact_
+
+        Rebuild the heaps with the jobs still in the queue only.
+        """
+        self._heaps = defaultdict(list)
+        for jobID, (jobPrio, taskType, sites, sequence) in self._jobs.items():
+            for site in sites:
+                self._heaps[(site, taskType)].append((-jobPrio, jobID, sequence))
+        for heap in self._heaps.values():
+            heapq.heapify(heap)
+        self._entries = sum(len(jobInfo[2]) for jobInfo in self._jobs.values())
+        self._staleEntries = 0
+
+    def _isValid(self, entry, site, taskType):
+        """
+        _isValid_
+
+        Whether a heap entry still corresponds to a queued job at that site.
+        """
+        jobInfo = self._jobs.get(entry[1])
+        return jobInfo is not None and jobInfo[3] == entry[2] and site in jobInfo[2]
+
+    def countsByPriority(self):
+        """
+        _countsByPriority_
+
+        Return a dictionary with the number of queued jobs per
+        priority and task type, as {priority: {taskType: count}}.
+        """
+        counts = defaultdict(dict)
+        for (jobPrio, taskType), count in self._prioCounts.items():
+            counts[jobPrio][taskType] = count
+        return counts
+
+    def iterJobs(self, closedQueues):
+        """
+        _iterJobs_
+
+        Generator yielding (priority, job id) of the queued jobs, from the
+        highest to the lowest priority, merging the heaps of all the
+        (site, task type) pairs not in closedQueues. The caller can add
+        pairs to the closedQueues set while iterating, such that jobs which
+        can only run at those sites are never yielded. Each job is yielded
+        at most once. Jobs not removed by the caller stay in the queue.
+        """
+        front = []
+        for key, heap in self._heaps.items():
+            if heap and key not in closedQueues:
+                front.append((heap[0], key))
+        heapq.heapify(front)
+
+        popped = []
+        seen = set()
+        jobs = self._jobs
+        heappop, heapreplace = heapq.heappop, heapq.heapreplace
+        self._iterating = True
+        try:
+            while front:
+                entry, key = front[0]
+                heap = self._heaps[key]
+                if key in closedQueues or not heap:
+                    heappop(front)
+                    continue
+                if heap[0] != entry:
+                    heapreplace(front, (heap[0], key))
+                    continue
+                heappop(heap)
+                if heap:
+                    heapreplace(front, (heap[0], key))
+                else:
+                    heappop(front)
+
+                jobInfo = jobs.get(entry[1])
+                if jobInfo is None or jobInfo[3] != entry[2] or key[0] not in jobInfo[2]:
+                    # lazily removed job
+                    self._entries -= 1
+                    self._staleEntries -= 1
+                    continue
+                popped.append((entry, key))
+                if entry[1] in seen:
+                    continue
+                seen.add(entry[1])
+                yield -entry[0], entry[1]
+        finally:
+            # put back the entries of the jobs left in the queue
+            self._iterating = False
+            for entry, key in popped:
+                if self._isValid(entry, *key):
+                    heapq.heappush(self._heaps[key], entry)
+                else:
+                    self._entries -= 1
+                    self._staleEntries -= 1
+            if self._staleEntries > max(self._entries - self._staleEntries, 1000):
+                self._compact()
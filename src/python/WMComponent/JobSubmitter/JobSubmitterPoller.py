@@ -17,8 +17,8 @@ import threading
 import json
 import time
 from collections import defaultdict, Counter
-import pickle
 
+from Utils.IteratorTools import grouper
 from Utils.Timers import timeFunction
 from Utils.wmcoreDTools import resetWatchdogTimer, moduleName
 from WMCore.DAOFactory import DAOFactory
@@ -28,6 +28,7 @@ from WMCore.JobStateMachine.ChangeState import ChangeState
 from WMCore.WorkerThreads.BaseWorkerThread import BaseWorkerThread
 from WMCore.ResourceControl.ResourceControl import ResourceControl
 from WMCore.DataStructs.JobPackage import JobPackage
+from WMCore.DataStructs.JobStore import loadJobs
 from WMCore.FwkJobReport.Report import Report
 from WMCore.WMException import WMException
 from WMCore.BossAir.BossAirAPI import BossAirAPI
@@ -36,6 +37,7 @@ from WMCore.Services.ReqMgrAux.ReqMgrAux import ReqMgrAux
 from WMCore.Services.TagCollector.TagCollector import TagCollector
 
 from WMComponent.JobSubmitter.JobSubmitAPI import availableScheddSlots
+from WMComponent.JobSubmitter.JobSubmitQueue import JobSubmitQueue
 
 
 def jobSubmitCondition(jobStats):
@@ -84,6 +86,11 @@ class JobSubmitterPoller(BaseWorkerThread):
         self.maxJobsThisCycle = self.maxJobsPerPoll  # changes as per schedd limit
         self.cacheRefreshSize = int(getattr(self.config.JobSubmitter, 'cacheRefreshSize', 30000))
         self.skipRefreshCount = int(getattr(self.config.JobSubmitter, 'skipRefreshCount', 20))
+        self.jobLoadChunkSize = int(getattr(self.config.JobSubmitter, 'jobLoadChunkSize', 5000))
+        # incremental cache refresh only pulls jobs which entered the created state since the last refresh
+        self.incrementalRefresh = getattr(self.config.JobSubmitter, 'incrementalRefresh', False)
+        self.fullRefreshInterval = int(getattr(self.config.JobSubmitter, 'fullRefreshInterval', 10))
+        self.incrementalRefreshOverlap = int(getattr(self.config.JobSubmitter, 'incrementalRefreshOverlap', 1800))
         self.packageSize = getattr(self.config.JobSubmitter, 'packageSize', 500)
         self.collSize = getattr(self.config.JobSubmitter, 'collectionSize', self.packageSize * 1000)
         self.maxTaskPriority = getattr(self.config.BossAir, 'maxTaskPriority', 1e7)
@@ -96,7 +103,7 @@ class JobSubmitterPoller(BaseWorkerThread):
         self.enableAllSites = False
 
         # Additions for caching-based JobSubmitter
-        self.jobsByPrio = {}  # key'ed by the final job priority, which contains a set of job ids
+        self.jobSubmitQueue = JobSubmitQueue()  # cached job ids, indexed by site, task type and final job priority
         self.jobDataCache = {}  # key'ed by the job id, containing the whole job info dict
         self.jobsToPackage = {}
         self.locationDict = {}
@@ -104,6 +111,8 @@ class JobSubmitterPoller(BaseWorkerThread):
         self.drainSitesSet = set()
         self.abortSites = set()
         self.refreshPollingCount = 0
+        self.lastRefreshTime = None
+        self.incrementalRefreshCount = 0
 
         # TagCollector for getting the CMSSW micro-architectures
         tcCacheHours = getattr(self.config.JobSubmitter, 'TagCollectorCacheHours', 3)
@@ -126,6 +135,7 @@ class JobSubmitterPoller(BaseWorkerThread):
 
         # Now the DAOs
         self.listJobsAction = self.daoFactory(classname="Jobs.ListForSubmitter")
+        self.listKilledJobsAction = self.daoFactory(classname="Jobs.GetAllJobs")
         self.setLocationAction = self.daoFactory(classname="Jobs.SetLocation")
         self.locationAction = self.daoFactory(classname="Locations.GetSiteInfo")
         self.setFWJRPathAction = self.daoFactory(classname="Jobs.SetFWJRPath")
@@ -264,7 +274,7 @@ class JobSubmitterPoller(BaseWorkerThread):
 
         Query WMBS for all jobs in the 'created' state.  For all jobs returned
         from the query, check if they already exist in the cache.  If they
-        don't, unpickle them and combine their site white and black list with
+        don't, load them and combine their site white and black list with
         the list of locations they can run at.  Add them to the cache.
 
         Each entry in the cache is a tuple with five items:
@@ -282,7 +292,22 @@ class JobSubmitterPoller(BaseWorkerThread):
 
         logging.info("Refreshing priority cache with currently %i jobs", len(self.jobDataCache))
 
-        newJobs = self.listJobsAction.execute(limitRows=self.maxJobsToCache)
+        incremental = self.incrementalRefresh and self.lastRefreshTime is not None and \
+                      self.incrementalRefreshCount < self.fullRefreshInterval
+        if incremental:
+            # jobs which entered the created state since the last refresh, with some
+            # overlap to account for transactions committed after that refresh
+            self.incrementalRefreshCount += 1
+            minStateTime = self.lastRefreshTime - self.incrementalRefreshOverlap
+            limitRows = self.maxJobsToCache - len(self.jobDataCache)
+            logging.info("Incremental refresh for jobs created since %d, up to %d jobs", minStateTime, limitRows)
+            newJobs = []
+            if limitRows > 0:
+                newJobs = self.listJobsAction.execute(limitRows=limitRows, minStateTime=minStateTime)
+        else:
+            self.incrementalRefreshCount = 0
+            newJobs = self.listJobsAction.execute(limitRows=self.maxJobsToCache)
+        self.lastRefreshTime = timeNow
         if self.useReqMgrForCompletionCheck:
             # if reqmgr is used (not Tier0 Agent) get the aborted/forceCompleted record
             abortedAndForceCompleteRequests = self.abortedAndForceCompleteWorkflowCache.getData()
@@ -295,12 +320,8 @@ class JobSubmitterPoller(BaseWorkerThread):
             logging.info("Agent is in speed drain mode. Submitting jobs to all possible locations.")
 
         logging.info("Determining possible sites for new jobs...")
-        jobCount = 0
+        jobsToLoad = []
         for newJob in newJobs:
-            jobCount += 1
-            if jobCount % 5000 == 0:
-                logging.info("Processed %d/%d new jobs.", jobCount, len(newJobs))
-
             # whether newJob belongs to aborted or force-complete workflow, and skip it if it is.
             if newJob['request_name'] in abortedAndForceCompleteRequests and \
                             newJob['task_type'] not in ['LogCollect', "Cleanup"]:
@@ -308,120 +329,104 @@ class JobSubmitterPoller(BaseWorkerThread):
 
             jobID = newJob['id']
             newJobIds.add(jobID)
-            if jobID in self.jobDataCache:
-                continue
+            if jobID not in self.jobDataCache:
+                jobsToLoad.append(newJob)
 
-            pickledJobPath = os.path.join(newJob["cache_dir"], "job.pkl")
-
-            if not os.path.isfile(pickledJobPath):
-                # Then we have a problem - there's no file
-                logging.warning("Could not find pickled jobObject %s", pickledJobPath)
-                badJobs[71104].append(newJob)
-                continue
-            try:
-                with open(pickledJobPath, 'rb') as jobHandle:
-                    loadedJob = pickle.load(jobHandle)
-            except Exception as ex:
-                logging.warning("Failed to load job pickle object %s", pickledJobPath)
-                badJobs[71105].append(newJob)
-                continue
-
-            # figure out possible locations for job
-            possibleLocations = loadedJob["possiblePSN"]
-
-            # Create another set of locations that may change when a site goes white/black listed
-            # Does not care about the non_draining or aborted sites, they may change and that is the point
-            potentialLocations = set()
-            potentialLocations.update(possibleLocations)
-
-            # check if there is at least one site left to run the job
-            if len(possibleLocations) == 0:
-                newJob['fileLocations'] = loadedJob.get('fileLocations', [])
-                newJob['siteWhitelist'] = loadedJob.get('siteWhitelist', [])
-                newJob['siteBlacklist'] = loadedJob.get('siteBlacklist', [])
-                logging.warning("Input data location doesn't pass the site restrictions for job id: %s", jobID)
-                badJobs[71101].append(newJob)
-                continue
+        jobCount = 0
+        for jobChunk in grouper(jobsToLoad, self.jobLoadChunkSize):
+            # bulk load the job objects, either from the job store or from their job.pkl
+            loadedJobs, missingJobs, failedJobs = loadJobs({newJob['id']: newJob['cache_dir'] for newJob in jobChunk})
+            for newJob in jobChunk:
+                jobCount += 1
+                if jobCount % 5000 == 0:
+                    logging.info("Processed %d/%d new jobs.", jobCount, len(jobsToLoad))
+                jobID = newJob['id']
+                if jobID in missingJobs:
+                    # Then we have a problem - there's no job object stored
+                    badJobs[71104].append(newJob)
+                    continue
+                if jobID in failedJobs:
+                    badJobs[71105].append(newJob)
+                    continue
+                loadedJob = loadedJobs.pop(jobID)
+
+                # figure out possible locations for job
+                possibleLocations = loadedJob["possiblePSN"]
+
+                # Create another set of locations that may change when a site goes white/black listed
+                # Does not care about the non_draining or aborted sites, they may change and that is the point
+                potentialLocations = set()
+                potentialLocations.update(possibleLocations)
+
+                # check if there is at least one site left to run the job
+                if len(possibleLocations) == 0:
+                    newJob['fileLocations'] = loadedJob.get('fileLocations', [])
+                    newJob['siteWhitelist'] = loadedJob.get('siteWhitelist', [])
+                    newJob['siteBlacklist'] = loadedJob.get('siteBlacklist', [])
+                    logging.warning("Input data location doesn't pass the site restrictions for job id: %s", jobID)
+                    badJobs[71101].append(newJob)
+                    continue
 
-            # if agent is in speed drain and has hit the threshold to submit to all sites, we can skip the logic below that exclude sites
-            if not self.enableAllSites:
-                # check for sites in aborted state and adjust the possible locations
-                nonAbortSites = [x for x in possibleLocations if x not in self.abortSites]
-                if nonAbortSites:  # if there is at least a non aborted/down site then run there, otherwise fail the job
-                    possibleLocations = nonAbortSites
-                else:
+                possibleLocations, exitCode = self._filterJobSites(jobID, newJob['task_type'],
+                                                                   possibleLocations, timeNow)
+                if exitCode:
                     newJob['possibleSites'] = possibleLocations
-                    logging.warning("Job id %s can only run at a site in Aborted state", jobID)
-                    badJobs[71102].append(newJob)
+                    badJobs[exitCode].append(newJob)
+                    continue
+                elif not possibleLocations:
+                    countDrainingJobs += 1
                     continue
 
-                # try to remove draining sites if possible, this is needed to stop
-                # jobs that could run anywhere blocking draining sites
-                # if the job type is Merge, LogCollect or Cleanup this is skipped
-                if newJob['task_type'] not in self.ioboundTypes:
-                    nonDrainingSites = [x for x in possibleLocations if x not in self.drainSites]
-                    if nonDrainingSites:  # if >1 viable non-draining site remove draining ones
-                        possibleLocations = nonDrainingSites
-                    elif self.failJobDrain(timeNow, possibleLocations):
-                        newJob['possibleSites'] = possibleLocations
-                        logging.warning("Job id %s can only run at a sites in Draining state", jobID)
-                        badJobs[71103].append(newJob)
-                        continue
-                    else:
-                        countDrainingJobs += 1
-                        continue
-
-            # Sigh...make sure the job added to the package has the proper retry_count
-            loadedJob['retry_count'] = newJob['retry_count']
-            batchDir = self.addJobsToPackage(loadedJob)
-
-            # calculate the final job priority such that we can order cached jobs by prio
-            jobPrio = newJob['task_prio'] * self.maxTaskPriority + newJob['wf_priority']
-            self.jobsByPrio.setdefault(jobPrio, set())
-            self.jobsByPrio[jobPrio].add(jobID)
-
-            # allow job baggage to override numberOfCores
-            #       => used for repacking to get more slots/disk
-            numberOfCores = loadedJob.get('numberOfCores', 1)
-            if numberOfCores == 1:
-                baggage = loadedJob.getBaggage()
-                numberOfCores = getattr(baggage, "numberOfCores", 1)
-            loadedJob['numberOfCores'] = numberOfCores
-
-            # Create a job dictionary object and put it in the cache (needs to be in sync with RunJob)
-            jobInfo = {'taskPriority': newJob['task_prio'],
-                       'activity': loadedJob.get("taskType"),
-                       'custom': {'location': None},  # update later
-                       'packageDir': batchDir,
-                       'retry_count': newJob["retry_count"],
-                       'sandbox': loadedJob["sandbox"],  # remove before submit
-                       'userdn': loadedJob.get("ownerDN", None),
-                       'usergroup': loadedJob.get("ownerGroup", ''),
-                       'userrole': loadedJob.get("ownerRole", ''),
-                       'possibleSites': frozenset(possibleLocations),  # abort and drain sites filtered out
-                       'potentialSites': frozenset(potentialLocations),  # original list of sites
-                       'scramArch': loadedJob.get("scramArch", None),
-                       'swVersion': loadedJob.get("swVersion", []),
-                       'proxyPath': loadedJob.get("proxyPath", None),
-                       'estimatedJobTime': loadedJob.get("estimatedJobTime", None),
-                       'estimatedDiskUsage': loadedJob.get("estimatedDiskUsage", None),
-                       'estimatedMemoryUsage': loadedJob.get("estimatedMemoryUsage", None),
-                       'numberOfCores': loadedJob.get("numberOfCores"),  # may update it later
-                       'inputDataset': loadedJob.get('inputDataset', None),
-                       'inputDatasetLocations': loadedJob.get('inputDatasetLocations', None),
-                       'inputPileup': loadedJob.get('inputPileup', None),
-                       'allowOpportunistic': loadedJob.get('allowOpportunistic', False),
-                       'requiresGPU': loadedJob.get('requiresGPU', "forbidden"),
-                       'gpuRequirements': loadedJob.get('gpuRequirements', None),
-                       'jobExtraMatchRequirements': loadedJob.get('jobExtraMatchRequirements', ""),
-                       'campaignName': loadedJob.get('campaignName', None),
-                       'requestType': loadedJob['requestType'],
-                       'physicsTaskType': loadedJob.get('physicsTaskType', None)
-                       }
-            # then update it with the info retrieved from the database
-            jobInfo.update(newJob)
-
-            self.jobDataCache[jobID] = jobInfo
+                # Sigh...make sure the job added to the package has the proper retry_count
+                loadedJob['retry_count'] = newJob['retry_count']
+                batchDir = self.addJobsToPackage(loadedJob)
+
+                # calculate the final job priority such that we can order cached jobs by prio
+                jobPrio = newJob['task_prio'] * self.maxTaskPriority + newJob['wf_priority']
+                self.jobSubmitQueue.add(jobID, jobPrio, newJob['task_type'], possibleLocations)
+
+                # allow job baggage to override numberOfCores
+                #       => used for repacking to get more slots/disk
+                numberOfCores = loadedJob.get('numberOfCores', 1)
+                if numberOfCores == 1:
+                    baggage = loadedJob.getBaggage()
+                    numberOfCores = getattr(baggage, "numberOfCores", 1)
+                loadedJob['numberOfCores'] = numberOfCores
+
+                # Create a job dictionary object and put it in the cache (needs to be in sync with RunJob)
+                jobInfo = {'taskPriority': newJob['task_prio'],
+                           'activity': loadedJob.get("taskType"),
+                           'custom': {'location': None},  # update later
+                           'packageDir': batchDir,
+                           'retry_count': newJob["retry_count"],
+                           'sandbox': loadedJob["sandbox"],  # remove before submit
+                           'userdn': loadedJob.get("ownerDN", None),
+                           'usergroup': loadedJob.get("ownerGroup", ''),
+                           'userrole': loadedJob.get("ownerRole", ''),
+                           'possibleSites': frozenset(possibleLocations),  # abort and drain sites filtered out
+                           'potentialSites': frozenset(potentialLocations),  # original list of sites
+                           'scramArch': loadedJob.get("scramArch", None),
+                           'swVersion': loadedJob.get("swVersion", []),
+                           'proxyPath': loadedJob.get("proxyPath", None),
+                           'estimatedJobTime': loadedJob.get("estimatedJobTime", None),
+                           'estimatedDiskUsage': loadedJob.get("estimatedDiskUsage", None),
+                           'estimatedMemoryUsage': loadedJob.get("estimatedMemoryUsage", None),
+                           'numberOfCores': loadedJob.get("numberOfCores"),  # may update it later
+                           'inputDataset': loadedJob.get('inputDataset', None),
+                           'inputDatasetLocations': loadedJob.get('inputDatasetLocations', None),
+                           'inputPileup': loadedJob.get('inputPileup', None),
+                           'allowOpportunistic': loadedJob.get('allowOpportunistic', False),
+                           'requiresGPU': loadedJob.get('requiresGPU', "forbidden"),
+                           'gpuRequirements': loadedJob.get('gpuRequirements', None),
+                           'jobExtraMatchRequirements': loadedJob.get('jobExtraMatchRequirements', ""),
+                           'campaignName': loadedJob.get('campaignName', None),
+                           'requestType': loadedJob['requestType'],
+                           'physicsTaskType': loadedJob.get('physicsTaskType', None)
+                           }
+                # then update it with the info retrieved from the database
+                jobInfo.update(newJob)
+
+                self.jobDataCache[jobID] = jobInfo
 
         # Register failures in submission
         for errorCode in badJobs:
@@ -438,14 +443,96 @@ class JobSubmitterPoller(BaseWorkerThread):
         self.flushJobPackages()
 
         # We need to remove any jobs from the cache that were not returned in
-        # the last call to the database.
-        jobIDsToPurge = set(self.jobDataCache.keys()) - newJobIds
+        # the last call to the database. Only possible with a full refresh,
+        # otherwise remove the jobs killed since the last refresh (aborted workflows)
+        if not incremental:
+            jobIDsToPurge = set(self.jobDataCache.keys()) - newJobIds
+        else:
+            killedJobs = self.listKilledJobsAction.execute(state="killed", minStateTime=minStateTime) or []
+            jobIDsToPurge = set(killedJobs) & set(self.jobDataCache.keys())
+            logging.info("Removing %d jobs killed since the last refresh from the cache", len(jobIDsToPurge))
         self._purgeJobsFromCache(jobIDsToPurge)
 
         logging.info("Found %d jobs pending to sites in drain within the grace period", countDrainingJobs)
         logging.info("Done pruning killed jobs, moving on to submit.")
         return
 
+    def _filterJobSites(self, jobID, taskType, possibleLocations, timeNow):
+        """
+        Remove the sites in Aborted/Down state and, when possible, the sites
+        in Draining state from the list of sites a job can run at.
+        :param jobID: the job id, for logging purposes
+        :param taskType: the job task type
+        :param possibleLocations: list of possible locations where the job can run
+        :param timeNow: timestamp for this cycle
+        :return: a tuple with the list of sites the job can be submitted to and
+            an error code if the job has to fail (71102 or 71103), otherwise None.
+            An empty list of sites without error code means the job can only run
+            at sites in drain within the grace period.
+        """
+        # if agent is in speed drain and has hit the threshold to submit to all sites, we can skip the logic below that exclude sites
+        if self.enableAllSites:
+            return possibleLocations, None
+
+        # check for sites in aborted state and adjust the possible locations
+        nonAbortSites = [x for x in possibleLocations if x not in self.abortSites]
+        if not nonAbortSites:  # if there is at least a non aborted/down site then run there, otherwise fail the job
+            logging.warning("Job id %s can only run at a site in Aborted state", jobID)
+            return possibleLocations, 71102
+        possibleLocations = nonAbortSites
+
+        # try to remove draining sites if possible, this is needed to stop
+        # jobs that could run anywhere blocking draining sites
+        # if the job type is Merge, LogCollect or Cleanup this is skipped
+        if taskType not in self.ioboundTypes:
+            nonDrainingSites = [x for x in possibleLocations if x not in self.drainSites]
+            if nonDrainingSites:  # if >1 viable non-draining site remove draining ones
+                possibleLocations = nonDrainingSites
+            elif self.failJobDrain(timeNow, possibleLocations):
+                logging.warning("Job id %s can only run at a sites in Draining state", jobID)
+                return possibleLocations, 71103
+            else:
+                return [], None
+
+        return possibleLocations, None
+
+    def updateCachedJobSites(self):
+        """
+        _updateCachedJobSites_
+
+        Recompute the possible sites of the cached jobs from their original
+        list of sites, after the list of Draining or Aborted sites changed.
+        Jobs left only with sites in drain within the grace period are dropped
+        from the cache, jobs that can no longer run anywhere are failed.
+        """
+        timeNow = int(time.time())
+        badJobs = {71102: [], 71103: []}
+        jobIDsToPurge = set()
+        for jobID, jobInfo in viewitems(self.jobDataCache):
+            possibleLocations, exitCode = self._filterJobSites(jobID, jobInfo['task_type'],
+                                                               jobInfo['potentialSites'], timeNow)
+            if exitCode:
+                jobInfo['possibleSites'] = possibleLocations
+                badJobs[exitCode].append(jobInfo)
+                jobIDsToPurge.add(jobID)
+            elif not possibleLocations:
+                jobIDsToPurge.add(jobID)
+            else:
+                jobInfo['possibleSites'] = frozenset(possibleLocations)
+                self.jobSubmitQueue.updateSites(jobID, possibleLocations)
+        self._purgeJobsFromCache(jobIDsToPurge)
+        logging.info("Updated possible sites for %d cached jobs, %d removed from the cache.",
+                     len(self.jobDataCache), len(jobIDsToPurge))
+        # jobs not in the cache may now be able to run, make sure the next refresh is a full one
+        self.incrementalRefreshCount = self.fullRefreshInterval
+
+        for errorCode in badJobs:
+            if badJobs[errorCode]:
+                msg = "%d jobs failed to be submitted due to location constraints (error code: %s)"
+                logging.warning(msg, len(badJobs[errorCode]), errorCode)
+                self._handleSubmitFailedJobs(badJobs[errorCode], errorCode)
+        return
+
     def failJobDrain(self, timeNow, possibleLocations):
         """
         Check whether sites are in drain for too long such that the job
@@ -479,11 +566,7 @@ class JobSubmitterPoller(BaseWorkerThread):
 
         for jobid in jobIDsToPurge:
             self.jobDataCache.pop(jobid, None)
-            for jobPrio in self.jobsByPrio:
-                if jobid in self.jobsByPrio[jobPrio]:
-                    # then the jobid was found, go to the next one
-                    self.jobsByPrio[jobPrio].discard(jobid)
-                    break
+            self.jobSubmitQueue.remove(jobid)
         return
 
     def _handleSubmitFailedJobs(self, badJobs, exitCode):
@@ -552,17 +635,18 @@ class JobSubmitterPoller(BaseWorkerThread):
                 newAbortSites.add(siteName)
 
         # When the list of drain/abort sites change between iteration then a location
-        # refresh is needed, for now it forces a full cache refresh
-        if set(newDrainSites.keys()) != self.drainSitesSet or newAbortSites != self.abortSites:
-            logging.info("Draining or Aborted sites have changed, the cache will be rebuilt.")
-            self.jobsByPrio = {}
-            self.jobDataCache = {}
+        # refresh is needed for the jobs already in the cache
+        sitesChanged = set(newDrainSites.keys()) != self.drainSitesSet or newAbortSites != self.abortSites
 
         self.currentRcThresholds = rcThresholds
         self.abortSites = newAbortSites
         self.drainSites = newDrainSites
         self.drainSitesSet = set(newDrainSites.keys())
 
+        if sitesChanged:
+            logging.info("Draining or Aborted sites have changed, updating the cached job locations.")
+            self.updateCachedJobSites()
+
         return
 
     def checkZeroTaskThresholds(self, jobType, siteList):
@@ -669,60 +753,63 @@ class JobSubmitterPoller(BaseWorkerThread):
         """
         jobsToSubmit = {}
         jobsCount = 0
-        exitLoop = False
         jobSubmitLogBySites = defaultdict(lambda: defaultdict(Counter))
         jobSubmitLogByPriority = defaultdict(lambda: defaultdict(Counter))
+        for jobPrio, countByType in viewitems(self.jobSubmitQueue.countsByPriority()):
+            for jobType, count in viewitems(countByType):
+                jobSubmitLogByPriority[jobPrio][jobType]['Total'] = count
+
+        # (site, task type) pairs which cannot take any further job in this cycle. Submit
+        # thresholds only get lower with the job priority, and the number of pending jobs
+        # only grows, so a pair rejecting a job rejects all the jobs after it as well.
+        closedQueues = set()
+        # iterate over jobs from the highest to the lowest prio, then by job id
+        for jobPrio, jobid in self.jobSubmitQueue.iterJobs(closedQueues):
+            jobType = self.jobDataCache[jobid]['task_type']
+            possibleSites = self.jobDataCache[jobid]['possibleSites']
+            # remove sites with 0 task thresholds
+            openSites = self.checkZeroTaskThresholds(jobType, possibleSites)
+            for siteName in set(possibleSites).difference(openSites):
+                closedQueues.add((siteName, jobType))
+            possibleSites = openSites
+            # now look for sites with free pending slots
+            for siteName in possibleSites:
+                if (siteName, jobType) in closedQueues:
+                    continue
+                condition = self._getJobSubmitCondition(jobPrio, siteName, jobType)
+                if condition != "JobSubmitReady":
+                    jobSubmitLogBySites[siteName][jobType][condition] += 1
+                    logging.debug("Found a job for %s : %s", siteName, condition)
+                    closedQueues.add((siteName, jobType))
+                    continue
 
-        # iterate over jobs from the highest to the lowest prio
-        for jobPrio in sorted(self.jobsByPrio, reverse=True):
+                # pop the job dictionary object and update it
+                cachedJob = self.jobDataCache.pop(jobid)
+                cachedJob['custom'] = {'location': siteName}
+                cachedJob['possibleSites'] = possibleSites
 
-            # then we're completely done and have our basket full of jobs to submit
-            if exitLoop:
+                # Sort jobs by jobPackage and get it in place to be submitted by the plugin
+                package = cachedJob['packageDir']
+                jobsToSubmit.setdefault(package, [])
+                jobsToSubmit[package].append(cachedJob)
+
+                # update site/task thresholds and the component job counter
+                self.currentRcThresholds[siteName]["total_pending_jobs"] += 1
+                self.currentRcThresholds[siteName]['thresholds'][jobType]["task_pending_jobs"] += 1
+                jobsCount += 1
+                jobSubmitLogBySites[siteName][jobType]["submitted"] += 1
+                jobSubmitLogByPriority[jobPrio][jobType]['submitted'] += 1
+
+                # jobs that will be submitted must leave the job data cache
+                self.jobSubmitQueue.remove(jobid)
+
+                # found a site to submit this job, so go to the next job
                 break
 
-            # can we assume jobid=1 is older than jobid=3? I think so...
-            for jobid in sorted(self.jobsByPrio[jobPrio]):
-                jobType = self.jobDataCache[jobid]['task_type']
-                possibleSites = self.jobDataCache[jobid]['possibleSites']
-                # remove sites with 0 task thresholds
-                possibleSites = self.checkZeroTaskThresholds(jobType, possibleSites)
-                jobSubmitLogByPriority[jobPrio][jobType]['Total'] += 1
-                # now look for sites with free pending slots
-                for siteName in possibleSites:
-                    condition = self._getJobSubmitCondition(jobPrio, siteName, jobType)
-                    if condition != "JobSubmitReady":
-                        jobSubmitLogBySites[siteName][jobType][condition] += 1
-                        logging.debug("Found a job for %s : %s", siteName, condition)
-                        continue
-
-                    # pop the job dictionary object and update it
-                    cachedJob = self.jobDataCache.pop(jobid)
-                    cachedJob['custom'] = {'location': siteName}
-                    cachedJob['possibleSites'] = possibleSites
-
-                    # Sort jobs by jobPackage and get it in place to be submitted by the plugin
-                    package = cachedJob['packageDir']
-                    jobsToSubmit.setdefault(package, [])
-                    jobsToSubmit[package].append(cachedJob)
-
-                    # update site/task thresholds and the component job counter
-                    self.currentRcThresholds[siteName]["total_pending_jobs"] += 1
-                    self.currentRcThresholds[siteName]['thresholds'][jobType]["task_pending_jobs"] += 1
-                    jobsCount += 1
-                    jobSubmitLogBySites[siteName][jobType]["submitted"] += 1
-                    jobSubmitLogByPriority[jobPrio][jobType]['submitted'] += 1
-
-                    # jobs that will be submitted must leave the job data cache
-                    self.jobsByPrio[jobPrio].discard(jobid)
-
-                    # found a site to submit this job, so go to the next job
-                    break
-
-                # set the flag and get out of the job iteration
-                if jobsCount >= self.maxJobsThisCycle:
-                    logging.info("Submitter reached limit of submit slots for this cycle: %i", self.maxJobsThisCycle)
-                    exitLoop = True
-                    break
+            # then we're completely done and have our basket full of jobs to submit
+            if jobsCount >= self.maxJobsThisCycle:
+                logging.info("Submitter reached limit of submit slots for this cycle: %i", self.maxJobsThisCycle)
+                break
 
         logging.info("Site submission report ...")
         for site in jobSubmitLogBySites:
@@ -66,6 +66,21 @@ def xmlFileToNode(reportFile):
     return node
 
 
+def xmlFileToNodeStream(reportFile, target, depth=2):
+    """
+    _xmlFileToNodeStream_
+
+    Incremental version of xmlFileToNode: the nodes at the given depth
+    are sent to the target coroutine as soon as they are closed, and are
+    not kept in the node structure. Returns the remaining node structure.
+
+    """
+    node = Node("JobReports", {})
+    with open(reportFile, 'rb') as fd:
+        expat_parse(fd, streamBuild(node, target, depth))
+    return node
+
+
 def expat_parse(f, target):
     """
     _expat_parse_
@@ -113,3 +128,36 @@ def build(topNode):
             nodeStack[-1].text = str(''.join(charCache)).strip()
             nodeStack.pop()
             charCache = []
+
+
+@coroutine
+def streamBuild(topNode, target, depth=2):
+    """
+    _streamBuild_
+
+    Same as build, but the nodes at the given depth below topNode are sent
+    to the target coroutine, as (parentNode, node), once they are closed,
+    instead of being attached to their parent. Their whole subtree can then
+    be freed as soon as the target is done with it.
+
+    """
+    nodeStack = [topNode]
+    charCache = []
+    while True:
+        event, value = (yield)
+        if event == "start":
+            charCache = []
+            newnode = Node(value[0], value[1])
+            if len(nodeStack) != depth:
+                nodeStack[-1].children.append(newnode)
+            nodeStack.append(newnode)
+
+        elif event == "text":
+            charCache.append(value)
+
+        else: # end
+            closedNode = nodeStack.pop()
+            closedNode.text = str(''.join(charCache)).strip()
+            charCache = []
+            if len(nodeStack) == depth:
+                target.send((nodeStack[-1], closedNode))
@@ -299,7 +299,7 @@ class BossAirAPI(WMConnectionBase):
 
         if len(loadedJobs) != len(wmbsJobs):
             logging.error("Could not load all jobs in BossAir for WMBS input!")
-            idList = [x['jobid'] for x in loadedJobs]
+            idList = set(x['jobid'] for x in loadedJobs)
             for job in wmbsJobs:
                 if job['id'] not in idList:
                     logging.error("Failed to retrieve wmbs_id %i and WMBS job info: %s", job['id'], job)
@@ -435,13 +435,11 @@ class BossAirAPI(WMConnectionBase):
         runningJobs = self._listRunJobs(active=True)
 
         if runJobIDs:
-            for job in runningJobs:
-                if job['id'] not in runJobIDs:
-                    runningJobs.remove(job)
+            runJobIDs = set(runJobIDs)
+            runningJobs = [job for job in runningJobs if job['id'] in runJobIDs]
         if wmbsIDs:
-            for job in runningJobs:
-                if job['jobid'] not in wmbsIDs:
-                    runningJobs.remove(job)
+            wmbsIDs = set(wmbsIDs)
+            runningJobs = [job for job in runningJobs if job['jobid'] in wmbsIDs]
 
         if len(runningJobs) < 1:
             # Then we have no running jobs
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+"""
+_CondorEventTracker_
+
+Keeps track of the HTCondor job status from the schedd job event log, such
+that the job status can be updated with the events written since the last
+tracking cycle instead of querying all the jobs from the schedd.
+
+The job location is only available from the job ad information events, thus
+the schedd must be configured with:
+
+    EVENT_LOG_JOB_AD_INFORMATION_ATTRS = JobStatus, MachineAttrGLIDEIN_CMSSite0
+
+otherwise every cycle with running jobs falls back to a full schedd query.
+"""
+import logging
+import os
+import pickle
+import time
+
+import htcondor2 as htcondor
+
+# HTCondor JobStatus of a running job
+RUNNING = 2
+# HTCondor JobStatus value set by each event type, see exitCodeMap in SimpleCondorPlugin
+EVENT_STATUS_MAP = {htcondor.JobEventType.SUBMIT: 1,
+                    htcondor.JobEventType.EXECUTE: 2,
+                    htcondor.JobEventType.JOB_EVICTED: 1,
+                    htcondor.JobEventType.JOB_TERMINATED: 4,
+                    htcondor.JobEventType.JOB_ABORTED: 3,
+                    htcondor.JobEventType.JOB_HELD: 5,
+                    htcondor.JobEventType.JOB_RELEASED: 1,
+                    htcondor.JobEventType.JOB_SUSPENDED: 7,
+                    htcondor.JobEventType.JOB_UNSUSPENDED: 2}
+
+
+class CondorEventTracker(object):
+    """
+    _CondorEventTracker_
+
+    Job status of the schedd jobs, keyed by their grid id ('ClusterId.ProcId'),
+    as (JobStatus, location) tuples. The job status gets rebuilt from a full
+    schedd query (the reconciliation), done by the caller, then it gets updated
+    with the job event log. The position of the job event log reader is saved to
+    a state file, thus a restart does not need to read the whole event log again.
+    """
+
+    def __init__(self, eventLog, stateFile=None, fullTrackInterval=3600):
+        """
+        :param eventLog: path to the schedd job event log (EVENT_LOG)
+        :param stateFile: optional path to the file saving the event log position
+        :param fullTrackInterval: maximum seconds between two full reconciliations
+        """
+        self.eventLog = eventLog
+        self.stateFile = stateFile
+        self.fullTrackInterval = fullTrackInterval
+        self.jobInfo = {}
+        # jobs submitted since the last cycle, of any owner, until they are claimed by getJobInfo
+        self.newJobs = {}
+        self.reader = None
+        self.lastFullTrack = 0
+
+    def _openReader(self):
+        """
+        Open the job event log, at the position saved in the state file if any
+        """
+        if self.stateFile and os.path.isfile(self.stateFile):
+            try:
+                with open(self.stateFile, 'rb') as fd:
+                    eventLog, reader = pickle.load(fd)
+                if eventLog == self.eventLog:
+                    return reader
+            except Exception as ex:
+                logging.warning("Failed to load the job event log position from %s: %s", self.stateFile, str(ex))
+        return htcondor.JobEventLog(self.eventLog)
+
+    def _saveReader(self):
+        """
+        Save the position of the job event log reader, if a state file is configured
+        """
+        if not self.stateFile:
+            return
+        tmpFile = self.stateFile + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.stateFile)), exist_ok=True)
+            with open(tmpFile, 'wb') as fd:
+                pickle.dump((self.eventLog, self.reader), fd)
+            os.rename(tmpFile, self.stateFile)
+        except Exception as ex:
+            logging.warning("Failed to save the job event log position to %s: %s", self.stateFile, str(ex))
+
+    def startFullTrack(self):
+        """
+        To be called before the full schedd query: it moves the event log
+        reader to the end of the log, such that only the events written after
+        the query get applied. On failure, the tracker stays disabled until
+        the next full reconciliation.
+        """
+        self.jobInfo = {}
+        self.newJobs = {}
+        self.lastFullTrack = 0
+        try:
+            if self.reader is None:
+                self.reader = self._openReader()
+            numEvents = sum(1 for _ in self.reader.events(stop_after=0))
+            logging.info("Skipped %d events from the job event log %s", numEvents, self.eventLog)
+        except Exception as ex:
+            logging.error("Failed to read the job event log %s: %s", self.eventLog, str(ex))
+            self.reader = None
+
+    def setJobInfo(self, jobInfo):
+        """
+        Set the job status from the full schedd query
+        :param jobInfo: dictionary of {grid id: (JobStatus, location)}
+        """
+        if self.reader is None:
+            return
+        self.jobInfo = jobInfo
+        self.lastFullTrack = int(time.time())
+        self._saveReader()
+
+    def update(self):
+        """
+        Apply the events written to the job event log since the last call.
+        The jobs submitted since then are kept apart, in newJobs, as the event
+        log has the jobs of all the schedd users. Events of other jobs are ignored.
+        :return: the number of events applied
+        """
+        numEvents = 0
+        for event in self.reader.events(stop_after=0):
+            gridId = "%s.%s" % (event.cluster, event.proc)
+            if event.type == htcondor.JobEventType.SUBMIT and gridId not in self.jobInfo:
+                self.newJobs[gridId] = (EVENT_STATUS_MAP[event.type], None)
+                numEvents += 1
+                continue
+            jobs = self.jobInfo if gridId in self.jobInfo else self.newJobs
+            if gridId not in jobs:
+                continue
+            if event.type == htcondor.JobEventType.JOB_AD_INFORMATION:
+                jobStatus, location = jobs[gridId]
+                jobs[gridId] = (event.get('JobStatus', jobStatus),
+                                event.get('MachineAttrGLIDEIN_CMSSite0', location))
+                numEvents += 1
+            elif event.type in EVENT_STATUS_MAP:
+                jobs[gridId] = (EVENT_STATUS_MAP[event.type], jobs[gridId][1])
+                numEvents += 1
+        self._saveReader()
+        return numEvents
+
+    def getJobInfo(self, gridIds):
+        """
+        Return the up to date job status, unless a full reconciliation is needed,
+        i.e. if the reconciliation interval is over, the event log could not be
+        read, some of the jobs provided are not known, or some are running
+        without a location (see EVENT_LOG_JOB_AD_INFORMATION_ATTRS above).
+        The jobs submitted since the last call are only tracked if they are
+        among the jobs provided, the others are not jobs of this agent.
+        :param gridIds: grid ids of the jobs to be tracked
+        :return: dictionary of {grid id: (JobStatus, location)}, or None
+        """
+        if self.reader is None or int(time.time()) - self.lastFullTrack > self.fullTrackInterval:
+            return None
+        try:
+            numEvents = self.update()
+        except Exception as ex:
+            logging.error("Failed to read the job event log %s: %s", self.eventLog, str(ex))
+            self.reader = None
+            return None
+        newJobs, self.newJobs = self.newJobs, {}
+        missing = 0
+        unlocated = 0
+        for gridId in gridIds:
+            if gridId not in self.jobInfo and gridId in newJobs:
+                self.jobInfo[gridId] = newJobs[gridId]
+            if gridId not in self.jobInfo:
+                missing += 1
+            elif self.jobInfo[gridId][0] == RUNNING and not self.jobInfo[gridId][1]:
+                unlocated += 1
+        if missing:
+            logging.info("%d jobs are not in the job event log, doing a full reconciliation", missing)
+            return None
+        if unlocated:
+            logging.info("%d running jobs have no location in the job event log, doing a full reconciliation. "
+                         "Is MachineAttrGLIDEIN_CMSSite0 in the schedd EVENT_LOG_JOB_AD_INFORMATION_ATTRS?",
+                         unlocated)
+            return None
+        logging.info("Applied %d events from the job event log to %d jobs", numEvents, len(self.jobInfo))
+        return self.jobInfo
+
+    def forget(self, gridIds):
+        """
+        Stop tracking jobs, e.g. once they are completed
+        """
+        for gridId in gridIds:
+            self.jobInfo.pop(gridId, None)
@@ -14,6 +14,7 @@ import htcondor2 as htcondor
 
 from Utils import FileTools
 from Utils.IteratorTools import grouper
+from WMCore.BossAir.CondorEventTracker import CondorEventTracker
 from WMCore.BossAir.Plugins.BasePlugin import BasePlugin
 from WMCore.Credential.Proxy import Proxy
 from WMCore.DAOFactory import DAOFactory
@@ -144,6 +145,14 @@ class SimpleCondorPlugin(BasePlugin):
 
         self.useCMSToken = getattr(config.JobSubmitter, 'useOauthToken', False)
 
+        # incremental job tracking from the schedd job event log, with a full
+        # schedd query every fullTrackInterval seconds
+        self.eventTracker = None
+        if getattr(config.BossAir, 'condorEventLog', None):
+            self.eventTracker = CondorEventTracker(config.BossAir.condorEventLog,
+                                                   stateFile=getattr(config.BossAir, 'condorEventLogState', None),
+                                                   fullTrackInterval=getattr(config.BossAir, 'fullTrackInterval', 3600))
+
         return
 
     def submit(self, jobs, info=None):
@@ -200,8 +209,11 @@ class SimpleCondorPlugin(BasePlugin):
         First, the total number of jobs still running
         Second, the jobs that need to be changed
         Third, the jobs that need to be completed
+
+        If the schedd job event log is configured, the job status is updated
+        with the events since the last cycle, and only periodically from a
+        full schedd query.
         """
-        jobInfo = {}
         changeList = []
         completeList = []
         runningList = []
@@ -209,24 +221,14 @@ class SimpleCondorPlugin(BasePlugin):
         # get info about all active and recent jobs
         logging.debug("SimpleCondorPlugin is going to track %s jobs", len(jobs))
 
-        schedd = htcondor.Schedd()
-
-        logging.debug("Start: Retrieving classAds using Condor Python query")
-        try:
-            jobAds = schedd.query("WMAgent_AgentName == %s" % classad.quote(self.agent),
-                                  ['ClusterId', 'ProcId', 'JobStatus', 'MachineAttrGLIDEIN_CMSSite0'])
-            for jobAd in jobAds:
-                gridId = "%s.%s" % (jobAd['ClusterId'], jobAd['ProcId'])
-                jobStatus = SimpleCondorPlugin.exitCodeMap().get(jobAd.get('JobStatus'), 'Unknown')
-                location = jobAd.get('MachineAttrGLIDEIN_CMSSite0', None)
-                jobInfo[gridId] = (jobStatus, location)
-        except Exception as ex:
-            logging.error("Query to condor schedd failed in SimpleCondorPlugin.")
-            logging.error("Returning empty lists for all job types...")
-            logging.exception(ex)
-            return runningList, changeList, completeList
-
-        logging.debug("Finished retrieving %d classAds from Condor", len(jobInfo))
+        jobInfo = None
+        if self.eventTracker:
+            jobInfo = self.eventTracker.getJobInfo([job['gridid'] for job in jobs])
+        if jobInfo is None:
+            jobInfo = self._queryJobInfo()
+            if jobInfo is None:
+                logging.error("Returning empty lists for all job types...")
+                return runningList, changeList, completeList
 
         # now go over the jobs and see what we have
         for job in jobs:
@@ -236,7 +238,8 @@ class SimpleCondorPlugin(BasePlugin):
             if job['gridid'] not in jobInfo:
                 (newStatus, location) = ('Completed', None)
             else:
-                (newStatus, location) = jobInfo[job['gridid']]
+                (jobStatus, location) = jobInfo[job['gridid']]
+                newStatus = SimpleCondorPlugin.exitCodeMap().get(jobStatus, 'Unknown')
 
             # check for status changes
             if newStatus != job['status']:
@@ -262,11 +265,45 @@ class SimpleCondorPlugin(BasePlugin):
             else:
                 runningList.append(job)
 
+        if self.eventTracker:
+            self.eventTracker.forget([job['gridid'] for job in completeList])
+
         logging.debug("SimpleCondorPlugin tracking : %i/%i/%i (Executing/Changing/Complete)",
                       len(runningList), len(changeList), len(completeList))
 
         return runningList, changeList, completeList
 
+    def _queryJobInfo(self):
+        """
+        _queryJobInfo_
+
+        Query the schedd for the status of all the jobs of this agent
+        :return: dictionary of {grid id: (JobStatus, location)}, None on failure
+        """
+        if self.eventTracker:
+            # events written from now on get applied on top of the query results
+            self.eventTracker.startFullTrack()
+
+        jobInfo = {}
+        schedd = htcondor.Schedd()
+
+        logging.debug("Start: Retrieving classAds using Condor Python query")
+        try:
+            jobAds = schedd.query("WMAgent_AgentName == %s" % classad.quote(self.agent),
+                                  ['ClusterId', 'ProcId', 'JobStatus', 'MachineAttrGLIDEIN_CMSSite0'])
+            for jobAd in jobAds:
+                gridId = "%s.%s" % (jobAd['ClusterId'], jobAd['ProcId'])
+                jobInfo[gridId] = (jobAd.get('JobStatus'), jobAd.get('MachineAttrGLIDEIN_CMSSite0', None))
+        except Exception as ex:
+            logging.error("Query to condor schedd failed in SimpleCondorPlugin.")
+            logging.exception(ex)
+            return None
+
+        logging.debug("Finished retrieving %d classAds from Condor", len(jobInfo))
+        if self.eventTracker:
+            self.eventTracker.setJobInfo(jobInfo)
+        return jobInfo
+
     def complete(self, jobs):
         """
         Do any completion work required
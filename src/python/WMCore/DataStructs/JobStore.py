@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+"""
+_JobStore_
+
+Persistent storage for the job objects created by the JobCreator and loaded
+back by the JobSubmitter. Two backends are available:
+  * pickle: one job.pkl file per job cache directory (historical layout)
+  * sqlite: one JobStore.db file per JobCollection directory, keyed by job id,
+    with the workflow level job information stored only once per file.
+
+Jobs stored by either backend are loaded through loadJobs, which falls back
+to the job.pkl file whenever a job is not found in a JobStore.db file.
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+from collections import defaultdict
+
+from Utils.PythonVersion import HIGHEST_PICKLE_PROTOCOL
+from WMCore.WMException import WMException
+
+# job keys set by the JobCreator which are the same for all the jobs of a job group
+WORKFLOW_JOB_KEYS = ('spec', 'task', 'sandbox', 'agentNumber', 'agentName', 'owner',
+                     'ownerDN', 'ownerGroup', 'ownerRole', 'scramArch', 'swVersion',
+                     'numberOfCores', 'inputDataset', 'inputDatasetLocations', 'inputPileup',
+                     'allowOpportunistic', 'requiresGPU', 'gpuRequirements',
+                     'jobExtraMatchRequirements', 'requestType', 'physicsTaskType', 'campaignName')
+
+PICKLE_FILE_NAME = 'job.pkl'
+SQLITE_FILE_NAME = 'JobStore.db'
+
+
+class JobStoreException(WMException):
+    """
+    _JobStoreException_
+
+    Raised for errors when storing or loading job objects.
+    """
+
+
+class PickleJobStore(object):
+    """
+    _PickleJobStore_
+
+    Store every job in a job.pkl file inside its own cache directory.
+    """
+
+    def save(self, jobs):
+        """
+        _save_
+
+        Pickle each job to <cache_dir>/job.pkl
+        """
+        for job in jobs:
+            with open(os.path.join(job['cache_dir'], PICKLE_FILE_NAME), 'wb') as output:
+                pickle.dump(job, output, HIGHEST_PICKLE_PROTOCOL)
+        return
+
+    def load(self, cacheDirs):
+        """
+        _load_
+
+        Given a dictionary of job id to job cache directory, return a tuple
+        with a dictionary of the loaded job objects, the set of job ids
+        without a job.pkl file and the set of job ids that failed to load.
+        """
+        loadedJobs = {}
+        missingJobs = set()
+        failedJobs = set()
+        for jobID, cacheDir in cacheDirs.items():
+            pickledJobPath = os.path.join(cacheDir, PICKLE_FILE_NAME)
+            if not os.path.isfile(pickledJobPath):
+                logging.warning("Could not find pickled jobObject %s", pickledJobPath)
+                missingJobs.add(jobID)
+                continue
+            try:
+                with open(pickledJobPath, 'rb') as jobHandle:
+                    loadedJobs[jobID] = pickle.load(jobHandle)
+            except Exception:
+                logging.warning("Failed to load job pickle object %s", pickledJobPath)
+                failedJobs.add(jobID)
+        return loadedJobs, missingJobs, failedJobs
+
+
+class SQLiteJobStore(object):
+    """
+    _SQLiteJobStore_
+
+    Store the jobs of a JobCollection directory in a single SQLite file,
+    keyed by job id. The workflow level keys of the jobs (WORKFLOW_JOB_KEYS)
+    are stored once in a separate table and merged back into the jobs when
+    they are loaded.
+    """
+
+    def __init__(self, timeout=60):
+        """
+        __init__
+
+        :param timeout: seconds to wait for a lock on a JobStore.db file
+        """
+        self.timeout = timeout
+
+    def _connect(self, dbFile):
+        """
+        _connect_
+
+        Open a JobStore.db file, creating its tables if needed.
+        """
+        conn = sqlite3.connect(dbFile, timeout=self.timeout)
+        conn.execute("CREATE TABLE IF NOT EXISTS workflow_info (id TEXT PRIMARY KEY, data BLOB NOT NULL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS job (id INTEGER PRIMARY KEY, workflow_info TEXT NOT NULL, "
+                     "data BLOB NOT NULL)")
+        return conn
+
+    def save(self, jobs):
+        """
+        _save_
+
+        Store the jobs in the JobStore.db file of their JobCollection
+        directory, with one transaction per file.
+        """
+        jobsByStore = defaultdict(list)
+        for job in jobs:
+            jobsByStore[os.path.join(os.path.dirname(job['cache_dir']), SQLITE_FILE_NAME)].append(job)
+
+        for dbFile, storeJobs in jobsByStore.items():
+            workflowRows = {}
+            jobRows = []
+            for job in storeJobs:
+                workflowInfo = {}
+                for key in WORKFLOW_JOB_KEYS:
+                    if key in job:
+                        workflowInfo[key] = job.pop(key)
+                try:
+                    workflowData = pickle.dumps(workflowInfo, HIGHEST_PICKLE_PROTOCOL)
+                    jobData = pickle.dumps(job, HIGHEST_PICKLE_PROTOCOL)
+                finally:
+                    job.update(workflowInfo)
+                workflowID = hashlib.sha1(workflowData).hexdigest()
+                workflowRows[workflowID] = workflowData
+                jobRows.append((job['id'], workflowID, jobData))
+
+            conn = self._connect(dbFile)
+            try:
+                with conn:
+                    conn.executemany("INSERT OR IGNORE INTO workflow_info (id, data) VALUES (?, ?)",
+                                     list(workflowRows.items()))
+                    conn.executemany("INSERT OR REPLACE INTO job (id, workflow_info, data) VALUES (?, ?, ?)",
+                                     jobRows)
+            except sqlite3.Error as ex:
+                msg = "Failed to save %d jobs into %s. Error: %s" % (len(jobRows), dbFile, str(ex))
+                raise JobStoreException(msg)
+            finally:
+                conn.close()
+        return
+
+    def load(self, cacheDirs):
+        """
+        _load_
+
+        Given a dictionary of job id to job cache directory, return a tuple
+        with a dictionary of the loaded job objects, the set of job ids
+        not found in any JobStore.db file and the set of job ids that failed
+        to load.
+        """
+        loadedJobs = {}
+        missingJobs = set()
+        failedJobs = set()
+
+        jobIDsByStore = defaultdict(list)
+        for jobID, cacheDir in cacheDirs.items():
+            jobIDsByStore[os.path.join(os.path.dirname(cacheDir), SQLITE_FILE_NAME)].append(jobID)
+
+        for dbFile, jobIDs in jobIDsByStore.items():
+            if not os.path.isfile(dbFile):
+                missingJobs.update(jobIDs)
+                continue
+            try:
+                loaded, failed = self._loadFromFile(dbFile, jobIDs)
+            except (sqlite3.Error, pickle.UnpicklingError) as ex:
+                logging.warning("Failed to read job store %s. Error: %s", dbFile, str(ex))
+                failedJobs.update(jobIDs)
+                continue
+            loadedJobs.update(loaded)
+            failedJobs.update(failed)
+            missingJobs.update(set(jobIDs) - set(loaded) - failed)
+        return loadedJobs, missingJobs, failedJobs
+
+    def _loadFromFile(self, dbFile, jobIDs):
+        """
+        _loadFromFile_
+
+        Bulk load a list of job ids from a single JobStore.db file.
+        Return the loaded jobs keyed by id and the set of job ids which
+        could not be unpickled.
+        """
+        loadedJobs = {}
+        failedJobs = set()
+        workflowCache = {}
+        conn = sqlite3.connect(dbFile, timeout=self.timeout)
+        try:
+            # stay below the SQLite limit of host parameters per statement
+            for idx in range(0, len(jobIDs), 500):
+                chunk = jobIDs[idx:idx + 500]
+                query = "SELECT job.id, job.workflow_info, job.data, workflow_info.data FROM job "
+                query += "JOIN workflow_info ON job.workflow_info = workflow_info.id "
+                query += "WHERE job.id IN (%s)" % ",".join("?" * len(chunk))
+                for jobID, workflowID, jobData, workflowData in conn.execute(query, chunk):
+                    try:
+                        if workflowID not in workflowCache:
+                            workflowCache[workflowID] = pickle.loads(workflowData)
+                        job = pickle.loads(jobData)
+                    except Exception:
+                        logging.warning("Failed to load job %s from job store %s", jobID, dbFile)
+                        failedJobs.add(jobID)
+                        continue
+                    job.update(workflowCache[workflowID])
+                    loadedJobs[jobID] = job
+        finally:
+            conn.close()
+        return loadedJobs, failedJobs
+
+
+JOB_STORE_BACKENDS = {'pickle': PickleJobStore,
+                      'sqlite': SQLiteJobStore}
+
+
+def getJobStore(backend='pickle'):
+    """
+    _getJobStore_
+
+    Return a job store instance for the given backend name.
+    """
+    if backend not in JOB_STORE_BACKENDS:
+        msg = "Unknown job store backend '%s'. Supported: %s" % (backend, list(JOB_STORE_BACKENDS))
+        raise JobStoreException(msg)
+    return JOB_STORE_BACKENDS[backend]()
+
+
+def loadJobs(cacheDirs):
+    """
+    _loadJobs_
+
+    Bulk load job objects created by the JobCreator with any of the backends.
+    Jobs are looked up in the JobStore.db file of their JobCollection first
+    and then in their job.pkl file.
+
+    :param cacheDirs: dictionary of job id to job cache directory
+    :return: a tuple with a dictionary of the loaded jobs keyed by job id,
+        the set of job ids not found and the set of job ids that failed to load.
+    """
+    loadedJobs, missingJobs, failedJobs = SQLiteJobStore().load(cacheDirs)
+    if missingJobs:
+        pickleJobs, missingJobs, pickleFailed = PickleJobStore().load({jobID: cacheDirs[jobID]
+                                                                       for jobID in missingJobs})
+        loadedJobs.update(pickleJobs)
+        failedJobs.update(pickleFailed)
+    return loadedJobs, missingJobs, failedJobs
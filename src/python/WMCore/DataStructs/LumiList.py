@@ -20,13 +20,82 @@ from future.utils import viewitems
 from future import standard_library
 standard_library.install_aliases()
 
-import copy
-import itertools
+import bisect
 import json
 import re
 import urllib.request
 from contextlib import closing
 
+
+def _unionRanges(aRanges, bRanges):
+    """
+    Merge two sorted lists of [start, end] lumi ranges into a single sorted
+    list of non-overlapping ranges, in a single linear pass over both lists.
+    """
+    result = []
+    aIdx, bIdx = 0, 0
+    while aIdx < len(aRanges) or bIdx < len(bRanges):
+        if bIdx >= len(bRanges) or (aIdx < len(aRanges) and aRanges[aIdx][0] <= bRanges[bIdx][0]):
+            start, end = aRanges[aIdx]
+            aIdx += 1
+        else:
+            start, end = bRanges[bIdx]
+            bIdx += 1
+        if result and start <= result[-1][1] + 1:
+            result[-1][1] = max(result[-1][1], end)
+        else:
+            result.append([start, end])
+    return result
+
+
+def _intersectRanges(aRanges, bRanges):
+    """
+    Return the sorted list of [start, end] lumi ranges present in both
+    sorted, non-overlapping range lists, in a single linear pass.
+    """
+    result = []
+    aIdx, bIdx = 0, 0
+    while aIdx < len(aRanges) and bIdx < len(bRanges):
+        start = max(aRanges[aIdx][0], bRanges[bIdx][0])
+        end = min(aRanges[aIdx][1], bRanges[bIdx][1])
+        if start <= end:
+            if result and start == result[-1][1] + 1:
+                result[-1][1] = end
+            else:
+                result.append([start, end])
+        # advance whichever range finishes first
+        if aRanges[aIdx][1] < bRanges[bIdx][1]:
+            aIdx += 1
+        else:
+            bIdx += 1
+    return result
+
+
+def _subtractRanges(aRanges, bRanges):
+    """
+    Return the sorted list of [start, end] lumi ranges present in the first
+    but not in the second sorted, non-overlapping range list, in a single
+    linear pass.
+    """
+    result = []
+    bIdx = 0
+    for start, end in aRanges:
+        # skip the ranges to subtract which finish before this one starts
+        while bIdx < len(bRanges) and bRanges[bIdx][1] < start:
+            bIdx += 1
+        idx = bIdx
+        while idx < len(bRanges) and bRanges[idx][0] <= end:
+            if bRanges[idx][0] > start:
+                result.append([start, bRanges[idx][0] - 1])
+            start = max(start, bRanges[idx][1] + 1)
+            if start > end:
+                break
+            idx += 1
+        if start <= end:
+            result.append([start, end])
+    return result
+
+
 class LumiList(object):
     """
     Deal with lists of lumis in several different forms:
@@ -62,6 +131,7 @@ class LumiList(object):
         """
         self.compactList = {}
         self.duplicates = {}
+        self._rangeStarts = {}
         if filename:
             self.filename = filename
             with open(self.filename,'r') as jsonFile:
@@ -156,27 +226,7 @@ class LumiList(object):
     def __sub__(self, other): # Things from self not in other
         result = {}
         for run in sorted(self.compactList.keys()):
-            alumis = sorted(self.compactList[run])
-            blumis = sorted(other.compactList.get(run, []))
-            alist = []                    # verified part
-            for alumi in alumis:
-                tmplist = [alumi[0], alumi[1]] # may be part
-                for blumi in blumis:
-                    if blumi[0] <= tmplist[0] and blumi[1] >= tmplist[1]: # blumi has all of alumi
-                        tmplist = []
-                        break # blumi is has all of alumi
-                    if blumi[0] > tmplist[0] and blumi[1] < tmplist[1]: # blumi is part of alumi
-                        alist.append([tmplist[0], blumi[0]-1])
-                        tmplist = [blumi[1]+1, tmplist[1]]
-                    elif blumi[0] <= tmplist[0] and blumi[1] < tmplist[1] and blumi[1]>=tmplist[0]: # overlaps start
-                        tmplist = [blumi[1]+1, tmplist[1]]
-                    elif blumi[0] > tmplist[0] and blumi[1] >= tmplist[1] and blumi[0]<=tmplist[1]: # overlaps end
-                        alist.append([tmplist[0], blumi[0]-1])
-                        tmplist = []
-                        break
-                if tmplist:
-                    alist.append(tmplist)
-            result[run] = alist
+            result[run] = _subtractRanges(self.compactList[run], other.compactList.get(run, []))
 
         return LumiList(compactList = result)
 
@@ -186,29 +236,7 @@ class LumiList(object):
         aruns = set(self.compactList.keys())
         bruns = set(other.compactList.keys())
         for run in aruns & bruns:
-            lumiList = []                    # List for this run
-            unique = []                    # List for this run
-            for alumi in self.compactList[run]:
-                for blumi in other.compactList[run]:
-                    if blumi[0] <= alumi[0] and blumi[1] >= alumi[1]: # blumi has all of alumi
-                        lumiList.append(alumi)
-                    if blumi[0] > alumi[0] and blumi[1] < alumi[1]: # blumi is part of alumi
-                        lumiList.append(blumi)
-                    elif blumi[0] <= alumi[0] and blumi[1] < alumi[1] and blumi[1] >= alumi[0]: # overlaps start
-                        lumiList.append([alumi[0], blumi[1]])
-                    elif blumi[0] > alumi[0] and blumi[1] >= alumi[1] and blumi[0] <= alumi[1]: # overlaps end
-                        lumiList.append([blumi[0], alumi[1]])
-
-
-            if lumiList:
-                unique = [lumiList[0]]
-            for pair in lumiList[1:]:
-                if pair[0] == unique[-1][1]+1:
-                    unique[-1][1] = copy.deepcopy(pair[1])
-                else:
-                    unique.append(copy.deepcopy(pair))
-
-            result[run] = unique
+            result[run] = _intersectRanges(self.compactList[run], other.compactList[run])
         return LumiList(compactList = result)
 
 
@@ -218,14 +246,7 @@ class LumiList(object):
         bruns = list(other.compactList)
         runs = set(aruns + bruns)
         for run in runs:
-            overlap = sorted(self.compactList.get(run, []) + other.compactList.get(run, []))
-            unique = [overlap[0]]
-            for pair in overlap[1:]:
-                if pair[0] >= unique[-1][0] and pair[0] <= unique[-1][1]+1 and pair[1] > unique[-1][1]:
-                    unique[-1][1] = copy.deepcopy(pair[1])
-                elif pair[0] > unique[-1][1]:
-                    unique.append(copy.deepcopy(pair))
-            result[run] = unique
+            result[run] = _unionRanges(self.compactList.get(run, []), other.compactList.get(run, []))
         return LumiList(compactList = result)
 
 
@@ -245,14 +266,32 @@ class LumiList(object):
         """
         filteredList = []
         for (run, lumi) in lumiList:
-            runsInLumi = self.compactList.get(str(run), [[0, -1]])
-            for (first, last) in runsInLumi:
-                if lumi >= first and lumi <= last:
-                    filteredList.append((run, lumi))
-                    break
+            lumiRangeList, starts, _ = self._getRunIndex(run)
+            idx = bisect.bisect_right(starts, lumi) - 1
+            if idx >= 0 and lumi <= lumiRangeList[idx][1]:
+                filteredList.append((run, lumi))
         return filteredList
 
 
+    def _getRunIndex(self, run):
+        """
+        Return a tuple with the lumi ranges of a run, the sorted list of their
+        start lumis (used to bisect the ranges) and the lowest start of a range
+        open until the end of the run (upper bound 0), or None.
+        The index is cached and rebuilt only if the ranges of that run have
+        been replaced or resized.
+        """
+        run = str(run)
+        lumiRangeList = self.compactList.get(run, [])
+        cached = self._rangeStarts.get(run)
+        if cached is None or cached[0] is not lumiRangeList or len(cached[1]) != len(lumiRangeList):
+            openStarts = [lumiRange[0] for lumiRange in lumiRangeList if lumiRange[1] == 0]
+            cached = (lumiRangeList, [lumiRange[0] for lumiRange in lumiRangeList],
+                      min(openStarts) if openStarts else None)
+            self._rangeStarts[run] = cached
+        return cached
+
+
     def __str__ (self):
         doubleBracketRE = re.compile (r']],')
         return doubleBracketRE.sub (']],\n',
@@ -392,21 +431,19 @@ class LumiList(object):
                 run         = run[0]
             except:
                 raise RuntimeError("Improper format for run '%s'" % run)
-        lumiRangeList = self.compactList.get( str(run) )
+        lumiRangeList, starts, openStart = self._getRunIndex(run)
         if not lumiRangeList:
             # the run isn't there, so no need to look any further
             return False
-        for lumiRange in lumiRangeList:
-            # we want to make this as found if either the lumiSection
-            # is inside the range OR if the lumi section is greater
-            # than or equal to the lower bound of the lumi range and
-            # the upper bound is 0 (which means extends to the end of
-            # the run)
-            if lumiRange[0] <= lumiSection and \
-               (0 == lumiRange[1] or lumiSection <= lumiRange[1]):
-                # got it
-                return True
-        return False
+        # we want to make this as found if either the lumiSection
+        # is inside the range OR if the lumi section is greater
+        # than or equal to the lower bound of the lumi range and
+        # the upper bound is 0 (which means extends to the end of
+        # the run)
+        if openStart is not None and openStart <= lumiSection:
+            return True
+        idx = bisect.bisect_right(starts, lumiSection) - 1
+        return idx >= 0 and lumiSection <= lumiRangeList[idx][1]
 
 
     def __contains__ (self, runTuple):
@@ -205,6 +205,9 @@ class Database(CouchDBRequests):
         self._queue_size = size
         self.threads = []
         self.last_seq = 0
+        # throughput counters of the bulkCommit calls
+        self.bulkStats = {'docs': 0, 'requests': 0, 'failedRequests': 0,
+                          'conflicts': 0, 'docErrors': 0, 'seconds': 0.0}
 
     def _reset_queue(self):
         """
@@ -327,6 +330,124 @@ class Database(CouchDBRequests):
 
         return retval
 
+    def bulkCommit(self, docs=None, batchSize=None, maxInFlight=4, timestamp=False,
+                   conflictHandler=None):
+        """
+        Write documents to the database with _bulk_docs requests of batchSize
+        documents (by default the queue size), keeping up to maxInFlight
+        requests running at the same time. If docs is None, the queued
+        documents are written and the queue is emptied.
+
+        Once all the requests completed, the per document results are
+        classified and all the conflicting documents are passed at once to
+        the conflictHandler function, which is called with the database
+        object, the list of conflicting documents and the list of their
+        results, and must return the list of their new results.
+
+        If any request failed, the queue is left with the documents of the
+        failed requests only and the CouchError of the first failed request
+        is raised, such that they can be fixed and committed again.
+
+        Returns the list of results, in the same order as the documents
+        (None for the documents of failed requests).
+        """
+        fromQueue = docs is None
+        docs = list(self._queue) if fromQueue else list(docs)
+        if not docs:
+            return []
+        if timestamp:
+            self.timestamp(docs, timestamp)
+        batchSize = batchSize or self._queue_size
+        batches = [docs[idx:idx + batchSize] for idx in range(0, len(docs), batchSize)]
+
+        startTime = time.time()
+        results = [None] * len(docs)
+        failures = {}
+        for idx, rows, exc in self._bulkDocsRequests(batches, maxInFlight):
+            if exc is not None:
+                failures[idx] = exc
+                continue
+            results[idx * batchSize:idx * batchSize + len(rows)] = rows
+
+        classified = self.classifyBulkResults(results)
+        conflicts = classified.pop('conflict', [])
+        self.bulkStats['docs'] += len(docs)
+        self.bulkStats['requests'] += len(batches)
+        self.bulkStats['failedRequests'] += len(failures)
+        self.bulkStats['conflicts'] += len(conflicts)
+        self.bulkStats['docErrors'] += sum(len(value) for key, value in viewitems(classified) if key != 'ok')
+        if conflicts and conflictHandler:
+            newRows = conflictHandler(self, [docs[idx] for idx in conflicts], [results[idx] for idx in conflicts])
+            for idx, row in zip(conflicts, newRows):
+                results[idx] = row
+        self.bulkStats['seconds'] += time.time() - startTime
+
+        if fromQueue:
+            self._queue = [doc for idx in sorted(failures) for doc in batches[idx]]
+        if failures:
+            logging.warning("%d out of %d bulk requests to %s failed", len(failures), len(batches), self.name)
+            raise failures[min(failures)]
+        return results
+
+    def _bulkDocsRequests(self, batches, maxInFlight):
+        """
+        Post each batch of documents to _bulk_docs, with up to maxInFlight
+        concurrent requests when pycurl is used. Yield (batch index, result
+        rows, CouchError) tuples as the requests complete.
+        """
+        uri = '/%s/_bulk_docs/' % self.name
+        if not self.pycurl:
+            for idx, batch in enumerate(batches):
+                try:
+                    yield idx, self.post(uri, {'docs': batch}), None
+                except CouchError as exc:
+                    yield idx, None, exc
+            return
+
+        ckey, cert = self.getKeyCert()
+        capath = self.getCAPath()
+
+        def bulkRequests():
+            for batch in batches:
+                data, headers = self.encodeParams({'docs': batch}, 'POST', {'Cache-Control': 'no-cache'},
+                                                  True, None)
+                headers["Accept-Encoding"] = "gzip,deflate,identity"
+                yield {'url': self['host'] + uri, 'params': data, 'headers': headers, 'verb': 'POST'}
+
+        for idx, _, data, exc in self.reqmgr.streamRequests(bulkRequests(), maxInFlight,
+                                                           ckey=ckey, cert=cert, capath=capath):
+            if exc is None:
+                yield idx, self.decode(data), None
+                continue
+            try:
+                self.checkForCouchError(getattr(exc, "status", None), getattr(exc, "reason", str(exc)),
+                                        {'docs': batches[idx]}, getattr(exc, "result", None))
+            except CouchError as couchExc:
+                yield idx, None, couchExc
+
+    @staticmethod
+    def classifyBulkResults(results):
+        """
+        Given the rows returned by _bulk_docs, return a dictionary of the row
+        indexes key'ed by 'ok' or by the error name (e.g. 'conflict').
+        Rows which are None (failed requests) are skipped.
+        """
+        classified = {}
+        for idx, row in enumerate(results):
+            if row is None:
+                continue
+            classified.setdefault(row.get('error', 'ok'), []).append(idx)
+        return classified
+
+    def getBulkStats(self):
+        """
+        Return the bulkCommit throughput counters, along with the
+        number of documents written per second.
+        """
+        stats = dict(self.bulkStats)
+        stats['docsPerSecond'] = stats['docs'] / stats['seconds'] if stats['seconds'] else 0.0
+        return stats
+
     def document(self, id, rev=None):
         """
         Load a document identified by id. You can specify a rev to see an older revision
@@ -507,6 +628,19 @@ class Database(CouchDBRequests):
         self.last_seq = data['last_seq']
         return data
 
+    def changesSince(self, since=0, includeDocs=False, limit=None):
+        """
+        Get the changes since a sequence, which is a number in CouchDB 1.x and
+        an opaque string since CouchDB 2.x ('now' for the current sequence).
+        Use the last_seq value of the result as the since of the next call.
+        """
+        query = {'since': since}
+        if includeDocs:
+            query['include_docs'] = 'true'
+        if limit:
+            query['limit'] = limit
+        return self.get('/%s/_changes?%s' % (self.name, urllib.parse.urlencode(query)))
+
     def purge(self, data):
         return self.post('/%s/_purge' % self.name, data)
 
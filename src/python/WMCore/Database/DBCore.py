@@ -11,7 +11,28 @@ from copy import copy
 from Utils.IteratorTools import grouper
 import WMCore.WMLogging
 from WMCore.DataStructs.WMObject import WMObject
-from WMCore.Database.ResultSet import ResultSet
+from WMCore.Database.ResultSet import ResultSet, StreamingResultSet, ColumnarResultSet
+
+FETCH_MODES = ('stream', 'columnar')
+
+
+class StreamReleaser(object):
+    """
+    _StreamReleaser_
+
+    Return a connection to the pool once all the streaming result sets
+    using it have been closed.
+    """
+    def __init__(self, connection):
+        self.connection = connection
+        self.streams = set()
+
+    def __call__(self, stream):
+        self.streams.discard(id(stream))
+        if not self.streams and self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
 
 class DBInterface(WMObject):
     """
@@ -120,13 +141,55 @@ class DBInterface(WMObject):
         return self.engine.connect()
 
 
+    def fetchResults(self, results, fetchMode, chunkSize=1000, connection=None):
+        """
+        _fetchResults_
+
+        Wrap the result proxies returned by the execute calls according to
+        the fetch mode:
+          * stream: StreamingResultSet objects, reading the rows from the
+            open cursors while they are iterated over. If a connection is
+            given, it is closed once all the streams have been closed.
+          * columnar: ColumnarResultSet objects, holding one list per column
+        Proxies not returning rows are closed and replaced by an empty ResultSet.
+        """
+        releaser = StreamReleaser(connection) if connection is not None else None
+        wrapped = []
+        for resultProxy in results:
+            if resultProxy.closed or not resultProxy.returns_rows:
+                resultProxy.close()
+                wrapped.append(ResultSet())
+            elif fetchMode == 'stream':
+                stream = StreamingResultSet(resultProxy, chunkSize, releaser)
+                if releaser:
+                    releaser.streams.add(id(stream))
+                wrapped.append(stream)
+            else:
+                result = ColumnarResultSet()
+                result.add(resultProxy, chunkSize)
+                resultProxy.close()
+                wrapped.append(result)
+        return wrapped
+
     def processData(self, sqlstmt, binds={}, conn=None,
-                    transaction=False, returnCursor=False):
+                    transaction=False, returnCursor=False,
+                    fetchMode=None, chunkSize=1000):
         """
         set conn if you already have an active connection to reuse
         set transaction = True if you already have an active transaction
-
+        set fetchMode to 'stream' or 'columnar' to get StreamingResultSet or
+        ColumnarResultSet objects back, see fetchResults. The rows are
+        fetched chunkSize at a time. When streaming without an active
+        connection, the connection is only returned to the pool once all
+        the returned result sets have been read or closed.
         """
+        if fetchMode is not None and fetchMode not in FETCH_MODES:
+            raise ValueError("Unknown fetch mode '%s', supported are: %s" % (fetchMode, FETCH_MODES))
+        if fetchMode and returnCursor:
+            raise ValueError("The fetch mode cannot be used together with returnCursor")
+        rawCursor = returnCursor or fetchMode is not None
+        keepConnection = False
+
         connection = None
         try:
             if not conn:
@@ -146,7 +209,7 @@ class DBInterface(WMObject):
 
                 for i in sqlstmt:
                     r = self.executebinds(i, connection=connection,
-                                          returnCursor=returnCursor)
+                                          returnCursor=rawCursor)
                     result.append(r)
 
                 if not transaction:
@@ -157,7 +220,7 @@ class DBInterface(WMObject):
                     trans = connection.begin()
                 for subBinds in grouper(binds, self.maxBindsPerQuery):
                     result.extend(self.executemanybinds(sqlstmt[0], subBinds,
-                                                        connection=connection, returnCursor=returnCursor))
+                                                        connection=connection, returnCursor=rawCursor))
 
                 if not transaction:
                     trans.commit()
@@ -170,7 +233,7 @@ class DBInterface(WMObject):
                     b = binds[i]
 
                     r = self.executebinds(s, b, connection=connection,
-                                          returnCursor=returnCursor)
+                                          returnCursor=rawCursor)
                     result.append(r)
 
                 if not transaction:
@@ -192,7 +255,12 @@ class DBInterface(WMObject):
                                            (type(sqlstmt), type(binds), type(connection), type(transaction)))
                 raise Exception("""DBInterface.processData Nothing executed, problem with your arguments
                 Probably mismatched sizes for sql (%i) and binds (%i)""" % (len(sqlstmt), len(binds)))
+
+            if fetchMode:
+                result = self.fetchResults(result, fetchMode, chunkSize,
+                                           connection=None if conn else connection)
+                keepConnection = not conn and any(isinstance(r, StreamingResultSet) for r in result)
         finally:
-            if not conn and connection != None:
+            if not conn and connection != None and not keepConnection:
                 connection.close() # Return connection to the pool
         return result
@@ -111,6 +111,57 @@ class DBFormatter(WMObject):
             r.close()
         return listOut
 
+    def iterFormat(self, result):
+        """
+        Generator version of format, yielding one tuple per record.
+        Ideally used with the 'stream' fetch mode, such that the records
+        are never all held in memory.
+        """
+        for r in result:
+            for i in r:
+                yield tuple(i)
+            r.close()
+
+    def iterFormatDict(self, result):
+        """
+        Generator version of formatDict, yielding one dictionary per record
+        """
+        for r in result:
+            keyNames = []
+            for key in r.keys:
+                if isinstance(key, (str, bytes)):
+                    key = decodeBytesToUnicodeConditional(key, condition=PY3)
+                keyNames.append(key.lower())
+            for i in r:
+                entry = {}
+                for keyName, value in zip(keyNames, i):
+                    if isinstance(value, (str, bytes)):
+                        value = decodeBytesToUnicodeConditional(value, condition=PY3)
+                    entry[keyName] = value
+                yield entry
+            r.close()
+
+    def formatColumns(self, result):
+        """
+        Returns a dictionary of lower cased column names to the list of
+        their values, merging all the result sets. Result sets from the
+        'columnar' fetch mode are merged without building any row.
+        """
+        columns = {}
+        for r in result:
+            keyNames = [decodeBytesToUnicodeConditional(key, condition=PY3).lower()
+                        if isinstance(key, (str, bytes)) else key for key in r.keys]
+            if hasattr(r, 'columns'):
+                values = r.columns
+            else:
+                values = list(zip(*r.fetchall())) or [[] for _ in keyNames]
+            for keyName, column in zip(keyNames, values):
+                columns.setdefault(keyName, []).extend(
+                    decodeBytesToUnicodeConditional(val, condition=PY3)
+                    if isinstance(val, bytes) else val for val in column)
+            r.close()
+        return columns
+
     def formatOneDict(self, result):
         """
         Return a dictionary representing the first record
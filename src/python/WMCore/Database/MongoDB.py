@@ -7,14 +7,22 @@ Description: Provides a wrapper class for MongoDB
 from __future__ import division, print_function
 from builtins import str, object
 
+import threading
+import time
+from collections import Counter, OrderedDict
+from copy import deepcopy
+
 try:
     import mongomock
 except ImportError:
     # this library should only be required by unit tests
     mongomock = None
 
-from pymongo import MongoClient, errors, IndexModel
-from pymongo.errors import ConnectionFailure
+from pymongo import MongoClient, errors, IndexModel, InsertOne, ReplaceOne, UpdateOne
+from pymongo.errors import AutoReconnect, BulkWriteError, ConnectionFailure
+
+# MongoDB error code for documents violating a unique index
+DUPLICATE_KEY_ERROR = 11000
 
 
 class MongoDB(object):
@@ -239,3 +247,298 @@ class MongoDB(object):
             msg = "General Exception while trying to connect to : %s\n%s" % (db, str(ex))
             self.logger.error(msg)
             raise ex
+
+
+class _PendingWrite(object):
+    """
+    The coalesced state of all the writes queued for a single document:
+    either a full document replacement, or fields to be set, together with
+    the document to be inserted if missing (or only the latter, for inserts)
+    """
+
+    def __init__(self, filterDoc):
+        self.filterDoc = filterDoc
+        self.replacement = None
+        self.setFields = {}
+        self.insertDoc = None
+        self.upsert = False
+        self.retries = 0
+
+    def merge(self, other):
+        """
+        Apply the writes of another (more recent) pending write of the same document
+        """
+        if other.replacement is not None:
+            self.replacement = other.replacement
+            self.setFields = {}
+            self.insertDoc = None
+        elif self.replacement is not None:
+            self.replacement.update(other.setFields)
+        else:
+            self.setFields.update(other.setFields)
+            if self.insertDoc is None:
+                # an insert following another one would fail as a duplicate
+                self.insertDoc = other.insertDoc
+        self.upsert = self.upsert or other.upsert
+
+    def toOperation(self):
+        """
+        Return the pymongo bulk operation equivalent to the pending write
+        """
+        if self.replacement is not None:
+            return ReplaceOne(self.filterDoc, self.replacement, upsert=True)
+        if self.setFields:
+            update = {'$set': self.setFields}
+            if self.insertDoc is not None:
+                onInsert = {key: value for key, value in self.insertDoc.items()
+                            if key not in self.setFields and key not in self.filterDoc}
+                if onInsert:
+                    update['$setOnInsert'] = onInsert
+            return UpdateOne(self.filterDoc, update, upsert=self.upsert or self.insertDoc is not None)
+        return InsertOne(self.insertDoc)
+
+
+class MongoWriteBehind(object):
+    """
+    A write-behind buffer for a MongoDB collection. Writes are queued and
+    coalesced by document (by the filter selecting it), then written in the
+    background with bulk_write, in batches, such that the callers do not wait
+    for the database. Use flush() to write all the pending documents, e.g. at
+    the end of a polling cycle, and close() when done with the buffer.
+
+    Documents are copied when queued, so they can be changed or cleared right
+    after. Inserts of already existing documents (unique index violations) are
+    ignored, like a failed insert_one would be. Writes failing because of the
+    connection (e.g. NotPrimaryError) are retried up to retryCount times in
+    the next batches.
+    """
+
+    def __init__(self, collection, logger=None, maxPending=1000, batchSize=500,
+                 flushInterval=5, retryCount=3, background=True):
+        """
+        :collection:    The pymongo (or mongomock) collection to write to
+        :maxPending:    The maximum number of documents waiting to be written.
+                        Writes of new documents block beyond it (backpressure).
+        :batchSize:     The maximum number of documents written by a bulk_write call
+        :flushInterval: The number of seconds between background writes
+        :retryCount:    The number of retries of the writes failing because of the connection
+        :background:    Flag to write from a background thread, otherwise the documents
+                        are only written by flush()
+        """
+        self.collection = collection
+        self.logger = logger
+        self.maxPending = maxPending
+        self.batchSize = batchSize
+        self.flushInterval = flushInterval
+        self.retryCount = retryCount
+        self.pending = OrderedDict()  # document key -> _PendingWrite
+        self.cond = threading.Condition()
+        self.flushLock = threading.Lock()  # a single bulk write at a time, to keep the writes ordered
+        self.stats = Counter()
+        self.lastError = None
+        self.closed = False
+        self.thread = None
+        if background:
+            self.thread = threading.Thread(target=self._run, name="MongoWriteBehind-%s" % collection.name)
+            self.thread.daemon = True
+            self.thread.start()
+
+    def insert(self, doc):
+        """
+        Queue the insertion of a document, ignored if it already exists in the collection
+        """
+        pending = _PendingWrite(self._filterOf(doc))
+        pending.insertDoc = deepcopy(dict(doc))
+        self._enqueue(pending)
+
+    def update(self, filterDoc, setFields, insertDoc=None, upsert=False):
+        """
+        Queue the update of some fields of the document selected by filterDoc.
+        If insertDoc is given, it is inserted (with the fields updated) in case
+        the document does not exist yet.
+        """
+        pending = _PendingWrite(dict(filterDoc))
+        pending.setFields = deepcopy(setFields)
+        pending.insertDoc = deepcopy(dict(insertDoc)) if insertDoc is not None else None
+        pending.upsert = upsert
+        self._enqueue(pending)
+
+    def replace(self, filterDoc, doc):
+        """
+        Queue the replacement of the document selected by filterDoc (or its insertion)
+        """
+        pending = _PendingWrite(dict(filterDoc))
+        pending.replacement = deepcopy(dict(doc))
+        self._enqueue(pending)
+
+    def _filterOf(self, doc):
+        if '_id' in doc:
+            return {'_id': doc['_id']}
+        # documents without id cannot be coalesced
+        self.stats['noid'] += 1
+        return {'_noid': self.stats['noid']}
+
+    @staticmethod
+    def _keyOf(filterDoc):
+        return repr(sorted(filterDoc.items()))
+
+    def _enqueue(self, pending):
+        key = self._keyOf(pending.filterDoc)
+        with self.cond:
+            if self.closed:
+                raise RuntimeError("MongoWriteBehind buffer for %s is closed" % self.collection.name)
+            self.stats['queued'] += 1
+            if key in self.pending:
+                self.pending[key].merge(pending)
+                self.stats['coalesced'] += 1
+                return
+            if len(self.pending) >= self.maxPending:
+                self.stats['backpressure_waits'] += 1
+                tStart = time.time()
+                self.cond.notify_all()
+                while len(self.pending) >= self.maxPending:
+                    self.cond.wait(self.flushInterval)
+                    if self.thread is None:
+                        # nobody else is writing, do it from the caller thread
+                        self.cond.release()
+                        try:
+                            self._writeBatch()
+                        finally:
+                            self.cond.acquire()
+                self.stats['backpressure_secs'] += time.time() - tStart
+                if key in self.pending:
+                    self.pending[key].merge(pending)
+                    self.stats['coalesced'] += 1
+                    return
+            self.pending[key] = pending
+            if len(self.pending) >= self.batchSize:
+                self.cond.notify_all()
+
+    def _run(self):
+        """
+        Background writer loop
+        """
+        while True:
+            with self.cond:
+                if not self.pending and not self.closed:
+                    self.cond.wait(self.flushInterval)
+                if self.closed and not self.pending:
+                    return
+            try:
+                self._writeBatch()
+            except Exception as ex:
+                # never let the writer thread die
+                self.lastError = str(ex)
+                self._log("exception", "Unexpected error in the MongoDB write-behind thread: %s", str(ex))
+                time.sleep(self.flushInterval)
+
+    def _writeBatch(self):
+        """
+        Write up to batchSize pending documents with a single bulk_write call
+        :return: the number of documents taken from the queue
+        """
+        with self.flushLock:
+            with self.cond:
+                batch = []
+                while self.pending and len(batch) < self.batchSize:
+                    batch.append(self.pending.popitem(last=False))
+                self.cond.notify_all()
+            if not batch:
+                return 0
+            failed = []
+            try:
+                self.collection.bulk_write([pending.toOperation() for _, pending in batch], ordered=False)
+                self.stats['written'] += len(batch)
+            except BulkWriteError as ex:
+                writeErrors = ex.details.get('writeErrors', [])
+                errorIdx = set()
+                for writeError in writeErrors:
+                    errorIdx.add(writeError['index'])
+                    if writeError.get('code') == DUPLICATE_KEY_ERROR and \
+                            isinstance(batch[writeError['index']][1].toOperation(), InsertOne):
+                        self.stats['duplicates'] += 1
+                        continue
+                    self.stats['failed'] += 1
+                    self.lastError = writeError.get('errmsg')
+                    self._log("error", "Failed to write document %s to MongoDB collection %s: %s",
+                              batch[writeError['index']][1].filterDoc, self.collection.name, self.lastError)
+                self.stats['written'] += len(batch) - len(errorIdx)
+            except AutoReconnect as ex:
+                # includes NotPrimaryError: the whole batch can be retried
+                self.lastError = str(ex)
+                failed = batch
+            except Exception as ex:
+                self.stats['failed'] += len(batch)
+                self.lastError = str(ex)
+                self._log("exception", "Failed to write %d documents to MongoDB collection %s: %s",
+                          len(batch), self.collection.name, str(ex))
+            self.stats['batches'] += 1
+            if failed:
+                self._requeue(failed)
+            return len(batch)
+
+    def _requeue(self, batch):
+        """
+        Put back the writes of a batch failed because of the connection,
+        before the writes queued since for the same documents
+        """
+        with self.cond:
+            for key, pending in reversed(batch):
+                pending.retries += 1
+                if pending.retries > self.retryCount:
+                    self.stats['failed'] += 1
+                    self._log("error", "Giving up writing document %s to MongoDB collection %s after %d retries: %s",
+                              pending.filterDoc, self.collection.name, self.retryCount, self.lastError)
+                    continue
+                self.stats['retried'] += 1
+                newer = self.pending.pop(key, None)
+                if newer is not None:
+                    pending.merge(newer)
+                self.pending[key] = pending
+                self.pending.move_to_end(key, last=False)
+
+    def flush(self):
+        """
+        Write all the pending documents
+        :return: the statistics of the buffer, see getStats
+        """
+        while True:
+            with self.cond:
+                if not self.pending:
+                    break
+            if not self._writeBatch():
+                break
+        # wait for a batch being written by the background thread
+        with self.flushLock:
+            pass
+        return self.getStats()
+
+    def close(self):
+        """
+        Write all the pending documents, and stop the background thread
+        """
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        if self.thread is not None:
+            self.thread.join()
+        self.flush()
+
+    def getStats(self):
+        """
+        Return the number of documents queued, coalesced, written, written as
+        duplicates, retried, failed and still pending, together with the
+        number of batches, the number of times and seconds writers waited
+        because of the backpressure, and the last error
+        """
+        with self.cond:
+            stats = {key: self.stats[key] for key in ('queued', 'coalesced', 'written', 'duplicates',
+                                                       'retried', 'failed', 'batches', 'backpressure_waits')}
+            stats['backpressure_secs'] = round(self.stats['backpressure_secs'], 3)
+            stats['pending'] = len(self.pending)
+            stats['last_error'] = self.lastError
+        return stats
+
+    def _log(self, level, msg, *args):
+        if self.logger:
+            getattr(self.logger, level)(msg, *args)
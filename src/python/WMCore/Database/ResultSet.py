@@ -4,11 +4,21 @@ _ResultSet_
 A class to read in a SQLAlchemy result proxy and hold the data, such that the
 SQLAlchemy result sets (aka cursors) can be closed. Make this class look as much
 like the SQLAlchemy class to minimise the impact of adding this class.
+
+StreamingResultSet and ColumnarResultSet are the result sets returned by
+DBInterface.processData for the 'stream' and 'columnar' fetch modes: the
+former yields the rows as tuples, fetched in chunks from the open cursor,
+the latter holds the data as one list per column.
 """
 
-from builtins import object
+from builtins import object, zip
 import threading
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 class ResultSet(object):
     def __init__(self):
@@ -42,3 +52,116 @@ class ResultSet(object):
                 self.data.append(r)
 
         return
+
+
+class StreamingResultSet(object):
+    """
+    _StreamingResultSet_
+
+    Iterate over the rows of a SQLAlchemy result proxy as plain tuples,
+    fetching chunkSize rows at a time, such that the whole result does not
+    have to be held in memory. The result proxy is closed, and closeCallback
+    called with this object, once all the rows have been read or when
+    close() is called.
+    """
+    def __init__(self, resultproxy, chunkSize=1000, closeCallback=None):
+        self.proxy = resultproxy
+        self.chunkSize = chunkSize
+        self.closeCallback = closeCallback
+        self.keys = list(resultproxy.keys())
+        self.closed = False
+
+    def __iter__(self):
+        while not self.closed:
+            rows = self.proxy.fetchmany(self.chunkSize)
+            if not rows:
+                break
+            for row in rows:
+                yield tuple(row)
+        self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.proxy.close()
+        if self.closeCallback:
+            self.closeCallback(self)
+        return
+
+    def fetchone(self):
+        """
+        Return the next row, or an empty list if there are no rows left
+        """
+        if not self.closed:
+            row = self.proxy.fetchone()
+            if row is not None:
+                return tuple(row)
+            self.close()
+        return []
+
+    def fetchall(self):
+        """
+        Return all the remaining rows
+        """
+        return list(self)
+
+
+class ColumnarResultSet(object):
+    """
+    _ColumnarResultSet_
+
+    Read in SQLAlchemy result proxies in chunks and hold the data as one list
+    per column, in the order of keys. Rows are only built on demand, through
+    fetchone/fetchall.
+    """
+    def __init__(self):
+        self.keys = []
+        self.columns = []
+
+    def __len__(self):
+        return len(self.columns[0]) if self.columns else 0
+
+    def close(self):
+        return
+
+    def add(self, resultproxy, chunkSize=1000):
+        if resultproxy.closed or not resultproxy.returns_rows:
+            return
+        if not self.keys:
+            self.keys.extend(resultproxy.keys())
+            self.columns = [[] for _ in self.keys]
+        while True:
+            rows = resultproxy.fetchmany(chunkSize)
+            if not rows:
+                break
+            for column, values in zip(self.columns, zip(*rows)):
+                column.extend(values)
+        return
+
+    def fetchone(self):
+        if len(self) > 0:
+            return tuple(column[0] for column in self.columns)
+        return []
+
+    def fetchall(self):
+        return list(zip(*self.columns))
+
+    def asDict(self):
+        """
+        Return a dictionary of the column name to the list of its values
+        """
+        return dict(zip(self.keys, self.columns))
+
+    def asArrays(self):
+        """
+        Same as asDict, with the numeric columns converted to numpy arrays
+        when numpy is available. Other columns are left as lists.
+        """
+        columns = self.asDict()
+        if numpy is None:
+            return columns
+        for key, values in columns.items():
+            if values and all(isinstance(val, (int, float)) and not isinstance(val, bool) for val in values):
+                columns[key] = numpy.asarray(values)
+        return columns
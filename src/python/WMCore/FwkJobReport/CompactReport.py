@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+"""
+_CompactReport_
+
+Compact, lazily loaded on-disk format for the framework job reports.
+
+The ConfigSection tree of the report is split into blobs: one for the
+top level report attributes, one per step and one per output, input and
+performance section of each step. Each blob holds a plain, pickled
+representation of its sections, referencing the blobs of its lazy
+children by key. The file is made of:
+  * the MAGIC bytes
+  * the header length, as a 4 bytes unsigned int
+  * a JSON header, with the offset and length of every blob
+  * the blobs
+
+Loading a report only decodes the top level blob. The sections of the
+other blobs are decoded on first access, such that the exit codes, step
+status or site name are available without decoding the output files,
+their lumis or the performance sections.
+"""
+
+import json
+import pickle
+import struct
+
+from WMCore.Configuration import ConfigSection
+
+MAGIC = b"WMFWJR\x01\n"
+HEADER_LENGTH = struct.Struct("!I")
+ROOT_BLOB = "root"
+LAZY_STEP_SECTIONS = ("output", "input", "performance")
+
+# kinds of settings in the encoded sections
+SETTING, SECTION, LAZY_SECTION = 0, 1, 2
+
+
+class LazyConfigSection(ConfigSection):
+    """
+    _LazyConfigSection_
+
+    ConfigSection whose child sections can be decoded from the report file
+    only when first accessed.
+    """
+
+    def __init__(self, name=None, reader=None):
+        ConfigSection.__init__(self, name)
+        self._internal_reader = reader
+        self._internal_lazy = {}
+
+    def __getattr__(self, name):
+        # only called if the attribute was not found the normal way
+        lazy = self.__dict__.get('_internal_lazy')
+        if not lazy or name not in lazy:
+            raise AttributeError("'%s' section has no attribute '%s'" %
+                                 (self.__dict__.get('_internal_name'), name))
+        section = self._internal_reader.loadSection(lazy.pop(name))
+        section._internal_parent_ref = self
+        object.__setattr__(self, name, section)
+        return section
+
+    def __setattr__(self, name, value):
+        if not name.startswith("_internal_"):
+            self.__dict__.get('_internal_lazy', {}).pop(name, None)
+        ConfigSection.__setattr__(self, name, value)
+
+    def __delattr__(self, name):
+        lazy = self.__dict__.get('_internal_lazy', {})
+        if name in lazy:
+            # drop it without decoding it
+            lazy.pop(name)
+            self._internal_children.discard(name)
+            self._internal_settings.discard(name)
+            return
+        ConfigSection.__delattr__(self, name)
+
+    def __getstate__(self):
+        # pickling (or copying) decodes everything, the reader is not needed anymore
+        for name in list(self._internal_lazy):
+            getattr(self, name)
+        state = dict(self.__dict__)
+        state['_internal_reader'] = None
+        return state
+
+    def section_(self, sectionName):
+        if sectionName in self._internal_lazy:
+            return getattr(self, sectionName)
+        return ConfigSection.section_(self, sectionName)
+
+
+def encodeSection(section, blobs, key, lazyChildren):
+    """
+    _encodeSection_
+
+    Encode a ConfigSection as (name, [(setting, kind, value)]). The child
+    sections for which lazyChildren(key, childName) is true are encoded as
+    separate blobs, added to blobs, and referenced by their key.
+    """
+    settings = []
+    for name in section._internal_settings:
+        value = getattr(section, name)
+        if name not in section._internal_children:
+            settings.append((name, SETTING, value))
+        elif lazyChildren(key, name):
+            childKey = "%s/%s" % (key, name)
+            blobs[childKey] = encodeSection(value, blobs, childKey, lazyChildren)
+            settings.append((name, LAZY_SECTION, childKey))
+        else:
+            settings.append((name, SECTION, encodeSection(value, blobs, key, lazyChildren)))
+    return (section._internal_name, settings)
+
+
+def decodeSection(encoded, reader):
+    """
+    _decodeSection_
+
+    Build a LazyConfigSection from its encoded representation, without
+    going through the type checks of ConfigSection.__setattr__
+    """
+    name, settings = encoded
+    section = LazyConfigSection(name, reader)
+    for settingName, kind, value in settings:
+        if kind == SETTING:
+            object.__setattr__(section, settingName, value)
+        elif kind == SECTION:
+            child = decodeSection(value, reader)
+            child._internal_parent_ref = section
+            object.__setattr__(section, settingName, child)
+            section._internal_children.add(settingName)
+        else:
+            section._internal_lazy[settingName] = value
+            section._internal_children.add(settingName)
+        section._internal_settings.add(settingName)
+    return section
+
+
+def reportBlobs(data):
+    """
+    _reportBlobs_
+
+    Split the report data in blobs, with the steps and their heavy
+    sections in their own blobs.
+    """
+    steps = set(getattr(data, 'steps', []))
+
+    def lazyChildren(key, name):
+        if key == ROOT_BLOB:
+            return name in steps
+        return key.count("/") == 1 and name in LAZY_STEP_SECTIONS
+
+    blobs = {}
+    blobs[ROOT_BLOB] = encodeSection(data, blobs, ROOT_BLOB, lazyChildren)
+    return blobs
+
+
+def writeCompactReport(data, filename):
+    """
+    _writeCompactReport_
+
+    Write the report data (ConfigSection) to filename in the compact format
+    """
+    index = {}
+    chunks = []
+    offset = 0
+    for key, encoded in reportBlobs(data).items():
+        chunk = pickle.dumps(encoded, pickle.HIGHEST_PROTOCOL)
+        index[key] = [offset, len(chunk)]
+        offset += len(chunk)
+        chunks.append(chunk)
+    header = json.dumps({"version": 1, "blobs": index}).encode("utf-8")
+    with open(filename, 'wb') as handle:
+        handle.write(MAGIC)
+        handle.write(HEADER_LENGTH.pack(len(header)))
+        handle.write(header)
+        for chunk in chunks:
+            handle.write(chunk)
+    return
+
+
+def isCompactReport(filename):
+    """
+    _isCompactReport_
+
+    Whether the file is a report in the compact format
+    """
+    with open(filename, 'rb') as handle:
+        return handle.read(len(MAGIC)) == MAGIC
+
+
+class CompactReportReader(object):
+    """
+    _CompactReportReader_
+
+    Hold the content of a compact report file and decode its blobs on demand
+    """
+
+    def __init__(self, filename):
+        with open(filename, 'rb') as handle:
+            self.buffer = memoryview(handle.read())
+        if self.buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError("Not a compact job report: %s" % filename)
+        start = len(MAGIC) + HEADER_LENGTH.size
+        headerLength = HEADER_LENGTH.unpack(self.buffer[len(MAGIC):start])[0]
+        header = json.loads(bytes(self.buffer[start:start + headerLength]).decode("utf-8"))
+        self.dataStart = start + headerLength
+        self.blobs = header["blobs"]
+
+    def loadSection(self, key):
+        """
+        Decode the sections of a blob
+        """
+        offset, length = self.blobs[key]
+        offset += self.dataStart
+        return decodeSection(pickle.loads(self.buffer[offset:offset + length]), self)
+
+    def loadReport(self):
+        """
+        Return the top level section of the report
+        """
+        return self.loadSection(ROOT_BLOB)
@@ -9,8 +9,10 @@ from __future__ import print_function
 from builtins import str as newstr, bytes, range, object
 from future.utils import viewitems, listitems
 
+import json
 import logging
 import math
+import os
 import re
 import sys
 import time
@@ -21,6 +23,7 @@ from Utils.Utilities import decodeBytesToUnicode, encodeUnicodeToBytes
 from WMCore.Configuration import ConfigSection
 from WMCore.DataStructs.File import File
 from WMCore.DataStructs.Run import Run
+from WMCore.FwkJobReport.CompactReport import CompactReportReader, isCompactReport, writeCompactReport
 from WMCore.FwkJobReport.FileInfo import FileInfo
 from WMCore.WMException import WMException
 from WMCore.WMExceptions import WM_JOB_ERROR_CODES
@@ -37,6 +40,35 @@ class FwkJobReportException(WMException):
     pass
 
 
+def errorSummaryPath(reportPath):
+    """
+    _errorSummaryPath_
+
+    Path of the error summary written next to a report,
+    e.g. Report.0.summary.json for Report.0.pkl
+    """
+    return os.path.splitext(reportPath)[0] + ".summary.json"
+
+
+def loadErrorSummaries(reportPaths):
+    """
+    _loadErrorSummaries_
+
+    Load the error summaries written next to many reports, see
+    Report.getErrorSummary. Reports without a readable summary are skipped.
+    :param reportPaths: list of report paths
+    :return: a dictionary of {report path: error summary}
+    """
+    summaries = {}
+    for reportPath in reportPaths:
+        try:
+            with open(errorSummaryPath(reportPath)) as fd:
+                summaries[reportPath] = json.load(fd)
+        except (IOError, OSError, ValueError):
+            continue
+    return summaries
+
+
 def addBranchNamesToFile(fileSection, branchNames):
     """
     _addBranchNamesToFile_
@@ -133,17 +165,26 @@ class Report(object):
         reportStep.status = status
         return
 
-    def parse(self, xmlfile, stepName="cmsRun1"):
+    def parse(self, xmlfile, stepName="cmsRun1", streaming=False):
         """
         _parse_
 
         Read in the FrameworkJobReport XML file produced
-        by cmsRun and pull the information from it into this object
+        by cmsRun and pull the information from it into this object.
+        With streaming, the XML sections are handled as they are read,
+        keeping the memory footprint low for large reports. If the parsing
+        fails (e.g. truncated XML of a crashed cmsRun), the report is rolled
+        back to its state before the parsing, as with the default parser.
         """
         from WMCore.FwkJobReport.XMLParser import xmlToJobReport
+        snapshot = pickle.dumps(self.data) if streaming else None
         try:
-            xmlToJobReport(self, xmlfile)
+            xmlToJobReport(self, xmlfile, streaming=streaming)
         except Exception as ex:
+            if snapshot is not None:
+                reportName = getattr(self.report, '_internal_name', None)
+                self.data = pickle.loads(snapshot)
+                self.report = getattr(self.data, reportName, None) if reportName else None
             msg = "Error reading XML job report file, possibly corrupt XML File:\n"
             msg += "Details: %s" % str(ex)
 
@@ -386,13 +427,16 @@ class Report(object):
 
         return returnCode, returnMessage
 
-    def persist(self, filename):
+    def persist(self, filename, compact=False):
         """
         _persist_
 
         Pickle this object and save it to disk.
+        With compact, save it in the lazily loaded format of CompactReport.
         """
-        if PY3:
+        if compact:
+            writeCompactReport(self.data, filename)
+        elif PY3:
             with open(filename, 'wb') as handle:
                 pickle.dump(encodeUnicodeToBytes(self.data), handle)
         else:
@@ -404,9 +448,12 @@ class Report(object):
         """
         _unpersist_
 
-        Load a pickled FWJR from disk.
+        Load a pickled FWJR from disk. Reports in the compact format are
+        only decoded as their sections are accessed.
         """
-        if PY3:
+        if isCompactReport(filename):
+            self.data = CompactReportReader(filename).loadReport()
+        elif PY3:
             with open(filename, 'rb') as handle:
                 self.data = decodeBytesToUnicode(pickle.load(handle))
         else:
@@ -1644,3 +1691,37 @@ class Report(object):
         Return the log URL
         """
         return getattr(self.data, 'logURL', '')
+
+    def getErrorSummary(self):
+        """
+        _getErrorSummary_
+
+        Return what is needed to decide on the retry of a failed job, without
+        loading the whole report: the non-zero exit codes, the first start and
+        last stop times, the site name and the types of the step errors.
+        """
+        times = self.getFirstStartLastStop() or {}
+        errorTypes = set()
+        for stepName in self.listSteps():
+            reportStep = self.retrieveStep(stepName)
+            for i in range(getattr(reportStep.errors, "errorCount", 0)):
+                errorTypes.add(getattr(getattr(reportStep.errors, "error%i" % i), 'type', None))
+        errorTypes.discard(None)
+
+        return {"exitCodes": sorted(self.getExitCodes()),
+                "startTime": times.get('startTime'),
+                "stopTime": times.get('stopTime'),
+                "siteName": self.getSiteName() or None,
+                "errorTypes": sorted(errorTypes)}
+
+    def persistErrorSummary(self, reportPath):
+        """
+        _persistErrorSummary_
+
+        Save the error summary of this report next to the report file
+        """
+        summaryPath = errorSummaryPath(reportPath)
+        with open(summaryPath + ".tmp", 'w') as fd:
+            json.dump(self.getErrorSummary(), fd)
+        os.rename(summaryPath + ".tmp", summaryPath)
+        return
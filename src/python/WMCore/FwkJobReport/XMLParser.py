@@ -9,7 +9,7 @@ from __future__ import division, print_function
 import logging
 import re
 
-from WMCore.Algorithms.ParseXMLFile import coroutine, xmlFileToNode
+from WMCore.Algorithms.ParseXMLFile import coroutine, xmlFileToNode, xmlFileToNodeStream
 from WMCore.DataStructs.Run import Run
 from WMCore.FwkJobReport import Report
 
@@ -45,24 +45,34 @@ def reportDispatcher(targets):
             continue
 
         for subnode in node.children:
-            if subnode.name == "File":
-                targets['File'].send((report, subnode))
-            elif subnode.name == "InputFile":
-                targets['InputFile'].send((report, subnode))
-            elif subnode.name == "AnalysisFile":
-                targets['AnalysisFile'].send((report, subnode))
-            elif subnode.name == "PerformanceReport":
-                targets['PerformanceReport'].send((report, subnode))
-            elif subnode.name == "FrameworkError":
-                targets['FrameworkError'].send((report, subnode))
-            elif subnode.name == "SkippedFile":
-                targets['SkippedFile'].send((report, subnode))
-            elif subnode.name == "FallbackAttempt":
-                targets['FallbackAttempt'].send((report, subnode))
-            elif subnode.name == "SkippedEvent":
-                targets['SkippedEvent'].send((report, subnode))
-            else:
-                setattr(report.report.parameters, subnode.name, subnode.text)
+            dispatchSection(report, subnode, targets)
+
+
+@coroutine
+def streamDispatcher(report, targets):
+    """
+    _streamDispatcher_
+
+    Dispatch the sections of the job report to the handlers as they are
+    fed, one at a time, by the incremental XML parser.
+    """
+    while True:
+        parent, node = (yield)
+        if parent.name == "FrameworkJobReport":
+            dispatchSection(report, node, targets)
+
+
+def dispatchSection(report, subnode, targets):
+    """
+    _dispatchSection_
+
+    Send a section of the FrameworkJobReport to its handler, or store
+    it as a report parameter if it has none.
+    """
+    if subnode.name in targets:
+        targets[subnode.name].send((report, subnode))
+    else:
+        setattr(report.report.parameters, subnode.name, subnode.text)
 
 
 @coroutine
@@ -554,20 +564,12 @@ def perfStoreHandler():
             logging.error("Not adding any storage performance info to report.")
 
 
-def xmlToJobReport(reportInstance, xmlFile):
+def jobReportDispatchers():
     """
-    _xmlToJobReport_
-
-    parse the XML file and insert the information into the
-    Report instance provided
+    _jobReportDispatchers_
 
+    Set up the coroutine pipeline handling each section of the job report
     """
-    # read XML, build node structure
-    node = xmlFileToNode(xmlFile)
-
-    #  //
-    # // Set up coroutine pipeline
-    # //
     fileDispatchers = {
         "Runs": runHandler(),
         "Branches": branchHandler(),
@@ -591,6 +593,34 @@ def xmlToJobReport(reportInstance, xmlFile):
         "FallbackAttempt": fallbackAttemptHandler(),
         "SkippedEvent": skippedEventHandler(),
     }
+    return dispatchers
+
+
+def xmlToJobReport(reportInstance, xmlFile, streaming=False):
+    """
+    _xmlToJobReport_
+
+    parse the XML file and insert the information into the
+    Report instance provided
+
+    With streaming, each section of the FrameworkJobReport (File,
+    PerformanceReport, etc) is handled as soon as it is read and freed
+    right after, instead of building the node structure of the whole
+    file first. Note that the sections read before a parsing error have
+    then already been added to the report, Report.parse rolls them back.
+
+    """
+    dispatchers = jobReportDispatchers()
+
+    if streaming:
+        node = xmlFileToNodeStream(xmlFile, streamDispatcher(reportInstance, dispatchers))
+        for topNode in node.children:
+            if topNode.name != "FrameworkJobReport":
+                logging.warning("Not Handling: %s", topNode.name)
+        return
+
+    # read XML, build node structure
+    node = xmlFileToNode(xmlFile)
 
     #  //
     # // Feed pipeline with node structure and report result instance
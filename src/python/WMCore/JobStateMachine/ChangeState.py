@@ -60,6 +60,42 @@ def discardConflictingDocument(couchDbInstance, data, result):
         return result
 
 
+def discardConflictingDocuments(couchDbInstance, docs, results):
+    """
+    _discardConflictingDocuments_
+
+    Bulk version of discardConflictingDocument, to be passed as the
+    conflictHandler of the CMSCouch bulkCommit calls. The current revision
+    of all the conflicting documents is fetched with a single _all_docs
+    request, then the documents we were trying to commit are written again
+    on top of them. Documents which no longer exist are not retried.
+    """
+    try:
+        rows = couchDbInstance.allDocs(keys=[result["id"] for result in results])["rows"]
+        currentRevs = {}
+        for row in rows:
+            if "error" not in row and not row["value"].get("deleted", False):
+                currentRevs[row["id"]] = row["value"]["rev"]
+
+        retryIdx = []
+        for idx, doc in enumerate(docs):
+            if doc["_id"] in currentRevs:
+                doc["_rev"] = currentRevs[doc["_id"]]
+                retryIdx.append(idx)
+        if not retryIdx:
+            return results
+
+        retval = list(results)
+        newResults = couchDbInstance.bulkCommit(docs=[docs[idx] for idx in retryIdx])
+        for idx, newResult in zip(retryIdx, newResults):
+            retval[idx] = newResult
+        return retval
+    except CouchError as ex:
+        logging.error("Couldn't resolve conflicts when updating %d documents", len(docs))
+        logging.error("Error: %s", str(ex))
+        return results
+
+
 def shrinkLargeFJR(couchDbInstance, sizeLimit):
     """
     Look at the CouchDB database queue and empty documents
@@ -159,6 +195,9 @@ class ChangeState(WMObject, WMConnectionBase):
 
         # max total number of documents to be committed in the same Couch operation
         self.maxBulkCommit = getattr(self.config.JobStateMachine, 'maxBulkCommitDocs', 250)
+        # number of bulk Couch operations running concurrently when committing documents
+        self.bulkCommitInFlight = getattr(self.config.JobStateMachine, 'bulkCommitInFlight', 4)
+        self.maxQueuedDocs = self.maxBulkCommit * self.bulkCommitInFlight
         self.couchdb = CouchServer(self.config.JobStateMachine.couchurl)
         self._connectDatabases()
 
@@ -182,7 +221,7 @@ class ChangeState(WMObject, WMConnectionBase):
         if not hasattr(self, 'jobsdatabase') or self.jobsdatabase is None:
             try:
                 self.jobsdatabase = self.couchdb.connectDatabase("%s/jobs" % self.dbname,
-                                                                 size=self.maxBulkCommit)
+                                                                 size=self.maxQueuedDocs)
             except Exception as ex:
                 logging.error("Error connecting to couch db '%s/jobs': %s", self.dbname, str(ex))
                 self.jobsdatabase = None
@@ -191,7 +230,7 @@ class ChangeState(WMObject, WMConnectionBase):
         if not hasattr(self, 'fwjrdatabase') or self.fwjrdatabase is None:
             try:
                 self.fwjrdatabase = self.couchdb.connectDatabase("%s/fwjrs" % self.dbname,
-                                                                 size=self.maxBulkCommit)
+                                                                 size=self.maxQueuedDocs)
             except Exception as ex:
                 logging.error("Error connecting to couch db '%s/fwjrs': %s", self.dbname, str(ex))
                 self.fwjrdatabase = None
@@ -201,7 +240,7 @@ class ChangeState(WMObject, WMConnectionBase):
             dbname = getattr(self.config.JobStateMachine, 'jobSummaryDBName')
             try:
                 self.jsumdatabase = self.couchdb.connectDatabase(dbname,
-                                                                 size=self.maxBulkCommit)
+                                                                 size=self.maxQueuedDocs)
             except Exception as ex:
                 logging.error("Error connecting to couch db '%s': %s", dbname, str(ex))
                 self.jsumdatabase = None
@@ -211,7 +250,7 @@ class ChangeState(WMObject, WMConnectionBase):
             dbname = getattr(self.config.JobStateMachine, 'summaryStatsDBName')
             try:
                 self.statsumdatabase = self.couchdb.connectDatabase(dbname,
-                                                                    size=self.maxBulkCommit)
+                                                                    size=self.maxQueuedDocs)
             except Exception as ex:
                 logging.error("Error connecting to couch db '%s': %s", dbname, str(ex))
                 self.jsumdatabase = None
@@ -349,8 +388,8 @@ class ChangeState(WMObject, WMConnectionBase):
 
                 couchRecordsToUpdate.append({"jobid": job["id"],
                                              "couchid": jobDocument["_id"]})
-                if self.jobsdatabase.getQueueSize() >= self.maxBulkCommit:
-                    self.jobsdatabase.commit(callback=discardConflictingDocument)
+                if self.jobsdatabase.getQueueSize() >= self.maxQueuedDocs:
+                    self._bulkCommit(self.jobsdatabase, conflictHandler=discardConflictingDocuments)
                 self.jobsdatabase.queue(jobDocument, callback=discardConflictingDocument)
             else:
                 # We send a PUT request to the stateTransition update handler.
@@ -432,17 +471,9 @@ class ChangeState(WMObject, WMConnectionBase):
                                 "archivestatus": archStatus,
                                 "fwjr": jsonFWJR,
                                 "type": "fwjr"}
-                if self.fwjrdatabase.getQueueSize() >= self.maxBulkCommit:
-                    try:
-                        # TODO FIXME: https://github.com/dmwm/WMCore/issues/11576
-                        self.fwjrdatabase.commit(callback=discardConflictingDocument)
-                    except CouchRequestTooLargeError as exc:
-                        msg = "Failed to commit bulk of framework job report to CouchDB."
-                        msg += f" Details: {str(exc)}"
-                        logging.warning(msg)
-                        shrinkLargeFJR(self.fwjrdatabase, self.fwjrLimitSize)
-                        # now all the documents should fit in
-                        self.fwjrdatabase.commit(callback=discardConflictingDocument)
+                if self.fwjrdatabase.getQueueSize() >= self.maxQueuedDocs:
+                    # TODO FIXME: https://github.com/dmwm/WMCore/issues/11576
+                    self._bulkCommit(self.fwjrdatabase, shrinkLargeFJR, discardConflictingDocuments)
 
                 self.fwjrdatabase.queue(fwjrDocument, timestamp=True, callback=discardConflictingDocument)
 
@@ -543,17 +574,9 @@ class ChangeState(WMObject, WMConnectionBase):
                         except CouchNotFoundError:
                             pass
 
-                    if self.jsumdatabase.getQueueSize() >= self.maxBulkCommit:
-                        try:
-                            # TODO FIXME: https://github.com/dmwm/WMCore/issues/11576
-                            self.jsumdatabase.commit()
-                        except CouchRequestTooLargeError as exc:
-                            msg = "Failed to commit bulk of job summary documents to CouchDB."
-                            msg += f" Details: {str(exc)}"
-                            logging.warning(msg)
-                            shrinkLargeSummary(self.jsumdatabase, self.fwjrLimitSize)
-                            # now all the documents should fit in
-                            self.jsumdatabase.commit()
+                    if self.jsumdatabase.getQueueSize() >= self.maxQueuedDocs:
+                        # TODO FIXME: https://github.com/dmwm/WMCore/issues/11576
+                        self._bulkCommit(self.jsumdatabase, shrinkLargeSummary)
 
                     self.jsumdatabase.queue(jobSummary, timestamp=True)
 
@@ -562,25 +585,35 @@ class ChangeState(WMObject, WMConnectionBase):
                                      conn=self.getDBConn(),
                                      transaction=self.existingTransaction())
 
+        self._bulkCommit(self.fwjrdatabase, shrinkLargeFJR, discardConflictingDocuments)
+        self._bulkCommit(self.jobsdatabase, conflictHandler=discardConflictingDocuments)
+        self._bulkCommit(self.jsumdatabase, shrinkLargeSummary)
+        for database in (self.fwjrdatabase, self.jobsdatabase, self.jsumdatabase):
+            logging.debug("Couch bulk commit stats for %s: %s", database.name, database.getBulkStats())
+        return
+
+    def _bulkCommit(self, database, shrinkFunc=None, conflictHandler=None):
+        """
+        _bulkCommit_
+
+        Commit the documents queued in a Couch database, with up to
+        bulkCommitInFlight concurrent bulk operations of maxBulkCommit
+        documents each. If CouchDB rejects some of them for being too large,
+        shrink the documents left in the queue with shrinkFunc and try again.
+        """
         try:
-            self.fwjrdatabase.commit(callback=discardConflictingDocument)
-        except CouchRequestTooLargeError as exc:
-            msg = "Failed to commit bulk of framework job report to CouchDB."
-            msg += f" Error: {str(exc)}"
-            logging.warning(msg)
-            shrinkLargeFJR(self.fwjrdatabase, self.fwjrLimitSize)
-            # now all the documents should fit in
-            self.fwjrdatabase.commit(callback=discardConflictingDocument)
-        self.jobsdatabase.commit(callback=discardConflictingDocument)
-        try:
-            self.jsumdatabase.commit()
+            database.bulkCommit(batchSize=self.maxBulkCommit, maxInFlight=self.bulkCommitInFlight,
+                                conflictHandler=conflictHandler)
         except CouchRequestTooLargeError as exc:
-            msg = "Failed to commit bulk of job summary documents to CouchDB."
+            if shrinkFunc is None:
+                raise
+            msg = "Failed to commit bulk of documents to CouchDB database %s." % database.name
             msg += f" Details: {str(exc)}"
             logging.warning(msg)
-            shrinkLargeSummary(self.jsumdatabase, self.fwjrLimitSize)
+            shrinkFunc(database, self.fwjrLimitSize)
             # now all the documents should fit in
-            self.jsumdatabase.commit()
+            database.bulkCommit(batchSize=self.maxBulkCommit, maxInFlight=self.bulkCommitInFlight,
+                                conflictHandler=conflictHandler)
         return
 
     def persist(self, jobs, newstate, oldstate):
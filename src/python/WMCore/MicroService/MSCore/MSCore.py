@@ -7,12 +7,22 @@ Description: MSCore class provides core functionality of the MS.
 from __future__ import division, print_function
 
 from builtins import object
+from threading import Lock
+
 from WMCore.MicroService.Tools.Common import getMSLogger
 from WMCore.Services.ReqMgr.ReqMgr import ReqMgr
 from WMCore.Services.ReqMgrAux.ReqMgrAux import ReqMgrAux
 from WMCore.Services.Rucio.Rucio import Rucio
 from WMCore.Services.AlertManager.AlertManagerAPI import AlertManagerAPI
 
+# default seconds to cache the results of the Rucio read-only methods, which
+# are also shared between the microservices running in the same process
+RUCIO_CACHE_TTLS = {"getDID": 10 * 60,
+                    "getBlocksInContainer": 10 * 60,
+                    "listDataRules": 5 * 60,
+                    "getContainerLockedAndAvailable": 5 * 60,
+                    "getRSEUsage": 10 * 60}
+
 
 class MSCore(object):
     """
@@ -47,12 +57,33 @@ class MSCore(object):
             self.rucio = Rucio(acct=self.msConfig['rucioAccount'],
                                hostUrl=self.msConfig['rucioUrl'],
                                authUrl=self.msConfig['rucioAuthUrl'],
-                               configDict={"logger": self.logger, "user_agent": "wmcore-microservices"})
+                               configDict={"logger": self.logger, "user_agent": "wmcore-microservices",
+                                           "cacheTTLs": self.msConfig.get("rucioCacheTTLs", RUCIO_CACHE_TTLS)})
         self.alertManagerUrl = self.msConfig.get("alertManagerUrl", None)
         self.alertManagerApi = AlertManagerAPI(self.alertManagerUrl, logger=self.logger)
         # alertDestinationMap is used to define alert routes
         self.alertDestinationMap = self.msConfig.get("alertDestinationMap", {})
 
+        # status transitions queued during a cycle, to be committed in bulk
+        self.statusBatchSize = self.msConfig.get("statusTransitionBatchSize", 100)
+        self.pendingChanges = {}
+        self.pendingChangesLock = Lock()
+
+    def newCycle(self):
+        """
+        Called at the beginning of every cycle of the microservice, such that
+        data cached in a previous cycle is not used anymore
+        """
+        if self.rucio:
+            self.rucio.newCycle()
+
+    def cycleStats(self):
+        """
+        Log the statistics of the caches used in the current cycle
+        """
+        if self.rucio:
+            self.logger.info("Rucio cache statistics: %s", self.rucio.getCacheStats())
+
     def unifiedConfig(self):
         """
         Fetches the unified configuration
@@ -79,6 +110,66 @@ class MSCore(object):
         except Exception as err:
             self.logger.exception("Failed to change request status. Error: %s", str(err))
 
+    def queueChange(self, reqName, reqStatus):
+        """
+        Queue a request status transition, to be sent to ReqMgr2 in bulk
+        by the next call to commitChanges. A request queued more than once
+        gets its latest status only.
+        """
+        with self.pendingChangesLock:
+            self.pendingChanges[reqName] = reqStatus
+
+    def commitChanges(self, prefix='###', dryRun=None):
+        """
+        Send all the queued status transitions to ReqMgr2, in chunks of
+        statusTransitionBatchSize requests. If the bulk API fails for a
+        chunk, e.g. not supported by the ReqMgr2 server, then its requests
+        are updated one by one.
+        :param prefix: string prefixing the log messages
+        :param dryRun: boolean to only log the transitions, it defaults to
+            the opposite of the enableStatusTransition configuration
+        :return: a dictionary of {request name: boolean}, with True for
+            the transitions that succeeded (or in dry-run mode)
+        """
+        with self.pendingChangesLock:
+            pending, self.pendingChanges = self.pendingChanges, {}
+        if not pending:
+            return {}
+
+        if dryRun is None:
+            dryRun = not self.msConfig['enableStatusTransition']
+        if dryRun:
+            for reqName, reqStatus in pending.items():
+                self.logger.info('DRY-RUN:: %s updating %s status to: %s', prefix, reqName, reqStatus)
+            return {reqName: True for reqName in pending}
+
+        self.logger.info('%s updating the status of %d requests in bulk', prefix, len(pending))
+        results = {}
+        reqNames = list(pending)
+        for idx in range(0, len(reqNames), self.statusBatchSize):
+            chunk = {reqName: pending[reqName] for reqName in reqNames[idx:idx + self.statusBatchSize]}
+            try:
+                report = self.reqmgr2.updateRequestsStatus(chunk, chunkSize=len(chunk))
+            except Exception as err:
+                self.logger.warning("%s bulk status transition failed, updating requests one by one. Error: %s",
+                                    prefix, str(err))
+                report = {}
+                for reqName, reqStatus in chunk.items():
+                    try:
+                        # a list of {request name: "OK" or "ERROR"} dictionaries
+                        for item in self.reqmgr2.updateRequestStatus(reqName, reqStatus) or []:
+                            report.update(item)
+                    except Exception as exc:
+                        report[reqName] = "ERROR: %s" % str(exc)
+            for reqName, reqStatus in chunk.items():
+                result = report.get(reqName, "ERROR: missing from the ReqMgr2 response")
+                results[reqName] = result == "OK"
+                if results[reqName]:
+                    self.logger.info('%s updated %s status to: %s', prefix, reqName, reqStatus)
+                else:
+                    self.logger.error('%s failed to update %s status to: %s. %s', prefix, reqName, reqStatus, result)
+        return results
+
     def updateReportDict(self, reportDict, keyName, value):
         """
         Provided a key name and value, validate the key name
@@ -211,7 +211,9 @@ class MSManager(object):
         """
         startTime = datetime.utcnow()
         self.logger.info("Starting the pileup-tasks thread...")
+        self.msPileupTasks.newCycle()
         self.msPileupTasks.executeCycle()
+        self.msPileupTasks.cycleStats()
         res = self.msPileupTasks.status()
         endTime = datetime.utcnow()
         self.updateTimeUTC(res, startTime, endTime)
@@ -229,7 +231,9 @@ class MSManager(object):
         """
         startTime = datetime.utcnow()
         self.logger.info("Starting the transferor thread...")
+        self.msTransferor.newCycle()
         res = self.msTransferor.execute(reqStatus)
+        self.msTransferor.cycleStats()
         endTime = datetime.utcnow()
         self.updateTimeUTC(res, startTime, endTime)
         self.logger.info("Total transferor execution time: %.2f secs", res['execution_time'])
@@ -244,7 +248,9 @@ class MSManager(object):
         """
         startTime = datetime.utcnow()
         self.logger.info("Starting the monitor thread...")
+        self.msMonitor.newCycle()
         res = self.msMonitor.execute(reqStatus)
+        self.msMonitor.cycleStats()
         endTime = datetime.utcnow()
         self.updateTimeUTC(res, startTime, endTime)
         self.logger.info("Total monitor execution time: %d secs", res['execution_time'])
@@ -260,7 +266,9 @@ class MSManager(object):
         """
         startTime = datetime.utcnow()
         self.logger.info("Starting the outputConsumer thread...")
+        self.msOutputConsumer.newCycle()
         res = self.msOutputConsumer.execute(reqStatus)
+        self.msOutputConsumer.cycleStats()
         endTime = datetime.utcnow()
         self.updateTimeUTC(res, startTime, endTime)
         self.logger.info("Total outputConsumer execution time: %d secs", res['execution_time'])
@@ -276,7 +284,9 @@ class MSManager(object):
         """
         startTime = datetime.utcnow()
         self.logger.info("Starting the outputProducer thread...")
+        self.msOutputProducer.newCycle()
         res = self.msOutputProducer.execute(reqStatus)
+        self.msOutputProducer.cycleStats()
         endTime = datetime.utcnow()
         self.updateTimeUTC(res, startTime, endTime)
         self.logger.info("Total outputProducer execution time: %d secs", res['execution_time'])
@@ -293,7 +303,9 @@ class MSManager(object):
         """
         startTime = datetime.utcnow()
         self.logger.info("Starting the ruleCleaner thread...")
+        self.msRuleCleaner.newCycle()
         res = self.msRuleCleaner.execute(reqStatus)
+        self.msRuleCleaner.cycleStats()
         endTime = datetime.utcnow()
         self.updateTimeUTC(res, startTime, endTime)
         self.logger.info("Total ruleCleaner execution time: %d secs", res['execution_time'])
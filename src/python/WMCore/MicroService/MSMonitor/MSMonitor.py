@@ -121,7 +121,8 @@ class MSMonitor(MSCore):
                     msg += "the transfer document failed to get updated"
                     self.logger.warning(msg)
                     continue
-                self.change(reqName, 'staged', self.__class__.__name__)
+                self.queueChange(reqName, 'staged')
+            self.commitChanges(self.__class__.__name__)
             self.updateReportDict(summary, "request_status_updated",
                                   summary['success_transfer_doc_update'] - summary['failed_transfer_doc_update'])
             msg = "%s processed %d transfer records, where " % (self.__class__.__name__, len(transferRecords))
@@ -19,7 +19,7 @@ from WMCore.MicroService.Tools.Common import gigaBytes
 from WMCore.Services.CRIC.CRIC import CRIC
 from WMCore.Services.DBS.DBS3Reader import getDataTiers
 from Utils.Pipeline import Pipeline, Functor
-from WMCore.Database.MongoDB import MongoDB
+from WMCore.Database.MongoDB import MongoDB, MongoWriteBehind
 from WMCore.MicroService.MSOutput.MSOutputTemplate import MSOutputTemplate
 from WMCore.MicroService.MSOutput.RelValPolicy import RelValPolicy
 from WMCore.WMException import WMException
@@ -95,6 +95,8 @@ class MSOutput(MSCore):
         # fetch documents created in the last 6 months (default value)
         self.msConfig.setdefault("mongoDocsCreatedSecs", 6 * 30 * 24 * 60 * 60)
         self.msConfig.setdefault("sendNotification", False)
+        # number of requests going through the producer pipeline concurrently
+        self.msConfig.setdefault("producerThreads", 10)
         self.msConfig.setdefault("relvalPolicy", [])
         self.msConfig.setdefault("ruleLifetimeRelVal", [])
 
@@ -119,6 +121,11 @@ class MSOutput(MSCore):
         self.msConfig.setdefault("mongoDBReplicaSet", None)
         self.msConfig.setdefault("mongoDBPort", None)
         self.msConfig.setdefault("mockMongoDB", False)
+        # write the documents to MongoDB in the background, through write-behind buffers
+        self.msConfig.setdefault("mongoWriteBehind", True)
+        self.msConfig.setdefault("mongoWriteBatchSize", 500)
+        self.msConfig.setdefault("mongoWriteFlushInterval", 5)
+        self.msConfig.setdefault("mongoWriteMaxPending", 1000)
 
         msOutIndex = IndexModel('RequestName', unique=True)
 
@@ -143,6 +150,15 @@ class MSOutput(MSCore):
         self.msOutDB = getattr(mongoDB, self.msConfig['mongoDB'])
         self.msOutRelValColl = self.msOutDB['msOutRelValColl']
         self.msOutNonRelValColl = self.msOutDB['msOutNonRelValColl']
+        # write-behind buffers, by collection name
+        self.msOutWriters = {}
+        if self.msConfig['mongoWriteBehind']:
+            for dbColl in (self.msOutRelValColl, self.msOutNonRelValColl):
+                self.msOutWriters[dbColl.name] = MongoWriteBehind(dbColl, logger=self.logger,
+                                                                  maxPending=self.msConfig['mongoWriteMaxPending'],
+                                                                  batchSize=self.msConfig['mongoWriteBatchSize'],
+                                                                  flushInterval=self.msConfig['mongoWriteFlushInterval'],
+                                                                  retryCount=self.msConfig['mongoDBRetryCount'])
         self.currThread = None
         self.currThreadIdent = None
 
@@ -551,6 +567,7 @@ class MSOutput(MSCore):
             self.logger.info("Failed to process %d workflows from pipeline: %s", wfCounters - wfCountersOk, pipeLineName)
             wfCounterTotal += wfCountersOk
 
+        self.flushWriters()
         return wfCounterTotal
 
     def msOutputProducer(self, requestRecords):
@@ -584,25 +601,35 @@ class MSOutput(MSCore):
         # TODO:
         #    To generate the object from within the Function scope see above.
         counterOk = 0
-        for request in requestRecords:
-            pipeLineName = msPipeline.getPipelineName()
-            try:
-                msPipeline.run(request)
+        pipeLineName = msPipeline.getPipelineName()
+        # the pipeline is run for many requests concurrently, with the errors isolated by request
+        results = msPipeline.runConcurrent(requestRecords, maxWorkers=self.msConfig['producerThreads'])
+        for request, (_, ex) in zip(requestRecords, results):
+            if ex is None:
                 counterOk += 1
-            except (KeyError, TypeError) as ex:
+            elif isinstance(ex, (KeyError, TypeError)):
                 msg = "%s Possibly broken read from ReqMgr2 API or other. Err: %s." % (pipeLineName, str(ex))
                 msg += " Continue to the next document."
-                self.logger.exception(msg)
-                continue
-            except Exception as ex:
+                self.logger.error(msg, exc_info=ex)
+            else:
                 msg = "%s General Error from pipeline. Err: %s. " % (pipeLineName, str(ex))
                 msg += "Giving up Now."
-                self.logger.exception(str(ex))
+                self.logger.error(msg, exc_info=ex)
                 workflowname = request.get("_id", "")
                 self.alertGenericError(self.mode, workflowname, msg, str(ex), str(request))
-                continue
+        self.logger.info("%s stage statistics: %s", pipeLineName, msPipeline.getStageStats())
+        self.flushWriters()
         return counterOk
 
+    def flushWriters(self):
+        """
+        Write all the documents pending in the write-behind buffers to MongoDB,
+        to be called at the end of every cycle
+        """
+        for collName, writer in self.msOutWriters.items():
+            writeStats = writer.flush()
+            self.logger.info("MongoDB write-behind buffer statistics for %s: %s", collName, writeStats)
+
     def docTransformer(self, doc):
         """
         A function used to transform a request record from reqmgr2 to a document
@@ -867,6 +894,21 @@ class MSOutput(MSCore):
             dbColl = self.msOutRelValColl
         else:
             dbColl = self.msOutNonRelValColl
+
+        writer = self.msOutWriters.get(dbColl.name)
+        if writer:
+            # NOTE: The document is written later, in the background, with the
+            #       same semantics as below: a new document is inserted (and
+            #       skipped if already existing), while an update only changes
+            #       the requested keys of an existing document
+            if not update:
+                writer.insert(msOutDoc)
+            else:
+                keys = keys or [key for key in msOutDoc if key != '_id']
+                writer.update({'_id': msOutDoc['_id']}, {key: msOutDoc[key] for key in keys},
+                              insertDoc=msOutDoc)
+            return msOutDoc
+
         # Skipping documents avoiding index unique property (documents having the
         # same value for the indexed key as an already uploaded document)
         try:
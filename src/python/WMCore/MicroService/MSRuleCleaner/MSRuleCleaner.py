@@ -21,7 +21,7 @@ import re
 import time
 
 # system modules
-from threading import current_thread
+from threading import BoundedSemaphore, Lock, current_thread
 from pprint import pformat
 
 # WMCore modules
@@ -88,6 +88,12 @@ class MSRuleCleaner(MSCore):
         self.msConfig.setdefault('archiveDelayHours', 24 * 2)
         self.msConfig.setdefault('archiveAlarmHours', 24 * 30)
         self.msConfig.setdefault("sendNotification", False)
+        # number of workflows dispatched through the pipelines concurrently
+        self.msConfig.setdefault("dispatchThreads", 10)
+        # maximum number of workflows concurrently in a pipeline stage, shared by all the pipelines
+        self.msConfig.setdefault("stageConcurrency", {"cleanRucioRules": 5, "archive": 5})
+        # archival status transitions are committed to ReqMgr2 in bulk at the end of the cycle
+        self.msConfig.setdefault("bulkArchival", True)
 
         self.currThread = None
         self.currThreadIdent = None
@@ -98,6 +104,9 @@ class MSRuleCleaner(MSCore):
         self.logDB = LogDB(self.msConfig["logDBUrl"],
                            self.msConfig["logDBReporter"],
                            logger=self.logger)
+        # the LogDB deletions go through the single queue of its CouchDB database
+        # object, which must not be shared by the concurrently dispatched workflows
+        self.logDBLock = Lock()
         self.wmstatsSvc = WMStatsServer(self.msConfig['wmstatsUrl'], logger=self.logger)
         # service name used to route alerts via AlertManager
         self.alertServiceName = "ms-rulecleaner"
@@ -105,30 +114,32 @@ class MSRuleCleaner(MSCore):
         self.alertExpiration = self.msConfig.get("alertExpireSecs", 2 * 24 * 60 * 60)
 
         # Building all the Pipelines:
+        stageLimits = {stage: BoundedSemaphore(limit)
+                       for stage, limit in self.msConfig["stageConcurrency"].items()}
         pName = 'plineMSTrCont'
-        self.plineMSTrCont = Pipeline(name=pName,
+        self.plineMSTrCont = Pipeline(name=pName, stageLimits=stageLimits,
                                       funcLine=[Functor(self.setPlineMarker, pName),
                                                 Functor(self.setParentDatasets),
                                                 Functor(self.getRucioRules, 'container', self.msConfig['rucioMStrAccount']),
                                                 Functor(self.cleanRucioRules)])
         pName = 'plineMSTrBlock'
-        self.plineMSTrBlock = Pipeline(name=pName,
+        self.plineMSTrBlock = Pipeline(name=pName, stageLimits=stageLimits,
                                        funcLine=[Functor(self.setPlineMarker, pName),
                                                  Functor(self.setParentDatasets),
                                                  Functor(self.getRucioRules, 'block', self.msConfig['rucioMStrAccount']),
                                                  Functor(self.cleanRucioRules)])
         pName = 'plineAgentCont'
-        self.plineAgentCont = Pipeline(name=pName,
+        self.plineAgentCont = Pipeline(name=pName, stageLimits=stageLimits,
                                        funcLine=[Functor(self.setPlineMarker, pName),
                                                  Functor(self.getRucioRules, 'container', self.msConfig['rucioWmaAccount']),
                                                  Functor(self.cleanRucioRules)])
         pName = 'plineAgentBlock'
-        self.plineAgentBlock = Pipeline(name=pName,
+        self.plineAgentBlock = Pipeline(name=pName, stageLimits=stageLimits,
                                         funcLine=[Functor(self.setPlineMarker, pName),
                                                   Functor(self.getRucioRules, 'block', self.msConfig['rucioWmaAccount']),
                                                   Functor(self.cleanRucioRules)])
         pName = 'plineArchive'
-        self.plineArchive = Pipeline(name=pName,
+        self.plineArchive = Pipeline(name=pName, stageLimits=stageLimits,
                                      funcLine=[Functor(self.setPlineMarker, pName),
                                                Functor(self.findTargetStatus),
                                                Functor(self.setClean),
@@ -156,6 +167,8 @@ class MSRuleCleaner(MSCore):
         self.wfCounters = {'cleaned': {},
                            'archived': {'normalArchived': 0,
                                         'forceArchived': 0}}
+        # workflows are dispatched concurrently, the counters are updated with this lock
+        self.counterLock = Lock()
         self.globalLocks = set()
 
     def getGlobalLocks(self):
@@ -189,8 +202,17 @@ class MSRuleCleaner(MSCore):
         """
         for pline in self.cleanuplines:
             self.wfCounters['cleaned'][pline.name] = 0
+            pline.resetStageStats()
         self.wfCounters['archived']['normalArchived'] = 0
         self.wfCounters['archived']['forceArchived'] = 0
+        self.plineArchive.resetStageStats()
+
+    def incrementCounter(self, counter, name):
+        """
+        Increment one of the 'cleaned' or 'archived' counters, thread-safe
+        """
+        with self.counterLock:
+            self.wfCounters[counter][name] += 1
 
     def execute(self, reqStatus):
         """
@@ -258,10 +280,15 @@ class MSRuleCleaner(MSCore):
         cleanNumRequests = 0
         totalNumRequests = 0
 
-        # Call the workflow dispatcher:
-        for req in viewvalues(reqRecords):
-            wflow = MSRuleCleanerWflow(req)
-            self._dispatchWflow(wflow)
+        # Call the workflow dispatcher, for many workflows concurrently:
+        wflows = [MSRuleCleanerWflow(req) for req in viewvalues(reqRecords)]
+        dispatcher = Pipeline(name='dispatcher', funcLine=[Functor(self._dispatchWflow)])
+        results = dispatcher.runConcurrent(wflows, maxWorkers=self.msConfig['dispatchThreads'])
+        for wflow, (_, exc) in zip(wflows, results):
+            if exc is not None:
+                msg = "General error dispatching workflow: %s. Error: %s. "
+                msg += "Will retry again in the next cycle."
+                self.logger.error(msg, wflow['RequestName'], str(exc))
             msg = "\n----------------------------------------------------------"
             msg += "\nMSRuleCleanerWflow: %s"
             msg += "\n----------------------------------------------------------"
@@ -270,10 +297,27 @@ class MSRuleCleaner(MSCore):
             if self._checkClean(wflow):
                 cleanNumRequests += 1
 
+        # Commit the queued archival status transitions:
+        if self.msConfig['bulkArchival']:
+            archived = self.commitChanges(self.__class__.__name__, dryRun=False)
+            for wflow in wflows:
+                if wflow['RequestName'] not in archived:
+                    continue
+                if not archived[wflow['RequestName']]:
+                    msg = "%s: Archival Error: failed status transition to: %s for workflow: %s. "
+                    msg += "Will retry again in the next cycle."
+                    self.logger.error(msg, self.plineArchive.name, wflow['TargetStatus'], wflow['RequestName'])
+                elif wflow['ForceArchive']:
+                    self.incrementCounter('archived', 'forceArchived')
+                else:
+                    self.incrementCounter('archived', 'normalArchived')
+
         # Report the counters:
         for pline in self.cleanuplines:
             msg = "Workflows cleaned by pipeline: %s: %d"
             self.logger.info(msg, pline.name, self.wfCounters['cleaned'][pline.name])
+        for pline in self.cleanuplines + [self.plineArchive]:
+            self.logger.info("Stage statistics of pipeline: %s: %s", pline.name, pline.getStageStats())
         normalArchivedNumRequests = self.wfCounters['archived']['normalArchived']
         forceArchivedNumRequests = self.wfCounters['archived']['forceArchived']
         self.logger.info("Workflows normally archived: %d", self.wfCounters['archived']['normalArchived'])
@@ -348,7 +392,7 @@ class MSRuleCleaner(MSCore):
                     self._checkStatusAdvanceExpired(wflow, additionalInfo=msg)
                     continue
                 if wflow['CleanupStatus'][pline.name]:
-                    self.wfCounters['cleaned'][pline.name] += 1
+                    self.incrementCounter('cleaned', pline.name)
         else:
             # We shouldn't be here:
             msg = "Skipping workflow: %s - "
@@ -358,10 +402,13 @@ class MSRuleCleaner(MSCore):
         # Archive:
         try:
             self.plineArchive.run(wflow)
-            if wflow['ForceArchive']:
-                self.wfCounters['archived']['forceArchived'] += 1
+            if self.msConfig['bulkArchival']:
+                # counted once the status transition gets committed
+                pass
+            elif wflow['ForceArchive']:
+                self.incrementCounter('archived', 'forceArchived')
             else:
-                self.wfCounters['archived']['normalArchived'] += 1
+                self.incrementCounter('archived', 'normalArchived')
         except MSRuleCleanerArchivalSkip as ex:
             msg = "%s: Proper conditions not met: %s. "
             msg += "Skipping archival in the current cycle."
@@ -518,7 +565,8 @@ class MSRuleCleaner(MSCore):
         try:
             if self.msConfig['enableRealMode']:
                 self.logger.info("Deleting %s records from LogDB WMStats...", wflow['RequestName'])
-                res = self.logDB.delete(wflow['RequestName'], agent=False)
+                with self.logDBLock:
+                    res = self.logDB.delete(wflow['RequestName'], agent=False)
                 if res == 'delete-error':
                     msg = "Failed to delete logDB docs for wflow: %s" % wflow['RequestName']
                     raise MSRuleCleanerArchivalError(msg)
@@ -601,6 +649,11 @@ class MSRuleCleaner(MSCore):
             raise MSRuleCleanerArchivalSkip(msg)
 
         # Proceed with the actual archival:
+        if self.msConfig['bulkArchival']:
+            self.queueChange(wflow['RequestName'], wflow['TargetStatus'])
+            msg = "Queued status transition to: %s for workflow: %s"
+            self.logger.info(msg, wflow['TargetStatus'], wflow['RequestName'])
+            return wflow
         try:
             self.reqmgr2.updateRequestStatus(wflow['RequestName'], wflow['TargetStatus'])
             msg = "Successful status transition to: %s for workflow: %s"
@@ -16,6 +16,7 @@ standard_library.install_aliases()
 
 # system modules
 import os
+from concurrent.futures import ThreadPoolExecutor
 from operator import itemgetter
 from pprint import pformat
 from retry import retry
@@ -96,6 +97,8 @@ class MSTransferor(MSCore):
         # make a container level rule for the whole container whenever the open running
         # timeout is larger than what is configured (or the default of 7 days below)
         self.msConfig.setdefault("openRunning", 7 * 24 * 60 * 60)
+        # number of workflows having their input data discovered concurrently
+        self.msConfig.setdefault("discoveryThreads", 10)
         # define the pileup query to be executed through MSPileup
         self.pileupQuery = self.msConfig.get("pileupQuery",
                                              {"query": {"active": True}, "filters": ["expectedRSEs", "pileupName"]})
@@ -195,67 +198,83 @@ class MSTransferor(MSCore):
             self.updateReportDict(summary, "error", msg)
             return summary
 
-        # process all requests
-        for reqSlice in grouper(requestRecords, 100):
-            self.logger.info("Processing workflows from %d to %d.",
-                             counterWorkflows + 1, counterWorkflows + len(reqSlice))
-            # execute data discovery
-            reqResults = self.reqInfo(reqSlice, self.pileupDocs)
-            self.logger.info("%d requests information completely processed.", len(reqResults))
-
-            for wflow in reqResults:
-                if not self.verifyCampaignExist(wflow):
-                    counterProblematicRequests += 1
-                    continue
-
-                if not self.passSecondaryCheck(wflow):
-                    self.alertPUMisconfig(wflow.getName())
-                    counterProblematicRequests += 1
-                    continue
-
-                # find accepted RSEs for the workflow
-                rseList = self.getAcceptedRSEs(wflow)
-
-                # now check where input primary and parent blocks will need to go
-                self.checkDataLocation(wflow, rseList)
-
-                # check if our workflow needs an update, if so wflow.dataReplacement flag is set
-                # which will be used by makeTransferRucio->moveReplicationRule chain of API calls
-                self.checkDataReplacement(wflow)
-
-                try:
-                    success, transfers = self.makeTransferRequest(wflow, rseList)
-                except Exception as ex:
-                    success = False
-                    self.alertUnknownTransferError(wflow.getName())
-                    msg = "Unknown exception while making transfer request for %s " % wflow.getName()
-                    msg = "\tError: %s" % str(ex)
-                    self.logger.exception(msg)
-                if success:
-                    # then create a document in ReqMgr Aux DB
-                    self.logger.info("Transfer requests successful for %s. Summary: %s",
-                                     wflow.getName(), pformat(transfers))
-                    if self.createTransferDoc(wflow.getName(), transfers):
-                        self.logger.info("Transfer document successfully created in CouchDB for: %s", wflow.getName())
-                        # then move this request to staging status but only if we did't do data replacement
-                        if not wflow.dataReplacement:
-                            self.change(wflow.getName(), 'staging', self.__class__.__name__)
-                        counterSuccessRequests += 1
+        # process all requests. Data discovered in DBS and Rucio is shared by all
+        # the requests of this cycle, and the data discovery of the next slice of
+        # requests runs in the background while the current one is transferred
+        self.reqInfo.clearDiscoveryCache()
+        reqSlices = list(grouper(requestRecords, 100))
+        discovery = ThreadPoolExecutor(max_workers=1)
+        try:
+            if reqSlices:
+                nextResults = discovery.submit(self.reqInfo, reqSlices[0], self.pileupDocs)
+            for idx, reqSlice in enumerate(reqSlices):
+                self.logger.info("Processing workflows from %d to %d.",
+                                 counterWorkflows + 1, counterWorkflows + len(reqSlice))
+                # execute data discovery
+                reqResults = nextResults.result()
+                if idx + 1 < len(reqSlices):
+                    nextResults = discovery.submit(self.reqInfo, reqSlices[idx + 1], self.pileupDocs)
+                self.logger.info("%d requests information completely processed.", len(reqResults))
+
+                for wflow in reqResults:
+                    if not self.verifyCampaignExist(wflow):
+                        counterProblematicRequests += 1
+                        continue
+
+                    if not self.passSecondaryCheck(wflow):
+                        self.alertPUMisconfig(wflow.getName())
+                        counterProblematicRequests += 1
+                        continue
+
+                    # find accepted RSEs for the workflow
+                    rseList = self.getAcceptedRSEs(wflow)
+
+                    # now check where input primary and parent blocks will need to go
+                    self.checkDataLocation(wflow, rseList)
+
+                    # check if our workflow needs an update, if so wflow.dataReplacement flag is set
+                    # which will be used by makeTransferRucio->moveReplicationRule chain of API calls
+                    self.checkDataReplacement(wflow)
+
+                    try:
+                        success, transfers = self.makeTransferRequest(wflow, rseList)
+                    except Exception as ex:
+                        success = False
+                        self.alertUnknownTransferError(wflow.getName())
+                        msg = "Unknown exception while making transfer request for %s " % wflow.getName()
+                        msg = "\tError: %s" % str(ex)
+                        self.logger.exception(msg)
+                    if success:
+                        # then create a document in ReqMgr Aux DB
+                        self.logger.info("Transfer requests successful for %s. Summary: %s",
+                                         wflow.getName(), pformat(transfers))
+                        if self.createTransferDoc(wflow.getName(), transfers):
+                            self.logger.info("Transfer document successfully created in CouchDB for: %s", wflow.getName())
+                            # then move this request to staging status but only if we did't do data replacement
+                            if not wflow.dataReplacement:
+                                self.queueChange(wflow.getName(), 'staging')
+                            counterSuccessRequests += 1
+                        else:
+                            counterFailedRequests += 1
+                            self.alertTransferCouchDBError(wflow.getName())
+                        # clean-up local persistent storage if move operation was successful
+                        if wflow.dataReplacement:
+                            self.cleanupStorage(wflow.getName())
                     else:
                         counterFailedRequests += 1
-                        self.alertTransferCouchDBError(wflow.getName())
-                    # clean-up local persistent storage if move operation was successful
-                    if wflow.dataReplacement:
-                        self.cleanupStorage(wflow.getName())
-                else:
-                    counterFailedRequests += 1
-            # it can go slightly beyond the limit. It's evaluated for every slice
-            if counterSuccessRequests >= self.msConfig["limitRequestsPerCycle"]:
-                msg = "Transferor succeeded acting on %d workflows in this cycle. " % counterSuccessRequests
-                msg += "Which exceeds the configuration limit set to: %s" % self.msConfig["limitRequestsPerCycle"]
-                self.logger.info(msg)
-                break
-            counterWorkflows += len(reqSlice)
+                # status transitions of this slice are committed in bulk
+                self.commitChanges(self.__class__.__name__)
+                # it can go slightly beyond the limit. It's evaluated for every slice
+                if counterSuccessRequests >= self.msConfig["limitRequestsPerCycle"]:
+                    msg = "Transferor succeeded acting on %d workflows in this cycle. " % counterSuccessRequests
+                    msg += "Which exceeds the configuration limit set to: %s" % self.msConfig["limitRequestsPerCycle"]
+                    self.logger.info(msg)
+                    nextResults.cancel()
+                    break
+                counterWorkflows += len(reqSlice)
+        finally:
+            # do not leak the discovery thread, even if this cycle fails
+            discovery.shutdown(wait=True)
 
         self.logger.info("Summary for this cycle is:")
         self.logger.info("    * there were %d problematic requests;", counterProblematicRequests)
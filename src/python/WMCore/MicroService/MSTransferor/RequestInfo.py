@@ -10,10 +10,11 @@ from future.utils import viewitems
 
 # system modules
 import datetime
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 # WMCore modules
 from pprint import pformat
 from copy import deepcopy
-from Utils.IteratorTools import grouper
 from Utils.Timers import CodeTimer
 from WMCore.DataStructs.LumiList import LumiList
 from WMCore.MicroService.MSTransferor.DataStructs.DQMHarvestWorkflow import DQMHarvestWorkflow
@@ -26,6 +27,9 @@ from WMCore.MicroService.Tools.Common import (findBlockParents, getBlocksByDsetA
                                               getFileLumisInBlock, findParent, getRunsInBlock)
 from WMCore.MicroService.MSCore.MSCore import MSCore
 
+# placeholder for the keys not found by a data discovery lookup
+_NOT_FOUND = object()
+
 
 def isNanoWorkflow(reqDict):
     """
@@ -81,6 +85,11 @@ class RequestInfo(MSCore):
         self.tokenValidity = None
         self.openRunning = self.msConfig["openRunning"]
         self.pileupDocs = []
+        # number of workflows having their input data discovered concurrently
+        self.discoveryThreads = self.msConfig.get("discoveryThreads", 10)
+        # data discovered in the current cycle, by kind of lookup and key
+        self.discoveryCache = {}
+        self.discoveryLock = threading.Lock()
 
     def __call__(self, reqRecords, pileupDocs):
         """
@@ -103,23 +112,31 @@ class RequestInfo(MSCore):
 
         # check Rucio token validity and renew it if needed
         self.setupRucioToken()
-        # Step 1: figure out any possible parent datasets
-        self.logger.info("Getting/setting parent datasets for %d requests", len(workflows))
-        with CodeTimer("### getParentDatasets", logger=self.logger):
-            parentMap = self.getParentDatasets(workflows)
-            self.setParentDatasets(workflows, parentMap)
-
-        self.setupRucioToken()
-        # Step 2: check if pileup datasets are active and their expected locations
-        with CodeTimer("### checkSecondaryData", logger=self.logger):
-            workflows = self.setSecondaryData(workflows)
-
-        self.setupRucioToken()
-        # Step 3: get final list of valid blocks for both parent and primary data
-        # considers run, block and lumi lists
-        with CodeTimer("### getInputDataBlocks", logger=self.logger):
-            blocksByDset = self.getInputDataBlocks(workflows)
-            self.setInputDataBlocks(workflows, blocksByDset)
+        with ThreadPoolExecutor(max_workers=self.discoveryThreads) as executor:
+            # the primary blocks do not depend on the parentage resolution,
+            # fetch them from Rucio while resolving the parent datasets in DBS
+            primaryDsets = set(dataIn['name'] for wflow in workflows
+                               for dataIn in wflow.getDataCampaignMap() if dataIn['type'] == "primary")
+            prefetch = executor.submit(self._getBlocksAndSize, primaryDsets)
+
+            # Step 1: figure out any possible parent datasets
+            self.logger.info("Getting/setting parent datasets for %d requests", len(workflows))
+            with CodeTimer("### getParentDatasets", logger=self.logger):
+                parentMap = self.getParentDatasets(workflows)
+                self.setParentDatasets(workflows, parentMap)
+
+            self.setupRucioToken()
+            # Step 2: check if pileup datasets are active and their expected locations
+            with CodeTimer("### checkSecondaryData", logger=self.logger):
+                workflows = self.setSecondaryData(workflows)
+
+            self.setupRucioToken()
+            # Step 3: get final list of valid blocks for both parent and primary data
+            # considers run, block and lumi lists
+            with CodeTimer("### getInputDataBlocks", logger=self.logger):
+                prefetch.result()
+                blocksByDset = self.getInputDataBlocks(workflows)
+                self.setInputDataBlocks(workflows, blocksByDset, executor)
 
         # Step 4: compose the final list of parent/child dependency
         with CodeTimer("### getParentChildBlocks", logger=self.logger):
@@ -128,6 +145,66 @@ class RequestInfo(MSCore):
 
         return workflows
 
+    def clearDiscoveryCache(self):
+        """
+        Forget the data discovered so far, to be called at the beginning
+        of every cycle, such that data is only shared between the requests
+        processed in the same cycle
+        """
+        with self.discoveryLock:
+            self.discoveryCache = {}
+
+    def _discover(self, kind, keys, fetchFunc):
+        """
+        Return the data discovered for a list of keys (dataset or block names),
+        such that every key is looked up only once per cycle, even when
+        requested by concurrent threads.
+        :param kind: a hashable identifying the lookup, e.g. DBS API and URL
+        :param keys: list of keys to look up
+        :param fetchFunc: function fetching the data of a list of keys, returning a
+            dictionary where None flags a failure; failures are not kept and keys
+            not found in the returned dictionary are left out of the result
+        :return: a dictionary with the data of the keys
+        """
+        owned = {}
+        with self.discoveryLock:
+            cache = self.discoveryCache.setdefault(kind, {})
+            for key in keys:
+                if key not in cache:
+                    cache[key] = owned[key] = Future()
+            futures = {key: cache[key] for key in keys}
+
+        if owned:
+            try:
+                fetched = fetchFunc(list(owned))
+            except Exception as exc:
+                with self.discoveryLock:
+                    for key, future in viewitems(owned):
+                        cache.pop(key, None)
+                        future.set_exception(exc)
+                raise
+            with self.discoveryLock:
+                for key, future in viewitems(owned):
+                    value = fetched.get(key, _NOT_FOUND)
+                    if value is None:
+                        cache.pop(key, None)
+                    future.set_result(value)
+
+        result = {}
+        for key, future in viewitems(futures):
+            value = future.result()
+            if value is not _NOT_FOUND:
+                result[key] = value
+        return result
+
+    def _getBlocksAndSize(self, datasets):
+        """
+        Cached version of getBlocksAndSizeRucio
+        """
+        return self._discover("blocksAndSize", datasets,
+                              lambda dsets: getBlocksAndSizeRucio(dsets, self.msConfig['rucioUrl'],
+                                                                  self.rucioToken))
+
     def classifyWorkflows(self, reqRecords):
         """
         This method classifies the provided workflows into their
@@ -209,7 +286,8 @@ class RequestInfo(MSCore):
         for dbsUrl, datasets in viewitems(datasetByDbs):
             self.logger.info("Resolving %d dataset parentage against DBS: %s", len(datasets), dbsUrl)
             # first find out what's the parent dataset name
-            parentByDset.update(findParent(datasets, dbsUrl))
+            parentByDset.update(self._discover(("datasetparents", dbsUrl), datasets,
+                                               lambda dsets: findParent(dsets, dbsUrl)))
 
         # now check if any of our calls failed; if so, workflow needs to be skipped from this cycle
         # FIXME: isn't there a better way to do this?!?
@@ -277,7 +355,7 @@ class RequestInfo(MSCore):
         # fetch all block names and their sizes from Rucio
         self.logger.info("Fetching parent/primary block sizes for %d containers against Rucio: %s",
                          len(datasets), self.msConfig['rucioUrl'])
-        blocksByDset = getBlocksAndSizeRucio(datasets, self.msConfig['rucioUrl'], self.rucioToken)
+        blocksByDset = self._getBlocksAndSize(datasets)
 
         # now check if any of our calls failed; if so, workflow needs to be skipped from this cycle
         # FIXME: isn't there a better way to do this?!?
@@ -292,13 +370,15 @@ class RequestInfo(MSCore):
             self._workflowRemoval(workflows, retryWorkflows)
         return blocksByDset
 
-    def setInputDataBlocks(self, workflows, blocksByDset):
+    def setInputDataBlocks(self, workflows, blocksByDset, executor=None):
         """
         Provided a dictionary structure of dictionary, block name, and a couple of
         block information, set the workflow attributes accordingly.
+        The run/block/lumi lists of the workflows are applied concurrently
+        when an executor is provided.
         """
-        retryWorkflows = []
-        for wflow in workflows:
+        def setBlocks(wflow):
+            """Set the blocks of a workflow, return it in case of failure"""
             try:
                 for dataIn in wflow.getDataCampaignMap():
                     if dataIn['type'] == "primary":
@@ -311,7 +391,11 @@ class RequestInfo(MSCore):
                         wflow.setParentBlocks(newBlockDict)
             except Exception:
                 self.logger.error("Workflow: %s will be retried in the next cycle", wflow.getName())
-                retryWorkflows.append(wflow)
+                return wflow
+            return None
+
+        mapper = executor.map if executor else map
+        retryWorkflows = [wflow for wflow in mapper(setBlocks, list(workflows)) if wflow is not None]
         # remove workflows that failed one or more of the bulk queries to the data-service
         self._workflowRemoval(workflows, retryWorkflows)
 
@@ -364,7 +448,11 @@ class RequestInfo(MSCore):
                 runAllowedList = list(set(runAllowedList) - runForbiddenList)
                 self.logger.info("Fetching blocks matching a list of runs for %s", wflow.getName())
                 try:
-                    blocks = getBlocksByDsetAndRun(dset, runAllowedList, dbsUrl)
+                    runKey = tuple(sorted(runAllowedList))
+                    blocks = self._discover(("blocksByRun", dbsUrl), [(dset, runKey)],
+                                            lambda keys: {keys[0]: getBlocksByDsetAndRun(dset, runAllowedList,
+                                                                                         dbsUrl)})
+                    blocks = blocks[(dset, runKey)]
                 except Exception as exc:
                     msg = "Failed to retrieve blocks by dataset '%s'and run: %s\n" % (dset, runAllowedList)
                     msg += "Error details: %s" % str(exc)
@@ -379,7 +467,8 @@ class RequestInfo(MSCore):
             # only run blacklist set
             self.logger.info("Fetching runs in blocks for RunBlacklist for %s", wflow.getName())
             try:
-                blockRuns = getRunsInBlock(list(blocksDict), dbsUrl)
+                blockRuns = self._discover(("runs", dbsUrl), list(blocksDict),
+                                           lambda blocks: getRunsInBlock(blocks, dbsUrl))
             except Exception as exc:
                 self.logger.error("Failed to bulk retrieve runs per block. Details: %s", str(exc))
                 raise
@@ -395,24 +484,26 @@ class RequestInfo(MSCore):
             self.logger.debug("with the following run whitelist: %s", runAllowedList)
             goodBlocks = set()
             # now with a smaller set of blocks in hand, we collect their lumi
-            # information and discard any blocks not matching the lumi list
-            for blockSlice in grouper(finalBlocks, 10):
-                try:
-                    blockFileLumis = getFileLumisInBlock(blockSlice, dbsUrl, validFileOnly=1)
-                except Exception as exc:
-                    self.logger.error("Failed to bulk retrieve run/lumi per block. Details: %s", str(exc))
-                    raise
-                for block, fileLumis in viewitems(blockFileLumis):
-                    for fileLumi in fileLumis:
-                        if int(fileLumi['run_num']) not in runAllowedList:
-                            continue
-                        runNumber = str(fileLumi['run_num'])
-                        lumis = fileLumi['lumi_section_num']
-                        fileMask = LumiList(runsAndLumis={runNumber: lumis})
-                        if lumiList & fileMask:
-                            # then it has lumis that we need, keep this block and move on
-                            goodBlocks.add(block)
-                            break
+            # information and discard any blocks not matching the lumi list.
+            # getFileLumisInBlock limits itself to 10 concurrent calls to DBS
+            try:
+                blockFileLumis = self._discover(("filelumis", dbsUrl), list(finalBlocks),
+                                                lambda blocks: getFileLumisInBlock(blocks, dbsUrl,
+                                                                                   validFileOnly=1))
+            except Exception as exc:
+                self.logger.error("Failed to bulk retrieve run/lumi per block. Details: %s", str(exc))
+                raise
+            for block, fileLumis in viewitems(blockFileLumis):
+                for fileLumi in fileLumis:
+                    if int(fileLumi['run_num']) not in runAllowedList:
+                        continue
+                    runNumber = str(fileLumi['run_num'])
+                    lumis = fileLumi['lumi_section_num']
+                    fileMask = LumiList(runsAndLumis={runNumber: lumis})
+                    if lumiList & fileMask:
+                        # then it has lumis that we need, keep this block and move on
+                        goodBlocks.add(block)
+                        break
             # last but not least, drop any blocks that are not in the good list
             for block in list(finalBlocks):
                 if block not in goodBlocks:
@@ -458,7 +549,17 @@ class RequestInfo(MSCore):
                 continue
             self.logger.debug("Fetching DBS parent blocks for %d children blocks...", len(blocks))
             # first find out what's the parent dataset name
-            parentageMap.update(findBlockParents(blocks, dbsUrl))
+            parentsByBlock = self._discover(("blockparents", dbsUrl), list(blocks),
+                                            lambda blocks: self._findBlockParents(blocks, dbsUrl))
+            for block, parents in viewitems(parentsByBlock):
+                dataset = block.split("#")[0]
+                if parents is None:
+                    parentageMap[dataset] = None
+                elif parentageMap.get(dataset, {}) is not None:
+                    parentageMap.setdefault(dataset, {})
+                    if parents:
+                        # a copy, workflows remove the parent blocks they do not need
+                        parentageMap[dataset][block] = set(parents)
 
         # now check if any of our calls failed; if so, workflow needs to be skipped from this cycle
         # FIXME: isn't there a better way to do this?!?
@@ -473,6 +574,23 @@ class RequestInfo(MSCore):
             self._workflowRemoval(workflows, retryWorkflows)
         return parentageMap
 
+    @staticmethod
+    def _findBlockParents(blocks, dbsUrl):
+        """
+        Wrapper around findBlockParents, returning the parent blocks by
+        child block, or None for all the blocks of a dataset if one of
+        its calls failed
+        """
+        parentsByBlock = {}
+        parentsByDset = findBlockParents(blocks, dbsUrl)
+        for block in blocks:
+            dataset = block.split("#")[0]
+            if dataset in parentsByDset and parentsByDset[dataset] is None:
+                parentsByBlock[block] = None
+            else:
+                parentsByBlock[block] = parentsByDset.get(dataset, {}).get(block, set())
+        return parentsByBlock
+
     def setParentChildBlocks(self, workflows, parentageMap):
         """
         Provided a dictionary with the dataset, the child block and a set
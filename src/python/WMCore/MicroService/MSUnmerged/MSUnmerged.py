@@ -38,8 +38,9 @@ from WMCore.MicroService.MSCore.MSCore import MSCore
 from WMCore.MicroService.MSUnmerged.MSUnmergedRSE import MSUnmergedRSE
 from WMCore.Services.RucioConMon.RucioConMon import RucioConMon
 from WMCore.Services.WMStatsServer.WMStatsServer import WMStatsServer
-from WMCore.Database.MongoDB import MongoDB
+from WMCore.Database.MongoDB import MongoDB, MongoWriteBehind
 from WMCore.WMException import WMException
+from Utils.PathTrie import PathTrie
 from Utils.Pipeline import Pipeline, Functor
 from Utils.TwPrint import twFormat
 
@@ -116,6 +117,11 @@ class MSUnmerged(MSCore):
         self.msConfig.setdefault("mongoDBReplicaSet", None)
         self.msConfig.setdefault("mongoDBPort", None)
         self.msConfig.setdefault("mockMongoDB", False)
+        # write the RSE documents to MongoDB in the background, through a write-behind buffer
+        self.msConfig.setdefault("mongoWriteBehind", True)
+        self.msConfig.setdefault("mongoWriteBatchSize", 500)
+        self.msConfig.setdefault("mongoWriteFlushInterval", 5)
+        self.msConfig.setdefault("mongoWriteMaxPending", 1000)
 
         msUnmergedIndex = IndexModel('name', unique=True)
 
@@ -138,6 +144,13 @@ class MSUnmerged(MSCore):
         mongoDB = MongoDB(**msUnmergedDBConfig)
         self.msUnmergedDB = getattr(mongoDB, self.msConfig['mongoDB'])
         self.msUnmergedColl = self.msUnmergedDB['msUnmergedColl']
+        self.msUnmergedWriter = None
+        if self.msConfig['mongoWriteBehind']:
+            self.msUnmergedWriter = MongoWriteBehind(self.msUnmergedColl, logger=self.logger,
+                                                     maxPending=self.msConfig['mongoWriteMaxPending'],
+                                                     batchSize=self.msConfig['mongoWriteBatchSize'],
+                                                     flushInterval=self.msConfig['mongoWriteFlushInterval'],
+                                                     retryCount=self.msConfig['mongoDBRetryCount'])
 
         if self.msConfig['emulateGfal2'] is False and gfal2 is None:
             msg = "Failed to import gfal2 library while it's not "
@@ -170,6 +183,7 @@ class MSUnmerged(MSCore):
 
         # Initialization service common data structures:
         self.rseConsStats = {}
+        self.protectedTrie = PathTrie()
         self.protectedLFNs = set()
 
         # The basic /store/unmerged regular expression:
@@ -179,6 +193,22 @@ class MSUnmerged(MSCore):
         # log msConfig
         self.logger.info("msConfig: %s", pformat(self.msConfig))
 
+    @property
+    def protectedLFNs(self):
+        """
+        The set of protected LFNs, as fetched from WMStats
+        """
+        return self._protectedLFNs
+
+    @protectedLFNs.setter
+    def protectedLFNs(self, lfns):
+        """
+        Set the protected LFNs and index them in a path trie, such that
+        checking a directory against all of them is a single prefix walk
+        """
+        self._protectedLFNs = lfns
+        self.protectedTrie = PathTrie(lfns)
+
     # @profile
     def execute(self):
         """
@@ -302,6 +332,9 @@ class MSUnmerged(MSCore):
                 msg += "Will retry again in the next cycle."
                 self.logger.exception(msg, pline.name, rseName, str(ex))
                 continue
+        if self.msUnmergedWriter:
+            writeStats = self.msUnmergedWriter.flush()
+            self.logger.info("%s: MongoDB write-behind buffer statistics: %s", pline.name, writeStats)
         return self.plineCounters[pline.name]['totalNumRses'], \
             self.plineCounters[pline.name]['totalNumFiles'], \
             self.plineCounters[pline.name]['rsesCleaned'], \
@@ -690,23 +723,36 @@ class MSUnmerged(MSCore):
         :return:    rse
         """
         self.logger.info("Fetching data from Rucio ConMon for RSE: %s.", rse['name'])
+        self._logMemoryUsage(f"before fetching unmerged files for RSE {rse['name']}")
+        # NOTE: The consistency dump is streamed file by file into a trie of the
+        #       directories cut to the right level, with the number of files in
+        #       each of them. The memory used is thus bounded by the number of
+        #       directories, which is independent of the number of files at the RSE.
+        dirTrie = PathTrie()
         for lfn in self.rucioConMon.getRSEUnmerged(rse['name'], zipped=True):
-            dirPath = self._cutPath(lfn)
+            dirTrie.add(self._cutPath(lfn))
+        self.logger.info("RSE: %s: Found %d unmerged directories in %d trie nodes.",
+                         rse['name'], len(dirTrie), dirTrie.numNodes)
+
+        for dirPath, numFiles in dirTrie.paths():
             # Check if what is left is still under /store/unmerged/*
             if not self.regStoreUnmergedLfn.match(dirPath):
-                msg = f"Retrieved file from RucioConMon that does not belong to the unmerged area: {lfn}. Skipping it."
+                msg = f"Retrieved {numFiles} files from RucioConMon that do not belong to the unmerged area "
+                msg += f"under: {dirPath}. Skipping them."
                 self.logger.critical(msg)
                 continue
 
             # general counter for possible files and unique directories
-            rse['counters']['totalNumFiles'] += 1
+            rse['counters']['totalNumFiles'] += numFiles
 
             # now evaluate whether it is deletable or not, and persist it under the right field
             if self._isDeletable(dirPath):
                 rse['dirs']['toDelete'].add(dirPath)
-                rse['counters']['filesToDelete'] += 1
+                rse['counters']['filesToDelete'] += numFiles
             else:
                 rse['dirs']['protected'].add(dirPath)
+        del dirTrie
+        self._logMemoryUsage(f"after fetching unmerged files for RSE {rse['name']}")
 
         if not rse['counters']['totalNumFiles']:
             self.logger.error("RSE: %s has an empty list of unmerged files in Rucio ConMon.", rse['name'])
@@ -724,29 +770,14 @@ class MSUnmerged(MSCore):
         :param filePath:   The full (absolute) file path together with the file name
         :return finalPath: The final path cut the to correct level
         """
-        # pylint: disable=E1120
-        # This is a known issue when when passing an unpacked list to a method expecting
-        # at least one variable. In this case the signature of the method breaking the
-        # rule is:
-        # os.path.join(*newPath) != os.path.join(a, *p)
-
-        # Split the initial filePath into chunks and fill it into a dictionary
-        # containing only directory names and the root of the path e.g.
-        # ['/', 'store', 'unmerged', 'RunIISummer20UL17SIM', ...]
-        newPath = []
-        root = filePath
-        while True:
-            root, tail = os.path.split(root)
-            if tail:
-                newPath.append(tail)
-            else:
-                newPath.append(root)
-                break
-        newPath.reverse()
-        # Cut/slice the path to the level/element required.
-        newPath = newPath[:7]
+        # Split the initial filePath into its directory names e.g.
+        # ['store', 'unmerged', 'RunIISummer20UL17SIM', ...], and cut/slice
+        # the path to the level/element required.
+        newPath = [part for part in filePath.split('/') if part][:6]
         # Build the path out of all that is found up to the deepest level in the LFN tree
-        finalPath = os.path.join(*newPath)
+        finalPath = '/'.join(newPath)
+        if filePath.startswith('/'):
+            finalPath = '/' + finalPath
         return finalPath
 
     def _isDeletable(self, dirPath):
@@ -755,27 +786,26 @@ class MSUnmerged(MSCore):
         deleted or not. Checks are performed against:
          * directory inclusion filter
          * directory exclusion filter
-         * protected lfns
+         * protected lfns, a directory is protected if it, one of its parent
+           directories or one of its sub-directories is a protected LFN
 
         :param dirPath: string with a shorter version of the LFN
         :return _type_: True if the directory can be deleted, False otherwise
         """
         # Check against the inclusion filter
         if self.msConfig['dirFilterIncl']:
-            respFilter = [dirPath.startswith(filterItem) for filterItem in self.msConfig['dirFilterIncl']]
-            if any(respFilter) is False:
+            if not dirPath.startswith(tuple(self.msConfig['dirFilterIncl'])):
                 # does not match against any of the inclusion filters
                 return False
 
         # Check against the exclusion filter
         if self.msConfig['dirFilterExcl']:
-            respFilter = [dirPath.startswith(filterItem) for filterItem in self.msConfig['dirFilterExcl']]
-            if any(respFilter) is True:
+            if dirPath.startswith(tuple(self.msConfig['dirFilterExcl'])):
                 # matches against at least one exclusion filter
                 return False
 
         # Finally, check against the protected LFNs
-        return dirPath not in self.protectedLFNs
+        return not self.protectedTrie.overlaps(dirPath)
 
     def getPfn(self, rse):
         """
@@ -919,6 +949,9 @@ class MSUnmerged(MSCore):
         """
         try:
             self.logger.info("Uploading RSE information to MongoDB for RSE: %s.", rse['name'])
+            if self.msUnmergedWriter:
+                rse.queueRSEToMongoDB(self.msUnmergedWriter, fullRSEToDB=fullRSEToDB, overwrite=overwrite)
+                return rse
             rse.writeRSEToMongoDB(self.msUnmergedColl, fullRSEToDB=fullRSEToDB, overwrite=overwrite, retryCount=self.msConfig['mongoDBRetryCount'])
         except NotPrimaryError:
             msg = "Could not write RSE to MongoDB for the maximum of %s mongoDBRetryCounts configured." % self.msConfig['mongoDBRetryCount']
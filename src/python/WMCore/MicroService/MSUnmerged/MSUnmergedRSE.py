@@ -115,26 +115,12 @@ class MSUnmergedRSE(dict):
         else:
             return False
 
-    def writeRSEToMongoDB(self, collection, fullRSEToDB=False, overwrite=False, retryCount=0):
+    def buildMongoDoc(self, fullRSEToDB=False):
         """
-        A method to write/update the RSE at the Database from the current object.
-        :param collection:     The MonogoDB collection to write on
-        :param fullRSEToDB:    Bool flag, used to trigger dump of the whole RSE object to
-                               the database with the `files` section (excluding the generator objects)
-                               NOTE: if fullRSEToDB=False and a previous record for the RSE already exists
-                                     the fields missing from the projection won't be updated
-                                     during this write operation but will preserver their values.
-                                     To completely refresh and RSE record in the database use
-                                     self.purgeRSEAtMongoDB first.
-        :param overwrite:      A flag to note if the currently existing document into
-                               the database is about to be completely replaced or just
-                               fields update is to happen.
-        :param retryCount:     The number of retries for the write operation if failed due to
-                               `NotPrimaryError. Possible values:
-                               0   - the write operation will be tried exactly once and no retries will happen
-                               > 0 - the write operation will be retried this number of times
-                               < 0 - the write operation will never be tried
-        :return:               True if update was successful, False otherwise.
+        Returns the MongoDB document (or the fields to be updated) for the current
+        object, with the fields selected by the projection from buildMongoProjection
+        :param fullRSEToDB: Flag to include the `files` section in the document
+        :return:            A dictionary with MongoDB compatible values
         """
         # NOTE: The fields to be manipulated are only those which are compatible
         #       with MongoDB (i.e. here we avoid any field holding a strictly
@@ -165,6 +151,30 @@ class MSUnmergedRSE(dict):
                 else:
                     updateFields[field] = self[field]
 
+        return updateFields
+
+    def writeRSEToMongoDB(self, collection, fullRSEToDB=False, overwrite=False, retryCount=0):
+        """
+        A method to write/update the RSE at the Database from the current object.
+        :param collection:     The MonogoDB collection to write on
+        :param fullRSEToDB:    Bool flag, used to trigger dump of the whole RSE object to
+                               the database with the `files` section (excluding the generator objects)
+                               NOTE: if fullRSEToDB=False and a previous record for the RSE already exists
+                                     the fields missing from the projection won't be updated
+                                     during this write operation but will preserver their values.
+                                     To completely refresh and RSE record in the database use
+                                     self.purgeRSEAtMongoDB first.
+        :param overwrite:      A flag to note if the currently existing document into
+                               the database is about to be completely replaced or just
+                               fields update is to happen.
+        :param retryCount:     The number of retries for the write operation if failed due to
+                               `NotPrimaryError. Possible values:
+                               0   - the write operation will be tried exactly once and no retries will happen
+                               > 0 - the write operation will be retried this number of times
+                               < 0 - the write operation will never be tried
+        :return:               True if update was successful, False otherwise.
+        """
+        updateFields = self.buildMongoDoc(fullRSEToDB)
         updateOps = {'$set': updateFields}
         # NOTE: NotPrimaryError is a recoverable error, caused by a session to a
         #       non primary backend part of a replicaset.
@@ -192,6 +202,20 @@ class MSUnmergedRSE(dict):
         else:
             return False
 
+    def queueRSEToMongoDB(self, writer, fullRSEToDB=False, overwrite=False):
+        """
+        Same as writeRSEToMongoDB, but through a write-behind buffer, such that
+        the document is written to the Database later, in the background.
+        :param writer:      The MongoWriteBehind buffer of the MongoDB collection
+        :param fullRSEToDB: Bool flag, see writeRSEToMongoDB
+        :param overwrite:   Bool flag, see writeRSEToMongoDB
+        """
+        updateFields = self.buildMongoDoc(fullRSEToDB)
+        if overwrite:
+            writer.replace(self.mongoFilter, updateFields)
+        else:
+            writer.update(self.mongoFilter, updateFields, upsert=True)
+
     def resetRSE(self, collection, keepTimestamps=False, keepCounters=False, retryCount=0):
         """
         Resets all records of the RSE object to default values  and write the
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+"""
+_Codec_
+
+Serialization of the batches of work and results exchanged between the
+ProcessPool and its slaves. A codec turns a list of items into a list of
+ZMQ frames, and back. Available codecs:
+  * json: JSON with the JSONThunker, handling __to_json__ objects, as
+    done by Services.Requests.JSONRequests
+  * pickle: pickle protocol 5, with large buffers sent as out-of-band frames
+  * msgpack: msgpack serialization, if the msgpack module is installed
+"""
+
+import json
+import pickle
+
+from WMCore.WMException import WMException
+from WMCore.Wrappers.JsonWrapper.JSONThunker import JSONThunker
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class CodecException(WMException):
+    """
+    _CodecException_
+
+    Raised for unknown or unavailable codecs.
+    """
+
+
+def frameBuffer(frame):
+    """
+    _frameBuffer_
+
+    Return a buffer for a frame received with or without copy.
+    """
+    return getattr(frame, 'buffer', frame)
+
+
+class JSONCodec(object):
+    """
+    _JSONCodec_
+
+    Encode a batch of items as a single JSON frame.
+    """
+    name = 'json'
+
+    def encode(self, items):
+        return [json.dumps(JSONThunker().thunk(items)).encode('utf-8')]
+
+    def decode(self, frames):
+        data = json.loads(bytes(frameBuffer(frames[0])).decode('utf-8'))
+        return JSONThunker().unthunk(data)
+
+
+class PickleCodec(object):
+    """
+    _PickleCodec_
+
+    Encode a batch of items with pickle. With protocol 5, buffers exposed
+    through the PickleBuffer API are sent as separate frames, without
+    being copied into the pickle stream.
+    """
+    name = 'pickle'
+
+    def __init__(self):
+        self.protocol = pickle.HIGHEST_PROTOCOL
+
+    def encode(self, items):
+        if self.protocol < 5:
+            return [pickle.dumps(items, self.protocol)]
+        buffers = []
+        data = pickle.dumps(items, self.protocol, buffer_callback=buffers.append)
+        return [data] + [buf.raw() for buf in buffers]
+
+    def decode(self, frames):
+        buffers = [frameBuffer(frame) for frame in frames]
+        if len(buffers) == 1:
+            return pickle.loads(buffers[0])
+        return pickle.loads(buffers[0], buffers=buffers[1:])
+
+
+def _msgpackDefault(obj):
+    """
+    _msgpackDefault_
+
+    Convert the objects msgpack does not know about
+    """
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, '__to_json__'):
+        return obj.__to_json__(None)
+    raise TypeError("Object of type %s is not msgpack serializable" % type(obj).__name__)
+
+
+class MsgPackCodec(object):
+    """
+    _MsgPackCodec_
+
+    Encode a batch of items with msgpack. Sets are sent as lists.
+    """
+    name = 'msgpack'
+
+    def __init__(self):
+        if msgpack is None:
+            raise CodecException("The msgpack codec requires the msgpack python module")
+
+    def encode(self, items):
+        return [msgpack.packb(items, use_bin_type=True, default=_msgpackDefault)]
+
+    def decode(self, frames):
+        return msgpack.unpackb(frameBuffer(frames[0]), raw=False, strict_map_key=False)
+
+
+CODECS = {'json': JSONCodec,
+          'pickle': PickleCodec,
+          'msgpack': MsgPackCodec}
+
+
+def getCodec(name='json'):
+    """
+    _getCodec_
+
+    Return a codec instance given its name.
+    """
+    if name not in CODECS:
+        msg = "Unknown ProcessPool codec '%s'. Supported: %s" % (name, sorted(CODECS))
+        raise CodecException(msg)
+    return CODECS[name]()
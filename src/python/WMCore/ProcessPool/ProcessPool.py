@@ -11,12 +11,16 @@ from builtins import range, object
 import zmq
 import subprocess
 import sys
+import json
 import logging
 import os
 import threading
+import time
 import traceback
 import pickle
+from collections import deque
 
+from Utils.IteratorTools import grouper
 from Utils.PythonVersion import PY3
 
 from logging.handlers import RotatingFileHandler
@@ -24,12 +28,33 @@ from logging.handlers import RotatingFileHandler
 from WMCore.WMFactory import WMFactory
 from WMCore.WMInit import WMInit
 
-from WMCore.Services.Requests import JSONRequests
+from WMCore.ProcessPool.Codec import getCodec, frameBuffer
 
 from WMCore.Agent.HeartbeatAPI import HeartbeatAPI
 
 from WMCore.WMException import WMException
 
+# maximum number of batches a slave takes off its socket ahead of processing them
+SLAVE_PREFETCH = 100
+
+
+def encodeHeader(header):
+    """
+    _encodeHeader_
+
+    Encode the control header sent as the first frame of every message.
+    """
+    return json.dumps(header).encode('utf-8')
+
+
+def decodeHeader(frame):
+    """
+    _decodeHeader_
+
+    Decode the control header of a message.
+    """
+    return json.loads(bytes(frameBuffer(frame)).decode('utf-8'))
+
 
 class ProcessPoolException(WMException):
     """
@@ -65,7 +90,7 @@ class ProcessPoolWorker(object):
 class ProcessPool(object):
     def __init__(self, slaveClassName, totalSlaves, componentDir,
                  config, namespace='WMComponent', inPort='5555',
-                 outPort='5558'):
+                 outPort='5558', codec='json', batchSize=1):
         """
         __init__
 
@@ -79,13 +104,26 @@ class ProcessPool(object):
         parameters.  It is not passed to the slave class.  The slaveInit
         parameter will be serialized and passed to the slave class's
         constructor.
+
+        Work and results are serialized with the given codec (json, pickle
+        or msgpack, see WMCore.ProcessPool.Codec), and exchanged in ZMQ
+        multipart messages carrying up to batchSize items each.
         """
         self.enqueueIndex = 0
         self.dequeueIndex = 0
         self.runningWork = 0
 
-        # Use the Services.Requests JSONizer, which handles __to_json__ calls
-        self.jsonHandler = JSONRequests()
+        # json by default, the Services.Requests JSONizer handles __to_json__ calls
+        self.codecName = codec
+        self.codec = getCodec(codec)
+        self.batchSize = max(int(batchSize), 1)
+        # results received from the slaves but not dequeued yet
+        self.completedWork = deque()
+        self.metrics = {'enqueuedItems': 0, 'enqueuedBatches': 0,
+                        'dequeuedItems': 0, 'receivedBatches': 0,
+                        'encodeTime': 0.0, 'decodeTime': 0.0}
+        # latest metrics reported by each slave, key'ed by process id
+        self.slaveMetrics = {}
 
         # heartbeat should be registered at this point
         if getattr(config.Agent, "useHeartbeat", True):
@@ -161,7 +199,8 @@ class ProcessPool(object):
         outPort = self.outPort
 
         slaveArgs = [self.versionString, __file__, self.slaveClassName, inPort,
-                     outPort, self.configPath, self.componentDir, self.namespace]
+                     outPort, self.configPath, self.componentDir, self.namespace,
+                     self.codecName]
 
         count = 0
         while totalSlaves > 0:
@@ -204,11 +243,7 @@ class ProcessPool(object):
         """
         for i in range(self.nSlaves):
             try:
-                encodedWork = self.jsonHandler.encode('STOP')
-                if PY3:
-                    self.sender.send_string(encodedWork)
-                else:
-                    self.sender.send(encodedWork)
+                self.sender.send_multipart([encodeHeader({'stop': True})])
             except Exception as ex:
                 # Might be already failed.  Nothing you can
                 # really do about that.
@@ -246,7 +281,8 @@ class ProcessPool(object):
         __enqeue__
 
         Assign work to the workers processes.  The work parameters must be a
-        list where each item in the list can be serialized into JSON.
+        list where each item in the list can be serialized with the pool codec.
+        Items are sent to the slaves in batches of batchSize items.
 
         If list is True, the entire list is sent as one piece of work
         """
@@ -256,21 +292,17 @@ class ProcessPool(object):
             logging.error(msg)
             raise ProcessPoolException(msg)
 
-        if not list:
-            for w in work:
-                encodedWork = self.jsonHandler.encode(w)
-                if PY3:
-                    self.sender.send_string(encodedWork)
-                else:
-                    self.sender.send(encodedWork)
-                self.runningWork += 1
-        else:
-            encodedWork = self.jsonHandler.encode(work)
-            if PY3:
-                self.sender.send_string(encodedWork)
-            else:
-                self.sender.send(encodedWork)
-            self.runningWork += 1
+        if list:
+            work = [work]
+
+        for batch in grouper(work, self.batchSize):
+            startTime = time.time()
+            frames = self.codec.encode(batch)
+            self.metrics['encodeTime'] += time.time() - startTime
+            self.sender.send_multipart([encodeHeader({'items': len(batch)})] + frames, copy=False)
+            self.metrics['enqueuedBatches'] += 1
+            self.metrics['enqueuedItems'] += len(batch)
+            self.runningWork += len(batch)
 
         return
 
@@ -281,36 +313,61 @@ class ProcessPool(object):
         Retrieve completed work from the slave workers.  This method will block
         until enough work has been completed.
         """
-        completedWork = []
-
         if totalItems > self.runningWork:
             msg = "Asked to dequeue more work then is running!\n"
             msg += "Failing"
             logging.error(msg)
             raise ProcessPoolException(msg)
 
-        while totalItems > 0:
+        while len(self.completedWork) < totalItems:
             try:
-                output = self.sink.recv()
-                decode = self.jsonHandler.decode(output)
-                if isinstance(decode, dict) and decode.get('type', None) == 'ERROR':
-                    # Then we had some kind of error
-                    msg = decode.get('msg', 'Unknown Error in ProcessPool')
-                    logging.error("Received Error Message from ProcessPool Slave")
-                    logging.error(msg)
-                    self.close()
-                    raise ProcessPoolException(msg)
-                completedWork.append(decode)
-                self.runningWork -= 1
-                totalItems -= 1
+                frames = self.sink.recv_multipart(copy=False)
+                header = decodeHeader(frames[0])
+                startTime = time.time()
+                decode = self.codec.decode(frames[1:])
+                self.metrics['decodeTime'] += time.time() - startTime
+                self.metrics['receivedBatches'] += 1
+                if 'slave' in header:
+                    self.slaveMetrics[header['slave']['pid']] = header['slave']
+                for item in decode:
+                    if isinstance(item, dict) and item.get('type', None) == 'ERROR':
+                        # Then we had some kind of error
+                        msg = item.get('msg', 'Unknown Error in ProcessPool')
+                        logging.error("Received Error Message from ProcessPool Slave")
+                        logging.error(msg)
+                        self.close()
+                        raise ProcessPoolException(msg)
+                self.completedWork.extend(decode)
             except Exception as ex:
                 msg = "Exception while getting slave output in ProcessPool.\n"
                 msg += str(ex)
                 logging.error(msg)
                 break
 
+        completedWork = []
+        while totalItems > 0 and self.completedWork:
+            completedWork.append(self.completedWork.popleft())
+            self.runningWork -= 1
+            totalItems -= 1
+        self.metrics['dequeuedItems'] += len(completedWork)
+
         return completedWork
 
+    def getMetrics(self):
+        """
+        _getMetrics_
+
+        Return the pool counters and timings (in seconds), the number of
+        items in flight and the latest metrics reported by each slave:
+        items received and processed, items waiting in its queue, items
+        in flight, and its decode, encode and work timings.
+        """
+        metrics = dict(self.metrics)
+        metrics['inFlight'] = self.runningWork - len(self.completedWork)
+        metrics['pendingResults'] = len(self.completedWork)
+        metrics['slaves'] = dict(self.slaveMetrics)
+        return metrics
+
     def restart(self):
         """
         _restart_
@@ -372,7 +429,8 @@ if __name__ == "__main__":
     in through stdin as a JSON object.
 
     Input variables:
-    className, input port, output port, path to pickled config, component dir, namespace
+    className, input port, output port, path to pickled config, component dir,
+    namespace, codec name
     """
 
     # Get variables passed in
@@ -382,6 +440,7 @@ if __name__ == "__main__":
     configPath = sys.argv[4]
     componentDir = sys.argv[5]
     namespace = sys.argv[6]
+    codecName = sys.argv[7] if len(sys.argv) > 7 else 'json'
 
     # Set up logging
     setupLogging(componentDir)
@@ -408,68 +467,100 @@ if __name__ == "__main__":
     wmInit = WMInit()
     setupDB(config, wmInit)
 
-    # Create JSON handler
-    jsonHandler = JSONRequests()
+    # Create the codec handler
+    codec = getCodec(codecName)
 
     wmFactory = WMFactory(name="slaveFactory", namespace=namespace)
     slaveClass = wmFactory.loadObject(classname=slaveClassName, args=config)
 
     logging.info("Have slave class")
 
+    # batches already taken off the socket, and metrics reported with every result
+    backlog = deque()
+    metrics = {'pid': os.getpid(), 'received': 0, 'processed': 0, 'queueDepth': 0,
+               'inFlight': 0, 'decodeTime': 0.0, 'encodeTime': 0.0, 'workTime': 0.0}
+
+    def sendResults(results):
+        """
+        Send a batch of results back to the pool, with the slave metrics
+        """
+        startTime = time.time()
+        frames = codec.encode(results)
+        metrics['encodeTime'] += time.time() - startTime
+        metrics['queueDepth'] = sum(header.get('items', 0) for header, _ in backlog)
+        metrics['inFlight'] = metrics['received'] - metrics['processed']
+        sender.send_multipart([encodeHeader({'items': len(results), 'slave': metrics})] + frames,
+                              copy=False)
+
+    def receiveBatch(flags=0):
+        """
+        Take a batch off the socket and append it to the backlog
+        """
+        frames = receiver.recv_multipart(flags, copy=False)
+        header = decodeHeader(frames[0])
+        metrics['received'] += header.get('items', 0)
+        backlog.append((header, frames))
+
     while (True):
-        encodedInput = receiver.recv()
+        if not backlog:
+            receiveBatch()
+        # take whatever was already pushed to this slave, to measure its queue depth
+        while len(backlog) < SLAVE_PREFETCH:
+            try:
+                receiveBatch(zmq.NOBLOCK)
+            except zmq.Again:
+                break
+        header, frames = backlog.popleft()
+
+        if header.get('stop'):
+            break
 
         try:
-            input = jsonHandler.decode(encodedInput)
+            startTime = time.time()
+            inputs = codec.decode(frames[1:])
+            metrics['decodeTime'] += time.time() - startTime
         except Exception as ex:
             logging.error("Error decoding: %s" % str(ex))
             break
 
-        if input == "STOP":
-            break
-
-        try:
-            logging.error(input)
-            output = slaveClass(input)
-        except Exception as ex:
-            crashMessage = "Slave process crashed with exception: " + str(ex)
-            crashMessage += "\nStacktrace:\n"
+        results = []
+        crashed = False
+        startTime = time.time()
+        for input in inputs:
+            try:
+                logging.debug(input)
+                output = slaveClass(input)
+            except Exception as ex:
+                crashMessage = "Slave process crashed with exception: " + str(ex)
+                crashMessage += "\nStacktrace:\n"
 
-            stackTrace = traceback.format_tb(sys.exc_info()[2], None)
-            for stackFrame in stackTrace:
-                crashMessage += stackFrame
+                stackTrace = traceback.format_tb(sys.exc_info()[2], None)
+                for stackFrame in stackTrace:
+                    crashMessage += stackFrame
 
-            logging.error(crashMessage)
-            try:
-                output = {'type': 'ERROR', 'msg': crashMessage}
-                encodedOutput = jsonHandler.encode(output)
-                if PY3:
-                    sender.send_string(encodedOutput)
-                else:
-                    sender.send(encodedOutput)
-                logging.error("Sent error message and now breaking")
+                logging.error(crashMessage)
+                results.append({'type': 'ERROR', 'msg': crashMessage})
+                crashed = True
                 break
-            except Exception as ex:
-                logging.error("Failed to send error message")
-                logging.error(str(ex))
-                del jsonHandler
-                sys.exit(1)
-
-        if output != None:
-            if isinstance(output, list):
-                for item in output:
-                    encodedOutput = jsonHandler.encode(item)
-                    if PY3:
-                        sender.send_string(encodedOutput)
-                    else:
-                        sender.send(encodedOutput)
-            else:
-                encodedOutput = jsonHandler.encode(output)
-                if PY3:
-                    sender.send_string(encodedOutput)
+
+            metrics['processed'] += 1
+            if output != None:
+                if isinstance(output, list):
+                    results.extend(output)
                 else:
-                    sender.send(encodedOutput)
+                    results.append(output)
+        metrics['workTime'] += time.time() - startTime
+
+        try:
+            if results or crashed:
+                sendResults(results)
+        except Exception as ex:
+            logging.error("Failed to send results")
+            logging.error(str(ex))
+            sys.exit(1)
+        if crashed:
+            logging.error("Sent error message and now breaking")
+            break
 
     logging.info("Process with PID %s finished" % (os.getpid()))
-    del jsonHandler
     sys.exit(0)
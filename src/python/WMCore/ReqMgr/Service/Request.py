@@ -23,7 +23,7 @@ from WMCore.ReqMgr.DataStructs.AuthzByStatus import AuthzByStatus
 
 from WMCore.ReqMgr.DataStructs.Request import RequestInfo
 from WMCore.ReqMgr.DataStructs.ReqMgrConfigDataCache import ReqMgrConfigDataCache
-from WMCore.ReqMgr.DataStructs.RequestError import InvalidSpecParameterValue
+from WMCore.ReqMgr.DataStructs.RequestError import InvalidSpecParameterValue, InvalidStateTransition
 from WMCore.ReqMgr.DataStructs.RequestStatus import (REQUEST_STATE_LIST, REQUEST_STATE_TRANSITION,
                                                      ACTIVE_STATUS, check_allowed_transition)
 from WMCore.ReqMgr.DataStructs.RequestType import REQUEST_TYPES
@@ -168,6 +168,51 @@ class Request(RESTEntity):
 
         safe.kwargs["multi_update_flag"] = True
 
+    def _validateBulkStatus(self, safe):
+        """
+        Validates a bulk of status-only transitions, provided in the request
+        body as a list of {"RequestName": ..., "RequestStatus": ..., "cascade": ...}
+        dictionaries. The current status of all the requests is fetched in a
+        single CouchDB call, then every transition goes through the same
+        authorization and transition checks as a single status update. A
+        failed validation does not reject the whole bulk, instead its error
+        message is carried over to the response of that request.
+        """
+        transitions = json.loads(cherrypy.request.body.read() or "[]")
+        if not isinstance(transitions, list) or not all(isinstance(item, dict) for item in transitions):
+            raise InvalidSpecParameterValue("Bulk status transitions must be provided as a list of dictionaries")
+
+        names = [item.get("RequestName") for item in transitions if isinstance(item.get("RequestName"), str)]
+        currentDocs = self.reqmgr_db_service.getRequestByNames(list(set(names))) if names else {}
+
+        safe.kwargs['workload_pair_list'] = []
+        for item in transitions:
+            requestName = item.get("RequestName")
+            requestArgs = {key: val for key, val in viewitems(item) if key != "RequestName"}
+            try:
+                if not isinstance(requestName, str) or not requestName:
+                    raise InvalidSpecParameterValue("Missing or invalid RequestName in: %s" % item)
+                if set(requestArgs) - {"RequestStatus", "cascade"} or "RequestStatus" not in requestArgs:
+                    msg = "Only RequestStatus and cascade are supported in bulk status transitions: %s" % item
+                    raise InvalidSpecParameterValue(msg)
+                newStatus = requestArgs["RequestStatus"]
+                if newStatus not in REQUEST_STATE_LIST or newStatus == "assigned":
+                    msg = "Status '%s' is not supported in bulk status transitions" % newStatus
+                    raise InvalidSpecParameterValue(msg)
+                if requestName not in currentDocs:
+                    raise InvalidSpecParameterValue("Request not found: %s" % requestName)
+                currentStatus = currentDocs[requestName]["RequestStatus"]
+                if not check_allowed_transition(currentStatus, newStatus):
+                    raise InvalidStateTransition(requestName, currentStatus, newStatus)
+                isUserAllowed(self.reqmgrAuthzByStatus, requestArgs)
+                error = None
+            except cherrypy.HTTPError as exc:
+                error = exc._message or str(exc)
+            except Exception as exc:
+                error = getattr(exc, "message", None) or str(exc)
+            safe.kwargs['workload_pair_list'].append((requestName, requestArgs, error))
+        safe.kwargs["bulk_status_flag"] = True
+
     def _getRequestNamesFromBody(self, safe):
 
         request_names = json.loads(cherrypy.request.body.read())
@@ -209,6 +254,10 @@ class Request(RESTEntity):
                     # special case for multi update from browser.
                     param.args.pop()
                     self._getRequestNamesFromBody(safe)
+                elif args_length == 1 and param.args[0] == "bulk_status":
+                    # status-only transitions of many requests, e.g. from the microservices
+                    param.args.pop()
+                    self._validateBulkStatus(safe)
                 else:
                     self._validateRequestBase(param, safe, validate_request_create_args)
         except cherrypy.HTTPError as exc:
@@ -519,6 +568,13 @@ class Request(RESTEntity):
         It handles only the state transition.
         Special handling needed if a request is aborted or force completed.
         """
+        return self._handleStatusTransition(workload.name(), request_args, dn)
+
+    def _handleStatusTransition(self, requestName, request_args, dn):
+        """
+        Performs a status transition given the request name, such that
+        it does not require the workload to be loaded.
+        """
         # if we got here, then the main workflow has been already validated
         # and the status transition is allowed
         req_status = request_args["RequestStatus"]
@@ -526,13 +582,13 @@ class Request(RESTEntity):
 
         if req_status in ["aborted", "force-complete"]:
             # cancel the workflow first
-            self.gq_service.cancelWorkflow(workload.name())
+            self.gq_service.cancelWorkflow(requestName)
 
         # cascade option is only supported for these 3 statuses. If set, we need to
         # find all the children requests and perform the same status transition
         if req_status in ["rejected", "closed-out", "announced"] and cascade:
-            childrenNamesAndStatus = self._retrieveResubmissionChildren(workload.name())
-            msg = "Workflow {} has {} ".format(workload.name(), len(childrenNamesAndStatus))
+            childrenNamesAndStatus = self._retrieveResubmissionChildren(requestName)
+            msg = "Workflow {} has {} ".format(requestName, len(childrenNamesAndStatus))
             msg += "children workflows to have a status transition to: {}".format(req_status)
             cherrypy.log(msg)
             for childInfo in childrenNamesAndStatus:
@@ -544,8 +600,29 @@ class Request(RESTEntity):
                     msg += "not allowed for workflow: {}, skipping it!".format(childInfo['id'])
                     cherrypy.log(msg)
         # then update the original/parent workflow status in couchdb
-        cherrypy.log('Updating request status for {} to {}.'.format(workload.name(), req_status))
-        report = self.reqmgr_db_service.updateRequestStatus(workload.name(), req_status, dn)
+        cherrypy.log('Updating request status for {} to {}.'.format(requestName, req_status))
+        report = self.reqmgr_db_service.updateRequestStatus(requestName, req_status, dn)
+        return report
+
+    def _bulkStatusTransition(self, transitions):
+        """
+        Performs the status transitions validated by _validateBulkStatus.
+        Every request is updated on its own, such that a failure does not
+        affect the rest of the bulk.
+        :param transitions: list of (request name, request args, validation error) tuples
+        :return: a list of {request name: "OK"} or {request name: "ERROR: reason"}
+        """
+        dn = get_user_info().get("dn", "unknown")
+        report = []
+        for requestName, requestArgs, error in transitions:
+            if error is None:
+                try:
+                    result = self._handleStatusTransition(requestName, requestArgs, dn)
+                    error = None if result == 'OK' else "CouchDB update returned: %s" % result
+                except Exception as exc:
+                    cherrypy.log("Error in the bulk status transition of %s: %s" % (requestName, str(exc)))
+                    error = str(exc)
+            report.append({requestName: "OK" if error is None else "ERROR: %s" % error})
         return report
 
     def _updateRequest(self, workload, request_args):
@@ -611,7 +688,8 @@ class Request(RESTEntity):
         return
 
     @restcall(formats=[('application/json', JSONFormat())])
-    def post(self, workload_pair_list, multi_update_flag=False, multi_names_flag=False):
+    def post(self, workload_pair_list, multi_update_flag=False, multi_names_flag=False,
+             bulk_status_flag=False):
         """
         Create and update couchDB with  a new request.
         request argument is passed from validation
@@ -634,6 +712,8 @@ class Request(RESTEntity):
             return self.put(workload_pair_list)
         if multi_names_flag:
             return self.get(name=workload_pair_list)
+        if bulk_status_flag:
+            return self._bulkStatusTransition(workload_pair_list)
 
         out = []
         for workload, request_args in workload_pair_list:
@@ -0,0 +1,433 @@
+#!/usr/bin/env python
+"""
+_CurlEngine_
+
+Long-lived, asynchronous HTTP request engine built on a pycurl.CurlMulti
+object driven by a background thread. Requests are submitted from any
+thread and a concurrent.futures.Future is returned for each of them, e.g.:
+
+    engine = CurlEngine(RequestHandler(), maxPerHost=10, retries=2)
+    futures = [engine.submit(url, {'block_name': block}, ckey=ckey, cert=cert, decode=True)
+               for block in blocks]
+    for future in futures:
+        header, data = future.result()
+
+All the HTTP verbs supported by RequestHandler can be used, the requests
+are set up by RequestHandler.set_opts and their curl handles come from
+the RequestHandler pool, such that connections are kept alive between
+requests. The engine limits the number of concurrent transfers, globally
+and per host, retries transport errors and the retryCodes HTTP statuses
+with an exponential backoff, and can hand the response body to a
+streamCallback as it arrives instead of buffering it.
+
+Future callbacks and stream callbacks are run in the engine thread, they
+should not block.
+"""
+
+from __future__ import division
+
+import heapq
+import logging
+import os
+import select
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import Future
+
+import pycurl
+
+from Utils.PortForward import PortForward
+from WMCore.Services.pycurl_manager import RequestHandler, CurlPool, getException, decompress
+
+
+class Transfer(object):
+    """
+    _Transfer_
+
+    State of a request submitted to the engine
+    """
+
+    def __init__(self, future, url, params, headers, verb, options, retries, streamCallback, parser):
+        self.future = future
+        self.url = url
+        self.host = CurlPool.hostKey(url)
+        self.params = params
+        self.headers = headers
+        self.verb = verb
+        self.options = options
+        self.retries = retries
+        self.streamCallback = streamCallback
+        self.parser = parser
+        self.attempt = 0
+        self.bbuf = None
+        self.hbuf = None
+        self.streamed = 0
+        self.streamError = None
+
+    def write(self, chunk):
+        """Hand a chunk of the body to the stream callback, abort the transfer if it fails"""
+        try:
+            self.streamCallback(chunk)
+        except Exception as exc:
+            self.streamError = exc
+            return -1
+        self.streamed += len(chunk)
+        return None
+
+
+class CurlEngine(object):
+    """
+    _CurlEngine_
+
+    Asynchronous request engine with a submit-and-return-future API
+    """
+
+    def __init__(self, handler=None, maxConcurrent=50, maxPerHost=10, retries=0,
+                 backoff=1.0, retryCodes=(502, 503, 504), idleExit=60, logger=None):
+        """
+        :param handler: RequestHandler setting up the requests, a default one if None
+        :param maxConcurrent: maximum number of transfers running at the same time
+        :param maxPerHost: maximum number of transfers running at the same time per host
+        :param retries: default number of retries of a request
+        :param backoff: delay before the first retry, doubled at each retry (seconds)
+        :param retryCodes: HTTP statuses which are retried, on top of transport errors
+        :param idleExit: seconds without any request after which the engine thread exits,
+                         it is started again by the next submission
+        :param logger: logger object
+        """
+        self.handler = handler or RequestHandler()
+        self.maxConcurrent = maxConcurrent
+        self.maxPerHost = maxPerHost
+        self.retries = retries
+        self.backoff = backoff
+        self.retryCodes = set(retryCodes)
+        self.idleExit = idleExit
+        self.logger = logger or logging.getLogger()
+        self.portForwarder = PortForward(8443)
+        self.lock = threading.Lock()
+        self.stats = Counter()
+        self.closed = False
+        self.pid = None
+        self._init()
+
+    def _init(self):
+        """Set up the engine state, also after a fork, where the engine thread is gone"""
+        self.pid = os.getpid()
+        self.incoming = deque()
+        self.thread = None
+        self.wakeRead, self.wakeWrite = os.pipe()
+        os.set_blocking(self.wakeRead, False)
+        os.set_blocking(self.wakeWrite, False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def submit(self, url, params=None, headers=None, verb='GET', ckey=None, cert=None,
+               capath=None, cainfo=None, doseq=True, encode=False, decode=False,
+               retries=None, streamCallback=None, options=None, parser=None):
+        """
+        Submit a request, return a Future for its (header, data) tuple.
+
+        The arguments are the ones of RequestHandler.request, plus:
+        :param retries: number of retries, the engine default if None
+        :param streamCallback: function called with each chunk of the (decompressed)
+            body as it arrives, in which case data is None. Requests which delivered
+            part of their body are not retried.
+        :param options: dictionary of extra pycurl options, e.g. {'TIMEOUT': 30}
+        :param parser: function called with (header, data) in the engine thread,
+            whose return value becomes the result of the future
+        :return: concurrent.futures.Future. HTTP errors are set as the exceptions
+            raised by RequestHandler.request, transport errors as pycurl.error
+        """
+        future = Future()
+        url = self.portForwarder(url)
+        optArgs = dict(ckey=ckey, cert=cert, capath=capath, cainfo=cainfo,
+                       doseq=doseq, encode=encode, decode=decode)
+        transfer = Transfer(future, url, params, headers, verb, (optArgs, options or {}),
+                            self.retries if retries is None else retries, streamCallback, parser)
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("CurlEngine is closed")
+            if self.pid != os.getpid():
+                self._init()
+            self.incoming.append(transfer)
+            self.stats['submitted'] += 1
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="CurlEngine")
+                self.thread.daemon = True
+                self.thread.start()
+        self._wakeUp()
+        return future
+
+    def submitBatch(self, requests, **kwargs):
+        """
+        Submit a batch of requests, each of them a dictionary with the arguments
+        of submit. kwargs are the defaults of all the requests.
+        :return: list of futures, in the order of the requests
+        """
+        futures = []
+        for request in requests:
+            args = dict(kwargs)
+            args.update(request)
+            futures.append(self.submit(**args))
+        return futures
+
+    def getStats(self):
+        """Return the request counters: submitted, completed, failed, retried and cancelled"""
+        with self.lock:
+            return dict(self.stats)
+
+    def close(self, wait=True):
+        """
+        Stop accepting requests, cancel the ones which did not start yet,
+        and wait for the running ones to complete if wait is True
+        """
+        with self.lock:
+            self.closed = True
+            thread = self.thread
+            for transfer in self.incoming:
+                transfer.future.cancel()
+            self.incoming.clear()
+        self._wakeUp()
+        if wait and thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def _wakeUp(self):
+        """Interrupt the select of the engine thread"""
+        try:
+            os.write(self.wakeWrite, b'x')
+        except (BlockingIOError, OSError):
+            pass
+
+    def _run(self):
+        """Main loop of the engine thread"""
+        multi = pycurl.CurlMulti()
+        pending = OrderedDict()  # host -> deque of transfers waiting for a slot
+        active = {}  # curl handle -> transfer
+        perHost = Counter()
+        delayed = []  # heap of (time, sequence, transfer) to retry
+        sequence = 0
+        idleSince = time.time()
+        try:
+            while True:
+                with self.lock:
+                    while self.incoming:
+                        transfer = self.incoming.popleft()
+                        pending.setdefault(transfer.host, deque()).append(transfer)
+                    closed = self.closed
+                    if closed:
+                        for queue in pending.values():
+                            for transfer in queue:
+                                transfer.future.cancel()
+                        pending.clear()
+                        for _, _, transfer in delayed:
+                            transfer.future.cancel()
+                        delayed = []
+                    if not (pending or active or delayed):
+                        if closed or time.time() - idleSince > self.idleExit:
+                            self.thread = None
+                            return
+                    else:
+                        idleSince = time.time()
+
+                now = time.time()
+                while delayed and delayed[0][0] <= now:
+                    transfer = heapq.heappop(delayed)[2]
+                    pending.setdefault(transfer.host, deque()).append(transfer)
+                self._start(multi, pending, active, perHost)
+
+                while True:
+                    ret, _ = multi.perform()
+                    if ret != pycurl.E_CALL_MULTI_PERFORM:
+                        break
+                while True:
+                    numQueued, okList, errList = multi.info_read()
+                    finished = [(curl, None) for curl in okList]
+                    finished.extend((curl, pycurl.error(errno, errmsg)) for curl, errno, errmsg in errList)
+                    for curl, error in finished:
+                        multi.remove_handle(curl)
+                        transfer = active.pop(curl)
+                        perHost[transfer.host] -= 1
+                        delay = self._finish(transfer, curl, error)
+                        if delay is not None:
+                            sequence += 1
+                            heapq.heappush(delayed, (time.time() + delay, sequence, transfer))
+                    if not numQueued:
+                        break
+                self._wait(multi, delayed, bool(active or pending))
+        except Exception:
+            self.logger.exception("CurlEngine thread failed")
+            with self.lock:
+                self.thread = None
+                transfers = list(self.incoming) + list(active.values())
+                transfers += [transfer for queue in pending.values() for transfer in queue]
+                transfers += [transfer for _, _, transfer in delayed]
+                self.incoming.clear()
+            for transfer in transfers:
+                if not transfer.future.done():
+                    transfer.future.set_exception(RuntimeError("CurlEngine thread failed"))
+        finally:
+            for curl in active:
+                multi.remove_handle(curl)
+                self.handler.discardCurl(curl)
+            multi.close()
+
+    def _start(self, multi, pending, active, perHost):
+        """Start the pending transfers, within the global and per host limits"""
+        for host in list(pending):
+            queue = pending[host]
+            while queue and len(active) < self.maxConcurrent and perHost[host] < self.maxPerHost:
+                transfer = queue.popleft()
+                if transfer.attempt == 0 and not transfer.future.set_running_or_notify_cancel():
+                    with self.lock:
+                        self.stats['cancelled'] += 1
+                    continue
+                try:
+                    curl = self._setup(transfer)
+                except Exception as exc:
+                    transfer.future.set_exception(exc)
+                    with self.lock:
+                        self.stats['failed'] += 1
+                    continue
+                multi.add_handle(curl)
+                active[curl] = transfer
+                perHost[host] += 1
+            if not queue:
+                del pending[host]
+
+    def _setup(self, transfer):
+        """Return a curl handle set up for the transfer"""
+        optArgs, options = transfer.options
+        curl = self.handler.getCurl(transfer.url)
+        try:
+            transfer.bbuf, transfer.hbuf = self.handler.set_opts(curl, transfer.url, transfer.params,
+                                                                 transfer.headers, verb=transfer.verb,
+                                                                 ckey=optArgs['ckey'], cert=optArgs['cert'],
+                                                                 capath=optArgs['capath'], cainfo=optArgs['cainfo'],
+                                                                 doseq=optArgs['doseq'], encode=optArgs['encode'])
+            if transfer.streamCallback:
+                # let curl decompress the body, since it is not buffered
+                curl.setopt(pycurl.ENCODING, "gzip")
+                curl.setopt(pycurl.WRITEFUNCTION, transfer.write)
+                transfer.streamed = 0
+            for key, value in options.items():
+                curl.setopt(getattr(pycurl, key), value)
+        except Exception:
+            self.handler.discardCurl(curl)
+            raise
+        return curl
+
+    def _finish(self, transfer, curl, error):
+        """
+        Complete the future of a finished transfer, return the delay before
+        retrying it or None
+        """
+        if error is None:
+            self.handler.releaseCurl(transfer.url, curl)
+        else:
+            self.handler.discardCurl(curl)
+        if transfer.streamError is not None:
+            # the stream callback failed, there is no point retrying
+            return self._complete(transfer, error=transfer.streamError)
+
+        header = data = None
+        if error is None:
+            header = self.handler.parse_header(transfer.hbuf.getvalue())
+            if not transfer.streamCallback:
+                data = decompress(transfer.bbuf.getvalue(), header.header)
+            if header.status >= 300:
+                error = getException(transfer.url, transfer.params, transfer.headers, header, data)
+                if header.status not in self.retryCodes:
+                    return self._complete(transfer, error=error)
+
+        if error is not None:
+            if transfer.attempt < transfer.retries and not transfer.streamed:
+                transfer.attempt += 1
+                with self.lock:
+                    self.stats['retried'] += 1
+                delay = self.backoff * 2 ** (transfer.attempt - 1)
+                self.logger.debug("Retrying %s %s in %.1f s after: %s", transfer.verb, transfer.url, delay, error)
+                return delay
+            return self._complete(transfer, error=error)
+
+        try:
+            if transfer.verb == 'HEAD':
+                data = ''
+            elif data is not None:
+                data = self.handler.parse_body(data, transfer.options[0]['decode'])
+            result = (header, data)
+            if transfer.parser:
+                result = transfer.parser(header, data)
+        except Exception as exc:
+            return self._complete(transfer, error=exc)
+        return self._complete(transfer, result=result)
+
+    def _complete(self, transfer, result=None, error=None):
+        """Set the outcome of a transfer on its future"""
+        transfer.bbuf = transfer.hbuf = None
+        with self.lock:
+            self.stats['failed' if error is not None else 'completed'] += 1
+        if error is not None:
+            transfer.future.set_exception(error)
+        else:
+            transfer.future.set_result(result)
+        return None
+
+    def _wait(self, multi, delayed, busy):
+        """Sleep until there is curl activity, a submission or a retry is due"""
+        if busy:
+            timeout = 1.0
+        else:
+            timeout = 0 if self.closed else self.idleExit
+        if busy:
+            curlTimeout = multi.timeout()
+            if curlTimeout >= 0:
+                timeout = min(timeout, curlTimeout / 1000)
+        if delayed:
+            timeout = min(timeout, max(0, delayed[0][0] - time.time()))
+        readFds, writeFds, errFds = multi.fdset()
+        readable, _, _ = select.select(readFds + [self.wakeRead], writeFds, errFds, timeout)
+        if self.wakeRead in readable:
+            try:
+                while os.read(self.wakeRead, 1024):
+                    pass
+            except (BlockingIOError, OSError):
+                pass
+
+
+def mapFuture(future, func):
+    """
+    Return a Future for func applied to the result of future
+    """
+    mapped = Future()
+
+    def complete(done):
+        if done.cancelled():
+            mapped.cancel()
+            return
+        try:
+            mapped.set_result(func(done.result()))
+        except Exception as exc:
+            mapped.set_exception(exc)
+
+    future.add_done_callback(complete)
+    return mapped
+
+
+_CURL_ENGINE = None
+_CURL_ENGINE_LOCK = threading.Lock()
+
+
+def getCurlEngine(**kwargs):
+    """
+    Return the process wide CurlEngine, created with kwargs on first call
+    """
+    global _CURL_ENGINE
+    with _CURL_ENGINE_LOCK:
+        if _CURL_ENGINE is None or _CURL_ENGINE.closed:
+            _CURL_ENGINE = CurlEngine(**kwargs)
+        return _CURL_ENGINE
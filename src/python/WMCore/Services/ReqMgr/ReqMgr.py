@@ -195,6 +195,29 @@ class ReqMgr(Service):
         status["RequestName"] = request
         return self["requests"].put('request', status)[0]['result']
 
+    def updateRequestsStatus(self, transitions, chunkSize=100):
+        """
+        _updateRequestsStatus_
+
+        Performs status-only transitions of many requests, with one POST call
+        per chunk of requests. Each transition is validated on its own by the
+        server, thus a failed transition does not affect the rest of the chunk.
+
+        :param transitions: dictionary of {request name: new status}, or a list
+            of dictionaries with RequestName, RequestStatus and optional cascade keys
+        :param chunkSize: maximum number of transitions sent in a single call
+        :returns: dictionary of {request name: "OK" or "ERROR: reason"}
+        """
+        if isinstance(transitions, dict):
+            transitions = [{"RequestName": name, "RequestStatus": status}
+                           for name, status in viewitems(transitions)]
+        results = {}
+        for idx in range(0, len(transitions), chunkSize):
+            chunk = transitions[idx:idx + chunkSize]
+            for item in self["requests"].post('request/bulk_status', chunk)[0]['result']:
+                results.update(item)
+        return results
+
     def updateRequestStats(self, request, stats):
         """
         put initial stats for request
@@ -37,6 +37,7 @@ import traceback
 import types
 
 from urllib.parse import urlparse, urlencode
+from concurrent.futures import Future
 from io import BytesIO
 from http.client import HTTPException
 from json import JSONEncoder, JSONDecoder
@@ -52,6 +53,7 @@ from Utils.PortForward import portForward
 
 try:
     from WMCore.Services.pycurl_manager import RequestHandler, ResponseHeader
+    from WMCore.Services.CurlEngine import getCurlEngine
 except ImportError:
     pass
 
@@ -189,6 +191,45 @@ class Requests(dict):
         result = self.decodeResult(result, decoder)
         return result, response.status, response.reason, response.fromcache
 
+    def submitRequest(self, uri=None, data=None, verb='GET', incoming_headers=None,
+                      encoder=True, decoder=True, contentType=None, engine=None):
+        """
+        Asynchronous version of makeRequest: return a Future for the
+        (result, status, reason, fromcache) tuple, the request being run by
+        the given CurlEngine, or by the process wide one.
+        """
+        data = data or {}
+        incoming_headers = incoming_headers or {}
+        data, headers = self.encodeParams(data, verb, incoming_headers, encoder, contentType)
+        uri = self['host'] + uri
+
+        if not self.pycurl:
+            future = Future()
+            try:
+                result, response = self.makeRequest_httplib(uri, data, verb, headers)
+                future.set_result((self.decodeResult(result, decoder), response.status,
+                                   response.reason, response.fromcache))
+            except Exception as exc:
+                future.set_exception(exc)
+            return future
+
+        def parser(response, result):
+            return self.decodeResult(result, decoder), response.status, response.reason, response.fromcache
+
+        ckey, cert = self.getKeyCert()
+        headers["Accept-Encoding"] = "gzip,deflate,identity"
+        engine = engine or getCurlEngine()
+        return engine.submit(uri, data, headers, verb=verb, ckey=ckey, cert=cert,
+                             capath=self.getCAPath(), parser=parser)
+
+    def submitRequests(self, requests, engine=None):
+        """
+        Submit a batch of requests, each of them a dictionary with the
+        arguments of makeRequest, to run them concurrently.
+        :return: list of futures, in the order of the requests
+        """
+        return [self.submitRequest(engine=engine, **request) for request in requests]
+
     def makeRequest_pycurl(self, uri, data, verb, headers):
         """
         Make HTTP(s) request via pycurl library. Stay complaint with
@@ -535,6 +576,18 @@ class Requests(dict):
 
         return bres
 
+    def downloadRequest(self, uri, fileName, incoming_headers=None):
+        """
+        GET uri with the headers, credentials and curl options of makeRequest,
+        streaming the response body into fileName instead of returning it.
+        Return the response header.
+        """
+        _, headers = self.encodeParams({}, 'GET', incoming_headers or {}, False, None)
+        ckey, cert = self.getKeyCert()
+        capath = self.getCAPath()
+        return self.reqmgr.download(self['host'] + uri, fileName, headers,
+                                    ckey=ckey, cert=cert, capath=capath)
+
     def downloadFile(self, fileName, url):
         """
         Download a file with curl streaming it directly to disk
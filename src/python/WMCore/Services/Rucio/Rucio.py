@@ -11,15 +11,17 @@ from builtins import str, object
 from future.utils import viewitems, viewvalues
 
 from copy import deepcopy
+from concurrent.futures import ThreadPoolExecutor
 import json
 import logging
+import time
 
 from rucio.client import Client
 from rucio.common.exception import (AccountNotFound, DataIdentifierNotFound, AccessDenied, DuplicateRule,
                                     DataIdentifierAlreadyExists, DuplicateContent, InvalidRSEExpression,
                                     UnsupportedOperation, FileAlreadyExists, RuleNotFound, RSENotFound, RuleReplaceFailed)
-from Utils.MemoryCache import MemoryCache
 from Utils.IteratorTools import grouper
+from WMCore.Services.Rucio.RucioCache import CACHED_METHODS, callKey, getRucioCache, rucioCached
 from WMCore.Services.Rucio.RucioUtils import (validateMetaData, weightedChoice,
                                               isTapeRSE, dropTapeRSEs)
 from WMCore.WMException import WMException
@@ -63,12 +65,17 @@ class Rucio(object):
         :param acct: rucio account to be used
         :param hostUrl: defaults to the rucio config one
         :param authUrl: defaults to the rucio config one
-        :param configDict: dictionary with extra parameters
+        :param configDict: dictionary with extra parameters, among which:
+          * cacheExpiration: seconds to cache the RSE expressions resolution (default 12h)
+          * cacheTTLs: dictionary of seconds to cache the results of the read-only
+            methods decorated with rucioCached, by method name (default none)
         :param client: optional Rucio client to use (useful for mock-up)
         """
         configDict = configDict or {}
         # default RSE data caching to 12h
         rseCacheExpiration = configDict.pop('cacheExpiration', 12 * 60 * 60)
+        self.cacheTTLs = {"evaluateRSEExpression": rseCacheExpiration}
+        self.cacheTTLs.update(configDict.pop('cacheTTLs', {}))
         self.logger = configDict.pop("logger", logging.getLogger())
 
         self.rucioParams = deepcopy(configDict)
@@ -95,8 +102,100 @@ class Rucio(object):
                 clientParams[k] = getattr(self.cli, k)
             self.logger.info("Rucio client initialization parameters: %s", clientParams)
 
-        # keep a map of rse expression to RSE names mapped for some time
-        self.cachedRSEs = MemoryCache(rseCacheExpiration, {})
+        # read-through cache shared with the other objects using the same server and account,
+        # only data cached after the beginning of the current cycle is used (see newCycle)
+        self.cache = getRucioCache(self.rucioParams['rucio_host'], self.rucioParams['account'])
+        self.cache.maxAge = max([self.cache.maxAge] + list(self.cacheTTLs.values()))
+        self.cycleStart = 0
+        # hits and misses of this object in its current cycle, by method name
+        self.cacheCounters = {}
+
+    def newCycle(self):
+        """
+        _newCycle_
+
+        Start a new cycle: data cached before now will not be used anymore
+        by this object, while data cached from now on by any object sharing
+        the cache is used, within the TTL of each method. The methods which
+        are not cycle scoped (RSE expressions) keep using their older data.
+        The cache statistics of this object are reset.
+        """
+        self.cycleStart = time.time()
+        self.cacheCounters = {}
+        self.cache.expire()
+
+    def clearCache(self, methodName=None, name=None):
+        """
+        _clearCache_
+
+        Drop the cached results of a method, or of all of them, optionally
+        only for a given DID name
+        """
+        self.cache.invalidate(methodName, name)
+
+    def getCacheStats(self):
+        """
+        _getCacheStats_
+
+        Return the hits, misses and hit rate of the cached methods since the
+        beginning of the current cycle of this object, with the number of
+        entries of the (shared) cache
+        """
+        return self.cache.getStats(self.cacheCounters)
+
+    def prefillCache(self, methodName, result, *args, **kwargs):
+        """
+        _prefillCache_
+
+        Store the result of a call to a cached method, e.g. with data already
+        retrieved by a bulk query, such that the same call does not reach Rucio.
+        :param methodName: name of the cached method
+        :param result: result of the call
+        :param args/kwargs: arguments of the call
+        """
+        self.cache.put(methodName, callKey(CACHED_METHODS[methodName], args, kwargs), result)
+
+    def warmCache(self, methodName, callArgs, maxThreads=10):
+        """
+        _warmCache_
+
+        Call a cached method for a list of arguments, with up to maxThreads
+        concurrent calls, such that the following calls with the same arguments
+        are served from the cache.
+        :param methodName: name of the cached method
+        :param callArgs: list of arguments, either a dictionary of keyword
+            arguments or the (single) positional argument, e.g. a DID name
+        :return: list with the results of the calls, in the same order
+        """
+        method = getattr(self, methodName)
+
+        def call(item):
+            return method(**item) if isinstance(item, dict) else method(item)
+
+        with ThreadPoolExecutor(max_workers=maxThreads) as executor:
+            return list(executor.map(call, callArgs))
+
+    def _invalidateRules(self, names=None):
+        """
+        Drop the cached rules and data locations, of some DID names or all of them
+        """
+        if isinstance(names, str):
+            names = [names]
+        if names is not None:
+            # rules created on blocks also change the locations of their container
+            names = set(names) | set(name.split('#')[0] for name in names)
+        for methodName in ("listDataRules", "getContainerLockedAndAvailable"):
+            if names is None:
+                self.cache.invalidate(methodName)
+            for name in names or []:
+                self.cache.invalidate(methodName, name)
+
+    def _invalidateDID(self, name):
+        """
+        Drop the cached information and content of a DID name
+        """
+        for methodName in ("getDID", "getBlocksInContainer"):
+            self.cache.invalidate(methodName, name)
 
     def pingServer(self):
         """
@@ -161,6 +260,7 @@ class Rucio(object):
             self.logger.error("Failed to get account usage information from Rucio. Error: %s", str(ex))
         return res
 
+    @rucioCached
     def getBlocksInContainer(self, container, scope='cms'):
         """
         _getBlocksInContainer_
@@ -297,6 +397,7 @@ class Rucio(object):
         response = False
         if not validateMetaData(name, kwargs.get("meta", {}), logger=self.logger):
             return response
+        self._invalidateDID(name)
         try:
             # add_container(scope, name, statuses=None, meta=None, rules=None, lifetime=None)
             response = self.cli.add_container(scope, name, **kwargs)
@@ -333,6 +434,7 @@ class Rucio(object):
         response = False
         if not validateMetaData(name, kwargs.get("meta", {}), logger=self.logger):
             return response
+        self._invalidateDID(name)
         try:
             # add_dataset(scope, name, statuses=None, meta=None, rules=None, lifetime=None, files=None, rse=None)
             response = self.cli.add_dataset(scope, name, **kwargs)
@@ -363,6 +465,7 @@ class Rucio(object):
         """
         if not isinstance(dids, list):
             dids = [dids]
+        self._invalidateDID(superDID)
         # NOTE: the attaching dids do not create new container within a scope
         # and it is safe to use cms scope for it
         alldids = [{'scope': 'cms', 'name': did} for did in sorted(dids)]
@@ -444,6 +547,7 @@ class Rucio(object):
         :return: a boolean to represent whether it succeeded or not
         """
         response = False
+        self._invalidateDID(name)
         try:
             response = self.cli.close(scope, name)
         except UnsupportedOperation:
@@ -465,6 +569,7 @@ class Rucio(object):
         Please note, we made return type from this wrapper compatible with createReplicateRule
         """
         ruleIds = []
+        self._invalidateRules()
         try:
             rid = self.cli.move_replication_rule(ruleId, rseExpression, account)
             ruleIds.append(rid)
@@ -534,6 +639,7 @@ class Rucio(object):
         if not isinstance(names, (list, set)):
             names = [names]
         dids = [{'scope': scope, 'name': did} for did in names]
+        self._invalidateRules(names)
 
         response = []
         try:
@@ -621,6 +727,7 @@ class Rucio(object):
             self.logger.error("Exception listing content of: %s. Error: %s", name, str(ex))
         return list(res)
 
+    @rucioCached
     def listDataRules(self, name, **kwargs):
         """
         _listDataRules_
@@ -711,6 +818,7 @@ class Rucio(object):
                  any other Exception case is considered as failed.
         """
         status = True
+        self._invalidateRules()
         try:
             status = self.cli.update_replication_rule(ruleId, opts)
         except RuleNotFound:
@@ -730,6 +838,7 @@ class Rucio(object):
         :return: a boolean to represent whether it succeeded or not
         """
         res = True
+        self._invalidateRules()
         try:
             res = self.cli.delete_replication_rule(ruleId, purge_replicas=purgeReplicas)
         except RuleNotFound:
@@ -747,27 +856,30 @@ class Rucio(object):
         :param returnTape: boolean to also return Tape RSEs from the RSE expression result
         :return: a list of RSE names
         """
-        if self.cachedRSEs.isCacheExpired():
-            self.cachedRSEs.reset()
-        if useCache and rseExpr in self.cachedRSEs:
-            if returnTape:
-                return self.cachedRSEs[rseExpr]
-            return dropTapeRSEs(self.cachedRSEs[rseExpr])
-        else:
-            matchingRSEs = []
-            try:
-                for item in self.cli.list_rses(rseExpr):
-                    matchingRSEs.append(item['rse'])
-            except InvalidRSEExpression as exc:
-                msg = "Provided RSE expression is considered invalid: {}. Error: {}".format(rseExpr, str(exc))
-                raise WMRucioException(msg)
         if useCache:
-            # add this key/value pair to the cache
-            self.cachedRSEs.addItemToCache({rseExpr: matchingRSEs})
+            matchingRSEs = self._listRSEs(rseExpr)
+        else:
+            matchingRSEs = self._listRSEs.__wrapped__(self, rseExpr)
         if returnTape:
             return matchingRSEs
         return dropTapeRSEs(matchingRSEs)
 
+    @rucioCached(name="evaluateRSEExpression", cycleScoped=False)
+    def _listRSEs(self, rseExpr):
+        """
+        Resolve an RSE expression, cached under the evaluateRSEExpression name
+        :param rseExpr: an RSE expression
+        :return: a list of RSE names
+        """
+        matchingRSEs = []
+        try:
+            for item in self.cli.list_rses(rseExpr):
+                matchingRSEs.append(item['rse'])
+        except InvalidRSEExpression as exc:
+            msg = "Provided RSE expression is considered invalid: {}. Error: {}".format(rseExpr, str(exc))
+            raise WMRucioException(msg)
+        return matchingRSEs
+
     def pickRSE(self, rseExpression='rse_type=TAPE\cms_type=test', rseAttribute='dm_weight'):
         """
         _pickRSE_
@@ -827,6 +939,7 @@ class Rucio(object):
             raise WMRucioDIDNotFoundException(msg)
         return response['type'].upper() == 'CONTAINER'
 
+    @rucioCached
     def getDID(self, didName, dynamic=True, scope='cms'):
         """
         Retrieves basic information for a single data identifier.
@@ -1163,6 +1276,7 @@ class Rucio(object):
             finalRSEs = list(finalRSEs)
         return finalRSEs
 
+    @rucioCached
     def getContainerLockedAndAvailable(self, **kwargs):
         """
         This method retrieves all the locations where a given container DID is
@@ -1276,6 +1390,7 @@ class Rucio(object):
                          kwargs['name'], commonBlockRSEs, finalRSEs)
         return finalRSEs
 
+    @rucioCached
     def getRSEUsage(self, rse):
         """
         get_rse_usage rucio API
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+"""
+_RucioCache_
+
+Read-through cache for the read-only methods of the Rucio service class.
+
+The cache is shared by all the Rucio objects talking to the same Rucio
+server with the same account (e.g. the microservices running in the same
+process), while every Rucio object defines its own TTL for each cached
+method and its own cycle: data stored before the beginning of the current
+cycle of a Rucio object is never returned to it, such that every cycle of
+a microservice starts with fresh data, while sharing the lookups made by
+the other microservices during its cycle. Methods returning data which does
+not change within a cycle (e.g. the RSE expressions resolution) can opt out
+of the cycle cut-off and only rely on their TTL.
+"""
+
+from __future__ import division
+
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import Counter
+from copy import deepcopy
+
+
+class RucioCache(object):
+    """
+    _RucioCache_
+
+    Thread-safe cache of method results, keyed by method name and arguments
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}  # method name -> {arguments key: (result, time stored)}
+        self.maxAge = 0  # largest TTL of the Rucio objects using the cache
+
+    def get(self, method, key, ttl, notBefore=0, counter=None):
+        """
+        Return a (found, result) tuple for the method call, where the result
+        must have been stored less than ttl seconds ago and after notBefore.
+        The hits and misses are counted in counter, if given.
+        """
+        now = time.time()
+        counter = Counter() if counter is None else counter
+        with self.lock:
+            entry = self.entries.get(method, {}).get(key)
+            if entry is not None and entry[1] >= notBefore and now - entry[1] < ttl:
+                counter['hits'] += 1
+                return True, deepcopy(entry[0])
+            counter['misses'] += 1
+        return False, None
+
+    def put(self, method, key, result):
+        """
+        Store the result of a method call
+        """
+        with self.lock:
+            self.entries.setdefault(method, {})[key] = (deepcopy(result), time.time())
+
+    def invalidate(self, method=None, name=None):
+        """
+        Drop the results of a method, or of all of them, optionally only
+        the results of the calls made for a given DID name
+        """
+        with self.lock:
+            methods = [method] if method else list(self.entries)
+            for meth in methods:
+                if name is None:
+                    self.entries.pop(meth, None)
+                    continue
+                entries = self.entries.get(meth, {})
+                for key in [key for key in entries if name in key]:
+                    entries.pop(key)
+
+    def expire(self, maxAge=None):
+        """
+        Drop the results stored more than maxAge seconds ago, by default
+        the results no Rucio object can use anymore
+        """
+        oldest = time.time() - (self.maxAge if maxAge is None else maxAge)
+        with self.lock:
+            for entries in self.entries.values():
+                for key in [key for key, entry in entries.items() if entry[1] < oldest]:
+                    entries.pop(key)
+
+    def getStats(self, counters):
+        """
+        Return the number of hits, misses and entries, and the hit rate, by method
+        :param counters: dictionary of Counters of hits and misses, by method name
+        """
+        stats = {}
+        with self.lock:
+            for method, counter in list(counters.items()):
+                calls = counter['hits'] + counter['misses']
+                stats[method] = {'hits': counter['hits'], 'misses': counter['misses'],
+                                 'entries': len(self.entries.get(method, {})),
+                                 'hit_rate': round(counter['hits'] / calls, 3) if calls else 0.0}
+        return stats
+
+
+_CACHES = {}
+_CACHES_LOCK = threading.Lock()
+# cache name -> undecorated function, of all the methods decorated with rucioCached
+CACHED_METHODS = {}
+
+
+def getRucioCache(hostUrl, account):
+    """
+    Return the process wide cache of a Rucio server and account
+    """
+    with _CACHES_LOCK:
+        return _CACHES.setdefault((hostUrl, account), RucioCache())
+
+
+def callKey(func, args, kwargs):
+    """
+    Return a string identifying the arguments of a call to func, with the
+    default values applied, such that equivalent calls share the same key.
+    Note that the DID names are kept verbatim, for the invalidation by name.
+    """
+    bound = inspect.signature(func).bind(None, *args, **kwargs)
+    bound.apply_defaults()
+    arguments = dict(bound.arguments)
+    arguments.pop('self', None)
+    # flatten the **kwargs of methods like listDataRules
+    for argName, param in inspect.signature(func).parameters.items():
+        if param.kind == param.VAR_KEYWORD:
+            arguments.update(arguments.pop(argName, {}))
+    return json.dumps(arguments, sort_keys=True, default=str)
+
+
+def rucioCached(func=None, name=None, cycleScoped=True):
+    """
+    Decorator of the read-only methods of the Rucio class. The result of
+    a call is served from the cache of the Rucio object if it was stored
+    less than the method TTL ago and in its current cycle (or at any time,
+    if not cycleScoped), otherwise the method is called and its result stored.
+    Methods without a TTL (or with a TTL of 0) are not cached. Generators are
+    returned as lists. The TTLs and statistics use the method name, unless
+    name is given.
+    """
+    if func is None:
+        return functools.partial(rucioCached, name=name, cycleScoped=cycleScoped)
+    method = name or func.__name__
+    CACHED_METHODS[method] = func
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        ttl = self.cacheTTLs.get(method, 0)
+        if not ttl:
+            return func(self, *args, **kwargs)
+        key = callKey(func, args, kwargs)
+        found, result = self.cache.get(method, key, ttl, self.cycleStart if cycleScoped else 0,
+                                       self.cacheCounters.setdefault(method, Counter()))
+        if found:
+            return result
+        result = func(self, *args, **kwargs)
+        if inspect.isgenerator(result):
+            result = list(result)
+        self.cache.put(method, key, result)
+        return result
+
+    return wrapper
@@ -11,10 +11,12 @@ from future import standard_library
 
 from urllib.parse import urlencode
 
+import gzip
 import json
 import logging
+import os
 
-from WMCore.Services.Service import Service
+from WMCore.Services.Service import Service, cache_expired
 from Utils.Utilities import decodeBytesToUnicode
 
 
@@ -71,6 +73,9 @@ class RucioConMon(Service):
     def _getResultZipped(self, uri, callname="", clearCache=True):
         """
         This method retrieves gzipped content, instead of the standard json format.
+        The content is streamed in chunks from the HTTP response directly into the
+        cache file, and read back line by line, such that the memory used does not
+        depend on the size of the data.
         :param uri: The endpoint uri
         :param callname: alias for caller function
         :param clearCache: parameter to control the cache behavior
@@ -80,10 +85,25 @@ class RucioConMon(Service):
         if clearCache:
             self.clearCache(cachedApi)
 
-        with self.refreshCache(cachedApi, uri, decoder=False, binary=True) as istream:
+        cacheFile = self.cacheFileName(cachedApi)
+        if cache_expired(cacheFile, self["cacheduration"]):
+            self['logger'].debug('Streaming data from %s to %s', uri, cacheFile)
+            tmpFile = "%s.part" % cacheFile
+            try:
+                self["requests"].downloadRequest(uri, tmpFile)
+                os.rename(tmpFile, cacheFile)
+            finally:
+                if os.path.exists(tmpFile):
+                    os.remove(tmpFile)
+
+        with open(cacheFile, 'rb') as istream:
+            isGzipped = istream.read(2) == b'\x1f\x8b'
+        openFunc = gzip.open if isGzipped else open
+        with openFunc(cacheFile, 'rb') as istream:
             for line in istream:
                 line = decodeBytesToUnicode(line).replace("\n", "")
-                yield line
+                if line:
+                    yield line
 
     def getRSEStats(self):
         """
@@ -39,6 +39,16 @@ The Service class provides two layers of caching:
     service fails to respond the second layer cache will be used until the cache
     dies.
 
+On top of those, the content of the cache files is kept in a process wide,
+size bounded LRU memory cache (see ServiceCache), validated against the file
+modification time, such that cache hits do not read the file again. Set
+memcache to False to disable it. Concurrent threads refreshing the same cache
+file trigger a single request to the remote service. If staleduration (in
+hours) is set, an expired cache file younger than cacheduration + staleduration
+is still returned while it is refreshed in the background. The cache files of
+a cache path are kept below cachemaxsize bytes, the oldest ones being removed
+first.
+
 In tabular form:
 
 httplib2 cache  |   yes    |   yes    |    no    |     no     |
@@ -56,12 +66,14 @@ import datetime
 import json
 import logging
 import os
+import threading
 import time
 from io import BytesIO, StringIO
 from http.client import HTTPException
 
 from Utils.PythonVersion import PY3
 from WMCore.Services.Requests import Requests, JSONRequests
+from WMCore.Services.ServiceCache import getServiceMemoryCache, pruneCacheDir
 from WMCore.WMException import WMException
 
 try:
@@ -124,6 +136,9 @@ class Service(dict):
         # set up defaults
         self.setdefault("inputdata", {})
         self.setdefault("cacheduration", 0.5)
+        self.setdefault("staleduration", 0)
+        self.setdefault("memcache", True)
+        self.setdefault("cachemaxsize", 1024 ** 3)
         self.supportVerbList = ('GET', 'POST', 'PUT', 'DELETE')
         # this value should be only set when whole service class uses
         # the same verb ('GET', 'POST', 'PUT', 'DELETE')
@@ -214,6 +229,10 @@ class Service(dict):
 
         cachefile = self.cacheFileName(cachefile, verb, inputdata)
 
+        if openfile and self['memcache'] and not isfile(cachefile):
+            return self._refreshMemoryCache(cachefile, url, inputdata, incoming_headers,
+                                            encoder, decoder, verb, contentType, binary)
+
         if cache_expired(cachefile, self["cacheduration"]):
             self.getData(cachefile, url, inputdata, incoming_headers, encoder, decoder, verb, contentType, binary=binary)
         else:
@@ -227,6 +246,57 @@ class Service(dict):
         else:
             return cachefile
 
+    def _refreshMemoryCache(self, cachefile, url, inputdata, incoming_headers,
+                            encoder, decoder, verb, contentType, binary):
+        """
+        refreshCache through the memory cache: a single thread fetches an
+        expired cache file, while the others wait for it, or get the stale
+        content if it is within the stale duration. Return a file-like object.
+        """
+        memCache = getServiceMemoryCache()
+        getDataArgs = (cachefile, url, inputdata, incoming_headers, encoder, decoder, verb, contentType)
+
+        if cache_expired(cachefile, self["cacheduration"]):
+            stale = bool(self["staleduration"]) and os.path.exists(cachefile) and \
+                not cache_expired(cachefile, self["cacheduration"] + self["staleduration"])
+            event, leader = memCache.startFetch(cachefile)
+            if leader and stale:
+                self['logger'].debug('Returning stale data from %s while refreshing it', cachefile)
+                thread = threading.Thread(target=self._backgroundRefresh, args=(getDataArgs, binary))
+                thread.daemon = True
+                thread.start()
+            elif leader:
+                try:
+                    self.getData(*getDataArgs, binary=binary)
+                finally:
+                    memCache.endFetch(cachefile)
+            elif not stale:
+                event.wait()
+                if cache_expired(cachefile, self["cacheduration"]):
+                    # the other fetch failed, go through the regular error handling
+                    self.getData(*getDataArgs, binary=binary)
+            if stale:
+                memCache.count('stale_hits')
+        else:
+            self['logger'].debug('Data is from the Service cache')
+
+        content = memCache.get(cachefile, binary)
+        if content is None:
+            # vanished in between, let open raise the usual error
+            return open(cachefile, 'rb') if binary else open(cachefile, 'r', encoding='utf-8')
+        return BytesIO(content) if binary else StringIO(content)
+
+    def _backgroundRefresh(self, getDataArgs, binary):
+        """
+        Refresh a stale cache file, from a separate thread
+        """
+        try:
+            self.getData(*getDataArgs, binary=binary)
+        except Exception as ex:
+            self['logger'].warning('Background refresh of the cache file %s failed: %s', getDataArgs[0], str(ex))
+        finally:
+            getServiceMemoryCache().endFetch(getDataArgs[0])
+
     def forceRefresh(self, cachefile, url='', inputdata=None, openfile=True,
                      encoder=True, decoder=True, verb='GET',
                      contentType=None, incoming_headers=None, binary=False):
@@ -276,12 +346,36 @@ class Service(dict):
         verb = self._verbCheck(verb)
         os.system("/bin/rm -f %s/*" % self['requests']['req_cache_path'])
         cachefile = self.cacheFileName(cachefile, verb, inputdata)
+        getServiceMemoryCache().discard(cachefile)
         try:
             if not isfile(cachefile):
                 os.remove(cachefile)
         except OSError:  # File doesn't exist
             return
 
+    def _writeCacheFile(self, cachefile, data, binary):
+        """
+        _writeCacheFile_
+
+        Write the data to a temporary file, then move it in place of the
+        cache file, so that readers never see a truncated cache file.
+        """
+        tmpFile = cachefile + '.tmp'
+        if isinstance(data, (dict, list)) and not binary:
+            data = json.dumps(data)
+        try:
+            if binary:
+                with open(tmpFile, 'wb') as f:
+                    f.write(data)
+            else:
+                with open(tmpFile, 'w', encoding='utf-8') as f:
+                    f.write(data)
+            os.replace(tmpFile, cachefile)
+        except Exception:
+            if os.path.exists(tmpFile):
+                os.remove(tmpFile)
+            raise
+
     def getData(self, cachefile, url, inputdata=None, incoming_headers=None,
                 encoder=True, decoder=True,
                 verb='GET', contentType=None, force_refresh=False, binary=False):
@@ -331,16 +425,10 @@ class Service(dict):
                 if isfile(cachefile):
                     cachefile.write(data)
                     cachefile.seek(0, 0)  # return to beginning of file
-                elif binary:
-                    with open(cachefile, 'wb') as f:
-                        f.write(data)
-                elif isinstance(data, (dict, list)):
-                    with open(cachefile, 'w', encoding='utf-8') as f:
-                        f.write(json.dumps(data))
                 else:
-                    with open(cachefile, 'w', encoding='utf-8') as f:
-                        f.write(data)
-
+                    self._writeCacheFile(cachefile, data, binary)
+                    if self['cachemaxsize']:
+                        pruneCacheDir(self['cachepath'], self['cachemaxsize'])
 
         except (IOError, HttpLib2Error, HTTPException) as he:
             #
@@ -391,6 +479,31 @@ class Service(dict):
                     self['logger'].warning(msg)
                     raise he
 
+    def submitRequests(self, requests, engine=None):
+        """
+        Run a batch of requests concurrently, bypassing the Service cache.
+        Each request is a dictionary with the url key and, optionally, the
+        inputdata, incoming_headers, encoder, decoder, verb and contentType
+        keys of getData.
+
+        :param requests: list of request dictionaries
+        :param engine: CurlEngine running the requests, the process wide one if None
+        :return: list of futures for the response data, in the order of the requests
+        """
+        from WMCore.Services.CurlEngine import mapFuture
+        futures = []
+        for request in requests:
+            future = self["requests"].submitRequest(uri=request['url'],
+                                                    data=request.get('inputdata') or self["inputdata"],
+                                                    verb=self._verbCheck(request.get('verb', 'GET')),
+                                                    incoming_headers=request.get('incoming_headers'),
+                                                    encoder=request.get('encoder', True),
+                                                    decoder=request.get('decoder', True),
+                                                    contentType=request.get('contentType'),
+                                                    engine=engine)
+            futures.append(mapFuture(future, lambda response: response[0]))
+        return futures
+
     def _verbCheck(self, verb='GET'):
         if verb.upper() in self.supportVerbList:
             return verb.upper()
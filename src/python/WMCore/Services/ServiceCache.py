@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+"""
+_ServiceCache_
+
+In-process layer of the Service cache, in front of the cache files.
+
+The content of the cache files is kept in a thread-safe LRU cache bounded
+in number of entries and in size, and validated against the file
+modification time and size on every hit, such that files replaced or
+removed on disk are never served from memory. The cache also coalesces
+concurrent fetches of the same cache file into a single request to the
+remote service, and keeps hit/miss/eviction counters.
+
+pruneCacheDir bounds the size of the cache files of a directory, removing
+the least recently modified files first.
+"""
+
+from __future__ import division
+
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+
+
+class ServiceMemoryCache(object):
+    """
+    _ServiceMemoryCache_
+
+    Thread-safe LRU cache of cache file contents, keyed by (file name, binary)
+    """
+
+    def __init__(self, maxEntries=1000, maxBytes=256 * 1024 * 1024):
+        self.maxEntries = maxEntries
+        self.maxBytes = maxBytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (content, mtime, size)
+        self.totalBytes = 0
+        self.inflight = {}  # cache file name -> Event set once the fetch is over
+        self.stats = Counter()
+
+    def get(self, cachefile, binary):
+        """
+        Return the content of the cache file, from memory if it is up to
+        date, otherwise read from disk and kept. Return None if the file
+        does not exist.
+        """
+        key = (cachefile, binary)
+        try:
+            stat = os.stat(cachefile)
+        except OSError:
+            self.discard(cachefile)
+            return None
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1:] == (stat.st_mtime_ns, stat.st_size):
+                self.entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry[0]
+            self.stats['misses'] += 1
+        try:
+            with open(cachefile, 'rb') as fd:
+                stat = os.fstat(fd.fileno())
+                content = fd.read()
+            if not binary:
+                # same as reading the file in text mode, with universal newlines
+                content = content.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+        except (IOError, OSError, UnicodeDecodeError):
+            return None
+        self._put(key, content, stat.st_mtime_ns, stat.st_size)
+        return content
+
+    def _put(self, key, content, mtime, size):
+        """Add an entry, evicting the least recently used ones beyond the limits"""
+        if size > self.maxBytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.totalBytes -= old[2]
+            self.entries[key] = (content, mtime, size)
+            self.totalBytes += size
+            while self.entries and (len(self.entries) > self.maxEntries or self.totalBytes > self.maxBytes):
+                _, evicted = self.entries.popitem(last=False)
+                self.totalBytes -= evicted[2]
+                self.stats['evictions'] += 1
+
+    def discard(self, cachefile):
+        """Drop the entries of a cache file"""
+        with self.lock:
+            for binary in (False, True):
+                entry = self.entries.pop((cachefile, binary), None)
+                if entry is not None:
+                    self.totalBytes -= entry[2]
+
+    def startFetch(self, cachefile):
+        """
+        Register a fetch of the cache file. Return (event, True) if the caller
+        must fetch it and then call endFetch, or the event to wait for and
+        False if another thread is already fetching it.
+        """
+        with self.lock:
+            event = self.inflight.get(cachefile)
+            if event is not None:
+                self.stats['coalesced'] += 1
+                return event, False
+            event = self.inflight[cachefile] = threading.Event()
+            self.stats['fetches'] += 1
+            return event, True
+
+    def endFetch(self, cachefile):
+        """Signal the end of a fetch registered with startFetch"""
+        with self.lock:
+            event = self.inflight.pop(cachefile)
+        event.set()
+
+    def count(self, name, value=1):
+        """Increment a counter, e.g. stale_hits or disk_evictions"""
+        with self.lock:
+            self.stats[name] += value
+
+    def getStats(self):
+        """Return the counters, with the current number of entries and bytes"""
+        with self.lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self.entries)
+            stats['bytes'] = self.totalBytes
+        return stats
+
+    def clear(self):
+        """Drop all the entries"""
+        with self.lock:
+            self.entries.clear()
+            self.totalBytes = 0
+
+
+# names of the files written by Service.cacheFileName: <hash>_<verb>_<name>
+CACHE_FILE_RE = re.compile(r"^-?\d+_(GET|POST|PUT|DELETE)_")
+
+_MEMORY_CACHE = ServiceMemoryCache()
+_PRUNE_TIMES = {}
+_PRUNE_LOCK = threading.Lock()
+
+
+def getServiceMemoryCache():
+    """
+    Return the process wide memory cache shared by all the Service instances
+    """
+    return _MEMORY_CACHE
+
+
+def getServiceCacheStats():
+    """
+    Return the counters of the process wide memory cache
+    """
+    return _MEMORY_CACHE.getStats()
+
+
+def pruneCacheDir(cachepath, maxBytes, interval=60):
+    """
+    Remove the least recently modified cache files of the directory until
+    they hold less than maxBytes, at most once every interval seconds.
+    Return the number of files removed.
+    """
+    now = time.time()
+    with _PRUNE_LOCK:
+        if now - _PRUNE_TIMES.get(cachepath, 0) < interval:
+            return 0
+        _PRUNE_TIMES[cachepath] = now
+
+    files = []
+    totalBytes = 0
+    for entry in os.scandir(cachepath):
+        try:
+            # files being written are moved in place by their writer
+            if entry.name.endswith('.tmp') or not CACHE_FILE_RE.match(entry.name):
+                continue
+            if entry.is_file(follow_symlinks=False):
+                stat = entry.stat(follow_symlinks=False)
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+                totalBytes += stat.st_size
+        except OSError:
+            continue
+    removed = 0
+    files.sort()
+    for _, size, path in files:
+        if totalBytes <= maxBytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        _MEMORY_CACHE.discard(path)
+        totalBytes -= size
+        removed += 1
+    if removed:
+        _MEMORY_CACHE.count('disk_evictions', removed)
+    return removed
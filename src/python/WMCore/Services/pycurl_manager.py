@@ -53,10 +53,13 @@ import logging
 import os
 import re
 import subprocess
+import threading
+import time
 import pycurl
+from collections import Counter, deque
 from io import BytesIO
 import http.client
-from urllib.parse import urlencode
+from urllib.parse import urlencode, urlparse
 
 from Utils.Utilities import encodeUnicodeToBytes, decodeBytesToUnicode
 from Utils.PortForward import portForward, PortForward
@@ -170,6 +173,134 @@ class ResponseHeader(object):
                 return valHea
 
 
+class CurlPool(object):
+    """
+    Thread-safe pool of pycurl.Curl handles, kept per host such that their
+    connections can be reused (HTTP keep-alive). All the handles share
+    their DNS cache and SSL sessions through a CurlShare object, so that
+    a new handle to a known host resumes the TLS session.
+
+    At most maxSize idle handles are kept per host, and handles idle for
+    more than idleTimeout seconds are closed.
+    """
+
+    def __init__(self, maxSize=10, idleTimeout=300):
+        self.maxSize = maxSize
+        self.idleTimeout = idleTimeout
+        self.lock = threading.Lock()
+        self.stats = Counter()
+        self._init()
+
+    def _init(self):
+        """Create the share object and the idle handle queues"""
+        self.pid = os.getpid()
+        self.idle = {}
+        self.lastEviction = time.time()
+        self.share = pycurl.CurlShare()
+        for lockData in (pycurl.LOCK_DATA_DNS, pycurl.LOCK_DATA_SSL_SESSION):
+            self.share.setopt(pycurl.SH_SHARE, lockData)
+
+    @staticmethod
+    def hostKey(url):
+        """Return the pool key of an url, i.e. its scheme and network location"""
+        parsed = urlparse(url)
+        return parsed.scheme, parsed.netloc
+
+    def acquire(self, url):
+        """Return a Curl handle for the host of url, reusing an idle one if possible"""
+        key = self.hostKey(url)
+        now = time.time()
+        with self.lock:
+            if self.pid != os.getpid():
+                # forked: connections belong to the parent process, leave them alone
+                self.stats['forks'] += 1
+                self._init()
+            if now - self.lastEviction > self.idleTimeout:
+                self._evict(now)
+            handles = self.idle.get(key)
+            while handles:
+                curl, lastUsed = handles.pop()
+                if now - lastUsed < self.idleTimeout:
+                    self.stats['handles_reused'] += 1
+                    return curl
+                self.stats['handles_evicted'] += 1
+                curl.close()
+            self.stats['handles_new'] += 1
+        curl = pycurl.Curl()
+        curl.setopt(pycurl.SHARE, self.share)
+        return curl
+
+    def release(self, url, curl):
+        """Give back a Curl handle once its transfer is over"""
+        try:
+            newConnections = curl.getinfo(pycurl.NUM_CONNECTS)
+            # reset all the options, the connections and the share are kept
+            curl.reset()
+        except pycurl.error:
+            curl.close()
+            return
+        key = self.hostKey(url)
+        with self.lock:
+            if newConnections:
+                self.stats['connections_new'] += newConnections
+            else:
+                self.stats['connections_reused'] += 1
+            handles = self.idle.setdefault(key, deque())
+            if self.pid == os.getpid() and len(handles) < self.maxSize:
+                handles.append((curl, time.time()))
+                return
+            self.stats['handles_evicted'] += 1
+        curl.close()
+
+    def discard(self, curl):
+        """Close a handle which should not be reused, e.g. after a transport error"""
+        with self.lock:
+            self.stats['handles_discarded'] += 1
+        curl.close()
+
+    def _evict(self, now):
+        """Close the handles idle for too long, with the lock held"""
+        self.lastEviction = now
+        for key, handles in list(self.idle.items()):
+            while handles and now - handles[0][1] >= self.idleTimeout:
+                curl, _ = handles.popleft()
+                curl.close()
+                self.stats['handles_evicted'] += 1
+            if not handles:
+                del self.idle[key]
+
+    def getStats(self):
+        """Return the handle and connection reuse counters, and the number of idle handles"""
+        with self.lock:
+            stats = dict(self.stats)
+            stats['handles_idle'] = sum(len(handles) for handles in self.idle.values())
+        return stats
+
+    def close(self):
+        """Close all the idle handles"""
+        with self.lock:
+            for handles in self.idle.values():
+                for curl, _ in handles:
+                    curl.close()
+            self.idle = {}
+
+
+_CURL_POOLS = {}
+_CURL_POOLS_LOCK = threading.Lock()
+
+
+def getCurlPool(maxSize=10, idleTimeout=300):
+    """
+    Return the process wide CurlPool for the given size and idle timeout,
+    such that all the RequestHandler instances share their connections.
+    """
+    with _CURL_POOLS_LOCK:
+        key = (maxSize, idleTimeout)
+        if key not in _CURL_POOLS:
+            _CURL_POOLS[key] = CurlPool(maxSize, idleTimeout)
+        return _CURL_POOLS[key]
+
+
 class RequestHandler(object):
     """
     RequestHandler provides APIs to fetch single/multiple
@@ -187,6 +318,12 @@ class RequestHandler(object):
         self.followlocation = config.get('followlocation', defaultOpts['FOLLOWLOCATION'])
         self.maxredirs = config.get('maxredirs', defaultOpts['MAXREDIRS'])
         self.logger = logger if logger else logging.getLogger()
+        # keep-alive connections, through a pool of curl handles shared by all instances
+        if config.get('curl_pool', True):
+            self.curlPool = getCurlPool(config.get('curl_pool_size', 10),
+                                        config.get('curl_pool_idle_timeout', 300))
+        else:
+            self.curlPool = None
         self.tokenLocation = config.get('iam_token_file', '')
         if self.tokenLocation:
             self.tmgr = TokenManager(self.tokenLocation)
@@ -327,15 +464,48 @@ class RequestHandler(object):
         """
         return ResponseHeader(header)
 
+    def getCurl(self, url):
+        """Return a curl handle for url, from the pool if enabled"""
+        if self.curlPool:
+            return self.curlPool.acquire(url)
+        return pycurl.Curl()
+
+    def releaseCurl(self, url, curl):
+        """Give back a curl handle whose transfer completed"""
+        if self.curlPool:
+            self.curlPool.release(url, curl)
+        else:
+            curl.close()
+
+    def discardCurl(self, curl):
+        """Close a curl handle whose transfer failed"""
+        if self.curlPool:
+            self.curlPool.discard(curl)
+        else:
+            curl.close()
+
+    def getPoolStats(self):
+        """Return the curl pool counters, see CurlPool.getStats"""
+        return self.curlPool.getStats() if self.curlPool else {}
+
     @portForward(8443)
     def request(self, url, params, headers=None, verb='GET',
                 verbose=0, ckey=None, cert=None, capath=None,
                 doseq=True, encode=False, decode=False, cainfo=None, cookie=None):
         """Fetch data for given set of parameters"""
-        curl = pycurl.Curl()
+        curl = self.getCurl(url)
         bbuf, hbuf = self.set_opts(curl, url, params, headers, ckey, cert, capath,
                                    verbose, verb, doseq, encode, cainfo, cookie)
-        curl.perform()
+        try:
+            curl.perform()
+        except pycurl.error:
+            self.discardCurl(curl)
+            raise
+        if cookie and url in cookie:
+            # the cookie engine state survives a reset, do not share it
+            self.discardCurl(curl)
+        else:
+            self.releaseCurl(url, curl)
         if verbose:
             print(verb, url, params, headers)
         header = self.parse_header(hbuf.getvalue())
@@ -356,6 +526,34 @@ class RequestHandler(object):
         hbuf.flush()
         return header, data
 
+    @portForward(8443)
+    def download(self, url, fileName, headers=None, verbose=0,
+                 ckey=None, cert=None, capath=None, cainfo=None):
+        """
+        GET url with the same options and headers as request, streaming the
+        (decompressed) body into fileName instead of memory. Return the
+        response header, raise the same exception as request on HTTP errors.
+        """
+        curl = self.getCurl(url)
+        _, hbuf = self.set_opts(curl, url, None, headers, ckey, cert, capath,
+                                verbose, cainfo=cainfo)
+        # let curl decode the gzip content encoding requested by set_opts
+        curl.setopt(pycurl.ENCODING, "gzip")
+        with open(fileName, 'wb') as fd:
+            curl.setopt(pycurl.WRITEFUNCTION, fd.write)
+            try:
+                curl.perform()
+            except pycurl.error:
+                self.discardCurl(curl)
+                raise
+        self.releaseCurl(url, curl)
+        header = self.parse_header(hbuf.getvalue())
+        if header.status >= 300:
+            with open(fileName, 'rb') as fd:
+                data = fd.read(4096)
+            raise getException(url, None, headers, header, data)
+        return header
+
     def getdata(self, url, params, headers=None, verb='GET',
                 verbose=0, ckey=None, cert=None, doseq=True,
                 encode=False, decode=False, cookie=None):
@@ -372,6 +570,79 @@ class RequestHandler(object):
                                  verbose, ckey, cert, doseq=doseq)
         return header
 
+    def streamRequests(self, requests, maxInFlight=4, ckey=None, cert=None,
+                       capath=None, cainfo=None, decode=False):
+        """
+        Perform a sequence of requests with a CurlMulti object, keeping up to
+        maxInFlight of them running at the same time. Requests are taken lazily
+        from the requests iterable, each of them being a dictionary with the
+        url, params, headers, verb and (optional) encode keys.
+
+        Yield a (index, header, data, exception) tuple for each request, in
+        completion order, where index is the position of the request in the
+        input sequence and exception is None for successful requests. HTTP
+        errors are returned as the exceptions raised by the request method,
+        transport errors as pycurl.error.
+        """
+        portForwarder = PortForward(8443)
+        requests = enumerate(requests)
+        multi = pycurl.CurlMulti()
+        active = {}
+
+        def addRequest():
+            """Add the next request to the multi handle, return False when there is none left"""
+            for idx, req in requests:
+                url = portForwarder(req['url'])
+                curl = self.getCurl(url)
+                bbuf, hbuf = self.set_opts(curl, url, req.get('params'), req.get('headers'),
+                                           ckey=ckey, cert=cert, capath=capath, verb=req.get('verb', 'GET'),
+                                           encode=req.get('encode', False), cainfo=cainfo)
+                multi.add_handle(curl)
+                active[curl] = (idx, url, req, bbuf, hbuf)
+                return True
+            return False
+
+        try:
+            while len(active) < maxInFlight and addRequest():
+                pass
+            while active:
+                while True:
+                    ret, _ = multi.perform()
+                    if ret != pycurl.E_CALL_MULTI_PERFORM:
+                        break
+                finished = []
+                while True:
+                    numQueued, okList, errList = multi.info_read()
+                    finished.extend((curl, None) for curl in okList)
+                    finished.extend((curl, pycurl.error(errno, errmsg)) for curl, errno, errmsg in errList)
+                    if not numQueued:
+                        break
+                if not finished:
+                    multi.select(1.0)
+                    continue
+                for curl, exc in finished:
+                    multi.remove_handle(curl)
+                    idx, url, req, bbuf, hbuf = active.pop(curl)
+                    if exc is None:
+                        self.releaseCurl(url, curl)
+                    else:
+                        self.discardCurl(curl)
+                    header = data = None
+                    if exc is None:
+                        header = self.parse_header(hbuf.getvalue())
+                        data = decompress(bbuf.getvalue(), header.header)
+                        if header.status < 300:
+                            data = '' if req.get('verb') == 'HEAD' else self.parse_body(data, decode)
+                        else:
+                            exc = getException(url, req.get('params'), req.get('headers'), header, data)
+                    yield idx, header, data, exc
+                    addRequest()
+        finally:
+            for curl in active:
+                multi.remove_handle(curl)
+                self.discardCurl(curl)
+            multi.close()
+
     @portForward(8443)
     def multirequest(self, url, parray, headers=None, verb='GET',
                      ckey=None, cert=None, verbose=None, cookie=None,
@@ -473,7 +744,7 @@ def getdata(urls, ckey, cert, headers=None, options=None, num_conn=50, cookie=No
     portForwarder = PortForward(8443)
 
     # Make a queue with urls
-    queue = [portForwarder(u) for u in urls if validate_url(u)]
+    queue = deque(portForwarder(u) for u in urls if validate_url(u))
 
     # Check args
     num_urls = len(queue)
@@ -501,7 +772,7 @@ def getdata(urls, ckey, cert, headers=None, options=None, num_conn=50, cookie=No
         # If there is an url to process and a free curl object,
         # add to multi-stack
         while queue and freelist:
-            url = queue.pop(0)
+            url = queue.popleft()
             curl = freelist.pop()
             curl.setopt(pycurl.URL, url.encode('ascii', 'ignore'))
             if cookie and url in cookie:
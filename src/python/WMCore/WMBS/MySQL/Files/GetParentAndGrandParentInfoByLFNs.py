@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+"""
+_GetParentAndGrandParentInfoByLFNs_
+
+Same as Files.GetParentAndGrandParentInfo, but for many child files in a
+single query per chunk of LFNs, thus it also returns the child LFN.
+"""
+from __future__ import division
+
+from Utils.IteratorTools import grouper
+from WMCore.Database.DBFormatter import DBFormatter
+
+
+class GetParentAndGrandParentInfoByLFNs(DBFormatter):
+    # the IN list must not exceed 1000 elements in Oracle
+    maxLFNsPerQuery = 500
+
+    sql = """SELECT wfd.lfn AS child_lfn, wfp.id, wfp.lfn, wfp.merged,
+                    wfgp.lfn AS gplfn, wfgp.merged AS gpmerged
+             FROM wmbs_file_details wfp
+             INNER JOIN wmbs_file_parent wfpa ON wfpa.parent = wfp.id
+             INNER JOIN wmbs_file_details wfd ON wfd.id = wfpa.child
+             LEFT OUTER JOIN wmbs_file_parent wfpb ON wfpb.child = wfp.id
+             LEFT OUTER JOIN wmbs_file_details wfgp ON wfgp.id = wfpb.parent
+             WHERE wfd.lfn IN (%s)
+    """
+
+    def execute(self, childLFNs, conn=None, transaction=False):
+        results = []
+        for lfnChunk in grouper(childLFNs, self.maxLFNsPerQuery):
+            binds = {"child_lfn_%d" % idx: lfn for idx, lfn in enumerate(lfnChunk)}
+            sql = self.sql % ", ".join(":%s" % key for key in binds)
+            result = self.dbi.processData(sql, binds, conn=conn, transaction=transaction)
+            results.extend(self.formatDict(result))
+        return results
@@ -28,6 +28,8 @@ class GetAllJobs(DBFormatter):
                           WHERE wmbs_job_state.name = :state
                           AND wmbs_sub_types.name = :type"""
 
+    state_time_sql = " AND state_time >= :state_time"
+
     limit_sql = " limit %d"
 
     def format(self, results):
@@ -48,12 +50,13 @@ class GetAllJobs(DBFormatter):
             return final
 
     def execute(self, state=None, jobType=None, conn=None,
-                transaction=False, limitRows=None):
+                transaction=False, limitRows=None, minStateTime=None):
         """
         _execute_
 
         Execute the SQL for the given job ID and then format and return
-        the result.
+        the result. With a state, minStateTime only lists the jobs which
+        entered that state since then.
         """
         if limitRows:
             extraSql = self.limit_sql % limitRows
@@ -67,6 +70,10 @@ class GetAllJobs(DBFormatter):
             if jobType:
                 result = self.dbi.processData(self.sql_state_type + extraSql, {'state': state.lower(), 'type': jobType},
                                               conn=conn, transaction=transaction)
+            elif minStateTime is not None:
+                result = self.dbi.processData(self.sql_state + self.state_time_sql + extraSql,
+                                              {'state': state.lower(), 'state_time': int(minStateTime)},
+                                              conn=conn, transaction=transaction)
             else:
                 result = self.dbi.processData(self.sql_state + extraSql, {'state': state.lower()},
                                               conn=conn, transaction=transaction)
@@ -14,6 +14,7 @@ class ListForSubmitter(DBFormatter):
 
     List the available jobs in WMBS order by descending subscription priority,
     descending workflow priority, and ascending workflow ID.
+    Optionally, only list jobs which entered the created state since minStateTime.
     """
     sql = """SELECT wmbs_job.id AS id,
                     wmbs_job.name AS name,
@@ -36,7 +37,7 @@ class ListForSubmitter(DBFormatter):
                  wmbs_job.state = wmbs_job_state.id
                INNER JOIN wmbs_workflow ON
                  wmbs_subscription.workflow = wmbs_workflow.id
-             WHERE wmbs_job_state.name = 'created'
+             WHERE wmbs_job_state.name = 'created' %s
              ORDER BY
                wmbs_sub_types.priority DESC,
                wmbs_workflow.priority DESC,
@@ -44,12 +45,21 @@ class ListForSubmitter(DBFormatter):
 
     limit_sql = " limit %d"
 
-    def execute(self, conn=None, transaction=False, limitRows=None):
+    state_time_sql = "AND wmbs_job.state_time >= :state_time"
+
+    def execute(self, conn=None, transaction=False, limitRows=None, minStateTime=None):
         if limitRows:
             extraSql = self.limit_sql % limitRows
         else:
             extraSql = ""
 
-        result = self.dbi.processData(self.sql + extraSql, conn=conn,
+        if minStateTime is not None:
+            sql = self.sql % self.state_time_sql
+            binds = {"state_time": int(minStateTime)}
+        else:
+            sql = self.sql % ""
+            binds = {}
+
+        result = self.dbi.processData(sql + extraSql, binds, conn=conn,
                                       transaction=transaction)
         return self.formatDict(result)
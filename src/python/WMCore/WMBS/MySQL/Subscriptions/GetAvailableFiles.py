@@ -25,23 +25,25 @@ class GetAvailableFiles(DBFormatter):
         method turns everything into strings.  Also, fixup the results of the
         Oracle query by renaming 'fileid' to file.
         """
-        formattedResults = DBFormatter.formatDict(self, results)
+        return self.groupLocations(DBFormatter.formatDict(self, results))
 
-        for formattedResult in formattedResults:
-            if "file" in formattedResult:
-                formattedResult["file"] = int(formattedResult["file"])
-            else:
-                formattedResult["file"] = int(formattedResult["fileid"])
+    def groupLocations(self, formattedResults):
+        """
+        _groupLocations_
 
-        # Now the tricky part
+        Group the locations of each file, given an iterable of result
+        dictionaries, which can be a generator over a streamed result.
+        """
         tempResults = {}
         for formattedResult in formattedResults:
-            fileID = formattedResult['file']
-            if fileID not in tempResults:
-                tempResults[fileID] = []
+            if "file" in formattedResult:
+                fileID = int(formattedResult["file"])
+            else:
+                fileID = int(formattedResult["fileid"])
+            locations = tempResults.setdefault(fileID, [])
             if "pnn" in formattedResult:
-                if not formattedResult['pnn'] in tempResults[fileID]:
-                    tempResults[fileID].append(formattedResult["pnn"])
+                if not formattedResult['pnn'] in locations:
+                    locations.append(formattedResult["pnn"])
 
         finalResults = []
         for key in tempResults:
@@ -58,6 +60,8 @@ class GetAvailableFiles(DBFormatter):
                                         conn=conn, transaction=transaction,
                                         returnCursor=returnCursor)
 
+        # stream the rows, subscriptions can have millions of available files
         results = self.dbi.processData(self.sql, {"subscription": subscription},
-                                       conn=conn, transaction=transaction)
-        return self.formatDict(results)
+                                       conn=conn, transaction=transaction,
+                                       fetchMode='stream')
+        return self.groupLocations(self.iterFormatDict(results))
@@ -0,0 +1,14 @@
+#!/usr/bin/env python
+"""
+_GetParentAndGrandParentInfoByLFNs_
+
+Oracle implementation of Files.GetParentAndGrandParentInfoByLFNs
+"""
+from __future__ import division
+
+from WMCore.WMBS.MySQL.Files.GetParentAndGrandParentInfoByLFNs import \
+    GetParentAndGrandParentInfoByLFNs as GetParentAndGrandParentInfoByLFNsMySQL
+
+
+class GetParentAndGrandParentInfoByLFNs(GetParentAndGrandParentInfoByLFNsMySQL):
+    pass
@@ -31,7 +31,7 @@ class ListForSubmitter(MySQLListForSubmitter):
                  wmbs_job.state = wmbs_job_state.id
                INNER JOIN wmbs_workflow ON
                  wmbs_subscription.workflow = wmbs_workflow.id
-               WHERE wmbs_job_state.name = 'created'
+               WHERE wmbs_job_state.name = 'created' %s
                ORDER BY
                  wmbs_sub_types.priority DESC,
                  wmbs_workflow.priority DESC,
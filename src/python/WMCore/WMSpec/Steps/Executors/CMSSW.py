@@ -313,7 +313,7 @@ class CMSSW(Executor):
             argsDump = {'arguments': args}
             msg = "Error running cmsRun\n%s\n" % argsDump
             try:
-                self.report.parse(jobReportXML, stepName=self.stepName)
+                self.report.parse(jobReportXML, stepName=self.stepName, streaming=True)
                 (returnCode, returnMessage) = self.report.getStepExitCodeAndMessage(stepName=self.stepName)
                 msg += "CMSSW Return code: %s\n" % returnCode
             except Exception as ex:
@@ -329,7 +329,7 @@ class CMSSW(Executor):
 
         try:
             # parse job report XML
-            self.report.parse(jobReportXML, stepName=self.stepName)
+            self.report.parse(jobReportXML, stepName=self.stepName, streaming=True)
         except Exception as ex:
             msg = WM_JOB_ERROR_CODES[50115]
             msg += "\nDetails: %s" % str(ex)
@@ -1160,7 +1160,8 @@ class WMTaskHelper(TreeHelper):
                                      errorDetails="Failed to find a step report for %s!" % taskStep)
 
         finalReport.data.completed = True
-        finalReport.persist(reportName)
+        # the agent loads the final report lazily, decoding only the sections it needs
+        finalReport.persist(reportName, compact=True)
 
         return finalReport
 
@@ -1,6 +1,7 @@
 from __future__ import (division, print_function)
 
 import time
+from Utils.IteratorTools import grouper
 from WMCore.REST.CherryPyPeriodicTask import CherryPyPeriodicTask
 from WMCore.WMStats.DataStructs.DataCache import DataCache
 from WMCore.Services.WMStats.WMStatsReader import WMStatsReader
@@ -11,6 +12,13 @@ class DataCacheUpdate(CherryPyPeriodicTask):
 
     def __init__(self, rest, config):
         self.getJobInfo = getattr(config, "getJobInfo", False)
+        # the cache is fully reloaded with this period, and updated from the
+        # CouchDB changes feeds of ReqMgr and WMStats in between
+        self.fullReloadDuration = getattr(config, "dataCacheFullReloadDuration", 6 * 3600)
+        self.changesLimit = getattr(config, "dataCacheChangesLimit", 10000)
+        self.lastFullReload = 0
+        self.reqmgrSeq = None
+        self.wmstatsSeq = None
 
         super(DataCacheUpdate, self).__init__(config)
 
@@ -28,18 +36,97 @@ class DataCacheUpdate(CherryPyPeriodicTask):
         self.logger.info("Starting gatherActiveDataStats with jobInfo set to: %s", self.getJobInfo)
         try:
             tStart = time.time()
-            if DataCache.islatestJobDataExpired():
-                wmstatsDB = WMStatsReader(config.wmstats_url, reqdbURL=config.reqmgrdb_url,
-                                          reqdbCouchApp="ReqMgr", logger=self.logger)
-                self.logger.info("Getting active data with job info for statuses: %s", WMSTATS_JOB_INFO)
-                jobData = wmstatsDB.getActiveData(WMSTATS_JOB_INFO, jobInfoFlag=self.getJobInfo)
-                self.logger.info("Getting active data with NO job info for statuses: %s", WMSTATS_NO_JOB_INFO)
-                tempData = wmstatsDB.getActiveData(WMSTATS_NO_JOB_INFO, jobInfoFlag=False)
-                jobData.update(tempData)
-                self.logger.info("Running setlatestJobData...")
-                DataCache.setlatestJobData(jobData)
-                self.logger.info("DataCache is up-to-date with %d requests data", len(jobData))
+            wmstatsDB = WMStatsReader(config.wmstats_url, reqdbURL=config.reqmgrdb_url,
+                                      reqdbCouchApp="ReqMgr", logger=self.logger)
+            if self.reqmgrSeq is None or DataCache.isEmpty() or \
+                    time.time() - self.lastFullReload > self.fullReloadDuration:
+                self.loadActiveData(wmstatsDB)
+            else:
+                self.updateActiveData(wmstatsDB)
         except Exception as ex:
             self.logger.exception("Exception updating DataCache. Error: %s", str(ex))
         self.logger.info("Total time loading data from ReqMgr2 and WMStats: %s", time.time() - tStart)
         return
+
+    def loadActiveData(self, wmstatsDB):
+        """
+        Load all the active requests in the cache
+        """
+        # take the changes sequences first: changes happening while loading
+        # the data will be applied (again) by the next incremental update
+        reqmgrSeq = wmstatsDB.getRequestDBInstance().getDBInstance().changesSince('now')['last_seq']
+        wmstatsSeq = None
+        if self.getJobInfo:
+            wmstatsSeq = wmstatsDB.getDBInstance().changesSince('now')['last_seq']
+
+        self.logger.info("Getting active data with job info for statuses: %s", WMSTATS_JOB_INFO)
+        jobData = wmstatsDB.getActiveData(WMSTATS_JOB_INFO, jobInfoFlag=self.getJobInfo)
+        self.logger.info("Getting active data with NO job info for statuses: %s", WMSTATS_NO_JOB_INFO)
+        tempData = wmstatsDB.getActiveData(WMSTATS_NO_JOB_INFO, jobInfoFlag=False)
+        jobData.update(tempData)
+        self.logger.info("Running setlatestJobData...")
+        DataCache.setlatestJobData(jobData)
+        self.reqmgrSeq, self.wmstatsSeq = reqmgrSeq, wmstatsSeq
+        self.lastFullReload = time.time()
+        self.logger.info("DataCache is up-to-date with %d requests data", len(jobData))
+
+    def updateActiveData(self, wmstatsDB):
+        """
+        Update the cache with the requests and the agent job information
+        changed since the last update
+        """
+        reqDB = wmstatsDB.getRequestDBInstance()
+        changes, reqmgrSeq = self.readChanges(reqDB.getDBInstance(), self.reqmgrSeq)
+        removed = set(docId for docId, deleted, _ in changes if deleted)
+        requestNames = set(docId for docId, deleted, _ in changes
+                           if not deleted and not docId.startswith("_design/"))
+
+        cachedData = DataCache.getlatestJobData()
+        updated = {}
+        missingJobInfo = {}
+        for namesSlice in grouper(requestNames, 1000):
+            for reqName, reqDict in reqDB.getRequestByNames(namesSlice, True).items():
+                status = reqDict.get("RequestStatus")
+                if status in WMSTATS_NO_JOB_INFO:
+                    updated[reqName] = reqDict
+                elif status in WMSTATS_JOB_INFO:
+                    updated[reqName] = reqDict
+                    if not self.getJobInfo:
+                        continue
+                    if "AgentJobInfo" in cachedData.get(reqName, {}):
+                        reqDict["AgentJobInfo"] = cachedData[reqName]["AgentJobInfo"]
+                    else:
+                        missingJobInfo[reqName] = reqDict
+                else:
+                    removed.add(reqName)
+        if missingJobInfo:
+            # requests just moved to a status with job information
+            wmstatsDB._updateRequestInfoWithJobInfo(missingJobInfo)
+        DataCache.updateRequests(updated, removed)
+        self.reqmgrSeq = reqmgrSeq
+        self.logger.info("DataCache updated with %d changed and %d removed requests",
+                         len(updated), len(removed))
+
+        if self.getJobInfo:
+            changes, wmstatsSeq = self.readChanges(wmstatsDB.getDBInstance(), self.wmstatsSeq,
+                                                   includeDocs=True)
+            jobDocs = [doc for _, deleted, doc in changes
+                       if not deleted and doc and doc.get("type") == "agent_request"]
+            deletedIDs = [docId for docId, deleted, _ in changes if deleted]
+            DataCache.updateJobInfo(jobDocs, deletedIDs)
+            self.wmstatsSeq = wmstatsSeq
+            self.logger.info("DataCache updated with %d agent job documents", len(jobDocs))
+
+    def readChanges(self, couchDB, since, includeDocs=False):
+        """
+        Read the changes feed of a database since the given sequence.
+        Return a list of (document id, deleted flag, document) and the last sequence
+        """
+        changes = []
+        while True:
+            data = couchDB.changesSince(since, includeDocs=includeDocs, limit=self.changesLimit)
+            for row in data['results']:
+                changes.append((row['id'], row.get('deleted', False), row.get('doc')))
+            since = data['last_seq']
+            if len(data['results']) < self.changesLimit:
+                return changes, since
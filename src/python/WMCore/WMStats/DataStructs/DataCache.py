@@ -1,8 +1,39 @@
 from builtins import object, str, bytes
 from future.utils import viewitems
 
+import threading
 import time
 from WMCore.ReqMgr.DataStructs.Request import RequestInfo, protectedLFNs
+from WMCore.ReqMgr.DataStructs.RequestStatus import WMSTATS_JOB_INFO
+
+# request properties with an inverted index (value -> request names), used to
+# narrow down the requests matching a filter before running andFilterCheck
+INDEXED_FIELDS = ("RequestStatus", "RequestType", "SubRequestType", "Campaign", "Team", "Teams",
+                  "InputDataset", "PrepID", "Requestor", "Group")
+# index key of the requests whose property value cannot be indexed (e.g. a dict),
+# they are candidates for any filter on that property
+_UNHASHABLE = ("__unhashable__",)
+
+
+def indexValues(reqInfo, field):
+    """
+    Return the values of a request property as seen by andFilterCheck,
+    i.e. all the elements of list values, to be used as index keys
+    """
+    value = reqInfo.get(field)
+    if value is None:
+        return []
+    if not isinstance(value, (list, set, tuple)):
+        value = [value]
+    values = []
+    for item in value:
+        try:
+            hash(item)
+            values.append(item)
+        except TypeError:
+            values.append(_UNHASHABLE)
+    return values
+
 
 class DataCache(object):
     # TODO: need to change to  store in  db instead of storing in the memory
@@ -10,6 +41,13 @@ class DataCache(object):
     # from each server.
     _duration = 300  # 5 minitues
     _lastedActiveDataFromAgent = {}
+    # field -> value -> set of request names, always changed with the _lock held.
+    # The request data dictionary is never changed in place but replaced,
+    # such that readers can iterate over it without holding the lock
+    _index = {}
+    _indexedValues = {}  # request name -> {field: values}, to remove a request from the index
+    _jobDocs = {}  # agent_request document id -> (request name, agent url)
+    _lock = threading.RLock()
 
     @staticmethod
     def getDuration():
@@ -33,8 +71,15 @@ class DataCache(object):
 
     @staticmethod
     def setlatestJobData(jobData):
-        DataCache._lastedActiveDataFromAgent["time"] = int(time.time())
-        DataCache._lastedActiveDataFromAgent["data"] = jobData
+        with DataCache._lock:
+            DataCache._index = {}
+            DataCache._indexedValues = {}
+            DataCache._jobDocs = {}
+            if isinstance(jobData, dict):
+                for reqName, reqDict in viewitems(jobData):
+                    DataCache._indexRequest(reqName, reqDict)
+            DataCache._lastedActiveDataFromAgent["time"] = int(time.time())
+            DataCache._lastedActiveDataFromAgent["data"] = jobData
 
     @staticmethod
     def islatestJobDataExpired():
@@ -46,42 +91,155 @@ class DataCache(object):
         return False
 
     @staticmethod
-    def filterData(filterDict, maskList):
-        reqData = DataCache.getlatestJobData()
+    def updateRequests(requests, removed=None):
+        """
+        Incremental update of the cache: add or replace the requests of the
+        requests dictionary (request name -> request data) and remove the
+        requests named in removed
+        """
+        with DataCache._lock:
+            jobData = dict(DataCache.getlatestJobData())
+            for reqName in removed or []:
+                if jobData.pop(reqName, None) is not None:
+                    DataCache._unindexRequest(reqName)
+            for reqName, reqDict in viewitems(requests):
+                if reqName in jobData:
+                    DataCache._unindexRequest(reqName)
+                jobData[reqName] = reqDict
+                DataCache._indexRequest(reqName, reqDict)
+            DataCache._lastedActiveDataFromAgent["time"] = int(time.time())
+            DataCache._lastedActiveDataFromAgent["data"] = jobData
 
-        for _, reqInfo in viewitems(reqData):
-            reqData = RequestInfo(reqInfo)
-            if reqData.andFilterCheck(filterDict):
-                for prop in maskList:
-                    result = reqData.get(prop, [])
+    @staticmethod
+    def updateJobInfo(jobDocs, deletedIDs=None):
+        """
+        Incremental update of the AgentJobInfo of the cached requests, with the
+        agent_request documents of WMStats and the ids of the deleted ones.
+        Documents of requests not in the cache, or in a status without job
+        information (as for a full reload, see WMSTATS_JOB_INFO), are ignored.
+        """
+        with DataCache._lock:
+            jobData = DataCache.getlatestJobData()
+            updated = {}
+            for docID in deletedIDs or []:
+                reqName, agentUrl = DataCache._jobDocs.pop(docID, (None, None))
+                reqDict = updated.get(reqName, jobData.get(reqName))
+                if reqDict is not None and agentUrl in reqDict.get("AgentJobInfo", {}):
+                    reqDict = dict(reqDict)
+                    reqDict["AgentJobInfo"] = dict(reqDict["AgentJobInfo"])
+                    del reqDict["AgentJobInfo"][agentUrl]
+                    updated[reqName] = reqDict
+            for doc in jobDocs:
+                reqName = doc["workflow"]
+                reqDict = updated.get(reqName, jobData.get(reqName))
+                if reqDict is None or reqDict.get("RequestStatus") not in WMSTATS_JOB_INFO:
+                    continue
+                reqDict = dict(reqDict)
+                reqDict["AgentJobInfo"] = dict(reqDict.get("AgentJobInfo", {}))
+                reqDict["AgentJobInfo"][doc["agent_url"]] = doc
+                updated[reqName] = reqDict
+            if updated:
+                DataCache.updateRequests(updated)
 
-                    if isinstance(result, list):
-                        for value in result:
-                            yield value
-                    elif result is not None and result != "":
-                        yield result
+    @staticmethod
+    def _indexRequest(reqName, reqDict):
+        reqInfo = RequestInfo(reqDict)
+        indexed = {}
+        for field in INDEXED_FIELDS:
+            values = indexValues(reqInfo, field)
+            if values:
+                fieldIndex = DataCache._index.setdefault(field, {})
+                for value in values:
+                    fieldIndex.setdefault(value, set()).add(reqName)
+                indexed[field] = values
+        DataCache._indexedValues[reqName] = indexed
+        for agentUrl, jobDoc in viewitems(reqDict.get("AgentJobInfo") or {}):
+            if isinstance(jobDoc, dict) and "_id" in jobDoc:
+                DataCache._jobDocs[jobDoc["_id"]] = (reqName, agentUrl)
 
     @staticmethod
-    def filterDataByRequest(filterDict, maskList=None):
-        reqData = DataCache.getlatestJobData()
+    def _unindexRequest(reqName):
+        for field, values in viewitems(DataCache._indexedValues.pop(reqName, {})):
+            fieldIndex = DataCache._index[field]
+            for value in values:
+                names = fieldIndex.get(value)
+                if names is not None:
+                    names.discard(reqName)
+                    if not names:
+                        del fieldIndex[value]
+
+    @staticmethod
+    def _candidates(filterDict):
+        """
+        Return the names of the requests which can match the filter, according
+        to the indexes, or None if the filter has no indexed property
+        """
+        candidates = None
+        for key, value in viewitems(filterDict):
+            if key not in INDEXED_FIELDS or isinstance(value, dict):
+                continue
+            # same value conversions as RequestInfo.andFilterCheck
+            if value in ["false", "False", "FALSE"]:
+                value = False
+            elif value in ["true", "True", "TRUE"]:
+                value = True
+            if not isinstance(value, list):
+                value = [value]
+            fieldIndex = DataCache._index.get(key, {})
+            matched = set(fieldIndex.get(_UNHASHABLE, ()))
+            try:
+                for item in value:
+                    matched.update(fieldIndex.get(item, ()))
+            except TypeError:
+                # unhashable filter value, let andFilterCheck handle it
+                continue
+            candidates = matched if candidates is None else candidates & matched
+            if not candidates:
+                break
+        return candidates
 
+    @staticmethod
+    def _filteredRequests(filterDict):
+        """
+        Return the data of the requests matching the filter
+        """
+        with DataCache._lock:
+            reqData = DataCache.getlatestJobData()
+            candidates = DataCache._candidates(filterDict)
+        if candidates is None:
+            requests = [RequestInfo(reqDict) for reqDict in reqData.values()]
+        else:
+            requests = [RequestInfo(reqData[reqName]) for reqName in sorted(candidates) if reqName in reqData]
+        return [reqInfo for reqInfo in requests if reqInfo.andFilterCheck(filterDict)]
+
+    @staticmethod
+    def filterData(filterDict, maskList):
+        for reqData in DataCache._filteredRequests(filterDict):
+            for prop in maskList:
+                result = reqData.get(prop, [])
+
+                if isinstance(result, list):
+                    for value in result:
+                        yield value
+                elif result is not None and result != "":
+                    yield result
+
+    @staticmethod
+    def filterDataByRequest(filterDict, maskList=None):
         if maskList is not None:
             if isinstance(maskList, (str, bytes)):
                 maskList = [maskList]
             if "RequestName" not in maskList:
                 maskList.append("RequestName")
 
-        for _, reqDict in viewitems(reqData):
-            reqInfo = RequestInfo(reqDict)
-            if reqInfo.andFilterCheck(filterDict):
-
-                if maskList is None:
-                    yield reqDict
-                else:
-                    resultItem = {}
-                    for prop in maskList:
-                        resultItem[prop] = reqInfo.get(prop, None)
-                    yield resultItem
+        for reqInfo in DataCache._filteredRequests(filterDict):
+            if maskList is None:
+                yield reqInfo.data
+            else:
+                resultItem = {}
+                for prop in maskList:
+                    resultItem[prop] = reqInfo.get(prop, None)
+                yield resultItem
 
     @staticmethod
     def getProtectedLFNs():
@@ -89,4 +247,4 @@ class DataCache(object):
 
         for _, reqInfo in viewitems(reqData):
             for dirPath in protectedLFNs(reqInfo):
-                yield dirPath
\ No newline at end of file
+                yield dirPath
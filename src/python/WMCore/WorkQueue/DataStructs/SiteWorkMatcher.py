@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+"""
+_SiteWorkMatcher_
+
+Match available workqueue elements against the site thresholds and the
+number of jobs already queued at each site, by priority.
+
+For each site, the number of jobs of a given or higher priority is kept in
+a Fenwick (binary indexed) tree over the known priorities, such that it is
+computed and updated in O(log(priorities)), instead of summing over the
+whole site dictionary for every element and every candidate site.
+"""
+
+from bisect import bisect_left
+
+from future.utils import viewitems, viewvalues
+
+from WMCore.WorkQueue.DataStructs.WorkQueueElement import possibleSites
+
+
+class PriorityJobCounter(object):
+    """
+    _PriorityJobCounter_
+
+    Fenwick tree holding the number of jobs by priority, out of a fixed,
+    ascending list of priorities.
+    """
+
+    def __init__(self, priorities):
+        self.priorities = priorities
+        self.tree = [0] * (len(priorities) + 1)
+        self.total = 0
+
+    def add(self, prio, jobs):
+        """
+        Add jobs at a priority, which must be one of the known priorities
+        """
+        self.total += jobs
+        idx = bisect_left(self.priorities, prio) + 1
+        while idx < len(self.tree):
+            self.tree[idx] += jobs
+            idx += idx & -idx
+
+    def countAtOrAbove(self, prio):
+        """
+        Return the number of jobs with a priority greater or equal to prio
+        """
+        idx = bisect_left(self.priorities, prio)
+        below = 0
+        while idx > 0:
+            below += self.tree[idx]
+            idx -= idx & -idx
+        return self.total - below
+
+
+def siteRestrictionsKey(element):
+    """
+    _siteRestrictionsKey_
+
+    Return a hashable key of everything possibleSites depends on, such that
+    elements sharing the same site and data restrictions share the result.
+    """
+    elem = element.get('WMCore.WorkQueue.DataStructs.WorkQueueElement.WorkQueueElement', element)
+    return (tuple(elem['SiteWhitelist']), tuple(elem['SiteBlacklist']),
+            elem['NoInputUpdate'], elem['NoPileupUpdate'], elem['ParentFlag'],
+            tuple(tuple(locs) for locs in viewvalues(elem['Inputs'])),
+            tuple(tuple(locs) for locs in viewvalues(elem['ParentData'])),
+            tuple(tuple(locs) for locs in viewvalues(elem['PileupData'])))
+
+
+class SiteWorkMatcher(object):
+    """
+    _SiteWorkMatcher_
+
+    Decide at which site, if any, a workqueue element can be accepted,
+    and account for the jobs of the accepted elements.
+
+    :param thresholds: a dictionary key'ed by the site name, values representing the
+        maximum number of jobs allowed at that site.
+    :param siteJobCounts: a dictionary-of-dictionaries key'ed by the site name; value
+        is a dictionary with the number of jobs running at a given priority.
+        NOTE that it is updated in place when elements are accepted.
+    :param elements: the elements to be matched, needed to know all the priorities upfront
+    """
+
+    def __init__(self, thresholds, siteJobCounts, elements):
+        self.thresholds = thresholds
+        self.siteJobCounts = siteJobCounts
+        priorities = set(element['Priority'] for element in elements)
+        for jobsByPrio in viewvalues(siteJobCounts):
+            priorities.update(jobsByPrio)
+        self.priorities = sorted(priorities)
+        self.counters = {}
+        self.sitesCache = {}
+
+    def counter(self, site):
+        """
+        Return the job counter of a site, built on first use
+        """
+        if site not in self.counters:
+            counter = PriorityJobCounter(self.priorities)
+            for prio, jobs in viewitems(self.siteJobCounts.get(site, {})):
+                counter.add(prio, jobs)
+            self.counters[site] = counter
+        return self.counters[site]
+
+    def candidateSites(self, element):
+        """
+        Return a new list of the possible sites of the element with a
+        threshold, cached by site and data restrictions.
+        """
+        key = siteRestrictionsKey(element)
+        if key not in self.sitesCache:
+            self.sitesCache[key] = [site for site in possibleSites(element) if site in self.thresholds]
+        return list(self.sitesCache[key])
+
+    def jobCount(self, site, prio):
+        """
+        Number of jobs at the site with a priority greater or equal to prio
+        """
+        return self.counter(site).countAtOrAbove(prio)
+
+    def hasSlots(self, site, prio):
+        """
+        Whether the jobs of greater or equal priority are below the site threshold
+        """
+        return self.jobCount(site, prio) < self.thresholds[site]
+
+    def accept(self, element, site):
+        """
+        Account for the jobs of an element accepted at the site
+        """
+        prio = element['Priority']
+        jobs = element['Jobs'] * element.get('blowupFactor', 1.0)
+        self.siteJobCounts.setdefault(site, {})
+        self.siteJobCounts[site][prio] = self.siteJobCounts[site].setdefault(prio, 0) + jobs
+        self.counter(site).add(prio, jobs)
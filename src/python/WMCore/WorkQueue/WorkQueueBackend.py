@@ -18,7 +18,7 @@ from WMCore.Database.CMSCouch import CouchServer, CouchNotFoundError, Document
 from WMCore.Lexicon import sanitizeURL
 from WMCore.WMSpec.WMWorkload import WMWorkloadHelper
 from WMCore.WorkQueue.DataStructs.CouchWorkQueueElement import CouchWorkQueueElement, fixElementConflicts
-from WMCore.WorkQueue.DataStructs.WorkQueueElement import possibleSites
+from WMCore.WorkQueue.DataStructs.SiteWorkMatcher import SiteWorkMatcher
 from WMCore.WorkQueue.WorkQueueExceptions import WorkQueueNoMatchingElements, WorkQueueError
 
 
@@ -381,29 +381,15 @@ class WorkQueueBackend(object):
             sortedElements.append(element)
         sortAvailableElements(sortedElements)
 
+        matcher = SiteWorkMatcher(thresholds, siteJobCounts, sortedElements)
         for element in sortedElements:
-            commonSites = possibleSites(element)
             prio = element['Priority']
-            # shuffle list of common sites all the time to give everyone the same chance
-            random.shuffle(commonSites)
-            possibleSite = None
-            for site in commonSites:
-                if site in thresholds:
-                    # Count the number of jobs currently running of greater priority, if they
-                    # are less than the site thresholds, then accept this element
-                    curJobCount = sum([x[1] if x[0] >= prio else 0 for x in viewitems(siteJobCounts.get(site, {}))])
-                    self.logger.debug("Job Count: %s, site: %s thresholds: %s", curJobCount, site, thresholds[site])
-                    if curJobCount < thresholds[site]:
-                        possibleSite = site
-                        break
-
+            possibleSite = self._matchSite(matcher, element)
             if possibleSite:
                 self.logger.debug("Meant to accept workflow: %s, with prio: %s, element id: %s, for site: %s",
                                   element['RequestName'], prio, element.id, possibleSite)
                 elements.append(element)
-                siteJobCounts.setdefault(possibleSite, {})
-                siteJobCounts[possibleSite][prio] = siteJobCounts[possibleSite].setdefault(prio, 0) + \
-                                                    element['Jobs'] * element.get('blowupFactor', 1.0)
+                matcher.accept(element, possibleSite)
             else:
                 self.logger.debug("No available resources for %s with localdoc id %s",
                                   element['RequestName'], element.id)
@@ -491,6 +477,23 @@ class WorkQueueBackend(object):
                          len(acceptedElems), self.queueUrl)
         return acceptedElems, siteJobCounts
 
+    def _matchSite(self, matcher, element):
+        """
+        Return a site where the element can be accepted, or None.
+        The candidate sites are tried in random order to give everyone the same chance,
+        shuffling them lazily such that only the sites actually tried are drawn.
+        """
+        commonSites = matcher.candidateSites(element)
+        numSites = len(commonSites)
+        for idx in range(numSites):
+            pick = random.randrange(idx, numSites)
+            commonSites[idx], commonSites[pick] = commonSites[pick], commonSites[idx]
+            # Count the number of jobs currently queued of greater priority, if they
+            # are less than the site thresholds, then accept this element
+            if matcher.hasSlots(commonSites[idx], element['Priority']):
+                return commonSites[idx]
+        return None
+
     def _evalAvailableWork(self, listElems, thresholds, siteJobCounts,
                            excludeWorkflows, numElems):
         """
@@ -529,34 +532,19 @@ class WorkQueueBackend(object):
                 sortedElements.append(element)
         sortAvailableElements(sortedElements)
 
+        matcher = SiteWorkMatcher(thresholds, siteJobCounts, sortedElements)
         for element in sortedElements:
             if numElems <= 0:
                 # it means we accepted the configured number of elements
                 break
-            commonSites = possibleSites(element)
             prio = element['Priority']
-            # shuffle list of common sites all the time to give everyone the same chance
-            random.shuffle(commonSites)
-            possibleSite = None
-            for site in commonSites:
-                if site in thresholds:
-                    # Count the number of jobs currently running of greater priority, if they
-                    # are less than the site thresholds, then accept this element
-                    curJobCount = sum([x[1] if x[0] >= prio else 0 for x in viewitems(siteJobCounts.get(site, {}))])
-                    self.logger.debug("Job Count: %s, site: %s thresholds: %s",
-                                      curJobCount, site, thresholds[site])
-                    if curJobCount < thresholds[site]:
-                        possibleSite = site
-                        break
-
+            possibleSite = self._matchSite(matcher, element)
             if possibleSite:
                 self.logger.info("Accepting workflow: %s, with prio: %s, element id: %s, for site: %s",
                                  element['RequestName'], prio, element.id, possibleSite)
                 numElems -= 1
                 elems.append(element)
-                siteJobCounts.setdefault(possibleSite, {})
-                siteJobCounts[possibleSite][prio] = siteJobCounts[possibleSite].setdefault(prio, 0) + \
-                                                    element['Jobs'] * element.get('blowupFactor', 1.0)
+                matcher.accept(element, possibleSite)
             else:
                 self.logger.debug("No available resources for %s with doc id %s",
                                   element['RequestName'], element.id)
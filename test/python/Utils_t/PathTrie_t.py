@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+"""
+Unittests for the PathTrie module
+"""
+
+import unittest
+
+from Utils.PathTrie import PathTrie, splitPath
+
+
+class PathTrieTest(unittest.TestCase):
+    """
+    unittest for the PathTrie class
+    """
+
+    def testSplitPath(self):
+        """Empty components are ignored"""
+        self.assertEqual(splitPath("/store//unmerged/Run2016B/"), ["store", "unmerged", "Run2016B"])
+        self.assertEqual(splitPath("/"), [])
+
+    def testAddAndCount(self):
+        """Paths are counted and listed back"""
+        trie = PathTrie(["/store/unmerged/a/b", "/store/unmerged/a/c"])
+        self.assertEqual(trie.add("/store/unmerged/a/b/"), 2)
+        trie.add("/store/unmerged/d", count=5)
+        self.assertEqual(len(trie), 3)
+        self.assertEqual(trie.numNodes, 6)
+        self.assertIn("/store/unmerged/a/c", trie)
+        self.assertNotIn("/store/unmerged/a", trie)
+        self.assertEqual(trie.count("/store/unmerged/a/b"), 2)
+        self.assertEqual(trie.count("/store/unmerged/x"), 0)
+        self.assertEqual(sorted(trie.paths()), [("/store/unmerged/a/b", 2), ("/store/unmerged/a/c", 1),
+                                                ("/store/unmerged/d", 5)])
+
+    def testPrefixLookups(self):
+        """Parent and sub-directories of the paths are found"""
+        trie = PathTrie(["/store/unmerged/Run2016B/JetHT/MINIAOD/v2"])
+        self.assertTrue(trie.hasPrefixOf("/store/unmerged/Run2016B/JetHT/MINIAOD/v2"))
+        self.assertTrue(trie.hasPrefixOf("/store/unmerged/Run2016B/JetHT/MINIAOD/v2/140000"))
+        self.assertFalse(trie.hasPrefixOf("/store/unmerged/Run2016B/JetHT/MINIAOD"))
+        self.assertFalse(trie.hasPrefixOf("/store/unmerged/Run2016B/JetHT/MINIAOD/v2-v1"))
+
+        self.assertTrue(trie.overlaps("/store/unmerged/Run2016B/JetHT/MINIAOD/v2/140000"))
+        self.assertTrue(trie.overlaps("/store/unmerged/Run2016B/JetHT"))
+        self.assertFalse(trie.overlaps("/store/unmerged/Run2016B/JetHT/AOD"))
+        self.assertFalse(PathTrie().overlaps("/store/unmerged"))
+
+
+if __name__ == '__main__':
+    unittest.main()
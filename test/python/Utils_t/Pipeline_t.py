@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+"""
+Unittests for the Pipeline module
+"""
+
+import threading
+import time
+import unittest
+
+from Utils.Pipeline import Functor, Pipeline
+
+
+def adder(obj, num=1):
+    return obj + num
+
+
+def failer(obj):
+    if obj % 3 == 0:
+        raise ValueError("bad object: %s" % obj)
+    return obj
+
+
+class PipelineTest(unittest.TestCase):
+    """
+    unittest for the Pipeline class
+    """
+
+    def setUp(self):
+        self.running = 0
+        self.maxRunning = 0
+        self.lock = threading.Lock()
+
+    def slowStage(self, obj):
+        with self.lock:
+            self.running += 1
+            self.maxRunning = max(self.maxRunning, self.running)
+        time.sleep(0.05)
+        with self.lock:
+            self.running -= 1
+        return obj
+
+    def testRun(self):
+        """Objects go through all the stages, in order"""
+        pline = Pipeline(name="adder", funcLine=[Functor(adder), Functor(adder, num=10), adder])
+        self.assertEqual(pline.getPipelineName(), "adder")
+        self.assertEqual(pline.run(1), 13)
+        self.assertEqual(pline.getStageStats()['adder']['calls'], 3)
+
+    def testRunConcurrent(self):
+        """Errors are isolated by object and accounted by stage"""
+        pline = Pipeline(funcLine=[Functor(adder), Functor(failer), Functor(adder)])
+        results = pline.runConcurrent(range(10), maxWorkers=4)
+        self.assertEqual([res for res, _ in results], [2, 3, None, 5, 6, None, 8, 9, None, 11])
+        errors = [exc for _, exc in results if exc is not None]
+        self.assertEqual(len(errors), 3)
+        self.assertTrue(all(isinstance(exc, ValueError) for exc in errors))
+        stats = pline.getStageStats()
+        self.assertEqual((stats['failer']['calls'], stats['failer']['errors']), (10, 3))
+        self.assertEqual(stats['adder']['calls'], 17)
+        pline.resetStageStats()
+        self.assertEqual(pline.getStageStats(), {})
+
+    def testStageLimits(self):
+        """A stage limit is shared by the pipelines using the same semaphore"""
+        limit = threading.BoundedSemaphore(2)
+        pline1 = Pipeline(funcLine=[Functor(self.slowStage)], stageLimits={'slowStage': limit})
+        pline2 = Pipeline(funcLine=[Functor(self.slowStage)], stageLimits={'slowStage': limit})
+        threads = [threading.Thread(target=pline.runConcurrent, args=(range(5), 5)) for pline in (pline1, pline2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.maxRunning, 2)
+
+        self.maxRunning = 0
+        pline = Pipeline(funcLine=[Functor(self.slowStage)], stageLimits={'slowStage': 3})
+        pline.runConcurrent(range(10), maxWorkers=10)
+        self.assertEqual(self.maxRunning, 3)
+        self.assertTrue(pline.getStageStats()['slowStage']['time'] >= 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
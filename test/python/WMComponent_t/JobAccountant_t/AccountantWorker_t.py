@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+"""
+_AccountantWorker_t_
+
+Unit tests for the DBS parentage resolution of the AccountantWorker,
+against the WMBS parentage rows of an emulated database, and for the
+digest of the job reports.
+"""
+from __future__ import print_function, division
+
+import os
+import unittest
+
+from WMComponent.JobAccountant.AccountantWorker import loadDigestedReport, resolveDBSParents
+
+
+class FakeParentage(object):
+    """
+    WMBS file parentage, returning the same rows as the
+    Files.GetParentAndGrandParentInfoByLFNs DAO
+    """
+
+    def __init__(self):
+        self.parents = {}
+        self.merged = {}
+        self.queries = 0
+
+    def addFile(self, lfn, parents=None):
+        self.merged[lfn] = 0 if lfn.startswith("/store/unmerged/") else 1
+        self.parents[lfn] = list(parents or [])
+
+    def getParentInfo(self, childLFNs):
+        self.queries += 1
+        rows = []
+        for childLFN in childLFNs:
+            for parent in self.parents.get(childLFN, []):
+                row = {"child_lfn": childLFN, "lfn": parent, "merged": self.merged[parent]}
+                grandParents = self.parents.get(parent) or [None]
+                for grandParent in grandParents:
+                    rows.append(dict(row, gplfn=grandParent,
+                                     gpmerged=None if grandParent is None else self.merged[grandParent]))
+        return rows
+
+
+def findDBSParentsRecursive(lfn, getParentInfo):
+    """
+    The former AccountantWorker.findDBSParents, resolving one LFN per query
+    """
+    newParents = set()
+    for parentInfo in getParentInfo([lfn]):
+        if int(parentInfo["merged"]) == 1 and not parentInfo["lfn"].startswith("/store/unmerged/"):
+            newParents.add(parentInfo["lfn"])
+        elif parentInfo['gpmerged'] is None:
+            continue
+        elif int(parentInfo["gpmerged"]) == 1 and not parentInfo["gplfn"].startswith("/store/unmerged/"):
+            newParents.add(parentInfo["gplfn"])
+        else:
+            newParents.update(findDBSParentsRecursive(parentInfo['gplfn'], getParentInfo))
+    return newParents
+
+
+def buildMergeParentage(nOutputs, nInputs, depth):
+    """
+    Build the parentage of merged output files, each of them made of unmerged
+    input files, which were produced from a chain of `depth` unmerged (redneck)
+    files reading a merged file shared by all the inputs of an output.
+    :return: a tuple with the FakeParentage object and the output LFNs
+    """
+    parentage = FakeParentage()
+    outputs = []
+    for outIdx in range(nOutputs):
+        ancestor = "/store/data/Run2024A/Prompt/RAW/v1/000/%06d.root" % outIdx
+        parentage.addFile(ancestor)
+        for level in range(depth):
+            redneck = "/store/unmerged/Run2024A/Redneck/%d/%06d.root" % (level, outIdx)
+            parentage.addFile(redneck, [ancestor])
+            ancestor = redneck
+        inputs = []
+        for inIdx in range(nInputs):
+            inputLFN = "/store/unmerged/Run2024A/Skim/%06d/%04d.root" % (outIdx, inIdx)
+            parentage.addFile(inputLFN, [ancestor])
+            inputs.append(inputLFN)
+        output = "/store/data/Run2024A/Skim/AOD/v1/%06d.root" % outIdx
+        parentage.addFile(output, inputs)
+        outputs.append(output)
+    return parentage, outputs
+
+
+class AccountantWorkerTest(unittest.TestCase):
+    """
+    Tests for the parentage resolution, compared to the recursive resolution
+    """
+
+    def testParentageCases(self):
+        """Straight to merge, merged grandparents, parentless and redneck files"""
+        parentage = FakeParentage()
+        parentage.addFile("/store/data/A/RAW/1.root")
+        parentage.addFile("/store/data/A/RAW/2.root")
+        parentage.addFile("/store/unmerged/A/RECO/1.root", ["/store/data/A/RAW/1.root"])
+        parentage.addFile("/store/unmerged/A/RECO/2.root")
+        parentage.addFile("/store/unmerged/A/SKIM/1.root", ["/store/unmerged/A/RECO/1.root"])
+        parentage.addFile("/store/unmerged/A/SKIM/2.root", ["/store/unmerged/A/SKIM/1.root"])
+        parentage.addFile("/store/data/A/RECO/1.root", ["/store/data/A/RAW/2.root", "/store/unmerged/A/RECO/1.root",
+                                                        "/store/unmerged/A/RECO/2.root"])
+        parentage.addFile("/store/data/A/SKIM/1.root", ["/store/unmerged/A/SKIM/2.root",
+                                                        "/store/unmerged/A/SKIM/1.root"])
+        parentage.addFile("/store/data/A/SKIM/2.root")
+        lfns = ["/store/data/A/RECO/1.root", "/store/data/A/SKIM/1.root", "/store/data/A/SKIM/2.root"]
+
+        cache = {}
+        parents = resolveDBSParents(lfns, parentage.getParentInfo, cache=cache)
+        for lfn in lfns:
+            self.assertEqual(parents[lfn], findDBSParentsRecursive(lfn, parentage.getParentInfo))
+        self.assertEqual(parents["/store/data/A/RECO/1.root"], {"/store/data/A/RAW/1.root",
+                                                                 "/store/data/A/RAW/2.root"})
+        self.assertEqual(parents["/store/data/A/SKIM/1.root"], {"/store/data/A/RAW/1.root"})
+        self.assertEqual(parents["/store/data/A/SKIM/2.root"], set())
+
+        # resolved files are not queried again
+        parentage.queries = 0
+        self.assertEqual(resolveDBSParents(lfns[:1], parentage.getParentInfo, cache=cache),
+                         {lfns[0]: {"/store/data/A/RAW/1.root", "/store/data/A/RAW/2.root"}})
+        self.assertEqual(parentage.queries, 0)
+
+    def testLevelWiseQueries(self):
+        """One query per level of redneck ancestry, whatever the number of files"""
+        parentage, outputs = buildMergeParentage(nOutputs=20, nInputs=10, depth=4)
+        expected = {lfn: findDBSParentsRecursive(lfn, parentage.getParentInfo) for lfn in outputs}
+        # every query goes up two levels: the output, then two queries per input
+        self.assertEqual(parentage.queries, 20 * (1 + 10 * 2))
+
+        parentage.queries = 0
+        self.assertEqual(resolveDBSParents(outputs, parentage.getParentInfo), expected)
+        self.assertEqual(parentage.queries, 3)
+        self.assertEqual(expected[outputs[3]], {"/store/data/Run2024A/Prompt/RAW/v1/000/000003.root"})
+
+    def testDigestedReports(self):
+        """The digested files refer to the loaded report, missing reports are failures"""
+        fwjrDir = os.path.join(os.path.dirname(__file__), "fwjrs")
+        report, digest = loadDigestedReport(os.path.join(fwjrDir, "MergeSuccess.pkl"))
+        self.assertTrue(digest["taskSuccessful"])
+        self.assertEqual([fwjrFile["lfn"] for fwjrFile in digest["files"]],
+                         [fwjrFile["lfn"] for fwjrFile in report.getAllFiles()])
+        setattr(digest["files"][0]["fileRef"], 'merged', True)
+        self.assertTrue(report.getAllFiles()[0]["merged"])
+
+        missingReport, missingDigest = loadDigestedReport(os.path.join(fwjrDir, "missing.pkl"))
+        self.assertFalse(missingDigest["taskSuccessful"])
+        self.assertNotIn("files", missingDigest)
+        self.assertEqual(missingReport.getExitCode(), 99999)
+
+
+if __name__ == '__main__':
+    unittest.main()
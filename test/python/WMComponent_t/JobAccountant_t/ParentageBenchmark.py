@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+"""
+_ParentageBenchmark_
+
+Compare the level-wise DBS parentage resolution of the AccountantWorker with
+the former recursive one, which ran a query per LFN, for merge jobs with many
+inputs and redneck chains. Every query adds a round trip latency, to account
+for the database. Not a unit test, run it by hand:
+
+    python ParentageBenchmark.py [nOutputs] [nInputs] [depth] [latencyMs]
+"""
+
+from __future__ import print_function, division
+
+import sys
+import time
+
+from WMComponent.JobAccountant.AccountantWorker import resolveDBSParents
+from WMComponent_t.JobAccountant_t.AccountantWorker_t import buildMergeParentage, findDBSParentsRecursive
+
+
+def main():
+    nOutputs = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    nInputs = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    depth = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    latency = float(sys.argv[4]) / 1000 if len(sys.argv) > 4 else 0.001
+
+    parentage, outputs = buildMergeParentage(nOutputs, nInputs, depth)
+
+    def getParentInfo(childLFNs):
+        time.sleep(latency)
+        return parentage.getParentInfo(childLFNs)
+
+    print("%d merged outputs of %d inputs each, redneck depth %d, %.1f ms per query" %
+          (nOutputs, nInputs, depth, latency * 1000))
+
+    parentage.queries = 0
+    start = time.time()
+    expected = {lfn: findDBSParentsRecursive(lfn, getParentInfo) for lfn in outputs}
+    print("  recursive  %8.3f s  %6d queries" % (time.time() - start, parentage.queries))
+
+    parentage.queries = 0
+    start = time.time()
+    parents = resolveDBSParents(outputs, getParentInfo)
+    print("  level-wise %8.3f s  %6d queries" % (time.time() - start, parentage.queries))
+    assert parents == expected
+
+
+if __name__ == '__main__':
+    main()
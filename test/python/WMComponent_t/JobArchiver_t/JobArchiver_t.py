@@ -8,14 +8,13 @@ from builtins import range
 from future.utils import listvalues
 
 import os
-import shutil
 import threading
 import unittest
-from subprocess import PIPE, Popen
 
 from nose.plugins.attrib import attr
 
-from WMComponent.JobArchiver.JobArchiverPoller import JobArchiverPoller
+from WMComponent.JobArchiver.JobArchiverPoller import JobArchiverPoller, JobArchiverPollerException
+from WMComponent.JobArchiver.JobLogArchive import extractJob
 from WMCore.DAOFactory import DAOFactory
 from WMCore.DataStructs.Run import Run
 from WMCore.JobStateMachine.ChangeState import ChangeState
@@ -226,22 +225,54 @@ class JobArchiverTest(EmulatedUnitTestCase):
 
         logPath = os.path.join(config.JobArchiver.componentDir, 'logDir', 'w', 'wf001', 'JobCluster_0')
         logList = os.listdir(logPath)
+        self.assertCountEqual(logList, ['Jobs.tar.gz', 'Jobs.index'])
         for job in testJobGroup.jobs:
-            self.assertEqual('Job_%i.tar.bz2' % (job['id']) in logList, True,
-                             'Could not find transferred tarball for job %i' % (job['id']))
-            pipe = Popen(['tar', '-jxvf', os.path.join(logPath, 'Job_%i.tar.bz2' % (job['id']))],
-                         stdout=PIPE, stderr=PIPE, shell=False)
-            pipe.wait()
-            # filename = '%s/%s/%s.out' %(cacheDir[1:], job['name'], job['name'])
-            filename = 'Job_%i/%s.out' % (job['id'], job['name'])
-            self.assertEqual(os.path.isfile(filename), True, 'Could not find file %s' % (filename))
-            f = open(filename, 'r')
-            fileContents = f.readlines()
-            f.close()
+            extracted = extractJob(logPath, job['id'], self.testDir)
+            filename = os.path.join(self.testDir, 'Job_%i/%s.out' % (job['id'], job['name']))
+            self.assertEqual(extracted, [filename])
+            with open(filename, 'r') as f:
+                fileContents = f.readlines()
             self.assertEqual(fileContents[0].find(job['name']) > -1, True)
-            shutil.rmtree('Job_%i' % (job['id']))
-            if os.path.isfile('Job_%i.tar.bz2' % (job['id'])):
-                os.remove('Job_%i.tar.bz2' % (job['id']))
+
+        return
+
+    def testPartialFailure(self):
+        """
+        _PartialFailure_
+
+        A JobCluster which cannot be archived does not prevent the others from being
+        archived, and their jobs are not archived again in the next cycle
+        """
+        config = self.getConfig()
+        config.JobArchiver.numberOfJobsToCluster = 1
+        testJobArchiver = JobArchiverPoller(config=config)
+
+        doneList = []
+        for jobId in range(1, 4):
+            cacheDir = os.path.join(self.testDir, 'test', 'job_%i' % jobId)
+            os.makedirs(cacheDir)
+            with open(os.path.join(cacheDir, 'job.out'), 'w') as fd:
+                fd.write("job %i" % jobId)
+            doneList.append({'id': jobId, 'workflow': 'wf001', 'cache_dir': cacheDir})
+
+        # the JobCluster directory of the second job cannot be created
+        logPath = os.path.join(config.JobArchiver.componentDir, 'logDir', 'w', 'wf001')
+        os.makedirs(logPath)
+        with open(os.path.join(logPath, 'JobCluster_2'), 'w') as fd:
+            fd.write("not a directory")
+
+        with self.assertRaises(JobArchiverPollerException):
+            testJobArchiver.cleanWorkArea(doneList)
+        self.assertEqual([os.path.isdir(job['cache_dir']) for job in doneList], [False, True, False])
+        for jobId in (1, 3):
+            extractJob(os.path.join(logPath, 'JobCluster_%i' % jobId), jobId, self.testDir)
+
+        os.remove(os.path.join(logPath, 'JobCluster_2'))
+        testJobArchiver.cleanWorkArea(doneList)
+        self.assertFalse(os.path.isdir(doneList[1]['cache_dir']))
+        for jobId in range(1, 4):
+            with open(os.path.join(logPath, 'JobCluster_%i' % jobId, 'Jobs.index')) as fd:
+                self.assertEqual(len(fd.readlines()), 1)
 
         return
 
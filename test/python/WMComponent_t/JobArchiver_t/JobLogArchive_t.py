@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""
+_JobLogArchive_t_
+
+Unit tests for the JobCluster archives of the JobArchiver
+"""
+from __future__ import print_function, division
+
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+
+from WMComponent.JobArchiver.JobLogArchive import (JobLogArchiveException, appendJobs, archiveName,
+                                                   extractJob, jobClusterDir, packJob)
+
+
+class JobLogArchiveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.testDir = tempfile.mkdtemp()
+        self.clusterDir = jobClusterDir(os.path.join(self.testDir, 'logDir'), 'wf001', 1234, 1000)
+        os.makedirs(self.clusterDir)
+
+    def tearDown(self):
+        shutil.rmtree(self.testDir, ignore_errors=True)
+
+    def makeCacheDir(self, jobId, content):
+        """
+        Create a job cache directory with a couple of files
+        """
+        cacheDir = os.path.join(self.testDir, 'cache', 'job_%i' % jobId)
+        os.makedirs(cacheDir)
+        for fileName in ('job.pkl', 'Report.0.pkl'):
+            with open(os.path.join(cacheDir, fileName), 'w') as fd:
+                fd.write("%s %s" % (fileName, content))
+        return cacheDir
+
+    def testAppendAndExtract(self):
+        """Jobs appended in several batches are extracted one by one"""
+        self.assertEqual(self.clusterDir, os.path.join(self.testDir, 'logDir', 'w', 'wf001', 'JobCluster_1'))
+        for jobIds in ([1001, 1002], [1003]):
+            packed = [(jobId, packJob(jobId, self.makeCacheDir(jobId, "v1"), 'gz')) for jobId in jobIds]
+            self.assertEqual(appendJobs(self.clusterDir, packed, 'gz'), len(jobIds))
+        self.assertCountEqual(os.listdir(self.clusterDir), ['Jobs.tar.gz', 'Jobs.index'])
+
+        destDir = os.path.join(self.testDir, 'dest')
+        extracted = extractJob(self.clusterDir, 1002, destDir)
+        self.assertCountEqual(extracted, [os.path.join(destDir, 'Job_1002', 'job.pkl'),
+                                          os.path.join(destDir, 'Job_1002', 'Report.0.pkl')])
+        with open(os.path.join(destDir, 'Job_1002', 'job.pkl')) as fd:
+            self.assertEqual(fd.read(), "job.pkl v1")
+        self.assertEqual(os.listdir(destDir), ['Job_1002'])
+
+        # the archive is also readable as a whole
+        with tarfile.open(os.path.join(self.clusterDir, 'Jobs.tar.gz'), mode='r:gz', ignore_zeros=True) as tarball:
+            self.assertEqual(len([member for member in tarball.getmembers() if member.isfile()]), 6)
+
+        # a job archived again gets the latest version
+        shutil.rmtree(os.path.join(self.testDir, 'cache', 'job_1002'))
+        appendJobs(self.clusterDir, [(1002, packJob(1002, self.makeCacheDir(1002, "v2"), 'gz'))], 'gz')
+        extractJob(self.clusterDir, 1002, destDir)
+        with open(os.path.join(destDir, 'Job_1002', 'job.pkl')) as fd:
+            self.assertEqual(fd.read(), "job.pkl v2")
+
+        with self.assertRaises(JobLogArchiveException):
+            extractJob(self.clusterDir, 1004, destDir)
+        with self.assertRaises(JobLogArchiveException):
+            archiveName('bz2')
+
+    def testFailedAppend(self):
+        """Only the jobs fully written before a failure are indexed"""
+
+        def packedJobs():
+            yield 1001, packJob(1001, self.makeCacheDir(1001, "v1"), 'gz')
+            raise IOError("cannot read job 1002")
+
+        indexed = []
+        with self.assertRaises(IOError):
+            appendJobs(self.clusterDir, packedJobs(), 'gz', indexed=indexed)
+        self.assertEqual(indexed, [1001])
+        destDir = os.path.join(self.testDir, 'dest')
+        self.assertEqual(len(extractJob(self.clusterDir, 1001, destDir)), 2)
+        with self.assertRaises(JobLogArchiveException):
+            extractJob(self.clusterDir, 1002, destDir)
+
+    def testLegacyTarball(self):
+        """Jobs archived in a Job_<id>.tar.bz2 tarball are still extracted"""
+        cacheDir = self.makeCacheDir(1005, "old")
+        with tarfile.open(os.path.join(self.clusterDir, 'Job_1005.tar.bz2'), mode='w:bz2') as tarball:
+            tarball.add(os.path.join(cacheDir, 'job.pkl'), arcname='Job_1005/job.pkl')
+        destDir = os.path.join(self.testDir, 'dest')
+        self.assertEqual(extractJob(self.clusterDir, 1005, destDir), [os.path.join(destDir, 'Job_1005', 'job.pkl')])
+
+
+if __name__ == '__main__':
+    unittest.main()
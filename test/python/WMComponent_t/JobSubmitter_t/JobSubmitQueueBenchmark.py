@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+"""
+_JobSubmitQueueBenchmark_
+
+Compare the JobSubmitter assignJobLocations using the per (site, task type)
+priority heaps against the previous loop over all the cached jobs sorted by
+priority, with many cached jobs and sites. Not a unit test, run it by hand:
+
+    python JobSubmitQueueBenchmark.py [nJobs] [nSites] [maxJobsThisCycle]
+"""
+
+from __future__ import print_function, division
+
+import copy
+import logging
+import random
+import sys
+import time
+from collections import defaultdict, Counter
+
+from WMComponent.JobSubmitter.JobSubmitQueue import JobSubmitQueue
+from WMComponent.JobSubmitter.JobSubmitterPoller import JobSubmitterPoller
+
+TASK_TYPES = ("Processing", "Production", "Merge")
+
+
+def legacyAssignJobLocations(poller, jobsByPrio):
+    """
+    Previous implementation of JobSubmitterPoller.assignJobLocations,
+    with jobsByPrio key'ed by the final job priority holding sets of job ids
+    """
+    jobsToSubmit = {}
+    jobsCount = 0
+    exitLoop = False
+    jobSubmitLogBySites = defaultdict(lambda: defaultdict(Counter))
+    jobSubmitLogByPriority = defaultdict(lambda: defaultdict(Counter))
+    for jobPrio in sorted(jobsByPrio, reverse=True):
+        if exitLoop:
+            break
+        for jobid in sorted(jobsByPrio[jobPrio]):
+            jobType = poller.jobDataCache[jobid]['task_type']
+            possibleSites = poller.jobDataCache[jobid]['possibleSites']
+            possibleSites = poller.checkZeroTaskThresholds(jobType, possibleSites)
+            jobSubmitLogByPriority[jobPrio][jobType]['Total'] += 1
+            for siteName in possibleSites:
+                condition = poller._getJobSubmitCondition(jobPrio, siteName, jobType)
+                if condition != "JobSubmitReady":
+                    jobSubmitLogBySites[siteName][jobType][condition] += 1
+                    logging.debug("Found a job for %s : %s", siteName, condition)
+                    continue
+                cachedJob = poller.jobDataCache.pop(jobid)
+                cachedJob['custom'] = {'location': siteName}
+                cachedJob['possibleSites'] = possibleSites
+                jobsToSubmit.setdefault(cachedJob['packageDir'], []).append(cachedJob)
+                poller.currentRcThresholds[siteName]["total_pending_jobs"] += 1
+                poller.currentRcThresholds[siteName]['thresholds'][jobType]["task_pending_jobs"] += 1
+                jobsCount += 1
+                jobSubmitLogBySites[siteName][jobType]["submitted"] += 1
+                jobSubmitLogByPriority[jobPrio][jobType]['submitted'] += 1
+                jobsByPrio[jobPrio].discard(jobid)
+                break
+            if jobsCount >= poller.maxJobsThisCycle:
+                exitLoop = True
+                break
+    return jobsToSubmit
+
+
+def makePoller(nJobs, nSites, maxJobsThisCycle, seed=1):
+    """
+    Build a poller with nJobs cached jobs spread over nSites sites, without
+    going through its constructor (no database, no services needed). Like
+    in a busy agent, most sites have only a few free pending slots left.
+    """
+    rng = random.Random(seed)
+    sites = ["T2_XX_Site%03d" % idx for idx in range(nSites)]
+
+    poller = JobSubmitterPoller.__new__(JobSubmitterPoller)
+    poller.maxJobsThisCycle = maxJobsThisCycle
+    poller.maxTaskPriority = 1e7
+    poller.condorOverflowFraction = 0.2
+    poller.ioboundTypes = ('LogCollect', 'Merge', 'Cleanup', 'Harvesting')
+    poller.currentRcThresholds = {}
+    for site in sites:
+        thresholds = {}
+        for taskType in TASK_TYPES:
+            pendingSlots = rng.choice([0, 5, 10, 20, 50])
+            thresholds[taskType] = {"pending_slots": pendingSlots,
+                                    "task_pending_jobs": max(pendingSlots - rng.randint(0, 5), 0),
+                                    "max_slots": 10 * pendingSlots,
+                                    "task_running_jobs": rng.randint(0, 10 * pendingSlots + 1),
+                                    "wf_highest_priority": rng.choice([None, 1e7 * 3])}
+        poller.currentRcThresholds[site] = {"total_pending_slots": 60,
+                                            "total_pending_jobs": rng.randint(40, 60),
+                                            "total_running_slots": 600,
+                                            "total_running_jobs": rng.randint(0, 500),
+                                            "thresholds": thresholds}
+
+    poller.jobDataCache = {}
+    poller.jobSubmitQueue = JobSubmitQueue()
+    jobsByPrio = {}
+    for jobID in range(1, nJobs + 1):
+        taskType = rng.choice(TASK_TYPES)
+        possibleSites = frozenset(rng.sample(sites, rng.randint(1, 20)))
+        jobPrio = rng.randint(0, 5) * poller.maxTaskPriority + rng.choice([10000, 80000, 100000, 200000])
+        poller.jobDataCache[jobID] = {'task_type': taskType, 'possibleSites': possibleSites,
+                                      'packageDir': "package_%d" % (jobID // 100)}
+        poller.jobSubmitQueue.add(jobID, jobPrio, taskType, possibleSites)
+        jobsByPrio.setdefault(jobPrio, set()).add(jobID)
+    return poller, jobsByPrio
+
+
+def timeIt(label, func, *args):
+    """
+    Run func(*args), print and return its wall clock time
+    """
+    start = time.time()
+    res = func(*args)
+    runtime = time.time() - start
+    print("  %-28s %8.3f s" % (label, runtime))
+    return runtime, res
+
+
+def submittedJobs(jobsToSubmit):
+    """
+    Flatten the jobs to submit to a sorted list of (job id, site)
+    """
+    return sorted((job['id'], job['custom']['location']) for jobs in jobsToSubmit.values() for job in jobs)
+
+
+def main():
+    nJobs = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    nSites = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    maxJobsThisCycle = int(sys.argv[3]) if len(sys.argv) > 3 else 5000
+    logging.getLogger().setLevel(logging.WARNING)
+
+    poller, jobsByPrio = makePoller(nJobs, nSites, maxJobsThisCycle)
+    for jobID, jobInfo in poller.jobDataCache.items():
+        jobInfo['id'] = jobID
+    print("%d cached jobs, %d sites, %d jobs per cycle" % (nJobs, nSites, maxJobsThisCycle))
+
+    legacyPoller = copy.copy(poller)
+    # shallow copies of the jobs, such that the sites are tried in the same order
+    legacyPoller.jobDataCache = {jobID: dict(jobInfo) for jobID, jobInfo in poller.jobDataCache.items()}
+    legacyPoller.currentRcThresholds = copy.deepcopy(poller.currentRcThresholds)
+
+    print("assignJobLocations")
+    tOld, oldRes = timeIt("legacy", legacyAssignJobLocations, legacyPoller, jobsByPrio)
+    tNew, newRes = timeIt("priority heaps", poller.assignJobLocations)
+    assert submittedJobs(oldRes) == submittedJobs(newRes)
+    print("  %d jobs submitted, speedup x%.1f" % (len(submittedJobs(newRes)), tOld / max(tNew, 1e-6)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""
+_JobSubmitQueue_t_
+
+Unittests for the JobSubmitter priority index
+"""
+
+import unittest
+
+from WMComponent.JobSubmitter.JobSubmitQueue import JobSubmitQueue
+
+
+class JobSubmitQueueTest(unittest.TestCase):
+
+    def createQueue(self):
+        """
+        _createQueue_
+
+        Create a queue with jobs of two task types over three sites
+        """
+        queue = JobSubmitQueue()
+        queue.add(1, 10, "Processing", ["T1_US_FNAL", "T2_CH_CERN"])
+        queue.add(2, 30, "Processing", ["T2_CH_CERN"])
+        queue.add(3, 20, "Merge", ["T1_US_FNAL"])
+        queue.add(4, 30, "Processing", ["T1_US_FNAL", "T2_DE_DESY"])
+        queue.add(5, 10, "Processing", ["T2_DE_DESY"])
+        return queue
+
+    def testOrdering(self):
+        """
+        _testOrdering_
+
+        Jobs are yielded once, by descending priority and ascending job id
+        """
+        queue = self.createQueue()
+        self.assertEqual(len(queue), 5)
+        self.assertEqual(list(queue.iterJobs(set())), [(30, 2), (30, 4), (20, 3), (10, 1), (10, 5)])
+        # iterating does not consume the queue
+        self.assertEqual(len(queue), 5)
+        self.assertEqual([jobID for _, jobID in queue.iterJobs(set())], [2, 4, 3, 1, 5])
+        self.assertEqual(queue.countsByPriority(), {30: {"Processing": 2}, 20: {"Merge": 1},
+                                                    10: {"Processing": 2}})
+        return
+
+    def testRemoveAndUpdate(self):
+        """
+        _testRemoveAndUpdate_
+
+        Jobs can be removed while iterating, and re-indexed with new sites
+        """
+        queue = self.createQueue()
+        for _, jobID in queue.iterJobs(set()):
+            if jobID in (2, 3):
+                queue.remove(jobID)
+        self.assertEqual(len(queue), 3)
+        self.assertNotIn(2, queue)
+        self.assertEqual([jobID for _, jobID in queue.iterJobs(set())], [4, 1, 5])
+
+        queue.updateSites(1, ["T2_DE_DESY"])
+        closedQueues = {("T2_DE_DESY", "Processing")}
+        self.assertEqual([jobID for _, jobID in queue.iterJobs(closedQueues)], [4])
+
+        # re-adding a job replaces its previous entries
+        queue.add(5, 40, "Processing", ["T2_CH_CERN"])
+        self.assertEqual(list(queue.iterJobs(set())), [(40, 5), (30, 4), (10, 1)])
+        queue.remove(5)
+        queue.remove(5)
+        self.assertEqual(queue.countsByPriority(), {30: {"Processing": 1}, 10: {"Processing": 1}})
+        return
+
+    def testClosedQueues(self):
+        """
+        _testClosedQueues_
+
+        Closing a (site, task type) pair while iterating skips the jobs which
+        can only run there
+        """
+        queue = self.createQueue()
+        closedQueues = set()
+        yielded = []
+        for _, jobID in queue.iterJobs(closedQueues):
+            yielded.append(jobID)
+            if jobID == 2:
+                closedQueues.add(("T2_CH_CERN", "Processing"))
+                closedQueues.add(("T2_DE_DESY", "Processing"))
+        # job 1 can still run at FNAL, job 5 only at DESY
+        self.assertEqual(yielded, [2, 4, 3, 1])
+
+        # a queue which is stopped early keeps all its jobs
+        for _ in queue.iterJobs(set()):
+            break
+        self.assertEqual(len(queue), 5)
+        self.assertEqual([jobID for _, jobID in queue.iterJobs(set())], [2, 4, 3, 1, 5])
+        return
+
+    def testCompaction(self):
+        """
+        _testCompaction_
+
+        Removed jobs are eventually dropped from the heaps
+        """
+        queue = JobSubmitQueue()
+        for jobID in range(5000):
+            queue.add(jobID, jobID % 7, "Processing", ["T2_CH_CERN", "T1_US_FNAL"])
+        for jobID in range(5000):
+            if jobID % 4:
+                queue.remove(jobID)
+        self.assertEqual(len(queue), 1250)
+        self.assertLess(sum(len(heap) for heap in queue._heaps.values()), 5000)
+        jobIDs = [jobID for _, jobID in queue.iterJobs(set())]
+        self.assertEqual(jobIDs, sorted(range(0, 5000, 4), key=lambda x: (-(x % 7), x)))
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
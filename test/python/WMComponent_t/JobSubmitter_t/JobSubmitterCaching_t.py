@@ -208,6 +208,64 @@ class JobSubmitterCachingTest(EmulatedUnitTestCase):
                          "Error: The job cache should be empty.  Contains: %i" % len(mySubmitterPoller.jobDataCache))
         return
 
+    def testIncrementalCaching(self):
+        """
+        _testIncrementalCaching_
+
+        Verify that the incremental cache refresh picks up new jobs, that a full
+        refresh purges killed jobs and that site state changes update the cache in place.
+        """
+        config = self.createConfig()
+        config.JobSubmitter.incrementalRefresh = True
+        config.JobSubmitter.fullRefreshInterval = 1
+        mySubmitterPoller = JobSubmitterPoller(config)
+        mySubmitterPoller.getThresholds()
+        mySubmitterPoller.refreshCache()
+        self.assertEqual(len(mySubmitterPoller.jobDataCache), 0)
+
+        # incremental refresh
+        self.injectJobs()
+        mySubmitterPoller.refreshCache()
+        self.assertEqual(mySubmitterPoller.incrementalRefreshCount, 1)
+        self.assertEqual(len(mySubmitterPoller.jobDataCache), 20)
+
+        # full refresh
+        killWorkflow("wf001", jobCouchConfig=config)
+        mySubmitterPoller.refreshCache()
+        self.assertEqual(mySubmitterPoller.incrementalRefreshCount, 0)
+        self.assertEqual(len(mySubmitterPoller.jobDataCache), 10)
+
+        # jobs that can only run at an Aborted site are failed without rebuilding the cache
+        mySubmitterPoller.refreshCache()
+        self.assertEqual(len(mySubmitterPoller.jobDataCache), 10)
+        ResourceControl().changeSiteState("T1_UK_RAL", "Aborted")
+        mySubmitterPoller.getThresholds()
+        self.assertEqual(len(mySubmitterPoller.jobDataCache), 0)
+        self.assertEqual(mySubmitterPoller.incrementalRefreshCount, mySubmitterPoller.fullRefreshInterval)
+        return
+
+    def testIncrementalCachingKilledJobs(self):
+        """
+        _testIncrementalCachingKilledJobs_
+
+        Verify that the incremental cache refresh purges the jobs of workflows killed since the last refresh.
+        """
+        config = self.createConfig()
+        config.JobSubmitter.incrementalRefresh = True
+        config.JobSubmitter.fullRefreshInterval = 10
+        mySubmitterPoller = JobSubmitterPoller(config)
+        mySubmitterPoller.getThresholds()
+        mySubmitterPoller.refreshCache()
+        self.injectJobs()
+        mySubmitterPoller.refreshCache()
+        self.assertEqual(len(mySubmitterPoller.jobDataCache), 20)
+
+        killWorkflow("wf001", jobCouchConfig=config)
+        mySubmitterPoller.refreshCache()
+        self.assertEqual(mySubmitterPoller.incrementalRefreshCount, 2)
+        self.assertEqual(len(mySubmitterPoller.jobDataCache), 10)
+        return
+
 
 if __name__ == "__main__":
     unittest.main()
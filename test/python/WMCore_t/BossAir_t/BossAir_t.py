@@ -500,6 +500,45 @@ class BossAirTest(unittest.TestCase):
 
         return
 
+    def testC_TrackSomeJobs(self):
+        """
+        _TrackSomeJobs_
+
+        Check that only the jobs selected by wmbs or runjob id get tracked
+        """
+        config = self.getConfig()
+        baAPI = BossAirAPI(config=config, insertStates=True)
+
+        nJobs = 10
+        jobDummies = self.createDummyJobs(nJobs=nJobs, location='T3_US_Xanadu')
+        changeState = ChangeState(config)
+        changeState.propagate(jobDummies, 'created', 'new')
+        changeState.propagate(jobDummies, 'executing', 'created')
+        for job in jobDummies:
+            job['plugin'] = 'TestPlugin'
+            job['owner'] = 'tapas'
+        baAPI.submit(jobs=jobDummies)
+
+        # consecutive jobs, the TestPlugin completes all the jobs it tracks
+        baAPI.track(wmbsIDs=[job['id'] for job in jobDummies[:4]])
+        runningJobs = baAPI._listRunJobs(active=True)
+        self.assertEqual(len(runningJobs), nJobs - 4)
+        self.assertEqual(set(job['jobid'] for job in runningJobs), set(job['id'] for job in jobDummies[4:]))
+
+        runJobIDs = [job['id'] for job in runningJobs[:3]]
+        baAPI.track(runJobIDs=runJobIDs)
+        runningJobs = baAPI._listRunJobs(active=True)
+        self.assertEqual(len(runningJobs), nJobs - 7)
+        self.assertFalse(set(runJobIDs) & set(job['id'] for job in runningJobs))
+
+        # both filters at once
+        baAPI.track(runJobIDs=[runningJobs[0]['id']], wmbsIDs=[runningJobs[1]['jobid']])
+        self.assertEqual(len(baAPI._listRunJobs(active=True)), nJobs - 7)
+
+        self.assertEqual(len(baAPI.getComplete()), 7)
+
+        return
+
     def testG_monitoringDAO(self):
         """
         _monitoringDAO_
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""
+_CondorEventTracker_t_
+
+Unit tests for the job event log tracking, using a recorded schedd event log
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from WMCore.BossAir.CondorEventTracker import CondorEventTracker
+
+
+def getTestFile(partialPath):
+    """
+    Returns the absolute path for the test data file
+    """
+    normPath = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+    return os.path.join(normPath, partialPath)
+
+
+class CondorEventTrackerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.testDir = tempfile.mkdtemp()
+        self.eventLog = os.path.join(self.testDir, 'EventLog')
+        with open(getTestFile('data/WMCore/BossAir/condorEventLog.txt')) as fd:
+            # the recorded events, without their '...' separator
+            self.events = [event + '...\n' for event in fd.read().split('...\n') if event]
+        self.writeEvents(self.events[:2])
+
+    def tearDown(self):
+        shutil.rmtree(self.testDir)
+
+    def writeEvents(self, events):
+        with open(self.eventLog, 'a') as fd:
+            fd.write(''.join(events))
+
+    def testIncrementalTracking(self):
+        """Events written after the full query are applied to the known jobs"""
+        tracker = CondorEventTracker(self.eventLog)
+        self.assertIsNone(tracker.getJobInfo([]))
+
+        # events before the full query are skipped
+        tracker.startFullTrack()
+        tracker.setJobInfo({'1001.0': (1, None), '1001.1': (1, None)})
+        self.writeEvents(self.events[2:])
+        jobInfo = tracker.getJobInfo(['1001.0', '1001.1', '1001.2'])
+        # 2002.0 was submitted by another schedd user
+        self.assertEqual(jobInfo, {'1001.0': (4, 'T2_CH_CERN'), '1001.1': (1, None), '1001.2': (3, None)})
+
+        # unknown jobs and expired reconciliation intervals require a full query
+        tracker.forget(['1001.0', '2002.0'])
+        self.assertIsNone(tracker.getJobInfo(['1001.0']))
+        self.assertEqual(len(tracker.getJobInfo(['1001.1'])), 2)
+        tracker.lastFullTrack -= tracker.fullTrackInterval + 1
+        self.assertIsNone(tracker.getJobInfo(['1001.1']))
+
+    def testSavedPosition(self):
+        """The event log position survives a restart"""
+        stateFile = os.path.join(self.testDir, 'state.pkl')
+        tracker = CondorEventTracker(self.eventLog, stateFile=stateFile)
+        tracker.startFullTrack()
+        tracker.setJobInfo({})
+        self.assertTrue(os.path.isfile(stateFile))
+
+        self.writeEvents(self.events[2:4])
+        tracker = CondorEventTracker(self.eventLog, stateFile=stateFile)
+        tracker.reader = tracker._openReader()
+        self.assertEqual(tracker.update(), 2)
+        self.assertEqual(tracker.jobInfo, {})
+        self.assertEqual(tracker.newJobs, {'1001.2': (1, None), '2002.0': (1, None)})
+
+        # a missing event log disables the tracking until the next reconciliation
+        tracker = CondorEventTracker(os.path.join(self.testDir, 'missing'))
+        tracker.startFullTrack()
+        tracker.setJobInfo({'1001.0': (1, None)})
+        self.assertIsNone(tracker.getJobInfo(['1001.0']))
+
+    def testRunningWithoutLocation(self):
+        """Running jobs without a location in the event log require a full query"""
+        tracker = CondorEventTracker(self.eventLog)
+        tracker.startFullTrack()
+        tracker.setJobInfo({'1001.0': (1, None), '1001.1': (1, None)})
+        # 1001.0 starts running, with its job ad information event
+        self.writeEvents(self.events[2:6])
+        self.assertEqual(tracker.getJobInfo(['1001.0', '1001.1']),
+                         {'1001.0': (2, 'T2_CH_CERN'), '1001.1': (1, None)})
+        # 1001.1 starts running, without it
+        self.writeEvents(self.events[6:7])
+        self.assertIsNone(tracker.getJobInfo(['1001.0', '1001.1']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -11,19 +11,23 @@ from future.utils import viewitems
 
 import os.path
 import re
+import shutil
+import tempfile
 import threading
 import time
 import unittest
 from subprocess import Popen, PIPE
 
+import mock
 from WMCore_t.BossAir_t.BossAir_t import BossAirTest, getCondorRunningJobs
 from nose.plugins.attrib import attr
 
 from WMComponent.JobSubmitter.JobSubmitterPoller import JobSubmitterPoller
 from WMComponent.JobTracker.JobTrackerPoller import JobTrackerPoller
 from WMCore.BossAir.BossAirAPI import BossAirAPI
+from WMCore.BossAir.CondorEventTracker import CondorEventTracker
 from WMCore.BossAir.StatusPoller import StatusPoller
-from WMCore.BossAir.Plugins.SimpleCondorPlugin import activityToType
+from WMCore.BossAir.Plugins.SimpleCondorPlugin import SimpleCondorPlugin, activityToType
 from WMCore.JobStateMachine.ChangeState import ChangeState
 
 
@@ -468,5 +472,72 @@ class SimpleCondorPluginTest(BossAirTest):
 
 
 
+class SimpleCondorPluginTrackTest(unittest.TestCase):
+    """
+    _SimpleCondorPluginTrackTest_
+
+    Job tracking from the schedd job event log, with a mocked schedd
+    """
+
+    def setUp(self):
+        self.testDir = tempfile.mkdtemp()
+        self.eventLog = os.path.join(self.testDir, 'EventLog')
+        eventFile = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'data/WMCore/BossAir/condorEventLog.txt')
+        with open(eventFile) as fd:
+            self.events = [event + '...\n' for event in fd.read().split('...\n') if event]
+        self.writeEvents(self.events[:2])
+
+        # only the attributes used by track
+        self.plugin = SimpleCondorPlugin.__new__(SimpleCondorPlugin)
+        self.plugin.agent = 'WMAgent'
+        self.plugin.eventTracker = CondorEventTracker(self.eventLog)
+
+    def tearDown(self):
+        shutil.rmtree(self.testDir)
+
+    def writeEvents(self, events):
+        with open(self.eventLog, 'a') as fd:
+            fd.write(''.join(events))
+
+    def testTrackFromEventLog(self):
+        """
+        The schedd is only queried for the reconciliations, the job status
+        changes are otherwise taken from the job event log
+        """
+        jobs = [{'jobid': 1, 'gridid': '1001.0', 'status': 'Idle', 'location': None},
+                {'jobid': 2, 'gridid': '1001.1', 'status': 'Idle', 'location': None}]
+        with mock.patch('WMCore.BossAir.Plugins.SimpleCondorPlugin.htcondor.Schedd') as schedd:
+            query = schedd.return_value.query
+            query.return_value = [{'ClusterId': 1001, 'ProcId': 0, 'JobStatus': 1},
+                                  {'ClusterId': 1001, 'ProcId': 1, 'JobStatus': 1}]
+            running, changed, completed = self.plugin.track(jobs)
+            self.assertEqual((len(running), len(changed), len(completed)), (2, 0, 0))
+            self.assertEqual(query.call_count, 1)
+
+            # 1001.0 starts running at CERN, from the event log only
+            self.writeEvents(self.events[2:6])
+            running, changed, completed = self.plugin.track(jobs)
+            self.assertEqual(query.call_count, 1)
+            self.assertEqual([job['gridid'] for job in changed], ['1001.0'])
+            self.assertEqual((jobs[0]['status'], jobs[0]['location']), ('Running', 'T2_CH_CERN'))
+
+            # 1001.1 starts running without a location in the event log: reconciliation
+            self.writeEvents(self.events[6:8])
+            query.return_value = [{'ClusterId': 1001, 'ProcId': 1, 'JobStatus': 2,
+                                   'MachineAttrGLIDEIN_CMSSite0': 'T2_US_UCSD'}]
+            running, changed, completed = self.plugin.track(jobs)
+            self.assertEqual(query.call_count, 2)
+            self.assertEqual([job['gridid'] for job in completed], ['1001.0'])
+            self.assertEqual([job['gridid'] for job in running], ['1001.1'])
+            self.assertEqual((jobs[1]['status'], jobs[1]['location']), ('Running', 'T2_US_UCSD'))
+            self.assertNotIn('1001.0', self.plugin.eventTracker.jobInfo)
+
+            # a held job, from the event log
+            self.writeEvents(self.events[8:9])
+            running, changed, completed = self.plugin.track(jobs[1:])
+            self.assertEqual(query.call_count, 2)
+            self.assertEqual(jobs[1]['status'], 'Held')
+
+
 if __name__ == '__main__':
     unittest.main()
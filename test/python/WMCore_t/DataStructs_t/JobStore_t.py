@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+"""
+_JobStore_t_
+
+Unittests for the job object store backends
+"""
+
+import os
+import shutil
+import unittest
+
+from WMQuality.TestInit import TestInit
+
+from WMCore.DataStructs.Job import Job
+from WMCore.DataStructs.JobStore import (getJobStore, loadJobs, JobStoreException,
+                                         SQLITE_FILE_NAME, PICKLE_FILE_NAME)
+
+
+class JobStoreTest(unittest.TestCase):
+    def setUp(self):
+        """
+        _setUp_
+
+        Create a work directory with two job collections
+        """
+        self.testInit = TestInit(__file__)
+        self.testDir = self.testInit.generateWorkDir()
+        return
+
+    def tearDown(self):
+        self.testInit.delWorkDir()
+
+    def createJobs(self, collection, jobIDs):
+        """
+        _createJobs_
+
+        Create jobs with a cache directory in the given job collection
+        """
+        jobs = []
+        for jobID in jobIDs:
+            newJob = Job("Job%s" % jobID)
+            newJob["id"] = jobID
+            newJob["cache_dir"] = os.path.join(self.testDir, collection, "job_%s" % jobID)
+            newJob["possiblePSN"] = {"T2_CH_CERN", "T1_US_FNAL"}
+            newJob["sandbox"] = "/path/to/%s/sandbox.tar.bz2" % collection
+            newJob["swVersion"] = ["CMSSW_13_0_0"]
+            newJob["scramArch"] = ["el8_amd64_gcc11"]
+            setattr(newJob.getBaggage(), "seed1", jobID)
+            os.makedirs(newJob["cache_dir"])
+            jobs.append(newJob)
+        return jobs
+
+    def testSQLiteStore(self):
+        """
+        _testSQLiteStore_
+
+        Verify that jobs are saved once per job collection and loaded back in bulk
+        """
+        jobsA = self.createJobs("JobCollection_1_0", range(1, 11))
+        jobsB = self.createJobs("JobCollection_2_0", range(11, 16))
+        jobStore = getJobStore("sqlite")
+        jobStore.save(jobsA + jobsB)
+
+        # saving must not strip the workflow information from the jobs
+        self.assertEqual(jobsA[0]["sandbox"], "/path/to/JobCollection_1_0/sandbox.tar.bz2")
+        for collection in ("JobCollection_1_0", "JobCollection_2_0"):
+            self.assertTrue(os.path.isfile(os.path.join(self.testDir, collection, SQLITE_FILE_NAME)))
+        self.assertFalse(os.path.exists(os.path.join(jobsA[0]["cache_dir"], PICKLE_FILE_NAME)))
+
+        cacheDirs = {job["id"]: job["cache_dir"] for job in jobsA + jobsB}
+        cacheDirs[99] = os.path.join(self.testDir, "JobCollection_1_0", "job_99")
+        loadedJobs, missingJobs, failedJobs = jobStore.load(cacheDirs)
+        self.assertEqual(set(loadedJobs), set(range(1, 16)))
+        self.assertEqual(missingJobs, {99})
+        self.assertEqual(failedJobs, set())
+        for job in jobsA + jobsB:
+            loadedJob = loadedJobs[job["id"]]
+            self.assertEqual(loadedJob["name"], job["name"])
+            self.assertEqual(loadedJob["sandbox"], job["sandbox"])
+            self.assertEqual(loadedJob["swVersion"], ["CMSSW_13_0_0"])
+            self.assertEqual(loadedJob["possiblePSN"], {"T2_CH_CERN", "T1_US_FNAL"})
+            self.assertEqual(loadedJob.getBaggage().seed1, job["id"])
+        return
+
+    def testLoadJobs(self):
+        """
+        _testLoadJobs_
+
+        Verify that jobs are loaded from either backend, and failures are reported
+        """
+        sqliteJobs = self.createJobs("JobCollection_1_0", range(1, 6))
+        pickleJobs = self.createJobs("JobCollection_1_1", range(6, 11))
+        getJobStore("sqlite").save(sqliteJobs)
+        getJobStore("pickle").save(pickleJobs)
+        with open(os.path.join(pickleJobs[-1]["cache_dir"], PICKLE_FILE_NAME), "w") as badFile:
+            badFile.write("not a pickle")
+        shutil.rmtree(pickleJobs[-2]["cache_dir"])
+
+        loadedJobs, missingJobs, failedJobs = loadJobs({job["id"]: job["cache_dir"]
+                                                        for job in sqliteJobs + pickleJobs})
+        self.assertEqual(set(loadedJobs), set(range(1, 9)))
+        self.assertEqual(missingJobs, {9})
+        self.assertEqual(failedJobs, {10})
+        self.assertEqual(loadedJobs[7]["sandbox"], "/path/to/JobCollection_1_1/sandbox.tar.bz2")
+
+        with self.assertRaises(JobStoreException):
+            getJobStore("lmdb")
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
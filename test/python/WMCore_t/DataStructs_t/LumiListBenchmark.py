@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+"""
+_LumiListBenchmark_
+
+Compare the linear merge / bisect based LumiList set algebra against the
+previous nested-loop implementation, on lumi masks with many runs and lumis.
+Not a unit test, run it by hand:
+
+    python LumiListBenchmark.py [nRuns] [nRangesPerRun]
+"""
+
+from __future__ import print_function, division
+
+import random
+import sys
+import time
+
+from WMCore.DataStructs.LumiList import LumiList
+
+
+def legacySub(aList, bList):
+    """
+    Previous implementation of LumiList.__sub__, on compact list dicts
+    """
+    result = {}
+    for run in sorted(aList):
+        alist = []
+        blumis = sorted(bList.get(run, []))
+        for alumi in sorted(aList[run]):
+            tmplist = [alumi[0], alumi[1]]
+            for blumi in blumis:
+                if blumi[0] <= tmplist[0] and blumi[1] >= tmplist[1]:
+                    tmplist = []
+                    break
+                if blumi[0] > tmplist[0] and blumi[1] < tmplist[1]:
+                    alist.append([tmplist[0], blumi[0] - 1])
+                    tmplist = [blumi[1] + 1, tmplist[1]]
+                elif blumi[0] <= tmplist[0] and tmplist[0] <= blumi[1] < tmplist[1]:
+                    tmplist = [blumi[1] + 1, tmplist[1]]
+                elif tmplist[0] < blumi[0] <= tmplist[1] <= blumi[1]:
+                    alist.append([tmplist[0], blumi[0] - 1])
+                    tmplist = []
+                    break
+            if tmplist:
+                alist.append(tmplist)
+        result[run] = alist
+    return LumiList(compactList=result)
+
+
+def legacyAnd(aList, bList):
+    """
+    Previous implementation of LumiList.__and__, on compact list dicts
+    """
+    result = {}
+    for run in set(aList) & set(bList):
+        lumiList = []
+        for alumi in aList[run]:
+            for blumi in bList[run]:
+                if blumi[0] <= alumi[0] and blumi[1] >= alumi[1]:
+                    lumiList.append(list(alumi))
+                if blumi[0] > alumi[0] and blumi[1] < alumi[1]:
+                    lumiList.append(list(blumi))
+                elif blumi[0] <= alumi[0] and alumi[0] <= blumi[1] < alumi[1]:
+                    lumiList.append([alumi[0], blumi[1]])
+                elif alumi[0] < blumi[0] <= alumi[1] <= blumi[1]:
+                    lumiList.append([blumi[0], alumi[1]])
+        result[run] = lumiList
+    return LumiList(compactList=result)
+
+
+def legacyContains(aList, run, lumi):
+    """
+    Previous implementation of LumiList.contains, on compact list dicts
+    """
+    for lumiRange in aList.get(str(run), []):
+        if lumiRange[0] <= lumi and (0 == lumiRange[1] or lumi <= lumiRange[1]):
+            return True
+    return False
+
+
+def makeLumiList(nRuns, nRanges, seed):
+    """
+    Build a LumiList with nRuns runs, each made of roughly nRanges lumi ranges
+    """
+    rng = random.Random(seed)
+    compact = {}
+    for run in range(1, nRuns + 1):
+        lumi = 1
+        ranges = []
+        for _ in range(nRanges):
+            lumi += rng.randint(1, 5)
+            end = lumi + rng.randint(0, 20)
+            ranges.append([lumi, end])
+            lumi = end + 1
+        compact[str(run)] = ranges
+    return LumiList(compactList=compact)
+
+
+def timeIt(label, func, *args):
+    """
+    Run func(*args), print and return its wall clock time
+    """
+    start = time.time()
+    res = func(*args)
+    runtime = time.time() - start
+    print("  %-28s %8.3f s" % (label, runtime))
+    return runtime, res
+
+
+def main():
+    nRuns = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    nRanges = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    aList = makeLumiList(nRuns, nRanges, 1)
+    bList = makeLumiList(nRuns, nRanges, 2)
+    rng = random.Random(3)
+    lookups = [(rng.randint(1, nRuns), rng.randint(1, nRanges * 20)) for _ in range(200000)]
+    print("%d runs, %d ranges per run, %d lookups" % (nRuns, nRanges, len(lookups)))
+
+    print("a - b")
+    tOld, oldRes = timeIt("legacy", legacySub, aList.getCompactList(), bList.getCompactList())
+    tNew, newRes = timeIt("linear merge", aList.__sub__, bList)
+    assert oldRes.getCompactList() == newRes.getCompactList()
+    print("  speedup x%.1f" % (tOld / max(tNew, 1e-6)))
+
+    print("a & b")
+    tOld, oldRes = timeIt("legacy", legacyAnd, aList.getCompactList(), bList.getCompactList())
+    tNew, newRes = timeIt("linear merge", aList.__and__, bList)
+    assert oldRes.getCompactList() == newRes.getCompactList()
+    print("  speedup x%.1f" % (tOld / max(tNew, 1e-6)))
+
+    print("a | b")
+    timeIt("linear merge", aList.__or__, bList)
+
+    print("contains")
+    compact = aList.getCompactList()
+    tOld, oldRes = timeIt("legacy", lambda: [legacyContains(compact, r, l) for r, l in lookups])
+    tNew, newRes = timeIt("bisect", lambda: [aList.contains(r, l) for r, l in lookups])
+    assert oldRes == newRes
+    print("  speedup x%.1f" % (tOld / max(tNew, 1e-6)))
+
+
+if __name__ == '__main__':
+    main()
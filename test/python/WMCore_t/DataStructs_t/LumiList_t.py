@@ -369,6 +369,46 @@ class LumiListTest(unittest.TestCase):
 
         self.assertEqual(c1.getCMSSWString(), w2.getCMSSWString())
 
+    def testOperandsUnchanged(self):
+        """
+        Set operations must not modify the ranges of their operands
+        """
+        alumis = {'1': list(range(2, 20)) + list(range(31, 39)),
+                  '2': list(range(6, 20)) + list(range(30, 40))}
+        blumis = {'1': list(range(1, 6)) + list(range(16, 33)),
+                  '3': list(range(10, 35))}
+        a = LumiList(runsAndLumis=alumis)
+        b = LumiList(runsAndLumis=blumis)
+        aCompact = {'1': [[2, 19], [31, 38]], '2': [[6, 19], [30, 39]]}
+        bCompact = {'1': [[1, 5], [16, 32]], '3': [[10, 34]]}
+
+        self.assertEqual((a | b).getCompactList(), {'1': [[1, 38]], '2': [[6, 19], [30, 39]], '3': [[10, 34]]})
+        self.assertEqual((a & b).getCompactList(), {'1': [[2, 5], [16, 19], [31, 32]]})
+        self.assertEqual((a - b).getCompactList(), {'1': [[6, 15], [33, 38]], '2': [[6, 19], [30, 39]]})
+        self.assertEqual((b - a).getCompactList(), {'1': [[1, 1], [20, 30]], '3': [[10, 34]]})
+        self.assertEqual(a.getCompactList(), aCompact)
+        self.assertEqual(b.getCompactList(), bCompact)
+
+    def testContainsOpenRange(self):
+        """
+        Test contains and filterLumis lookups, including ranges open until the end of the run
+        """
+        lumiList = LumiList(compactList={'1': [[1, 10], [20, 30]], '2': [[50, 0]]})
+        self.assertTrue(lumiList.contains(1, 1))
+        self.assertTrue(lumiList.contains((1, 25)))
+        self.assertFalse(lumiList.contains(1, 15))
+        self.assertFalse(lumiList.contains(1, 31))
+        self.assertFalse(lumiList.contains(3, 1))
+        self.assertTrue(lumiList.contains(2, 5000))
+        self.assertFalse(lumiList.contains(2, 49))
+        self.assertTrue((1, 10) in lumiList)
+
+        # index must follow changes to the run ranges
+        lumiList.getCompactList()['1'] = [[11, 15]]
+        self.assertTrue(lumiList.contains(1, 15))
+        self.assertFalse(lumiList.contains(1, 1))
+        self.assertEqual(lumiList.filterLumis([(1, 10), (1, 11), (2, 60), (3, 1)]), [(1, 11)])
+
 
 if __name__ == '__main__':
     unittest.main()
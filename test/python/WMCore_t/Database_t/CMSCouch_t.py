@@ -368,6 +368,42 @@ class CMSCouchTest(unittest.TestCase):
 
         return
 
+    def testBulkCommit(self):
+        """
+        Test the pipelined bulk commit of the queued documents
+        """
+        for idx in range(100):
+            self.db.queue(Document(id=str(idx), inputDict={'foo': idx}))
+        answer = self.db.bulkCommit(batchSize=10, maxInFlight=3)
+        self.assertEqual(100, len(answer))
+        self.assertEqual(0, self.db.getQueueSize())
+        self.assertEqual([str(idx) for idx in range(100)], [row['id'] for row in answer])
+        self.assertTrue(all(row.get('ok') for row in answer))
+
+        # conflicts are classified and handed over all at once
+        conflicts = []
+
+        def conflictHandler(db, docs, results):
+            conflicts.append([doc['_id'] for doc in docs])
+            revs = {row['id']: row['value']['rev'] for row in db.allDocs(keys=[doc['_id'] for doc in docs])['rows']}
+            for doc in docs:
+                doc['_rev'] = revs[doc['_id']]
+            return db.bulkCommit(docs=docs)
+
+        docs = [Document(id=str(idx), inputDict={'foo': -idx}) for idx in range(95, 105)]
+        answer = self.db.bulkCommit(docs=docs, batchSize=3)
+        self.assertEqual(sorted(self.db.classifyBulkResults(answer)['conflict']), list(range(5)))
+        answer = self.db.bulkCommit(docs=docs, batchSize=3, conflictHandler=conflictHandler)
+        self.assertEqual(conflicts, [[str(idx) for idx in range(95, 105)]])
+        self.assertTrue(all(row.get('ok') for row in answer))
+        self.assertEqual(self.db.document('99')['foo'], -99)
+
+        stats = self.db.getBulkStats()
+        self.assertEqual(stats['docs'], 130)
+        self.assertEqual(stats['conflicts'], 15)
+        self.assertEqual(stats['failedRequests'], 0)
+        return
+
     def testUpdateHandler(self):
         """
         Test that update function support works
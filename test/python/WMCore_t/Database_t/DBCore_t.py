@@ -316,5 +316,44 @@ class DBCoreTest(unittest.TestCase):
 
         return
 
+    def testFetchModes(self):
+        """
+        _testFetchModes_
+
+        Verify the streaming and columnar fetch modes of processData.
+        """
+        insertSQL = "INSERT INTO test_tablea VALUES (:bind1, :bind2, :bind3)"
+        selectSQL = "SELECT column1, column2, column3 FROM test_tablea WHERE column1 = :bind1"
+        binds = [{"bind1": i, "bind2": 2 * i, "bind3": "value%d" % i} for i in range(25)]
+
+        myThread = threading.currentThread()
+        myThread.dbi.processData(insertSQL, binds)
+
+        streams = myThread.dbi.processData("SELECT column1, column2, column3 FROM test_tablea",
+                                           fetchMode='stream', chunkSize=10)
+        self.assertEqual(len(streams), 1)
+        self.assertEqual([key.lower() for key in streams[0].keys], ["column1", "column2", "column3"])
+        rows = list(streams[0])
+        self.assertEqual(len(rows), 25)
+        self.assertTrue(all(isinstance(row, tuple) for row in rows))
+        self.assertTrue(streams[0].closed)
+
+        # one stream per set of binds, all served by the same connection
+        streams = myThread.dbi.processData(selectSQL, binds[:3], fetchMode='stream')
+        self.assertEqual(len(streams), 3)
+        self.assertEqual([row[0] for stream in streams for row in stream],
+                         [0, 1, 2])
+
+        columnar = myThread.dbi.processData("SELECT column1, column2, column3 FROM test_tablea",
+                                            fetchMode='columnar', chunkSize=10)
+        self.assertEqual(len(columnar[0]), 25)
+        columns = columnar[0].asDict()
+        self.assertEqual(sorted(columns[columnar[0].keys[1]]), list(range(0, 50, 2)))
+        self.assertEqual(sorted(columnar[0].fetchall()),
+                         [(i, 2 * i, "value%d" % i) for i in range(25)])
+
+        self.assertRaises(ValueError, myThread.dbi.processData, selectSQL, binds[0], fetchMode='rows')
+        return
+
 if __name__ == "__main__":
     unittest.main()
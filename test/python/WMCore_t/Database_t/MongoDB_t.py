@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""
+Unit tests for the MongoDB write-behind buffer, using mongomock
+"""
+
+import logging
+import threading
+import unittest
+
+import mongomock
+from pymongo import IndexModel
+from pymongo.errors import NotPrimaryError
+
+from WMCore.Database.MongoDB import MongoWriteBehind
+
+
+class MongoWriteBehindTest(unittest.TestCase):
+
+    def setUp(self):
+        self.logger = logging.getLogger()
+        self.coll = mongomock.MongoClient().testDB.testColl
+        self.coll.create_indexes([IndexModel('RequestName', unique=True)])
+        self.coll.insert_one({'_id': 'existing', 'RequestName': 'existing', 'Status': 'done'})
+
+    def testCoalescing(self):
+        """Writes of the same document are coalesced, with the write semantics kept"""
+        writer = MongoWriteBehind(self.coll, logger=self.logger, background=False)
+        doc = {'_id': 'wf1', 'RequestName': 'wf1', 'Status': 'new'}
+        writer.insert(doc)
+        doc.clear()
+        writer.update({'_id': 'wf1'}, {'Status': 'pending'})
+        writer.insert({'_id': 'existing', 'RequestName': 'existing', 'Status': 'new'})
+        writer.update({'_id': 'wf2'}, {'Status': 'pending'},
+                      insertDoc={'_id': 'wf2', 'RequestName': 'wf2', 'Status': 'new', 'Size': 1})
+        writer.replace({'RequestName': 'wf3'}, {'RequestName': 'wf3', 'Status': 'new'})
+        writer.update({'RequestName': 'wf3'}, {'Status': 'done'})
+        self.assertEqual(self.coll.count_documents({}), 1)
+
+        stats = writer.flush()
+        self.assertEqual((stats['queued'], stats['coalesced'], stats['written'], stats['duplicates']), (6, 2, 3, 1))
+        self.assertEqual((stats['batches'], stats['pending'], stats['failed']), (1, 0, 0))
+        docs = {doc['RequestName']: doc for doc in self.coll.find({}, {'_id': False})}
+        self.assertEqual(docs, {'existing': {'RequestName': 'existing', 'Status': 'done'},
+                                'wf1': {'RequestName': 'wf1', 'Status': 'pending'},
+                                'wf2': {'RequestName': 'wf2', 'Status': 'pending', 'Size': 1},
+                                'wf3': {'RequestName': 'wf3', 'Status': 'done'}})
+
+    def testBackpressureAndRetries(self):
+        """Writers block beyond maxPending, connection failures are retried"""
+        writer = MongoWriteBehind(self.coll, logger=self.logger, maxPending=5, batchSize=2, flushInterval=0.01)
+        calls = []
+        bulkWrite = self.coll.bulk_write
+
+        def flakyBulkWrite(requests, ordered=True):
+            calls.append(len(requests))
+            if len(calls) == 1:
+                raise NotPrimaryError("not primary")
+            return bulkWrite(requests, ordered=ordered)
+
+        self.coll.bulk_write = flakyBulkWrite
+        threads = [threading.Thread(target=lambda idx=idx: [writer.insert({'_id': 'wf%d-%d' % (idx, num),
+                                                                           'RequestName': 'wf%d-%d' % (idx, num)})
+                                                            for num in range(10)])
+                   for idx in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        writer.close()
+
+        stats = writer.getStats()
+        self.assertEqual(self.coll.count_documents({}), 31)
+        self.assertEqual((stats['written'], stats['retried'], stats['failed'], stats['pending']), (30, 2, 0, 0))
+        self.assertTrue(stats['backpressure_waits'] > 0)
+        self.assertEqual(stats['last_error'], "not primary")
+        self.assertTrue(max(calls) <= 2)
+        self.assertRaises(RuntimeError, writer.insert, {'_id': 'late'})
+
+
+if __name__ == '__main__':
+    unittest.main()
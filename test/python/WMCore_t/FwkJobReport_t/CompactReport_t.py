@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""
+_CompactReport_t_
+
+Unit tests for the compact job report format
+"""
+
+import os
+import pickle
+import tempfile
+import unittest
+
+from WMCore.FwkJobReport.CompactReport import LazyConfigSection, isCompactReport
+from WMCore.FwkJobReport.Report import Report
+from WMCore.WMBase import getTestBase
+
+
+class CompactReportTest(unittest.TestCase):
+    """
+    _CompactReportTest_
+
+    Unit tests for the compact job report format
+    """
+
+    def setUp(self):
+        self.xmlPath = os.path.join(getTestBase(), "WMCore_t/FwkJobReport_t/CMSSWProcessingReport.xml")
+        self.tempDir = tempfile.mkdtemp()
+        self.report = Report("cmsRun1")
+        self.report.parse(self.xmlPath)
+        self.report.setTaskName("/TestWorkload/TestTask")
+        self.report.setJobID(12)
+        self.report._setSiteName("T2_CH_CERN")
+        self.report.addStep("stageOut1", status=0)
+        self.report.addError("stageOut1", 60307, "StageOutFailure", "Failed to stage out")
+
+    def tearDown(self):
+        for fileName in os.listdir(self.tempDir):
+            os.remove(os.path.join(self.tempDir, fileName))
+        os.rmdir(self.tempDir)
+
+    def saveAndLoad(self, report):
+        """
+        Persist the report in both formats, return both reports loaded back
+        """
+        picklePath = os.path.join(self.tempDir, "Report.pkl")
+        compactPath = os.path.join(self.tempDir, "Report.compact.pkl")
+        report.persist(picklePath)
+        report.persist(compactPath, compact=True)
+        self.assertFalse(isCompactReport(picklePath))
+        self.assertTrue(isCompactReport(compactPath))
+
+        pickleReport = Report()
+        pickleReport.load(picklePath)
+        compactReport = Report()
+        compactReport.load(compactPath)
+        return pickleReport, compactReport
+
+    def testLazyLoading(self):
+        """
+        Summary information does not decode the output and performance sections
+        """
+        pickleReport, compactReport = self.saveAndLoad(self.report)
+        self.assertIsInstance(compactReport.data, LazyConfigSection)
+        self.assertEqual(compactReport.listSteps(), ["cmsRun1", "stageOut1"])
+        self.assertEqual(compactReport.data._internal_lazy, {"cmsRun1": "root/cmsRun1",
+                                                             "stageOut1": "root/stageOut1"})
+
+        self.assertEqual(compactReport.getExitCode(), 60307)
+        self.assertEqual(compactReport.getSiteName(), "T2_CH_CERN")
+        self.assertFalse(compactReport.taskSuccessful())
+        self.assertEqual(compactReport.getTaskName(), "/TestWorkload/TestTask")
+        self.assertEqual(compactReport.getJobID(), 12)
+        self.assertEqual(set(compactReport.data.cmsRun1._internal_lazy), {"input", "output", "performance"})
+
+        outputFiles = compactReport.getAllFiles()
+        self.assertEqual(set(compactReport.data.cmsRun1._internal_lazy), {"input", "performance"})
+        self.assertEqual([(f["lfn"], f["events"], sorted(f["runs"])) for f in outputFiles],
+                         [(f["lfn"], f["events"], sorted(f["runs"])) for f in pickleReport.getAllFiles()])
+
+        self.assertEqual(compactReport.data.dictionary_whole_tree_(),
+                         pickleReport.data.dictionary_whole_tree_())
+        return
+
+    def testModifyAndPersist(self):
+        """
+        Lazily loaded reports can be modified and saved again, in both formats
+        """
+        _, compactReport = self.saveAndLoad(self.report)
+        compactReport.setJobID(13)
+        compactReport.setStepStatus("cmsRun1", 1)
+        del compactReport.data.stageOut1
+        compactReport.data.steps.remove("stageOut1")
+
+        pickleReport, compactReport = self.saveAndLoad(compactReport)
+        for report in (pickleReport, compactReport):
+            self.assertEqual(report.getJobID(), 13)
+            self.assertEqual(report.listSteps(), ["cmsRun1"])
+            self.assertFalse(report.taskSuccessful())
+            self.assertEqual(len(report.getAllFiles()), 2)
+        self.assertEqual(compactReport.data.dictionary_whole_tree_(),
+                         pickleReport.data.dictionary_whole_tree_())
+
+        # pickling a lazy section decodes it all, and leaves the file content behind
+        section = pickle.loads(pickle.dumps(compactReport.data.cmsRun1))
+        self.assertEqual(section._internal_lazy, {})
+        self.assertIsNone(section._internal_reader)
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
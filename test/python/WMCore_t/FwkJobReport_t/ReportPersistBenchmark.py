@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""
+_ReportPersistBenchmark_
+
+Compare loading framework job reports saved as a pickle and in the compact
+format, for what the JobAccountant needs: the job summary (exit code, site,
+success) and the output files. Not a unit test, run it by hand:
+
+    python ReportPersistBenchmark.py [nReports] [nFiles] [nLumisPerFile] [nMetrics]
+"""
+
+from __future__ import print_function, division
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from WMCore.FwkJobReport.Report import Report
+from WMCore_t.FwkJobReport_t.XMLParserBenchmark import writeReport
+
+
+def loadReports(paths, withFiles):
+    """
+    Load all the reports and query them, return the wall clock time and peak memory
+    """
+    tracemalloc.start()
+    start = time.time()
+    for path in paths:
+        report = Report()
+        report.load(path)
+        report.getExitCode()
+        report.getSiteName()
+        report.taskSuccessful()
+        if withFiles:
+            report.getAllFiles()
+    runtime = time.time() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return runtime, peak
+
+
+def main():
+    nReports = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    nFiles = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    nLumis = int(sys.argv[3]) if len(sys.argv) > 3 else 500
+    nMetrics = int(sys.argv[4]) if len(sys.argv) > 4 else 500
+
+    tempDir = tempfile.mkdtemp()
+    try:
+        xmlFile = os.path.join(tempDir, "FrameworkJobReport.xml")
+        with open(xmlFile, "w") as fd:
+            writeReport(fd, nFiles, nLumis, nMetrics)
+        report = Report("cmsRun1")
+        report.parse(xmlFile)
+        report._setSiteName("T2_CH_CERN")
+
+        paths = {"pickle": [], "compact": []}
+        for idx in range(nReports):
+            for label in paths:
+                path = os.path.join(tempDir, "Report.%s.%d.pkl" % (label, idx))
+                report.persist(path, compact=(label == "compact"))
+                paths[label].append(path)
+
+        print("%d reports, %d files with %d lumis each, %d metrics" % (nReports, nFiles, nLumis, nMetrics))
+        for label in paths:
+            print("  %-8s %8.1f kB per report" % (label, os.path.getsize(paths[label][0]) / 1e3))
+        for withFiles in (False, True):
+            print("load + exit code, site and status%s" % (" + output files" if withFiles else ""))
+            for label in paths:
+                runtime, peak = loadReports(paths[label], withFiles)
+                print("  %-8s %8.2f s  peak memory %8.1f MB" % (label, runtime, peak / 1e6))
+    finally:
+        shutil.rmtree(tempDir)
+
+
+if __name__ == '__main__':
+    main()
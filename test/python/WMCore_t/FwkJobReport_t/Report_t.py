@@ -17,7 +17,7 @@ from Utils import FileTools
 from Utils.PythonVersion import PY3
 
 from WMCore.Configuration import ConfigSection
-from WMCore.FwkJobReport.Report import Report
+from WMCore.FwkJobReport.Report import Report, errorSummaryPath, loadErrorSummaries
 from WMCore.WMBase import getTestBase
 from WMQuality.TestInitCouchApp import TestInitCouchApp
 
@@ -1073,6 +1073,40 @@ class ReportTest(unittest.TestCase):
         self.assertEqual(timing.get('TotalJobChildrenCPU'), 46.5806)
         self.assertEqual(procSummary.get('NumberBeginLumiCalls'), 118)
 
+    def testErrorSummary(self):
+        """
+        _testErrorSummary_
+
+        Test the error summary written next to a failed report, and its bulk loading
+        """
+        xmlPath = os.path.join(getTestBase(),
+                               "WMCore_t/FwkJobReport_t/CMSSWFailReport.xml")
+        myReport = Report("cmsRun1")
+        myReport.parse(xmlPath)
+        myReport.setStepStartTime("cmsRun1")
+        myReport.setStepStopTime("cmsRun1")
+        myReport.addError("stageOut1", 60403, "StageOutFailure", "Failure in stage out", siteName="T1_US_FNAL")
+        reportPath = os.path.join(self.testDir, "Report.0.pkl")
+        myReport.save(reportPath)
+        myReport.persistErrorSummary(reportPath)
+        self.assertEqual(errorSummaryPath(reportPath), os.path.join(self.testDir, "Report.0.summary.json"))
+
+        summaries = loadErrorSummaries([reportPath, os.path.join(self.testDir, "Report.1.pkl")])
+        self.assertEqual(list(summaries), [reportPath])
+        summary = summaries[reportPath]
+        times = myReport.getFirstStartLastStop()
+        self.assertEqual(summary["exitCodes"], sorted(myReport.getExitCodes()))
+        self.assertIn(60403, summary["exitCodes"])
+        self.assertEqual(summary["startTime"], times["startTime"])
+        self.assertEqual(summary["stopTime"], times["stopTime"])
+        self.assertEqual(summary["siteName"], "T1_US_FNAL")
+        self.assertIn("StageOutFailure", summary["errorTypes"])
+
+        # the summary of the reloaded report is the same
+        reloaded = Report()
+        reloaded.load(reportPath)
+        self.assertEqual(reloaded.getErrorSummary(), summary)
+
 
 if __name__ == "__main__":
     unittest.main()
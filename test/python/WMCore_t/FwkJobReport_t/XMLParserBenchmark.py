@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""
+_XMLParserBenchmark_
+
+Compare the wall clock time and the peak memory of parsing a large,
+synthetic framework job report with the default XML parser, which builds
+the node structure of the whole file first, and with the streaming one.
+Not a unit test, run it by hand:
+
+    python XMLParserBenchmark.py [nFiles] [nLumisPerFile] [nMetrics]
+"""
+
+from __future__ import print_function, division
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from WMCore.FwkJobReport.Report import Report
+
+
+def writeReport(fd, nFiles, nLumis, nMetrics):
+    """
+    Write a job report with nFiles input and output files, each with
+    nLumis lumi sections, and a PerformanceReport with nMetrics metrics
+    """
+    fd.write("<FrameworkJobReport>\n")
+    for idx in range(nFiles):
+        for tag, extra in (("InputFile", "<InputType>primaryFiles</InputType>\n"
+                                         "<InputSourceClass>PoolSource</InputSourceClass>\n"
+                                         "<EventsRead>%d</EventsRead>\n" % nLumis),
+                           ("File", "<OutputModuleClass>PoolOutputModule</OutputModuleClass>\n"
+                                    "<TotalEvents>%d</TotalEvents>\n<BranchHash>abc</BranchHash>\n" % nLumis)):
+            fd.write("<%s>\n<State Value=\"closed\"/>\n" % tag)
+            fd.write("<LFN>/store/data/Run2024/Benchmark/RAW/v1/%06d.root</LFN>\n" % idx)
+            fd.write("<PFN>root://eoscms.cern.ch//store/data/Run2024/Benchmark/RAW/v1/%06d.root</PFN>\n" % idx)
+            fd.write("<Catalog></Catalog>\n<ModuleLabel>%s</ModuleLabel>\n" % ("source" if tag == "InputFile" else "output"))
+            fd.write("<GUID>%032d</GUID>\n%s" % (idx, extra))
+            fd.write("<Branches>\n" + "".join("  <Branch>Branch%d_RECO.</Branch>\n" % b for b in range(20)) + "</Branches>\n")
+            fd.write("<Runs>\n<Run ID=\"%d\">\n" % (300000 + idx))
+            for lumi in range(1, nLumis + 1):
+                fd.write("   <LumiSection NEvents=\"1\" ID=\"%d\"/>\n" % lumi)
+            fd.write("</Run>\n</Runs>\n</%s>\n" % tag)
+    fd.write("<PerformanceReport>\n  <PerformanceSummary Metric=\"Timing\">\n")
+    for idx in range(nMetrics):
+        fd.write("    <Metric Name=\"Metric%d\" Value=\"%f\"/>\n" % (idx, idx / 3.0))
+    fd.write("  </PerformanceSummary>\n</PerformanceReport>\n")
+    fd.write("</FrameworkJobReport>\n")
+
+
+def parseReport(xmlFile, streaming):
+    """
+    Parse the report, return its wall clock time and peak memory
+    """
+    tracemalloc.start()
+    start = time.time()
+    report = Report("cmsRun1")
+    report.parse(xmlFile, streaming=streaming)
+    runtime = time.time() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return runtime, peak, report
+
+
+def main():
+    nFiles = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    nLumis = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    nMetrics = int(sys.argv[3]) if len(sys.argv) > 3 else 5000
+
+    with tempfile.NamedTemporaryFile("w", suffix=".xml", delete=False) as fd:
+        writeReport(fd, nFiles, nLumis, nMetrics)
+        xmlFile = fd.name
+    try:
+        print("FWJR with %d files, %d lumis per file, %d metrics: %.1f MB" %
+              (nFiles, nLumis, nMetrics, os.path.getsize(xmlFile) / 1e6))
+        results = {}
+        for label, streaming in (("node structure", False), ("streaming", True)):
+            runtime, peak, report = parseReport(xmlFile, streaming)
+            results[label] = report.data.dictionary_whole_tree_()
+            print("  %-16s %8.2f s  peak memory %8.1f MB" % (label, runtime, peak / 1e6))
+        assert results["node structure"] == results["streaming"]
+    finally:
+        os.remove(xmlFile)
+
+
+if __name__ == '__main__':
+    main()
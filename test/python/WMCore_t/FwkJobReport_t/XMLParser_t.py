@@ -15,7 +15,7 @@ from WMCore.FwkJobReport.XMLParser import perfSummaryHandler, perfRepHandler, \
         reportBuilder, reportDispatcher, inputFileHandler, fileHandler, \
         runHandler, branchHandler, inputAssocHandler, \
         perfCPUHandler, perfMemHandler, perfStoreHandler, castMetricValue
-from WMCore.FwkJobReport.Report import Report
+from WMCore.FwkJobReport.Report import Report, FwkJobReportException
 from WMCore.Algorithms.ParseXMLFile import xmlFileToNode
 from WMCore.WMBase import getTestBase
 
@@ -111,6 +111,32 @@ class XMLParserTest(unittest.TestCase):
         self.assertTrue(True, castMetricValue("true"))
         self.assertTrue("bla", castMetricValue("bla "))
 
+    def testStreamingParse(self):
+        """
+        The streaming parser builds the same reports as the default one
+        """
+        testData = os.path.join(getTestBase(), "WMCore_t/FwkJobReport_t")
+        for xmlName in sorted(os.listdir(testData)):
+            if not xmlName.endswith(".xml"):
+                continue
+            xmlFile = os.path.join(testData, xmlName)
+            report = Report("cmsRun1")
+            streamReport = Report("cmsRun1")
+            try:
+                report.parse(xmlFile)
+            except FwkJobReportException:
+                # corrupt reports fail in both modes, leaving the report untouched
+                self.assertRaises(FwkJobReportException, streamReport.parse, xmlFile, streaming=True)
+                self.assertEqual(streamReport.data.dictionary_whole_tree_(),
+                                 report.data.dictionary_whole_tree_(), xmlName)
+                self.assertEqual(streamReport.getExitCodes(), set(), xmlName)
+                streamReport.addError("cmsRun1", 134, "CmsRunFailure", "cmsRun crashed")
+                self.assertEqual(streamReport.getExitCode(), 134, xmlName)
+                self.assertEqual(streamReport.getAllFiles(), [], xmlName)
+                continue
+            streamReport.parse(xmlFile, streaming=True)
+            self.assertEqual(streamReport.data.dictionary_whole_tree_(),
+                             report.data.dictionary_whole_tree_(), xmlName)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,71 @@
+"""
+Unit tests for the bulk status transitions of the MSCore module
+"""
+
+# system modules
+import unittest
+
+# WMCore modules
+from WMCore.MicroService.MSCore.MSCore import MSCore
+
+
+class FakeReqMgr(object):
+    """
+    ReqMgr2 client recording the status transitions requested
+    """
+
+    def __init__(self, bulkSupported=True):
+        self.bulkSupported = bulkSupported
+        self.bulkCalls = []
+        self.singleCalls = []
+
+    def updateRequestsStatus(self, transitions, chunkSize=100):
+        if not self.bulkSupported:
+            raise RuntimeError("404 Not Found")
+        self.bulkCalls.append(dict(transitions))
+        return {name: "ERROR: Invalid status transition" if name == "wf2" else "OK" for name in transitions}
+
+    def updateRequestStatus(self, request, status):
+        self.singleCalls.append((request, status))
+        if request == "wf2":
+            raise RuntimeError("Invalid status transition")
+        if request == "wf4":
+            return [{request: "ERROR"}]
+        return [{request: "OK"}]
+
+
+class MSCoreTest(unittest.TestCase):
+    "Unit test for the MSCore module"
+
+    def setUp(self):
+        msConfig = {"enableStatusTransition": True, "statusTransitionBatchSize": 2}
+        self.msCore = MSCore(msConfig, skipReqMgr=True, skipReqMgrAux=True, skipRucio=True)
+        self.msCore.reqmgr2 = FakeReqMgr()
+
+    def testCommitChanges(self):
+        """Queued transitions are committed in chunks, with a result per request"""
+        for name in ("wf1", "wf2", "wf3"):
+            self.msCore.queueChange(name, "staging")
+        self.msCore.queueChange("wf3", "staged")
+        results = self.msCore.commitChanges()
+        self.assertEqual(results, {"wf1": True, "wf2": False, "wf3": True})
+        self.assertEqual(self.msCore.reqmgr2.bulkCalls, [{"wf1": "staging", "wf2": "staging"}, {"wf3": "staged"}])
+        self.assertEqual(self.msCore.commitChanges(), {})
+
+        # dry-run mode does not contact ReqMgr2
+        self.msCore.queueChange("wf4", "staging")
+        self.assertEqual(self.msCore.commitChanges(dryRun=True), {"wf4": True})
+        self.assertEqual(len(self.msCore.reqmgr2.bulkCalls), 2)
+
+    def testFallback(self):
+        """Requests are updated one by one if the bulk API is not available"""
+        self.msCore.reqmgr2 = FakeReqMgr(bulkSupported=False)
+        for name in ("wf1", "wf2", "wf3", "wf4"):
+            self.msCore.queueChange(name, "staged")
+        self.assertEqual(self.msCore.commitChanges(), {"wf1": True, "wf2": False, "wf3": True, "wf4": False})
+        self.assertEqual(self.msCore.reqmgr2.singleCalls,
+                         [("wf1", "staged"), ("wf2", "staged"), ("wf3", "staged"), ("wf4", "staged")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,7 +9,9 @@ from __future__ import division, print_function
 import json
 # system modules
 import os
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 
 # WMCore modules
 from WMCore.MicroService.MSRuleCleaner.MSRuleCleaner import MSRuleCleaner, MSRuleCleanerArchivalSkip
@@ -25,6 +27,25 @@ def getTestFile(partialPath):
     return os.path.join(normPath, partialPath)
 
 
+class SharedQueueLogDB(object):
+    """
+    LogDB deleting the docs through a single queue, committed and reset
+    by every call, as the CMSCouch Database object does
+    """
+
+    def __init__(self):
+        self._queue = []
+        self.committedBy = {}
+
+    def delete(self, request, agent=True):
+        self._queue.append(request)
+        time.sleep(0.1)
+        queued, self._queue = self._queue, []
+        for doc in queued:
+            self.committedBy[doc] = request
+        return None if request in queued else 'delete-error'
+
+
 # class MSRuleCleanerTest(EmulatedUnitTestCase):
 class MSRuleCleanerTest(unittest.TestCase):
     "Unit test for MSruleCleaner module"
@@ -428,6 +449,16 @@ class MSRuleCleanerTest(unittest.TestCase):
                       'PlineMarkers': ['plineAgentBlock', 'plineAgentCont']}
         self.assertFalse(self.msRuleCleaner._checkClean(wflowFlags))
 
+    def testConcurrentLogDBClean(self):
+        "Test the LogDB cleanup of workflows dispatched concurrently"
+        self.msRuleCleaner.msConfig['enableRealMode'] = True
+        self.msRuleCleaner.logDB = SharedQueueLogDB()
+        wflows = [{'RequestName': 'wflow_%d' % idx} for idx in range(2)]
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = list(executor.map(self.msRuleCleaner._cleanLogDB, wflows))
+        self.assertEqual(results, [True, True])
+        self.assertEqual(self.msRuleCleaner.logDB.committedBy, {'wflow_0': 'wflow_0', 'wflow_1': 'wflow_1'})
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,9 +1,11 @@
 """
 Unit tests for the WMCore/MicroService/DataStructs/NanoWorkflow module
 """
+import threading
+import time
 import unittest
 
-from WMCore.MicroService.MSTransferor.RequestInfo import isNanoWorkflow, rsesIntersection
+from WMCore.MicroService.MSTransferor.RequestInfo import RequestInfo, isNanoWorkflow, rsesIntersection
 
 
 class RequestInfoTest(unittest.TestCase):
@@ -60,6 +62,39 @@ class RequestInfoTest(unittest.TestCase):
         rses = [['aaa', 'bbb', 'ccc'], ['ddd']]
         self.assertEqual([], rsesIntersection(rses))
 
+    def testDiscover(self):
+        """
+        Test that data discovery lookups are shared by the workflows of a cycle
+        """
+        msConfig = {"openRunning": 0, "reqmgr2Url": "https://cmsweb.cern.ch/reqmgr2"}
+        reqInfo = RequestInfo(msConfig, None, None)
+        calls = []
+
+        def fetch(keys):
+            calls.append(sorted(keys))
+            time.sleep(0.1)
+            return {key: None if key == "bad" else key.upper() for key in keys if key != "none"}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(reqInfo._discover("kind", ["a", "b"], fetch)))
+                   for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [{"a": "A", "b": "B"}] * 3)
+        self.assertEqual(calls, [["a", "b"]])
+
+        # keys not found are kept, failures are looked up again
+        result = reqInfo._discover("kind", ["a", "bad", "none"], fetch)
+        self.assertEqual(result, {"a": "A", "bad": None})
+        self.assertEqual(reqInfo._discover("kind", ["bad", "none"], fetch), {"bad": None})
+        self.assertEqual(calls[1:], [["bad", "none"], ["bad"]])
+
+        reqInfo.clearDiscoveryCache()
+        reqInfo._discover("kind", ["a"], fetch)
+        self.assertEqual(calls[-1], ["a"])
+
 
 if __name__ == '__main__':
     unittest.main()
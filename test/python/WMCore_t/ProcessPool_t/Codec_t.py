@@ -0,0 +1,76 @@
+"""
+_Codec_t_
+
+Unit tests for the ProcessPool codecs.
+"""
+
+import pickle
+import unittest
+
+from WMCore.ProcessPool.Codec import getCodec, CodecException, msgpack
+
+
+class CodecTest(unittest.TestCase):
+
+    def setUp(self):
+        self.items = [{"jobID": 1, "fwjrPath": "/path/to/Report.0.pkl",
+                       "outputs": [{"lfn": "/store/data/file.root", "size": 1024, "events": 100}]},
+                      "STOP", 12, None, [1, 2.5, "three"]]
+
+    def testJSONCodec(self):
+        """
+        _testJSONCodec_
+
+        Items survive a JSON round trip, as a single frame
+        """
+        codec = getCodec("json")
+        frames = codec.encode(self.items)
+        self.assertEqual(len(frames), 1)
+        self.assertEqual(codec.decode(frames), self.items)
+        return
+
+    def testPickleCodec(self):
+        """
+        _testPickleCodec_
+
+        Items survive a pickle round trip, large buffers are sent out-of-band
+        """
+        codec = getCodec("pickle")
+        self.assertEqual(codec.decode(codec.encode(self.items)), self.items)
+
+        if pickle.HIGHEST_PROTOCOL >= 5:
+            payload = bytearray(b"x" * 1000000)
+            frames = codec.encode([pickle.PickleBuffer(payload), "small"])
+            self.assertEqual(len(frames), 2)
+            self.assertLess(len(frames[0]), 1000)
+            decoded = codec.decode(frames)
+            self.assertEqual(bytes(decoded[0]), bytes(payload))
+            self.assertEqual(decoded[1], "small")
+        return
+
+    def testMsgPackCodec(self):
+        """
+        _testMsgPackCodec_
+
+        Items survive a msgpack round trip, if msgpack is available
+        """
+        if msgpack is None:
+            self.assertRaises(CodecException, getCodec, "msgpack")
+            return
+        codec = getCodec("msgpack")
+        self.assertEqual(codec.decode(codec.encode(self.items)), self.items)
+        self.assertEqual(codec.decode(codec.encode([{1, 2}])), [[1, 2]])
+        return
+
+    def testUnknownCodec(self):
+        """
+        _testUnknownCodec_
+
+        Asking for an unknown codec raises an exception
+        """
+        self.assertRaises(CodecException, getCodec, "xml")
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -8,6 +8,7 @@ from builtins import range
 import unittest
 import nose
 
+from WMCore.ProcessPool import Codec
 from WMCore.ProcessPool.ProcessPool import ProcessPool
 from WMQuality.TestInit import TestInit
 
@@ -22,6 +23,8 @@ class ProcessPoolTest(unittest.TestCase):
         self.testInit.setDatabaseConnection(destroyAllDatabase = True)
         self.testInit.setSchema(customModules = ["WMCore.Agent.Database"],
                                 useDefault = False)
+        if not hasattr(self, 'assertItemsEqual'):
+            self.assertItemsEqual = self.assertCountEqual
         return
 
     def tearDown(self):
@@ -123,8 +126,78 @@ class ProcessPoolTest(unittest.TestCase):
             self.assertEqual(len(result), len(input),
                              "Error: Wrong number of results returned.")
 
+    def runBatchedPool(self, codec, batchSize, totalSlaves, inPort, outPort):
+        """
+        _runBatchedPool_
+
+        Run real slaves with the given codec and batch size, check the
+        results and return the pool metrics
+        """
+        config = self.testInit.getConfiguration()
+        config.Agent.useHeartbeat = False
+        self.testInit.generateWorkDir(config)
 
+        processPool = ProcessPool("ProcessPool_t.ProcessPoolTestWorker",
+                                  totalSlaves=totalSlaves,
+                                  componentDir=config.General.workDir,
+                                  namespace="WMCore_t",
+                                  config=config,
+                                  inPort=inPort,
+                                  outPort=outPort,
+                                  codec=codec,
+                                  batchSize=batchSize)
+        try:
+            work = [{"name": "COMMAND%d" % i, "lumis": list(range(i))} for i in range(23)]
+            processPool.enqueue(work)
+            result = processPool.dequeue(10)
+            self.assertEqual(len(result), 10)
+            result.extend(processPool.dequeue(13))
+            self.assertItemsEqual([item["name"] for item in result], [item["name"] for item in work])
+            self.assertEqual(sorted(result, key=lambda item: len(item["lumis"])), work)
+            return processPool.getMetrics()
+        finally:
+            processPool.close()
+
+    def testD_CodecBatchMetrics(self):
+        """
+        _testCodecBatchMetrics_
+
+        Run multiple workers with the pickle codec and batches of several items,
+        then check the pool and slave metrics
+        """
+        metrics = self.runBatchedPool("pickle", batchSize=5, totalSlaves=2, inPort='5565', outPort='5568')
+
+        # 23 items go in 5 batches, each answered by a single result batch
+        self.assertEqual(metrics['enqueuedItems'], 23)
+        self.assertEqual(metrics['enqueuedBatches'], 5)
+        self.assertEqual(metrics['receivedBatches'], 5)
+        self.assertEqual(metrics['dequeuedItems'], 23)
+        self.assertEqual(metrics['inFlight'], 0)
+        self.assertEqual(metrics['pendingResults'], 0)
+        self.assertTrue(metrics['encodeTime'] > 0)
+        self.assertTrue(metrics['decodeTime'] > 0)
+
+        self.assertTrue(1 <= len(metrics['slaves']) <= 2)
+        self.assertEqual(sum(slave['processed'] for slave in metrics['slaves'].values()), 23)
+        for pid, slave in metrics['slaves'].items():
+            self.assertEqual(slave['pid'], pid)
+            self.assertEqual(slave['received'], slave['processed'])
+            self.assertEqual(slave['inFlight'], 0)
+            self.assertEqual(slave['queueDepth'], 0)
+            self.assertTrue(slave['workTime'] >= 0)
+
+    def testE_MsgpackBatches(self):
+        """
+        _testMsgpackBatches_
 
+        Run a worker with the msgpack codec, with batches larger than the work
+        """
+        if Codec.msgpack is None:
+            raise nose.SkipTest("msgpack is not installed")
+        metrics = self.runBatchedPool("msgpack", batchSize=50, totalSlaves=1, inPort='5575', outPort='5578')
+        self.assertEqual(metrics['enqueuedBatches'], 1)
+        self.assertEqual(metrics['receivedBatches'], 1)
+        self.assertEqual(list(metrics['slaves'].values())[0]['processed'], 23)
 
 
 if __name__ == "__main__":
@@ -201,6 +201,32 @@ class ReqMgrTest(RESTBaseUnitTestWithDBBackend):
         self.assertEqual(self.resultLength(response), 1)
         self.assertEqual(list(response[0]['result'][0])[0], requestName)
 
+    def testBulkStatusTransitions(self):
+        """
+        test the bulk status transitions, with a result per request
+        """
+        requestName = self.insertRequest(self.rerecoCreateArgs)
+        data = [{'RequestName': requestName, 'RequestStatus': 'assignment-approved'},
+                {'RequestName': 'NotExistingRequest', 'RequestStatus': 'rejected'},
+                {'RequestName': requestName, 'RequestStatus': 'completed'},
+                {'RequestStatus': 'rejected'}]
+        response = self.jsonSender.post('data/request/bulk_status', data, incoming_headers=self.ppd_header)
+        self.assertEqual(response[1], 200)
+        results = response[0]['result']
+        self.assertEqual(len(results), 4)
+        self.assertEqual(results[0], {requestName: 'OK'})
+        self.assertTrue(results[1]['NotExistingRequest'].startswith('ERROR'))
+        self.assertTrue(results[2][requestName].startswith('ERROR'))
+        self.assertTrue(list(results[3].values())[0].startswith('ERROR'))
+
+        response = self.getRequestWithNoStale('status=assignment-approved')
+        self.assertEqual(self.resultLength(response), 1)
+
+        # the body must be a list of transitions
+        with self.assertRaises(HTTPException):
+            self.jsonSender.post('data/request/bulk_status', {requestName: 'rejected'},
+                                 incoming_headers=self.ppd_header)
+
     def atestRequestCombinedGetCall(self):
         """
         test request composite get call
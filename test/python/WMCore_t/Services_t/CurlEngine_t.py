@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+"""
+Unit tests for the CurlEngine module, against a local HTTP server
+"""
+
+from __future__ import division
+
+import gzip
+import http.server
+import json
+import socketserver
+import threading
+import time
+import unittest
+from http.client import HTTPException
+
+from WMCore.Services.CurlEngine import CurlEngine
+from WMCore.Services.Requests import JSONRequests
+from WMCore.Services.pycurl_manager import RequestHandler
+
+
+class EchoHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Reply with the verb, path and body of the request. Paths starting with
+    /flaky fail with 503 the first two times, /error fails with 404 and
+    /slow takes 0.2 s to reply.
+    """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def reply(self):
+        server = self.server
+        with server.lock:
+            server.running += 1
+            server.maxRunning = max(server.maxRunning, server.running)
+            server.calls[self.path] = server.calls.get(self.path, 0) + 1
+            calls = server.calls[self.path]
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length).decode() if length else ''
+            if self.path.startswith('/slow'):
+                time.sleep(0.2)
+            status = 200
+            if self.path.startswith('/error') or (self.path.startswith('/flaky') and calls <= 2):
+                status = 503 if self.path.startswith('/flaky') else 404
+            data = json.dumps({'verb': self.command, 'path': self.path, 'body': body}).encode()
+            if self.path.startswith('/big'):
+                data = gzip.compress(b'x' * 1000000)
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            if self.path.startswith('/big'):
+                self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        finally:
+            with server.lock:
+                server.running -= 1
+
+    do_GET = do_POST = do_PUT = do_DELETE = reply
+
+    def log_message(self, *args):
+        pass
+
+
+class EchoServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+class CurlEngineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = EchoServer(("127.0.0.1", 0), EchoHandler)
+        self.server.lock = threading.Lock()
+        self.server.running = self.server.maxRunning = 0
+        self.server.calls = {}
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = "http://127.0.0.1:%d" % self.server.server_address[1]
+        self.engine = CurlEngine(RequestHandler(), maxConcurrent=20, maxPerHost=4, backoff=0.01)
+
+    def tearDown(self):
+        self.engine.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def testVerbsAndErrors(self):
+        """All the verbs, HTTP errors and transport errors are reported through the futures"""
+        futures = [self.engine.submit(self.url + '/data', {'i': i}, verb=verb, encode=True, decode=True)
+                   for i, verb in enumerate(['GET', 'POST', 'PUT', 'DELETE'])]
+        futures.append(self.engine.submit(self.url + '/error'))
+        futures.append(self.engine.submit("http://127.0.0.1:1/closed"))
+        futures.append(self.engine.submit(self.url + '/data', parser=lambda header, data: header.status))
+        results = [future.result()[1] for future in futures[:4]]
+        self.assertEqual(results[0], {'verb': 'GET', 'path': '/data?i=0', 'body': ''})
+        self.assertEqual(results[1], {'verb': 'POST', 'path': '/data', 'body': '{"i": 1}'})
+        self.assertEqual([res['verb'] for res in results[2:]], ['PUT', 'DELETE'])
+        with self.assertRaises(HTTPException) as ctx:
+            futures[4].result()
+        self.assertEqual(ctx.exception.status, 404)
+        self.assertRaises(Exception, futures[5].result)
+        self.assertEqual(futures[6].result(), 200)
+        self.assertEqual(self.engine.getStats(), {'submitted': 7, 'completed': 5, 'failed': 2})
+
+    def testConcurrencyAndRetries(self):
+        """Requests run concurrently within the per host limit, and are retried"""
+        start = time.time()
+        futures = self.engine.submitBatch([{'url': self.url + '/slow%d' % i} for i in range(12)])
+        for future in futures:
+            self.assertEqual(future.result()[0].status, 200)
+        # 12 requests of 0.2 s, 4 at a time
+        self.assertLess(time.time() - start, 1.5)
+        self.assertEqual(self.server.maxRunning, 4)
+
+        future = self.engine.submit(self.url + '/flaky1', retries=1)
+        with self.assertRaises(HTTPException) as ctx:
+            future.result()
+        self.assertEqual(ctx.exception.status, 503)
+        future = self.engine.submit(self.url + '/flaky2', retries=2, decode=True)
+        self.assertEqual(future.result()[1]['path'], '/flaky2')
+        self.assertEqual(self.engine.getStats()['retried'], 3)
+
+    def testStreaming(self):
+        """The body is handed, decompressed, to the stream callback"""
+        chunks = []
+        future = self.engine.submit(self.url + '/big', streamCallback=chunks.append)
+        header, data = future.result()
+        self.assertIsNone(data)
+        self.assertEqual(header.status, 200)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(b''.join(chunks), b'x' * 1000000)
+
+        def failingCallback(chunk):
+            raise ValueError("cannot handle %d bytes" % len(chunk))
+
+        future = self.engine.submit(self.url + '/big', streamCallback=failingCallback, retries=3)
+        self.assertRaises(ValueError, future.result)
+        self.assertNotIn('retried', self.engine.getStats())
+
+    def testClose(self):
+        """Closing the engine cancels the requests not started yet"""
+        engine = CurlEngine(RequestHandler(), maxConcurrent=1)
+        futures = [engine.submit(self.url + '/slow%d' % i) for i in range(3)]
+        time.sleep(0.1)
+        engine.close()
+        self.assertEqual(futures[0].result()[0].status, 200)
+        self.assertTrue(all(future.cancelled() for future in futures[1:]))
+        self.assertRaises(RuntimeError, engine.submit, self.url + '/data')
+
+    def testRequestsBatch(self):
+        """Requests hands a batch of requests to the engine"""
+        requests = JSONRequests(self.url, {'cachepath': None, 'key': 'dummy', 'cert': 'dummy'})
+        batch = [{'uri': '/slow%d' % i, 'data': {'i': i}} for i in range(4)]
+        batch.append({'uri': '/data', 'data': {'i': 4}, 'verb': 'POST'})
+        futures = requests.submitRequests(batch, engine=self.engine)
+        results = [future.result() for future in futures]
+        self.assertEqual([res[0]['path'] for res in results[:4]], ['/slow%d?i=%d' % (i, i) for i in range(4)])
+        self.assertEqual(results[4][0]['body'], '{"i": 4}')
+        self.assertEqual(results[4][1:], (200, 'OK', False))
+        self.assertEqual(self.server.maxRunning, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
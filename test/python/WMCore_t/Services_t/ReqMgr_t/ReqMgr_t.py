@@ -141,6 +141,37 @@ class ReqMgrTest(RESTBaseUnitTestWithDBBackend):
         response = self.reqSvc.getRequestByStatus('acquired')
         self.assertEqual(len(response), 1)
 
+    def testBulkStatusTransitions(self):
+        """
+        Test the status-only transitions of many requests, valid or not, in bulk
+        """
+        reqNames = [self.reqSvc.insertRequests(self.rerecoCreateArgs)[0]['request'] for _ in range(2)]
+
+        transitions = {reqNames[0]: 'assignment-approved', reqNames[1]: 'running-open',
+                       'NotExistingRequest': 'rejected'}
+        response = self.reqSvc.updateRequestsStatus(transitions, chunkSize=2)
+        self.assertEqual(set(response), set(transitions))
+        self.assertEqual(response[reqNames[0]], "OK")
+        self.assertTrue(response[reqNames[1]].startswith("ERROR"))
+        self.assertTrue(response['NotExistingRequest'].startswith("ERROR"))
+
+        response = self.reqSvc.getRequestByNames(reqNames)[0]
+        self.assertEqual(response[reqNames[0]]['RequestStatus'], 'assignment-approved')
+        self.assertEqual(response[reqNames[1]]['RequestStatus'], 'new')
+
+        # assignments and extra arguments are rejected, while the rest of the bulk goes through
+        self.reqSvc['requests'].additionalHeaders = self.ops_header
+        transitions = [{"RequestName": reqNames[0], "RequestStatus": "assigned"},
+                       {"RequestName": reqNames[1], "RequestStatus": "rejected", "Team": "unittest"},
+                       {"RequestName": reqNames[1], "RequestStatus": "assignment-approved", "cascade": False}]
+        response = self.reqSvc["requests"].post('request/bulk_status', transitions)[0]['result']
+        self.assertEqual([list(item)[0] for item in response], [reqNames[0], reqNames[1], reqNames[1]])
+        self.assertTrue(list(response[0].values())[0].startswith("ERROR"))
+        self.assertTrue(list(response[1].values())[0].startswith("ERROR"))
+        self.assertEqual(list(response[2].values())[0], "OK")
+        response = self.reqSvc.getRequestByStatus('assignment-approved')
+        self.assertEqual(len(response), 2)
+
     def testRequestClone(self):
         """
         Test making a clone of a given request
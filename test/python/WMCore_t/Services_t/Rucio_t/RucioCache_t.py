@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+"""
+Unit tests for the read-through cache of the Rucio service class
+"""
+from __future__ import division
+
+import time
+import unittest
+from collections import Counter
+
+from WMCore.Services.Rucio.Rucio import Rucio
+from WMCore.Services.Rucio.RucioCache import RucioCache
+
+DSET = "/ZeroBias/Run2016B-UL16_ver2_forHarvestOnly-v1/DQMIO"
+
+
+class FakeClient(object):
+    """
+    Rucio client counting the calls made to it
+    """
+
+    def __init__(self):
+        self.calls = Counter()
+
+    def get_did(self, scope, name, dynamic=False):
+        self.calls['get_did'] += 1
+        return {'scope': scope, 'name': name, 'type': 'CONTAINER', 'bytes': 10}
+
+    def list_replication_rules(self, filters):
+        self.calls['list_replication_rules'] += 1
+        return iter([{'id': 'rule%d' % self.calls['list_replication_rules'], 'name': filters['name']}])
+
+    def add_replication_rule(self, dids, copies, rseExpression, **kwargs):
+        self.calls['add_replication_rule'] += 1
+        return ['newRule']
+
+    def list_rses(self, rseExpr):
+        self.calls['list_rses'] += 1
+        return iter([{'rse': 'T1_US_FNAL_Disk'}, {'rse': 'T1_US_FNAL_Tape'}])
+
+
+class RucioCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        # every test uses its own server URL, thus its own cache
+        self.hostUrl = "http://rucio.%s.cern.ch" % self._testMethodName
+        self.client = FakeClient()
+        self.rucio = Rucio("wma_test", hostUrl=self.hostUrl, client=self.client,
+                           configDict={"cacheTTLs": {"getDID": 100, "listDataRules": 100}})
+
+    def testReadThrough(self):
+        """Calls are served from the cache within the TTL and the current cycle"""
+        for _ in range(3):
+            self.assertEqual(self.rucio.getDID(DSET)['name'], DSET)
+        self.rucio.getDID(DSET, dynamic=False)
+        self.rucio.getDID(didName=DSET, dynamic=False)
+        self.assertEqual(self.client.calls['get_did'], 2)
+
+        # results are copies, and generators are cached as lists
+        self.rucio.getDID(DSET)['name'] = 'changed'
+        self.assertEqual(self.rucio.getDID(DSET)['name'], DSET)
+        self.assertEqual(self.rucio.listDataRules(DSET, account="wma_test"), [{'id': 'rule1', 'name': DSET}])
+        self.assertEqual(self.rucio.listDataRules(DSET, account="wma_test"), [{'id': 'rule1', 'name': DSET}])
+
+        # another object using the same server shares the data of its cycle
+        rucio2 = Rucio("wma_test", hostUrl=self.hostUrl, client=self.client,
+                       configDict={"cacheTTLs": {"getDID": 100}})
+        rucio2.getDID(DSET)
+        self.assertEqual(self.client.calls['get_did'], 2)
+        rucio2.newCycle()
+        rucio2.getDID(DSET)
+        self.rucio.getDID(DSET)
+        self.assertEqual(self.client.calls['get_did'], 3)
+
+        # statistics are those of each object in its current cycle
+        stats = self.rucio.getCacheStats()
+        self.assertEqual(stats['getDID'], {'hits': 6, 'misses': 2, 'entries': 2, 'hit_rate': 0.75})
+        self.assertEqual(stats['listDataRules']['hits'], 1)
+        self.assertEqual(rucio2.getCacheStats()['getDID'], {'hits': 0, 'misses': 1, 'entries': 2, 'hit_rate': 0.0})
+        self.rucio.newCycle()
+        self.assertEqual(self.rucio.getCacheStats(), {})
+
+    def testInvalidation(self):
+        """Rule changes drop the cached rules, RSE expressions follow the useCache flag"""
+        self.rucio.listDataRules(DSET)
+        self.rucio.createReplicationRule(DSET, "T1_US_FNAL_Disk")
+        self.assertEqual(self.rucio.listDataRules(DSET), [{'id': 'rule2', 'name': DSET}])
+        self.assertEqual(self.client.calls['list_replication_rules'], 2)
+
+        self.assertEqual(self.rucio.evaluateRSEExpression("tier=1", returnTape=False), ['T1_US_FNAL_Disk'])
+        self.assertEqual(len(self.rucio.evaluateRSEExpression("tier=1")), 2)
+        self.rucio.evaluateRSEExpression("tier=1", useCache=False)
+        self.assertEqual(self.client.calls['list_rses'], 2)
+        # RSE expressions are kept across cycles
+        self.rucio.newCycle()
+        self.rucio.evaluateRSEExpression("tier=1")
+        self.assertEqual(self.client.calls['list_rses'], 2)
+        self.rucio.clearCache("evaluateRSEExpression")
+        self.rucio.evaluateRSEExpression("tier=1")
+        self.assertEqual(self.client.calls['list_rses'], 3)
+
+    def testPrefill(self):
+        """The cache can be filled with bulk data, or concurrently"""
+        self.rucio.prefillCache("getDID", {'name': 'prefilled'}, DSET)
+        self.assertEqual(self.rucio.getDID(DSET), {'name': 'prefilled'})
+        names = ["%s-%d" % (DSET, idx) for idx in range(20)]
+        results = self.rucio.warmCache("getDID", names + [{'didName': DSET, 'dynamic': False}])
+        self.assertEqual([res['name'] for res in results], names + [DSET])
+        for name in names:
+            self.rucio.getDID(name)
+        self.assertEqual(self.client.calls['get_did'], 21)
+
+    def testExpiration(self):
+        """Entries older than their TTL are neither used nor kept"""
+        cache = RucioCache()
+        cache.put("getDID", "key", {'name': DSET})
+        self.assertEqual(cache.get("getDID", "key", 100), (True, {'name': DSET}))
+        self.assertEqual(cache.get("getDID", "key", 100, notBefore=time.time() + 1), (False, None))
+        time.sleep(0.2)
+        self.assertEqual(cache.get("getDID", "key", 0.1), (False, None))
+        cache.expire(0.1)
+        self.assertEqual(cache.getStats({'getDID': Counter()})['getDID']['entries'], 0)
+
+    def testBlockRules(self):
+        """Rules created on blocks drop the cached locations of their container"""
+        self.rucio.cacheTTLs["getContainerLockedAndAvailable"] = 100
+        key = '{"name": "%s"}' % DSET
+        self.rucio.cache.put("getContainerLockedAndAvailable", key, ["T1_US_FNAL_Disk"])
+        self.rucio.cache.put("getContainerLockedAndAvailable", '{"name": "/Other/Container/AOD"}', [])
+        self.rucio.createReplicationRule([DSET + "#block1"], "T2_CH_CERN")
+        entries = self.rucio.cache.entries["getContainerLockedAndAvailable"]
+        self.assertEqual(list(entries), ['{"name": "/Other/Container/AOD"}'])
+
+
+if __name__ == '__main__':
+    unittest.main()
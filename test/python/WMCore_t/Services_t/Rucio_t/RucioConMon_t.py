@@ -5,16 +5,74 @@ _RucioConMon_t_
 Unit tests for RucioConMon WMCore Service class
 """
 
+import gzip
+import os
+import shutil
+import tempfile
+import threading
 import unittest
+from http.client import HTTPException
+from http.server import BaseHTTPRequestHandler, HTTPServer
 
 from WMCore.Services.RucioConMon.RucioConMon import RucioConMon
 
 
+class FakeConMonHandler(BaseHTTPRequestHandler):
+    """
+    Serve a gzipped unmerged files dump, with a gzip content encoding,
+    or an error for the RSEs named 'Broken'
+    """
+    requestHeaders = []
+
+    def do_GET(self):
+        self.requestHeaders.append(dict(self.headers))
+        if "Broken" in self.path:
+            self.send_response(500)
+            self.end_headers()
+            self.wfile.write(b"server error")
+            return
+        body = gzip.compress(gzip.compress(b"/store/unmerged/file1.root\n/store/unmerged/file2.root\n"))
+        self.send_response(200)
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
 class RucioConMonTest(unittest.TestCase):
     """
     Unit tests for RucioConMon Service module
     """
 
+    def testGetRSEUnmergedStreamed(self):
+        """
+        The zipped dump is streamed to the cache file with the Requests headers,
+        and failed downloads leave no partial file behind
+        """
+        server = HTTPServer(("127.0.0.1", 0), FakeConMonHandler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        cacheDir = tempfile.mkdtemp()
+        try:
+            url = "http://127.0.0.1:%d/rucioconmon/unmerged/" % server.server_port
+            mgr = RucioConMon(url, configDict={'cachepath': cacheDir, 'key': 'dummy', 'cert': 'dummy'})
+            self.assertEqual(list(mgr.getRSEUnmerged("T2_XX_Site", zipped=True)),
+                             ["/store/unmerged/file1.root", "/store/unmerged/file2.root"])
+            headers = FakeConMonHandler.requestHeaders[-1]
+            self.assertEqual(headers["User-Agent"], "WMCore.Services.Requests/v002")
+            self.assertEqual(headers["Accept"], "application/json")
+
+            self.assertRaises(HTTPException, list, mgr.getRSEUnmerged("T2_XX_Broken", zipped=True))
+            self.assertEqual(os.listdir(mgr['cachepath']), [os.path.basename(mgr.cacheFileName("T2_XX_Site.zipped"))])
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+            shutil.rmtree(cacheDir)
+
     def testGetRSEUnmerged(self):
         """
         Test getRSEUnmerged method using both zipped and unzipped requests
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+"""
+Unit tests for the in-memory layer of the Service cache
+"""
+
+from __future__ import division
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from WMCore.Services.Service import Service
+from WMCore.Services.ServiceCache import ServiceMemoryCache, getServiceMemoryCache, pruneCacheDir
+
+
+class CountingService(Service):
+    """
+    Service writing the number of calls to getData in the cache file,
+    instead of querying a remote service
+    """
+
+    def __init__(self, cfg_dict):
+        Service.__init__(self, cfg_dict)
+        self.calls = 0
+        self.delay = 0
+
+    def getData(self, cachefile, url, inputdata=None, incoming_headers=None,
+                encoder=True, decoder=True, verb='GET', contentType=None, force_refresh=False, binary=False):
+        self.calls += 1
+        time.sleep(self.delay)
+        with open(cachefile, 'w') as fd:
+            fd.write("call %d" % self.calls)
+
+
+class ServiceCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cacheDir = tempfile.mkdtemp()
+        self.service = CountingService({'endpoint': 'https://cmsweb.cern.ch/', 'cachepath': self.cacheDir,
+                                        'key': 'dummy', 'cert': 'dummy', 'cacheduration': 1})
+        getServiceMemoryCache().clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.cacheDir, ignore_errors=True)
+
+    def testLRU(self):
+        """Entries are bounded in number and size, and follow the files on disk"""
+        memCache = ServiceMemoryCache(maxEntries=2, maxBytes=10)
+        fileNames = [os.path.join(self.cacheDir, "file%d" % idx) for idx in range(3)]
+        for idx, fileName in enumerate(fileNames):
+            with open(fileName, 'w') as fd:
+                fd.write("data%d" % idx)
+            self.assertEqual(memCache.get(fileName, False), "data%d" % idx)
+        self.assertEqual(memCache.get(fileNames[2], True), b"data2")
+        stats = memCache.getStats()
+        self.assertEqual((stats['entries'], stats['bytes'], stats['evictions'], stats['misses']), (2, 10, 2, 4))
+        self.assertEqual(memCache.get(fileNames[2], False), "data2")
+        self.assertEqual(memCache.getStats()['hits'], 1)
+
+        with open(fileNames[2], 'w') as fd:
+            fd.write("new data\r\n")
+        self.assertEqual(memCache.get(fileNames[2], False), "new data\n")
+        os.remove(fileNames[2])
+        self.assertIsNone(memCache.get(fileNames[2], False))
+        self.assertEqual(memCache.getStats()['entries'], 0)
+
+    def testRefreshCache(self):
+        """Hits are served from memory, refreshes are coalesced"""
+        for _ in range(3):
+            with self.service.refreshCache('api', '/api') as fd:
+                self.assertEqual(fd.read(), "call 1")
+        self.assertEqual(self.service.calls, 1)
+        self.assertEqual(getServiceMemoryCache().getStats()['hits'], 2)
+
+        self.service.clearCache('api')
+        self.service.delay = 0.2
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.service.refreshCache('api', '/api').read()))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ["call 2"] * 5)
+        self.assertEqual(self.service.calls, 2)
+        self.assertEqual(getServiceMemoryCache().getStats()['coalesced'], 4)
+
+    def testStaleWhileRevalidate(self):
+        """Stale data is returned while refreshed in the background"""
+        self.service['cacheduration'] = 0.0002  # less than a second
+        self.service['staleduration'] = 1
+        self.assertEqual(self.service.refreshCache('api', '/api').read(), "call 1")
+        time.sleep(2)
+        self.service.delay = 0.2
+        self.assertEqual(self.service.refreshCache('api', '/api').read(), "call 1")
+        time.sleep(0.5)
+        self.assertEqual(self.service.refreshCache('api', '/api').read(), "call 2")
+        self.assertEqual(getServiceMemoryCache().getStats()['stale_hits'], 1)
+
+    def testPruneCacheDir(self):
+        """The oldest cache files are removed beyond the size limit, other files are left"""
+        cacheDir = self.service['cachepath']
+        now = time.time()
+        for idx in range(5):
+            fileName = os.path.join(cacheDir, "123_GET_file%d" % idx)
+            with open(fileName, 'w') as fd:
+                fd.write("x" * 100)
+            os.utime(fileName, (now - 100 + idx, now - 100 + idx))
+        with open(os.path.join(cacheDir, "service.log"), 'w') as fd:
+            fd.write("x" * 1000)
+        with open(os.path.join(cacheDir, "123_GET_file5.tmp"), 'w') as fd:
+            fd.write("x" * 1000)
+        self.assertEqual(pruneCacheDir(cacheDir, 250), 3)
+        self.assertEqual(sorted(os.listdir(cacheDir)),
+                         ["123_GET_file3", "123_GET_file4", "123_GET_file5.tmp", "service.log"])
+        # pruned at most once per interval
+        self.assertEqual(pruneCacheDir(cacheDir, 0), 0)
+
+    def testCacheFileReplaced(self):
+        """Cache files are written aside and moved in place, never truncated"""
+        service = Service({'endpoint': 'https://cmsweb.cern.ch/', 'cachepath': self.cacheDir,
+                           'key': 'dummy', 'cert': 'dummy', 'cacheduration': 1})
+        cachefile = service.cacheFileName('api')
+        with open(cachefile, 'w') as fd:
+            fd.write("old data")
+        inode = os.stat(cachefile).st_ino
+        with open(cachefile) as reader:
+            with mock.patch.object(service['requests'], 'makeRequest',
+                                   return_value=({"new": "data"}, 200, "OK", False)):
+                service.getData(cachefile, '/api')
+            # an open reader keeps the complete previous content
+            self.assertEqual(reader.read(), "old data")
+        with open(cachefile) as fd:
+            self.assertEqual(json.load(fd), {"new": "data"})
+        self.assertNotEqual(os.stat(cachefile).st_ino, inode)
+        self.assertEqual(os.listdir(service["cachepath"]), [os.path.basename(cachefile)])
+
+        with mock.patch.object(service['requests'], 'makeRequest', return_value=(b"bin", 200, "OK", False)), \
+                mock.patch('WMCore.Services.Service.os.replace', side_effect=OSError("disk full")):
+            self.assertRaises(OSError, service.getData, cachefile, '/api', binary=True)
+        # the temporary file is removed, the cache file is left intact
+        self.assertEqual(os.listdir(service["cachepath"]), [os.path.basename(cachefile)])
+        with open(cachefile) as fd:
+            self.assertEqual(json.load(fd), {"new": "data"})
+
+
+if __name__ == '__main__':
+    unittest.main()
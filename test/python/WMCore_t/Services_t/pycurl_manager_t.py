@@ -7,11 +7,37 @@ from __future__ import division
 import gzip
 import os
 import tempfile
+import threading
+import time
 import unittest
 import traceback
+from http.client import HTTPException
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pycurl
+
 from Utils.CertTools import getKeyCertFromEnv
 from WMCore.Services.pycurl_manager import \
-        RequestHandler, ResponseHeader, getdata, cern_sso_cookie, decompress
+        RequestHandler, ResponseHeader, getdata, cern_sso_cookie, decompress, CurlPool
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    """Answer after the number of seconds given as path, 404 for other paths"""
+
+    def do_GET(self):
+        delay = self.path.strip('/')
+        if not delay.isdigit():
+            self.send_error(404)
+            return
+        time.sleep(int(delay))
+        body = b"done"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
 
 
 class PyCurlManager(unittest.TestCase):
@@ -44,6 +70,36 @@ class PyCurlManager(unittest.TestCase):
         data = decompress(gzipBody, headers)
         self.assertEqual(data, bytes(body, 'utf-8'))
 
+    def testCurlPool(self):
+        """
+        Test that handles are reused per host, and evicted once idle for too long
+        """
+        pool = CurlPool(maxSize=1, idleTimeout=300)
+        self.assertEqual(CurlPool.hostKey('https://cmsweb.cern.ch/dbs/blocks?x=1'),
+                         ('https', 'cmsweb.cern.ch'))
+        curl1 = pool.acquire('https://cmsweb.cern.ch/a')
+        curl2 = pool.acquire('https://cmsweb.cern.ch/b')
+        self.assertIsNot(curl1, curl2)
+        pool.release('https://cmsweb.cern.ch/a', curl1)
+        pool.release('https://cmsweb.cern.ch/b', curl2)
+        # only one idle handle is kept, and only for the same host
+        self.assertIs(pool.acquire('https://cmsweb.cern.ch/c'), curl1)
+        curl3 = pool.acquire('https://cms-cric.cern.ch/c')
+        self.assertIsNot(curl3, curl1)
+        pool.discard(curl3)
+        pool.release('https://cmsweb.cern.ch/c', curl1)
+        stats = pool.getStats()
+        self.assertEqual(stats['handles_new'], 3)
+        self.assertEqual(stats['handles_reused'], 1)
+        self.assertEqual(stats['handles_evicted'], 1)
+        self.assertEqual(stats['handles_discarded'], 1)
+        self.assertEqual(stats['handles_idle'], 1)
+
+        pool.idleTimeout = 0
+        self.assertIsNot(pool.acquire('https://cmsweb.cern.ch/d'), curl1)
+        self.assertEqual(pool.getStats()['handles_idle'], 0)
+        pool.close()
+
     def testMulti(self):
         """
         Test fetch of several urls at once, one of the url relies on CERN SSO.
@@ -312,5 +368,30 @@ class PyCurlManager(unittest.TestCase):
             pairs.add(pair)
         self.assertTrue(len(pairs), 100)
 
+    def testDownload(self):
+        """
+        Test that downloads stream to a file with the handler timeouts, and raise on HTTP errors
+        """
+        server = HTTPServer(("127.0.0.1", 0), SlowHandler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        url = "http://127.0.0.1:%d/" % server.server_port
+        try:
+            with tempfile.NamedTemporaryFile() as tfile:
+                mgr = RequestHandler({'timeout': 1, 'curl_pool': False})
+                header = mgr.download(url + "0", tfile.name)
+                self.assertEqual(header.status, 200)
+                with open(tfile.name, 'rb') as fd:
+                    self.assertEqual(fd.read(), b"done")
+                self.assertRaises(HTTPException, mgr.download, url + "missing", tfile.name)
+                with self.assertRaises(pycurl.error) as context:
+                    mgr.download(url + "3", tfile.name)
+                self.assertEqual(context.exception.args[0], pycurl.E_OPERATION_TIMEDOUT)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
 if __name__ == "__main__":
     unittest.main()
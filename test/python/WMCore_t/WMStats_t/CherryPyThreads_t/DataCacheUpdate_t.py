@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+"""
+Unit tests for the incremental updates of the WMStats DataCache
+"""
+from __future__ import division, print_function
+
+import logging
+import unittest
+
+from WMCore.WMStats.CherryPyThreads.DataCacheUpdate import DataCacheUpdate
+from WMCore.WMStats.DataStructs.DataCache import DataCache
+
+
+class FakeCouchDB(object):
+    """
+    CouchDB database serving a changes feed
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = 0
+
+    def changesSince(self, since=0, includeDocs=False, limit=None):
+        self.calls += 1
+        results = [row for row in self.rows if row['seq'] > since][:limit]
+        if not includeDocs:
+            results = [{key: val for key, val in row.items() if key != 'doc'} for row in results]
+        return {'results': results, 'last_seq': results[-1]['seq'] if results else since}
+
+
+class FakeReqDB(object):
+    """
+    ReqMgr database reader
+    """
+
+    def __init__(self, requests, rows):
+        self.requests = requests
+        self.couchDB = FakeCouchDB(rows)
+
+    def getDBInstance(self):
+        return self.couchDB
+
+    def getRequestByNames(self, names, detail=True):
+        return {name: dict(self.requests[name]) for name in names if name in self.requests}
+
+
+class FakeWMStatsReader(object):
+    """
+    WMStats reader, with the ReqMgr database
+    """
+
+    def __init__(self, reqDB, rows):
+        self.reqDB = reqDB
+        self.couchDB = FakeCouchDB(rows)
+
+    def getRequestDBInstance(self):
+        return self.reqDB
+
+    def getDBInstance(self):
+        return self.couchDB
+
+    def _updateRequestInfoWithJobInfo(self, requests):
+        for reqName, reqDict in requests.items():
+            reqDict["AgentJobInfo"] = {"agent1:9999": {"_id": "agent1:9999-%s" % reqName, "workflow": reqName}}
+
+
+def request(reqName, status, agentJobInfo=None):
+    reqDict = {"RequestName": reqName, "RequestStatus": status, "RequestType": "TaskChain"}
+    if agentJobInfo is not None:
+        reqDict["AgentJobInfo"] = agentJobInfo
+    return reqDict
+
+
+class DataCacheUpdateTests(unittest.TestCase):
+    """
+    Unit tests for the DataCacheUpdate changes feed handling
+    """
+
+    def setUp(self):
+        # the periodic task threads are not started
+        self.cacheUpdate = DataCacheUpdate.__new__(DataCacheUpdate)
+        self.cacheUpdate.logger = logging.getLogger()
+        self.cacheUpdate.getJobInfo = True
+        self.cacheUpdate.changesLimit = 2
+        self.cacheUpdate.reqmgrSeq = 10
+        self.cacheUpdate.wmstatsSeq = 20
+
+        self.jobDoc = {"_id": "agent1:9999-wfRunning", "workflow": "wfRunning", "agent_url": "agent1:9999",
+                       "type": "agent_request"}
+        DataCache.setlatestJobData({"wfRunning": request("wfRunning", "running-open",
+                                                         {"agent1:9999": self.jobDoc}),
+                                    "wfAssigned": request("wfAssigned", "assigned"),
+                                    "wfArchived": request("wfArchived", "completed", {}),
+                                    "wfDeleted": request("wfDeleted", "new")})
+
+    def testReadChanges(self):
+        """The changes feed is read in chunks, up to its last sequence"""
+        couchDB = FakeCouchDB([{'seq': seq, 'id': 'doc%d' % seq, 'doc': {'seq': seq}} for seq in range(1, 6)])
+        changes, lastSeq = self.cacheUpdate.readChanges(couchDB, 0, includeDocs=True)
+        self.assertEqual([docId for docId, _, _ in changes], ['doc1', 'doc2', 'doc3', 'doc4', 'doc5'])
+        self.assertEqual(changes[0], ('doc1', False, {'seq': 1}))
+        self.assertEqual(lastSeq, 5)
+        self.assertEqual(couchDB.calls, 3)
+
+        changes, lastSeq = self.cacheUpdate.readChanges(couchDB, lastSeq)
+        self.assertEqual((changes, lastSeq), ([], 5))
+
+    def testUpdateActiveData(self):
+        """Changed requests and agent documents are applied to the cache"""
+        requests = {"wfRunning": request("wfRunning", "running-open"),
+                    "wfAssigned": request("wfAssigned", "running-open"),
+                    "wfArchived": request("wfArchived", "normal-archived"),
+                    "wfNew": request("wfNew", "new")}
+        reqRows = [{'seq': 11, 'id': "wfRunning"}, {'seq': 12, 'id': "wfAssigned"},
+                   {'seq': 13, 'id': "wfArchived"}, {'seq': 14, 'id': "wfDeleted", 'deleted': True},
+                   {'seq': 15, 'id': "_design/ReqMgr"}, {'seq': 16, 'id': "wfNew"}]
+        newJobDoc = dict(self.jobDoc, _id="agent2:9999-wfRunning", agent_url="agent2:9999")
+        wmstatsRows = [{'seq': 21, 'id': newJobDoc['_id'], 'doc': newJobDoc},
+                       {'seq': 22, 'id': "agent2:9999-wfNew",
+                        'doc': dict(newJobDoc, _id="agent2:9999-wfNew", workflow="wfNew")},
+                       {'seq': 23, 'id': self.jobDoc['_id'], 'deleted': True},
+                       {'seq': 24, 'id': "otherDoc", 'doc': {"type": "other"}}]
+        wmstatsDB = FakeWMStatsReader(FakeReqDB(requests, reqRows), wmstatsRows)
+
+        self.cacheUpdate.updateActiveData(wmstatsDB)
+        self.assertEqual((self.cacheUpdate.reqmgrSeq, self.cacheUpdate.wmstatsSeq), (16, 24))
+
+        jobData = DataCache.getlatestJobData()
+        self.assertCountEqual(list(jobData), ["wfRunning", "wfAssigned", "wfNew"])
+        # the job information is kept, then updated from the agent documents
+        self.assertEqual(jobData["wfRunning"]["AgentJobInfo"], {"agent2:9999": newJobDoc})
+        # requests moved to a status with job information get it loaded
+        self.assertEqual(list(jobData["wfAssigned"]["AgentJobInfo"]), ["agent1:9999"])
+        # requests in a status without job information do not get any
+        self.assertNotIn("AgentJobInfo", jobData["wfNew"])
+        self.assertEqual(list(DataCache.filterData({'RequestStatus': 'running-open'}, ['RequestName'])),
+                         ["wfAssigned", "wfRunning"])
+
+        # nothing changed since
+        self.cacheUpdate.updateActiveData(wmstatsDB)
+        self.assertEqual(DataCache.getlatestJobData(), jobData)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,6 +7,7 @@ import os
 import unittest
 
 from Utils.PythonVersion import PY3
+from WMCore.ReqMgr.DataStructs.Request import RequestInfo
 from WMCore.WMStats.DataStructs.DataCache import DataCache
 
 
@@ -90,6 +91,64 @@ class DataCacheTests(unittest.TestCase):
         self.assertEqual("amaltaro_TaskChain_InclParents_HG1812_Validation_181203_121005_1483",
                          data[0]['RequestName'])
 
+    def testIndexedFilter(self):
+        """Filters on indexed properties give the same results as a full scan"""
+        reqData = DataCache.getlatestJobData()
+        reqTypes = set(reqDict['RequestType'] for reqDict in reqData.values())
+        campaigns = set(camp for reqDict in reqData.values() for camp in RequestInfo(reqDict).get('Campaign', []))
+        filters = [{'RequestType': reqType} for reqType in reqTypes]
+        filters += [{'Campaign': camp} for camp in campaigns]
+        filters.append({'RequestType': list(reqTypes)[:2], 'IncludeParents': 'True'})
+        filters.append({'RequestType': 'TaskChain', 'Campaign': list(campaigns)})
+        filters.append({'RequestStatus': ['unknown']})
+        for filterDict in filters:
+            expected = sorted(reqName for reqName, reqDict in reqData.items()
+                              if RequestInfo(reqDict).andFilterCheck(filterDict))
+            data = list(DataCache.filterDataByRequest(filterDict, maskList=['RequestType']))
+            self.assertEqual(sorted(item['RequestName'] for item in data), expected)
+        self.assertEqual(DataCache._candidates({'RequestStatus': ['unknown']}), set())
+
+    def testIncrementalUpdate(self):
+        """Requests and job information updated in place keep the indexes consistent"""
+        reqData = DataCache.getlatestJobData()
+        reqName = "amaltaro_TaskChain_InclParents_HG1812_Validation_181203_121005_1483"
+        reqDict = dict(reqData[reqName])
+        reqDict['RequestType'] = 'Resubmission'
+        reqDict['RequestStatus'] = 'running-open'
+        removedName = [name for name in reqData if name != reqName][0]
+        DataCache.updateRequests({reqName: reqDict}, removed=[removedName, 'notCached'])
+
+        self.assertEqual(19, len(DataCache.getlatestJobData()))
+        self.assertNotIn(removedName, DataCache.getlatestJobData())
+        self.assertEqual(20, len(reqData))  # readers still see the previous data
+        data = list(DataCache.filterData({'RequestType': 'Resubmission'}, ['RequestName']))
+        self.assertEqual([reqName], data)
+        self.assertNotIn('TaskChain', [item['RequestType'] for item in
+                                       DataCache.filterDataByRequest({'RequestName': reqName}, 'RequestType')])
+
+        jobDoc = {'_id': 'agent1:9999-%s' % reqName, 'workflow': reqName, 'agent_url': 'agent1:9999',
+                  'type': 'agent_request', 'status': {'success': 10}}
+        DataCache.updateJobInfo([jobDoc, dict(jobDoc, workflow='notCached')])
+        self.assertEqual({'agent1:9999': jobDoc}, DataCache.getlatestJobData()[reqName]['AgentJobInfo'])
+        DataCache.updateJobInfo([], deletedIDs=[jobDoc['_id']])
+        self.assertEqual({}, DataCache.getlatestJobData()[reqName]['AgentJobInfo'])
+        self.assertEqual([reqName], list(DataCache.filterData({'RequestType': 'Resubmission'}, ['RequestName'])))
+
+    def testJobInfoStatus(self):
+        """Requests in a status without job information do not get any, as for a full reload"""
+        reqName = "amaltaro_TaskChain_InclParents_HG1812_Validation_181203_121005_1483"
+        reqDict = dict(DataCache.getlatestJobData()[reqName], RequestStatus='announced')
+        reqDict.pop('AgentJobInfo', None)
+        DataCache.updateRequests({reqName: reqDict})
+        filterDict = {'RequestStatus': 'announced', 'AgentJobInfo': 'CLEANED'}
+        self.assertEqual([reqName], list(DataCache.filterData(filterDict, ['RequestName'])))
+
+        jobDoc = {'_id': 'agent1:9999-%s' % reqName, 'workflow': reqName, 'agent_url': 'agent1:9999',
+                  'type': 'agent_request', 'status': {'success': 10}}
+        DataCache.updateJobInfo([jobDoc])
+        self.assertNotIn('AgentJobInfo', DataCache.getlatestJobData()[reqName])
+        self.assertEqual([reqName], list(DataCache.filterData(filterDict, ['RequestName'])))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""
+    SiteWorkMatcher unit tests
+"""
+from __future__ import (print_function, division)
+
+import json
+import os
+import random
+import unittest
+
+from WMCore.WMBase import getTestBase
+from WMCore.WorkQueue.DataStructs.SiteWorkMatcher import PriorityJobCounter, SiteWorkMatcher
+from WMCore.WorkQueue.DataStructs.WorkQueueElement import WorkQueueElement, possibleSites
+
+
+class SiteWorkMatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        filePath = os.path.join(getTestBase(),
+                                "WMCore_t/WorkQueue_t/DataStructs_t/wq_available_elements.json")
+        with open(filePath, "r") as f:
+            gqData = json.load(f)
+
+        self.gqElements = [WorkQueueElement(**ele) for ele in gqData]
+
+    def testPriorityJobCounter(self):
+        """Number of jobs at or above a priority"""
+        rng = random.Random(12)
+        priorities = sorted(set(rng.randint(0, 300000) for _ in range(200)))
+        counter = PriorityJobCounter(priorities)
+        jobsByPrio = {}
+        for _ in range(1000):
+            prio = rng.choice(priorities)
+            jobs = rng.randint(0, 100)
+            counter.add(prio, jobs)
+            jobsByPrio[prio] = jobsByPrio.get(prio, 0) + jobs
+        for prio in priorities + [-1, 300001]:
+            expected = sum(jobs for p, jobs in jobsByPrio.items() if p >= prio)
+            self.assertEqual(counter.countAtOrAbove(prio), expected)
+
+    def testMatchingAndAccounting(self):
+        """Job counts match the sum over the site dictionary, also after accepting elements"""
+        sites = set()
+        for element in self.gqElements:
+            sites.update(possibleSites(element))
+        thresholds = {site: 3000 for site in sites}
+        siteJobCounts = {site: {50000: 100, 100000: 1500, 200000: 10} for site in sorted(sites)[::2]}
+
+        matcher = SiteWorkMatcher(thresholds, siteJobCounts, self.gqElements)
+        for element in self.gqElements:
+            candidates = matcher.candidateSites(element)
+            self.assertEqual(set(candidates), set(possibleSites(element)) & set(thresholds))
+            # the cached list must not be shuffled by the caller
+            candidates.reverse()
+            self.assertEqual(set(matcher.candidateSites(element)), set(candidates))
+            for site in candidates:
+                curJobCount = sum(jobs for prio, jobs in siteJobCounts.get(site, {}).items()
+                                  if prio >= element['Priority'])
+                self.assertEqual(matcher.jobCount(site, element['Priority']), curJobCount)
+                if matcher.hasSlots(site, element['Priority']):
+                    matcher.accept(element, site)
+                    break
+        self.assertLess(len(matcher.sitesCache), len(self.gqElements))
+        self.assertTrue(any(jobsByPrio.get(50000, 0) > 100 for jobsByPrio in siteJobCounts.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()